@@ -21,7 +21,6 @@ import os
 import re
 import signal
 import sqlite3
-import subprocess
 import sys
 import time
 import urllib.parse
@@ -49,6 +48,9 @@ try:
 except ImportError:
     _HAS_YAML = False
 
+from botsu.daemon_client import run as run_botsu
+from botsu.extfetch import ExternalFetcher, http_backend
+
 # === 設定 ===
 
 SCRIPT_DIR = Path(__file__).parent
@@ -57,6 +59,7 @@ DB_PATH = PROJECT_ROOT / "data" / "botsunichiroku.db"
 DREAMS_PATH = PROJECT_ROOT / "data" / "dreams.jsonl"
 DAILY_SUMMARY_PATH = PROJECT_ROOT / "data" / "dreams_daily.md"
 PID_FILE = PROJECT_ROOT / "data" / "baku.pid"
+EXTERNAL_CACHE_DIR = PROJECT_ROOT / "data" / "external_cache"
 
 DEFAULT_INTERVAL = 3600  # 1時間
 MAX_SEARCHES_PER_RUN = 5
@@ -270,14 +273,20 @@ def extract_nouns_simple(text: str) -> list[str]:
 # === 検索 ===
 
 
+# DDG Lite 取得（ディスクキャッシュ・サーキットブレーカ・合流は botsu/extfetch.py）
+_ddg_fetcher = ExternalFetcher(
+    "ddg_lite",
+    url_for=lambda q: "https://lite.duckduckgo.com/lite/?" + urllib.parse.urlencode({"q": q, "kl": "jp-jp"}),
+    cache_dir=EXTERNAL_CACHE_DIR,
+    backend=http_backend("Mozilla/5.0 (baku/1.0)"),
+    timeout=15,
+)
+
+
 def search_ddg(query: str) -> str | None:
     """DuckDuckGo Lite経由でWeb検索（API課金ゼロ）"""
     try:
-        params = urllib.parse.urlencode({"q": query, "kl": "jp-jp"})
-        url = f"https://lite.duckduckgo.com/lite/?{params}"
-        req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0 (baku/1.0)"})
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            html = resp.read().decode("utf-8", errors="replace")
+        html = _ddg_fetcher.fetch(query)
 
         results = []
         snippets = re.findall(r'result-snippet[^>]*>(.*?)</td>', html, re.DOTALL)
@@ -299,16 +308,10 @@ def search_ddg(query: str) -> str | None:
 
 
 def search_kousatsu(query: str) -> str | None:
-    """没日録CLI経由の内部検索"""
-    try:
-        result = subprocess.run(
-            [sys.executable, str(PROJECT_ROOT / "scripts" / "botsunichiroku.py"), "search", query],
-            capture_output=True, text=True, timeout=10,
-        )
-        if result.returncode == 0:
-            return result.stdout.strip()
-    except subprocess.TimeoutExpired:
-        pass
+    """没日録の内部検索（botsu serve 常駐があれば常駐、無ければ botsunichiroku.py をサブプロセスで実行。10秒で打ち切り）"""
+    result = run_botsu(["search", query], timeout=10)
+    if result.returncode == 0:
+        return result.stdout.strip()
     return None
 
 
@@ -17,13 +17,15 @@ Phase 1実装 (cmd_439 subtask_975)
 """
 from __future__ import annotations
 
-import subprocess
 import sys
 from pathlib import Path
 
-# botsunichiroku.pyへのパス（このスクリプトと同じディレクトリ）
+# botsuモジュールをimportできるようにする（scripts.bloom_router として import された場合も）
 _SCRIPTS_DIR = Path(__file__).resolve().parent
-_BOTSUNICHIROKU = str(_SCRIPTS_DIR / "botsunichiroku.py")
+if str(_SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(_SCRIPTS_DIR))
+
+from botsu.daemon_client import run as run_botsu  # noqa: E402
 
 
 def route(description: str, bloom_level: int) -> str:
@@ -37,14 +39,10 @@ def route(description: str, bloom_level: int) -> str:
         effort level: "low" | "medium" | "high" | "max"
     """
     # 没日録で類似タスクを検索し "Total hits: N" からヒット数を取得
+    # （botsu serve 常駐があれば常駐、無ければ botsunichiroku.py をサブプロセスで起動。10秒で打ち切り）
     similar_count = 0
     try:
-        result = subprocess.run(
-            ["python3", _BOTSUNICHIROKU, "search", description[:50]],
-            capture_output=True,
-            text=True,
-            timeout=10,
-        )
+        result = run_botsu(["search", description[:50]], timeout=10)
         for line in result.stdout.splitlines():
             if line.startswith("Total hits:"):
                 # "Total hits: 2  (showing 2)" → 2
@@ -6,8 +6,8 @@
 import json
 import os
 import sqlite3
-import subprocess
 import sys
+from collections import OrderedDict
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -27,6 +27,8 @@ DB_PATH = SHOGUN_ROOT / "data" / "botsunichiroku.db"
 
 def _try_notify(message: str, title: str = "", tags: str = "") -> None:
     """通知を試みる。失敗しても握りつぶす。"""
+    import subprocess  # 通知する書き込み系コマンドでだけ読み込む
+
     try:
         subprocess.Popen(
             [sys.executable, os.path.join(str(SCRIPT_DIR), "notify.py"),
@@ -41,8 +43,14 @@ def _try_notify(message: str, title: str = "", tags: str = "") -> None:
 # Database helpers
 # ---------------------------------------------------------------------------
 
+# botsunichiroku.py serve（botsu/daemon.py）の常駐中、コマンド実行の間だけ使い回す接続が入る
+_held_conn: sqlite3.Connection | None = None
+
+
 def get_connection() -> sqlite3.Connection:
     """Open a connection to botsunichiroku.db with WAL mode and foreign keys."""
+    if _held_conn is not None:
+        return _held_conn
     if not DB_PATH.exists():
         print(f"Error: database not found at {DB_PATH}", file=sys.stderr)
         print("Run 'python3 scripts/init_db.py' first.", file=sys.stderr)
@@ -110,42 +118,37 @@ def row_to_dict(row: sqlite3.Row) -> dict:
 # FTS5 helpers
 # ---------------------------------------------------------------------------
 
-try:
-    import MeCab as _MeCab
-    _MECAB_AVAILABLE = True
-except ImportError:
-    _MECAB_AVAILABLE = False
-
-_ALLOWED_POS = {"名詞", "動詞", "形容詞"}
-_fts5_tagger = None
-
-
-def _fts5_tokenize(text: str) -> str:
-    """MeCab分かち書き（利用可能な場合）。未インストール時はrawテキストを返す。"""
-    global _fts5_tagger
-    if not text:
-        return ""
-    if not _MECAB_AVAILABLE:
-        return text
-    if _fts5_tagger is None:
-        try:
-            _fts5_tagger = _MeCab.Tagger()
-        except Exception:
-            return text
+from botsu.index_sources import index_text as _fts5_tokenize
+
+# search_docs（外部コンテンツ索引の行表）を確認済みの接続（id(conn)）。存在した場合のみ覚える。
+# sqlite3.Connection は弱参照できないため件数で区切る（id の再利用による誤りは実行時エラーで外す）
+_search_docs_seen: OrderedDict[int, None] = OrderedDict()
+_SEARCH_DOCS_SEEN_MAX = 16
+
+
+def _has_search_docs(conn: sqlite3.Connection) -> bool:
+    key = id(conn)
+    if key in _search_docs_seen:
+        return True
+    found = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='search_docs'"
+    ).fetchone() is not None
+    if found:
+        _search_docs_seen[key] = None
+        if len(_search_docs_seen) > _SEARCH_DOCS_SEEN_MAX:
+            _search_docs_seen.popitem(last=False)
+    return found
+
+
+def _search_docs_execute(conn: sqlite3.Connection, sql: str, params: tuple) -> bool:
+    """search_docs への1文。表が消えていれば（別接続での作り直し等）確認済みを取り消して何もしない。"""
     try:
-        tokens = []
-        node = _fts5_tagger.parseToNode(text)
-        while node:
-            features = node.feature.split(",")
-            if features[0] in _ALLOWED_POS:
-                surface = node.surface.strip()
-                if surface:
-                    tokens.append(surface)
-            node = node.next
-        result = " ".join(tokens)
-        return result if result.strip() else text
-    except Exception:
-        return text
+        return conn.execute(sql, params).rowcount > 0
+    except sqlite3.OperationalError:
+        _search_docs_seen.pop(id(conn), None)
+        if _has_search_docs(conn):
+            raise
+        return False
 
 
 def fts5_upsert(
@@ -157,47 +160,45 @@ def fts5_upsert(
     worker_id: str,
     status: str,
     raw_text: str,
-) -> None:
-    """search_index FTS5テーブルをインクリメンタル更新する。
+    content: str | None = None,
+) -> bool:
+    """search_index（外部コンテンツFTS5）を1行更新する（botsu/indexer.py の drain から呼ばれる）。
 
-    search_indexが存在しない場合は何もしない（エラーにしない）。
+    search_docs が存在しない場合は何もしない（エラーにしない。存在確認は接続毎に1回）。
     MeCab利用可能なら分かち書き後投入、不可ならrawテキストをそのまま投入。
-    冪等設計: DELETE WHERE source_id=? → INSERT。
-    呼び出し元でconn.commit()が必要。
+    分かち書き済みの content を渡した場合は raw_text を解析しない（drain は書き込みロックの外で解析する）。
+    (source_type, source_id) の UNIQUE 索引で upsert し、FTS5 への反映は search_docs の
+    トリガが rowid 指定で行う。内容が同じなら更新しない。
+    行を追加・更新した場合に True（内容が同じなら False）。呼び出し元でconn.commit()が必要。
     """
-    exists = conn.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='search_index'"
-    ).fetchone()
-    if not exists:
-        return
-    content = _fts5_tokenize(raw_text)
-    conn.execute("DELETE FROM search_index WHERE source_id = ?", (source_id,))
-    conn.execute(
-        "INSERT INTO search_index"
+    if not _has_search_docs(conn):
+        return False
+    if content is None:
+        content = _fts5_tokenize(raw_text)
+    return _search_docs_execute(
+        conn,
+        "INSERT INTO search_docs"
         " (source_type, source_id, parent_id, project, worker_id, status, content)"
-        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+        " VALUES (?, ?, ?, ?, ?, ?, ?)"
+        " ON CONFLICT (source_type, source_id) DO UPDATE SET"
+        " parent_id = excluded.parent_id, project = excluded.project,"
+        " worker_id = excluded.worker_id, status = excluded.status, content = excluded.content"
+        " WHERE (parent_id, project, worker_id, status, content)"
+        " IS NOT (excluded.parent_id, excluded.project, excluded.worker_id, excluded.status, excluded.content)",
         (source_type, source_id, parent_id, project, worker_id, status, content),
     )
 
 
-def vec_upsert_if_available(
-    conn: sqlite3.Connection,
-    source_id: str,
-    source_type: str,
-    raw_text: str,
-    parent_id: str = "",
-    project: str = "",
-    created_at: str = "",
-) -> bool:
-    """ベクトルupsert。sentence-transformers未インストール時はスキップ。
+def fts5_delete(conn: sqlite3.Connection, source_type: str, source_id: str) -> bool:
+    """search_index から1行削除する。呼び出し元でconn.commit()が必要。
 
-    fts5_upsert()と対で呼ぶ。graceful degradation設計:
-    sqlite-vec / sentence-transformers が未インストールでもエラーにならない。
-    呼び出し元でconn.commit()が必要。
+    source_id は表をまたいで重複しうる（report/dashboard/diary/reply は数値ID）ため
+    source_type と組で指定する。削除した場合に True。
     """
-    try:
-        from botsu.vec import vec_upsert
-        return vec_upsert(conn, source_id, source_type, raw_text,
-                          parent_id, project, created_at)
-    except (ImportError, Exception):
+    if not _has_search_docs(conn):
         return False
+    return _search_docs_execute(
+        conn,
+        "DELETE FROM search_docs WHERE source_type = ? AND source_id = ?",
+        (source_type, source_id),
+    )
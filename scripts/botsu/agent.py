@@ -3,6 +3,7 @@
 import sys
 
 from . import get_connection, print_table, print_json, row_to_dict
+from .worker_stats import ensure_worker_stats, read_worker_stats, rebuild_worker_stats
 
 
 def agent_list(args) -> None:
@@ -59,3 +60,39 @@ def agent_update(args) -> None:
         print(f"Error: agent '{args.agent_id}' not found.", file=sys.stderr)
         sys.exit(1)
     print(f"Updated: {args.agent_id} -> status={args.status}")
+
+
+def agent_stats(args) -> None:
+    """足軽別統計をロールアップ表から表示する（初回はバックフィル）。"""
+    conn = get_connection()
+    created = ensure_worker_stats(conn)
+    if args.rebuild and not created:
+        rebuild_worker_stats(conn)
+    conn.commit()
+    results = read_worker_stats(conn, args.worker)
+    conn.close()
+
+    if args.json:
+        print_json(results)
+        return
+
+    if not results:
+        print("No worker stats found.")
+        return
+
+    headers = ["WORKER", "TOTAL", "DONE", "BLOCK", "CANCEL", "APPROVAL", "AVG_H", "REPORTS", "TOP_PROJECT"]
+    table_rows = []
+    for r in results:
+        avg = r["avg_completion_hours"]
+        table_rows.append([
+            r["worker_id"],
+            r["total_tasks"],
+            r["done"],
+            r["blocked"],
+            r["cancelled"],
+            f"{r['approval_rate']:.2f}",
+            f"{avg:.1f}" if avg is not None else "-",
+            r.get("report_count", 0),
+            r["top_project"] or "-",
+        ])
+    print_table(headers, table_rows, [12, 6, 6, 6, 6, 8, 6, 7, 16])
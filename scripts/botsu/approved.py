@@ -0,0 +1,297 @@
+"""approved.py — enrich の positive_patterns 用「承認済み作業」FTS5インデックス。
+
+高札 _extract_positive_patterns() / botsu search --enrich は従来、キーワード毎
+（最大5回）に audit PASS 済み subtasks × reports を LIKE '%kw%' で全件走査していた。
+本モジュールは承認済み作業だけを小さな表に保持し、トリガで差分更新する。
+
+  - approved_work    : audit_status='done' かつ done報告のある subtask 1件=1行
+                       body = description + done報告 summary（改行区切り）
+  - approved_fts     : approved_work.body の外部コンテンツ FTS5（trigram = 部分一致）
+  - approved_version : 変更毎に +1 する版数（検索結果キャッシュの無効化に使う）
+
+検索は1クエリ: 3文字以上のキーワードは approved_fts の MATCH（rank = bm25順）、
+trigram で引けない2文字以下のキーワードは共有トークン索引（没日録DB内 search_index。
+botsu/indexer.py が MeCab 分かち書きで維持）の MATCH で subtask / report を引き、
+該当した承認済み作業の body だけを LIKE で確かめる（キーワードは enrich の名詞抽出と
+同じトークナイザ由来なので語単位で引ける）。search_index の無いDBでは従来どおり
+approved_work.body の LIKE で補う。
+結果は (DB世代, 版数, キーワード集合) をキーにプロセス内でキャッシュする
+（search_index の反映待ち（index_queue）がある間の短いキーワードの結果はキャッシュしない）。
+
+高札コンテナへ単体でマウントされるため stdlib のみに依存する（botsu を import しない）。
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from collections import OrderedDict
+
+MAX_KEYWORDS = 5
+DEFAULT_LIMIT = 5
+CACHE_SIZE = 256
+_TRIGRAM_MIN = 3  # trigram トークナイザが MATCH できる最短文字数
+
+SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS approved_work (
+        subtask_id TEXT PRIMARY KEY,
+        project TEXT,
+        worker_id TEXT,
+        completed_at TEXT,
+        description TEXT,
+        body TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS approved_fts USING fts5(
+        body, content='approved_work', content_rowid='rowid', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS approved_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        epoch TEXT NOT NULL,            -- 作成・rebuild毎に変わる（別DB・再構築の識別）
+        version INTEGER NOT NULL
+    )
+    """,
+]
+
+
+def _refresh(subtask_id: str) -> str:
+    """subtask 1件の approved_work 行を作り直す（承認済みでなければ消すだけ）。"""
+    return f"""
+        DELETE FROM approved_work WHERE subtask_id = {subtask_id};
+        INSERT INTO approved_work (subtask_id, project, worker_id, completed_at, description, body)
+        SELECT s.id, s.project, s.worker_id, s.completed_at, s.description,
+               coalesce(s.description, '') || char(10) || group_concat(r.summary, char(10))
+        FROM subtasks s
+        JOIN reports r ON r.task_id = s.id AND r.status = 'done'
+        WHERE s.id = {subtask_id} AND s.audit_status = 'done'
+        GROUP BY s.id;
+    """
+
+
+_BUMP = "UPDATE approved_version SET version = version + 1 WHERE id = 1;"
+
+TRIGGERS_SQL = [
+    # approved_work → approved_fts（外部コンテンツ同期）+ 版数
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_approved_work_ins
+    AFTER INSERT ON approved_work BEGIN
+        INSERT INTO approved_fts (rowid, body) VALUES (NEW.rowid, NEW.body);
+        {_BUMP}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_approved_work_del
+    AFTER DELETE ON approved_work BEGIN
+        INSERT INTO approved_fts (approved_fts, rowid, body) VALUES ('delete', OLD.rowid, OLD.body);
+        {_BUMP}
+    END
+    """,
+    # subtasks / reports → approved_work
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_approved_subtask_ins
+    AFTER INSERT ON subtasks WHEN NEW.audit_status = 'done' BEGIN
+        {_refresh("NEW.id")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_approved_subtask_upd
+    AFTER UPDATE OF id, project, worker_id, description, audit_status, completed_at ON subtasks
+    WHEN OLD.audit_status = 'done' OR NEW.audit_status = 'done' BEGIN
+        DELETE FROM approved_work WHERE subtask_id = OLD.id;
+        {_refresh("NEW.id")}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_approved_subtask_del
+    AFTER DELETE ON subtasks WHEN OLD.audit_status = 'done' BEGIN
+        DELETE FROM approved_work WHERE subtask_id = OLD.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_approved_report_ins
+    AFTER INSERT ON reports WHEN NEW.status = 'done' BEGIN
+        {_refresh("NEW.task_id")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_approved_report_upd
+    AFTER UPDATE OF task_id, status, summary ON reports BEGIN
+        {_refresh("OLD.task_id")}
+        {_refresh("NEW.task_id")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_approved_report_del
+    AFTER DELETE ON reports WHEN OLD.status = 'done' BEGIN
+        {_refresh("OLD.task_id")}
+    END
+    """,
+]
+
+_REBUILD_SQL = [
+    "DELETE FROM approved_work",
+    "INSERT INTO approved_fts (approved_fts) VALUES ('delete-all')",
+    # 以下の INSERT は trg_approved_work_ins が approved_fts へ反映する
+    """
+    INSERT INTO approved_work (subtask_id, project, worker_id, completed_at, description, body)
+    SELECT s.id, s.project, s.worker_id, s.completed_at, s.description,
+           coalesce(s.description, '') || char(10) || group_concat(r.summary, char(10))
+    FROM subtasks s
+    JOIN reports r ON r.task_id = s.id AND r.status = 'done'
+    WHERE s.audit_status = 'done'
+    GROUP BY s.id
+    """,
+    """
+    INSERT INTO approved_version (id, epoch, version) VALUES (1, lower(hex(randomblob(8))), 0)
+    ON CONFLICT(id) DO UPDATE SET epoch = excluded.epoch, version = 0
+    """,
+]
+
+# --- 検索結果キャッシュ（(epoch, version, keywords, limit) → 結果） ---
+_cache: OrderedDict[tuple, list[dict]] = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_hits = 0
+_cache_misses = 0
+
+
+def ensure_approved_index(conn: sqlite3.Connection) -> bool:
+    """表・トリガを作成する。新規作成時はバックフィルしてTrueを返す。
+
+    既に存在する場合は sqlite_master の1行参照のみ。呼び出し元で conn.commit() が必要。
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='trg_approved_report_del'"
+    ).fetchone()
+    if exists:
+        return False
+    for sql in SCHEMA_SQL + TRIGGERS_SQL:
+        conn.execute(sql)
+    rebuild_approved_index(conn)
+    return True
+
+
+def rebuild_approved_index(conn: sqlite3.Connection) -> None:
+    """approved_work / approved_fts を全件再構築する。呼び出し元で conn.commit() が必要。"""
+    for sql in _REBUILD_SQL:
+        conn.execute(sql)
+
+
+def _fts_query(keywords: list[str]) -> str:
+    return " OR ".join('"' + kw.replace('"', '""') + '"' for kw in keywords)
+
+
+def _build_sql(long_kws: list[str], short_kws: list[str],
+               token_index: bool = True) -> tuple[str, list]:
+    branches: list[str] = []
+    params: list = []
+    if long_kws:
+        branches.append(
+            "SELECT rowid AS rid, rank AS score"
+            " FROM approved_fts WHERE approved_fts MATCH ?"
+        )
+        params.append(_fts_query(long_kws))
+    if short_kws:
+        like = " OR ".join("w.body LIKE '%' || ? || '%'" for _ in short_kws)
+        if token_index:
+            # search_index（語単位）で候補の subtask を引き、その承認済み作業だけ LIKE で確かめる
+            branches.append(
+                "SELECT w.rowid AS rid, 0.0 AS score FROM approved_work w"
+                " WHERE w.subtask_id IN ("
+                " SELECT CASE d.source_type WHEN 'subtask' THEN d.source_id ELSE d.parent_id END"
+                " FROM search_index JOIN search_docs d ON d.id = search_index.rowid"
+                " WHERE search_index MATCH ? AND d.source_type IN ('subtask', 'report'))"
+                f" AND ({like})"
+            )
+            params.append("content : (" + _fts_query(short_kws) + ")")
+        else:
+            branches.append(f"SELECT w.rowid AS rid, 0.0 AS score FROM approved_work w WHERE {like}")
+        params.extend(short_kws)
+    sql = f"""
+        WITH hits AS ({" UNION ALL ".join(branches)})
+        SELECT w.subtask_id, w.project, substr(w.description, 1, 120) AS description,
+               MIN(h.score) AS score
+        FROM hits h JOIN approved_work w ON w.rowid = h.rid
+        GROUP BY h.rid
+        ORDER BY score, w.completed_at DESC
+        LIMIT ?
+    """
+    return sql, params
+
+
+def search_approved(conn: sqlite3.Connection, keywords: list[str],
+                    limit: int = DEFAULT_LIMIT) -> list[dict]:
+    """承認済み作業をキーワード関連度順に返す（positive_patterns 形式）。
+
+    approved_* 表が無い場合は sqlite3.OperationalError。
+    """
+    global _cache_hits, _cache_misses
+    kws = sorted({kw for kw in keywords[:MAX_KEYWORDS] if kw})
+    if not kws:
+        return []
+    epoch, version = conn.execute(
+        "SELECT epoch, version FROM approved_version WHERE id = 1"
+    ).fetchone()
+    key = (epoch, version, tuple(kws), limit)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            _cache_hits += 1
+            return [dict(item) for item in cached]
+        _cache_misses += 1
+
+    long_kws = [kw for kw in kws if len(kw) >= _TRIGRAM_MIN]
+    short_kws = [kw for kw in kws if len(kw) < _TRIGRAM_MIN]
+    cacheable = True
+    try:
+        sql, params = _build_sql(long_kws, short_kws)
+        rows = conn.execute(sql, params + [limit]).fetchall()
+        if short_kws:
+            # 反映待ちの subtask / report は search_index にまだ無い（drain 後に結果が変わる）
+            cacheable = conn.execute("SELECT NOT EXISTS (SELECT 1 FROM index_queue)").fetchone()[0]
+    except sqlite3.OperationalError:
+        if not short_kws:
+            raise
+        sql, params = _build_sql(long_kws, short_kws, token_index=False)  # search_index 未作成
+        rows = conn.execute(sql, params + [limit]).fetchall()
+    strength = "high" if len(rows) >= 3 else "medium"
+    results = [
+        {
+            "source_id": subtask_id,
+            "project": project or "",
+            "description": f"{description} → audit PASS",
+            "strength": strength,
+            "hint": "この方向を継続せよ",
+        }
+        for subtask_id, project, description, _score in rows
+    ]
+
+    if cacheable:
+        with _cache_lock:
+            _cache[key] = results
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return [dict(item) for item in results]
+
+
+def cache_stats() -> dict:
+    with _cache_lock:
+        lookups = _cache_hits + _cache_misses
+        return {
+            "size": len(_cache),
+            "hits": _cache_hits,
+            "misses": _cache_misses,
+            "hit_ratio": round(_cache_hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def clear_cache() -> None:
+    global _cache_hits, _cache_misses
+    with _cache_lock:
+        _cache.clear()
+        _cache_hits = 0
+        _cache_misses = 0
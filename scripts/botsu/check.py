@@ -14,6 +14,10 @@ import sys
 from datetime import datetime
 
 from botsu import get_connection
+from botsu.orphans import (
+    CMD_ALL_DONE, CMD_PENDING, DONE_WITHOUT_REPORT, SUBTASK_ASSIGNED,
+    ensure_orphan_index, read_orphans,
+)
 from botsu.search import _extract_keywords
 
 
@@ -21,107 +25,41 @@ from botsu.search import _extract_keywords
 # check orphans  (main.py GET /check/orphans 移植)
 # ---------------------------------------------------------------------------
 
+_ORPHAN_CHECKS = [
+    (CMD_ALL_DONE, "全subtaskがdoneだがcmdがdoneでない"),
+    (CMD_PENDING, "7日以上pendingのcmd"),
+    (SUBTASK_ASSIGNED, "7日以上assignedのsubtask"),
+    (DONE_WITHOUT_REPORT, "doneなのにreportが0件のsubtask"),
+]
+
+
 def check_orphans(args) -> None:
     """矛盾・放置タスクを検出する（4種類のチェック）。
 
+    検出結果は botsu/orphans.py の差分インデックス（トリガ更新）から読む。
+    初回のみインデックスを作成・バックフィルする。
+
     Args:
         args: argparse.Namespace (未使用。将来の拡張用)
     """
     conn = get_connection()
-    checks: list[dict] = []
     try:
-        # (a) 全subtaskがdoneだがcmdがdoneでない
-        rows_a = conn.execute(
-            """
-            SELECT c.id AS cmd_id, c.status, COUNT(s.id) AS subtask_count
-            FROM commands c
-            JOIN subtasks s ON s.parent_cmd = c.id
-            WHERE c.status != 'done'
-            GROUP BY c.id
-            HAVING COUNT(s.id) > 0
-               AND COUNT(s.id) = SUM(CASE WHEN s.status = 'done' THEN 1 ELSE 0 END)
-            """
-        ).fetchall()
-        checks.append({
-            "check_type": "cmd_all_subtasks_done_but_pending",
-            "description": "全subtaskがdoneだがcmdがdoneでない",
-            "count": len(rows_a),
-            "items": [
-                {"cmd_id": r["cmd_id"], "status": r["status"], "subtask_count": r["subtask_count"]}
-                for r in rows_a
-            ],
-        })
-
-        # (b) 7日以上pendingのcmd
-        rows_b = conn.execute(
-            """
-            SELECT id AS cmd_id, status, created_at
-            FROM commands
-            WHERE status = 'pending'
-              AND created_at <= datetime('now', '-7 days')
-            """
-        ).fetchall()
-        checks.append({
-            "check_type": "cmd_pending_over_7_days",
-            "description": "7日以上pendingのcmd",
-            "count": len(rows_b),
-            "items": [
-                {"cmd_id": r["cmd_id"], "status": r["status"], "created_at": r["created_at"]}
-                for r in rows_b
-            ],
-        })
-
-        # (c) 7日以上assignedのsubtask
-        rows_c = conn.execute(
-            """
-            SELECT id AS subtask_id, parent_cmd, worker_id, assigned_at
-            FROM subtasks
-            WHERE status = 'assigned'
-              AND assigned_at <= datetime('now', '-7 days')
-            """
-        ).fetchall()
-        checks.append({
-            "check_type": "subtask_assigned_over_7_days",
-            "description": "7日以上assignedのsubtask",
-            "count": len(rows_c),
-            "items": [
-                {
-                    "subtask_id": r["subtask_id"],
-                    "parent_cmd": r["parent_cmd"],
-                    "worker_id": r["worker_id"],
-                    "assigned_at": r["assigned_at"],
-                }
-                for r in rows_c
-            ],
-        })
-
-        # (d) doneなのにreportが0件のsubtask
-        rows_d = conn.execute(
-            """
-            SELECT s.id AS subtask_id, s.parent_cmd, s.worker_id
-            FROM subtasks s
-            LEFT JOIN reports r ON r.task_id = s.id
-            WHERE s.status = 'done'
-              AND r.id IS NULL
-            """
-        ).fetchall()
-        checks.append({
-            "check_type": "subtask_done_without_report",
-            "description": "doneなのにreportが0件のsubtask",
-            "count": len(rows_d),
-            "items": [
-                {
-                    "subtask_id": r["subtask_id"],
-                    "parent_cmd": r["parent_cmd"],
-                    "worker_id": r["worker_id"],
-                }
-                for r in rows_d
-            ],
-        })
-
+        if ensure_orphan_index(conn):
+            conn.commit()
+        found = read_orphans(conn)
     finally:
         conn.close()
 
+    checks = [
+        {
+            "check_type": check_type,
+            "description": description,
+            "count": len(found[check_type]),
+            "items": found[check_type],
+        }
+        for check_type, description in _ORPHAN_CHECKS
+    ]
+
     total = sum(c["count"] for c in checks)
     ts = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
 
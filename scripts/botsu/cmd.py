@@ -2,7 +2,9 @@
 
 import sys
 
-from . import get_connection, next_counter, now_iso, print_table, print_json, row_to_dict, _try_notify, fts5_upsert, vec_upsert_if_available
+from . import get_connection, next_counter, now_iso, print_table, print_json, row_to_dict, _try_notify
+from .indexer import ensure_index_queue
+from .orphans import ensure_orphan_index
 
 
 def cmd_list(args) -> None:
@@ -58,16 +60,13 @@ def cmd_add(args) -> None:
     seq = next_counter(conn, "cmd_id")
     cmd_id = f"cmd_{seq:03d}"
     ts = now_iso()
+    ensure_index_queue(conn)  # 全文検索索引はトリガ→index_queue 経由で indexer が反映
     conn.execute(
         """INSERT INTO commands (id, timestamp, command, project, priority, status, assigned_karo, created_at, details)
            VALUES (?, ?, ?, ?, ?, 'pending', ?, ?, ?)""",
         (cmd_id, ts, args.description, args.project, args.priority, args.karo, ts, details),
     )
     conn.commit()
-    raw_text = f"{args.description} {details or ''}".strip()
-    fts5_upsert(conn, "command", cmd_id, "", args.project or "", args.karo or "", "pending", raw_text)
-    vec_upsert_if_available(conn, cmd_id, "command", raw_text, "", args.project or "", ts)
-    conn.commit()
     conn.close()
     print(f"Created: {cmd_id}")
 
@@ -90,22 +89,12 @@ def cmd_update(args) -> None:
         updates.append("completed_at = ?")
         params.append(now_iso())
 
+    ensure_orphan_index(conn)  # 矛盾検出インデックス・全文検索キューはトリガで差分更新
+    ensure_index_queue(conn)
     params.append(args.cmd_id)
     query = f"UPDATE commands SET {', '.join(updates)} WHERE id = ?"
     cursor = conn.execute(query, params)
     conn.commit()
-
-    if cursor.rowcount > 0:
-        row = conn.execute(
-            "SELECT command, details, project, assigned_karo FROM commands WHERE id = ?",
-            (args.cmd_id,),
-        ).fetchone()
-        if row:
-            raw_text = f"{row['command'] or ''} {row['details'] or ''}".strip()
-            fts5_upsert(conn, "command", args.cmd_id, "", row["project"] or "", row["assigned_karo"] or "", args.status, raw_text)
-            vec_upsert_if_available(conn, args.cmd_id, "command", raw_text, "", row["project"] or "")
-            conn.commit()
-
     conn.close()
 
     if cursor.rowcount == 0:
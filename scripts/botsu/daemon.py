@@ -0,0 +1,289 @@
+"""daemon.py — 没日録CLIの常駐実行（botsunichiroku.py serve）。
+
+baku の内部検索・bloom_router・inbox_read・勘定吟味役はクエリ毎に CLI を起動しており、
+毎回 python 起動・import・MeCab 初期化（hybrid 検索ではベクトルモデルの読込）を払っていた。
+
+本モジュールは Unixソケット（daemon_client.SOCKET_PATH）で待ち受け、CLI と同じ引数を
+JSON で受けてこのプロセス内で実行する。プロトコルは daemon_client.py を参照。
+
+  - 温存するもの : 全サブコマンドのモジュール・MeCab タガーと分かち書きLRU・
+                   ベクトルモデル（--warm-vec で起動時に読込）・DB接続
+  - DB接続      : HeldConnection を1本保持し get_connection() がそれを返す。
+                   コマンド側の close() は未確定の変更を捨てるだけで、次のコマンドでも使う。
+                   DBファイルが差し替わっていれば（inode 変化）開き直す
+  - 実行        : stdout/stderr/stdin/cwd はプロセス共通のため、コマンドは1件ずつ実行する。
+                   sys.exit() は終了コードとして返す（常駐は落ちない）
+
+serve 自身・index drain/embed --watch・--profile-import は常駐内では実行しない。
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Callable
+
+import botsu
+
+from .daemon_client import SOCKET_PATH, Result
+
+_exec_lock = threading.Lock()
+_parsers: dict[Callable, object] = {}
+_holder: "_ConnectionHolder | None" = None
+
+
+class HeldConnection(sqlite3.Connection):
+    """常駐が使い回す接続。close() は未確定の変更をロールバックするだけで接続は閉じない。"""
+
+    def close(self) -> None:
+        if self.in_transaction:
+            self.rollback()
+
+    def shutdown(self) -> None:
+        super().close()
+
+
+class _ConnectionHolder:
+    """DBファイル毎に HeldConnection を1本保持し、実行中だけ botsu.get_connection() に渡す。"""
+
+    def __init__(self) -> None:
+        self.conn: HeldConnection | None = None
+        self.identity: tuple | None = None
+        self.opened = 0
+
+    def attach(self) -> None:
+        path = botsu.DB_PATH
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.release()  # get_connection() が通常どおり「DBが無い」と報告する
+            return
+        identity = (str(path), st.st_dev, st.st_ino)
+        if self.conn is not None and self.identity != identity:
+            self.release()
+        if self.conn is None:
+            conn = sqlite3.connect(str(path), factory=HeldConnection, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.row_factory = sqlite3.Row
+            self.conn, self.identity = conn, identity
+            self.opened += 1
+        botsu._held_conn = self.conn
+
+    def detach(self) -> None:
+        botsu._held_conn = None
+        if self.conn is not None:
+            self.conn.close()
+
+    def release(self) -> None:
+        botsu._held_conn = None
+        if self.conn is not None:
+            self.conn.shutdown()
+        self.conn = self.identity = None
+
+
+def _refusal(args) -> str | None:
+    if args.entity == "serve":
+        return "serve cannot run inside botsu serve"
+    if getattr(args, "watch", 0):
+        return f"index {args.action} --watch cannot run inside botsu serve"
+    if getattr(args, "profile_import", False):
+        return "--profile-import cannot run inside botsu serve"
+    return None
+
+
+def _exit_code(exc: SystemExit) -> int:
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def run_argv(argv: list[str], stdin: str | None = None, cwd: str | None = None,
+             build_parser: Callable | None = None) -> Result:
+    """CLI の argv をこのプロセス内で実行し、終了コードと出力を返す（常駐から呼ばれる）。"""
+    if build_parser is None:
+        from botsunichiroku import build_parser
+    out, err = io.StringIO(), io.StringIO()
+    code = 0
+    with _exec_lock:
+        parser = _parsers.get(build_parser)
+        if parser is None:
+            parser = _parsers[build_parser] = build_parser()
+        prev_cwd = os.getcwd()
+        prev_stdin = sys.stdin
+        try:
+            with redirect_stdout(out), redirect_stderr(err):
+                try:
+                    if cwd and os.path.isdir(cwd):
+                        os.chdir(cwd)
+                    # stdin 無しのリクエストでも常駐自身の stdin は読ませない（ロックを握ったまま待たない）
+                    sys.stdin = io.StringIO(stdin if stdin is not None else "")
+                    if _holder is not None:
+                        _holder.attach()
+                    args = parser.parse_args(argv)
+                    reason = _refusal(args)
+                    if reason:
+                        print(f"Error: {reason}", file=sys.stderr)
+                        code = 2
+                    else:
+                        args.func(args)
+                except SystemExit as e:
+                    code = _exit_code(e)
+                except Exception:
+                    traceback.print_exc()
+                    code = 1
+        finally:
+            if _holder is not None:
+                _holder.detach()
+            sys.stdin = prev_stdin
+            os.chdir(prev_cwd)
+    return Result(code, out.getvalue(), err.getvalue())
+
+
+# ---------------------------------------------------------------------------
+# Unixソケットサーバー
+# ---------------------------------------------------------------------------
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError(req)
+        except ValueError:
+            resp = {"returncode": 2, "stdout": "", "stderr": "Error: invalid request\n"}
+        else:
+            resp = self.server.dispatch(req)
+        self.wfile.write(json.dumps(resp, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+class BotsuServer(socketserver.ThreadingUnixStreamServer):
+    """接続毎にスレッドで受け、実行は run_argv のロックで1件ずつ行う。"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, build_parser: Callable) -> None:
+        super().__init__(socket_path, _Handler)
+        self.build_parser = build_parser
+        self.started_at = time.time()
+        self._stats_lock = threading.Lock()
+        self._counts = {"requests": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+
+    def dispatch(self, req: dict) -> dict:
+        op = req.get("op", "run")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "stats":
+            return self.stats()
+        argv = req.get("argv")
+        if op != "run" or not isinstance(argv, list) or not all(isinstance(a, str) for a in argv):
+            return {"returncode": 2, "stdout": "", "stderr": "Error: invalid request\n"}
+        started = time.perf_counter()
+        result = run_argv(argv, stdin=req.get("stdin"), cwd=req.get("cwd"), build_parser=self.build_parser)
+        ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self._counts["requests"] += 1
+            self._counts["errors"] += result.returncode != 0
+            self._counts["total_ms"] += ms
+            self._counts["max_ms"] = max(self._counts["max_ms"], ms)
+        return {**result._asdict(), "ms": round(ms, 3)}
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            counts = dict(self._counts)
+        n = counts["requests"]
+        return {
+            "pid": os.getpid(),
+            "uptime_sec": round(time.time() - self.started_at, 1),
+            "requests": n,
+            "errors": counts["errors"],
+            "mean_ms": round(counts["total_ms"] / n, 3) if n else 0.0,
+            "max_ms": round(counts["max_ms"], 3),
+            "connections_opened": _holder.opened if _holder is not None else 0,
+        }
+
+
+def _claim_socket(path: str) -> None:
+    """前回の常駐が残したソケットファイルを片付ける。生きている常駐がいれば終了する。"""
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    print(f"Error: botsu serve is already listening on {path}", file=sys.stderr)
+    sys.exit(1)
+
+
+def _warm(modules: tuple[str, ...], warm_vec: bool) -> None:
+    for module in modules:
+        __import__(module)
+    from botsu import tokenizer
+
+    tokenizer.tokenize("没日録の常駐を起動")
+    if warm_vec:
+        from botsu.vec import _get_embedding
+
+        _get_embedding("warmup", mode="query")
+
+
+def make_server(socket_path: str, build_parser: Callable) -> BotsuServer:
+    """ソケットを作って BotsuServer を返す（serve_forever は呼び出し側）。"""
+    global _holder
+    _claim_socket(socket_path)
+    server = BotsuServer(socket_path, build_parser)
+    os.chmod(socket_path, 0o600)
+    _holder = _ConnectionHolder()
+    return server
+
+
+def close_server(server: BotsuServer) -> None:
+    global _holder
+    server.server_close()
+    try:
+        os.unlink(server.server_address)
+    except OSError:
+        pass
+    if _holder is not None:
+        _holder.release()
+        _holder = None
+
+
+def serve(args, build_parser: Callable, modules: tuple[str, ...] = ()) -> None:
+    """serve サブコマンド: SIGTERM/SIGINT で停止するまで待ち受ける。"""
+    path = args.socket or SOCKET_PATH
+    server = make_server(path, build_parser)
+    _warm(modules, args.warm_vec)
+
+    def _stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    print(f"botsu serve: listening on {path} (pid {os.getpid()})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        close_server(server)
+        print("botsu serve: stopped", file=sys.stderr)
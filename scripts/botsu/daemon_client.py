@@ -0,0 +1,102 @@
+"""daemon_client.py — 常駐 botsu serve（botsu/daemon.py）への薄いクライアント。
+
+baku / bloom_router / inbox_read のように没日録CLIを1クエリ毎に
+`python3 scripts/botsunichiroku.py ...` で起動していた呼び出し元向け。
+Unixソケット上の botsu serve に同じ引数を JSON で送り、起動・import・MeCab 初期化を省く。
+
+  - 常駐あり: ソケットに1行のJSONを送り、1行のJSONを受け取る（下記プロトコル）
+  - 常駐なし: 接続できなければ同じ引数で CLI をサブプロセス起動する（run のみ。call は None）。
+              どちらも timeout 秒で打ち切り、returncode=1 の Result を返す
+
+プロトコル（改行区切りJSON、1接続1リクエスト）:
+    → {"argv": ["search", "MeCab"], "stdin": null, "cwd": "/path"}
+    ← {"returncode": 0, "stdout": "...", "stderr": "...", "ms": 1.2}
+    → {"op": "stats"}  ← {"requests": N, ...}
+
+使用方法:
+    from botsu.daemon_client import run
+    result = run(["subtask", "show", "subtask_100"])
+    result.returncode, result.stdout
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import subprocess
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
+# 没日録DBと同じ data/ に置く（SHOGUN_ROOT が違えば別の常駐に繋がる）
+SOCKET_PATH = os.environ.get(
+    "BOTSU_SOCKET",
+    str(Path(os.environ.get("SHOGUN_ROOT", str(Path(__file__).resolve().parents[2]))) / "data" / "botsu.sock"),
+)
+DEFAULT_TIMEOUT = 10.0
+CLI_PATH = Path(__file__).resolve().parents[1] / "botsunichiroku.py"
+
+
+class Result(NamedTuple):
+    """subprocess.CompletedProcess と同じ属性名の実行結果。"""
+    returncode: int
+    stdout: str
+    stderr: str
+
+
+class DaemonError(RuntimeError):
+    """送信後に常駐との通信が失敗した（実行されたか不明なため再実行しない）。"""
+
+
+def request(payload: dict, socket_path: str | None = None, timeout: float = DEFAULT_TIMEOUT) -> dict | None:
+    """1リクエストを送って応答を返す。常駐に接続できなければ None。"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        try:
+            sock.connect(socket_path or SOCKET_PATH)
+        except OSError:
+            return None
+        try:
+            sock.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        except OSError as e:
+            raise DaemonError(f"botsu serve: {e}") from e
+        if not line:
+            raise DaemonError("botsu serve: connection closed without response")
+        return json.loads(line)
+    finally:
+        sock.close()
+
+
+def call(argv: list[str], stdin: str | None = None, socket_path: str | None = None,
+         timeout: float = DEFAULT_TIMEOUT) -> Result | None:
+    """常駐で argv を実行する。常駐が無ければ None。"""
+    try:
+        resp = request({"argv": list(argv), "stdin": stdin, "cwd": os.getcwd()}, socket_path, timeout)
+    except DaemonError as e:
+        return Result(1, "", str(e))
+    if resp is None:
+        return None
+    return Result(resp.get("returncode", 1), resp.get("stdout", ""), resp.get("stderr", ""))
+
+
+def run(argv: list[str], stdin: str | None = None, socket_path: str | None = None,
+        timeout: float = DEFAULT_TIMEOUT) -> Result:
+    """常駐があれば常駐で、無ければ CLI のサブプロセスで argv を実行する（どちらも timeout 付き）。
+
+    呼び出し元のプロセス内では実行しない（stdout/stdin/cwd の差し替えと時間無制限の実行を避ける）。
+    """
+    result = call(argv, stdin, socket_path, timeout)
+    if result is not None:
+        return result
+    try:
+        proc = subprocess.run(
+            [sys.executable, str(CLI_PATH), *argv],
+            input=stdin if stdin is not None else "", capture_output=True, text=True, timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return Result(1, "", f"botsunichiroku.py: timed out after {timeout:g}s")
+    return Result(proc.returncode, proc.stdout, proc.stderr)
@@ -1,28 +1,18 @@
 """dashboard サブコマンド — ダッシュボードエントリ管理。"""
 
-from . import get_connection, now_iso, print_table, fts5_upsert, vec_upsert_if_available
+from . import get_connection, now_iso, print_table
+from .indexer import ensure_index_queue
 
 
 def dashboard_add(args) -> None:
     conn = get_connection()
     ts = now_iso()
+    ensure_index_queue(conn)  # 全文検索索引はトリガ→index_queue 経由で indexer が反映
     cursor = conn.execute(
         "INSERT INTO dashboard_entries (cmd_id, section, content, status, tags, created_at) VALUES (?, ?, ?, ?, ?, ?)",
         (args.cmd, args.section, args.content, args.status, args.tags, ts),
     )
     entry_id = cursor.lastrowid
-    raw_text = " ".join(filter(None, [args.section, args.content]))
-    fts5_upsert(
-        conn,
-        source_type="dashboard",
-        source_id=str(entry_id),
-        parent_id=args.cmd or "",
-        project="",
-        worker_id=args.tags or "",
-        status=args.status or "",
-        raw_text=raw_text,
-    )
-    vec_upsert_if_available(conn, str(entry_id), "dashboard", raw_text, args.cmd or "")
     conn.commit()
     conn.close()
     print(f"Created: dashboard entry #{entry_id}")
@@ -4,7 +4,8 @@ import sqlite3
 import sys
 from datetime import datetime
 
-from . import get_connection, now_iso, print_table, print_json, row_to_dict, fts5_upsert, vec_upsert_if_available
+from . import get_connection, now_iso, print_table, print_json, row_to_dict
+from .indexer import ensure_index_queue
 
 
 DIARY_TABLE_SQL = """
@@ -38,6 +39,7 @@ def ensure_diary_table(conn: sqlite3.Connection) -> None:
 def diary_add(args) -> None:
     conn = get_connection()
     ensure_diary_table(conn)
+    ensure_index_queue(conn)  # 全文検索索引はトリガ→index_queue 経由で indexer が反映
     today = datetime.now().strftime("%Y-%m-%d")
     conn.execute(
         "INSERT INTO diary_entries (agent_id, date, cmd_id, subtask_id, summary, body, tags, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
@@ -45,18 +47,6 @@ def diary_add(args) -> None:
     )
     row = conn.execute("SELECT last_insert_rowid()").fetchone()
     diary_id = row[0]
-    raw_text = " ".join(filter(None, [args.summary, args.body]))
-    fts5_upsert(
-        conn,
-        source_type="diary",
-        source_id=str(diary_id),
-        parent_id=args.cmd or args.subtask or "",
-        project="",
-        worker_id=args.agent_id or "",
-        status="",
-        raw_text=raw_text,
-    )
-    vec_upsert_if_available(conn, str(diary_id), "diary", raw_text, args.cmd or args.subtask or "")
     conn.commit()
     conn.close()
     print(f"Created: diary entry #{diary_id}")
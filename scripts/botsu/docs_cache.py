@@ -0,0 +1,160 @@
+"""docs_cache.py — 静的ドキュメント配信用のメモリキャッシュ（高札 /docs/... / dat_server /docs/...）。
+
+エージェントはコンテキスト圧縮の度に同じ instructions/context/skill 文書を取り直すが、
+両サーバーとも毎リクエストでファイルを読み直していた。
+
+  - 有効性   : stat 1回の (st_ino, st_mtime_ns, st_size) が保存時と一致する間だけ使う
+               （ファイル更新・差し替えは次のリクエストで反映される）
+  - 容量上限 : 合計 MAX_BYTES（本文+gzip）を超えたら最も古く使われた文書から追い出す
+  - gzip     : GZIP_MIN_BYTES 以上の文書は読込時に gzip 版も作っておく
+  - 大きい文書: MAX_ENTRY_BYTES を超える文書はキャッシュせず、呼び出し側が
+               ファイルから直接（sendfile 等で）送る
+
+高札コンテナへ単体でマウントされるため stdlib のみに依存する（botsu を import しない）。
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import stat
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+MAX_BYTES = int(os.environ.get("DOCS_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+MAX_ENTRY_BYTES = int(os.environ.get("DOCS_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+GZIP_MIN_BYTES = int(os.environ.get("DOCS_CACHE_GZIP_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+
+
+class FileStat(NamedTuple):
+    path: str
+    ino: int
+    mtime_ns: int
+    size: int
+
+    @property
+    def mtime(self) -> float:
+        return self.mtime_ns / 1e9
+
+    @property
+    def etag(self) -> str:
+        """引用符付きの強いETag（ファイルの同一性と更新時刻・サイズから作る）。"""
+        key = f"{self.ino}|{self.mtime_ns}|{self.size}"
+        return f'"{hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]}"'
+
+    @property
+    def cacheable(self) -> bool:
+        return self.size <= MAX_ENTRY_BYTES
+
+    @property
+    def has_gzip(self) -> bool:
+        """gzip 版を持つか（stat だけで決まる。304 判定前に表現を選べるように）。"""
+        return GZIP_MIN_BYTES <= self.size <= MAX_ENTRY_BYTES
+
+
+class Doc(NamedTuple):
+    stat: FileStat
+    data: bytes
+    gzip: bytes | None
+
+
+def stat_file(path: str | os.PathLike) -> FileStat | None:
+    """通常ファイルなら FileStat を返す（stat 1回）。無い・ディレクトリ等は None。"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return FileStat(os.fspath(path), st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """Accept-Encoding が gzip を許すか（gzip;q=0 は拒否とみなす）。"""
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        q = params.strip().lower()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+class DocsCache:
+    """文書本文と gzip 版の LRU キャッシュ。スレッドセーフ。"""
+
+    def __init__(self, max_bytes: int = MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._docs: OrderedDict[str, Doc] = OrderedDict()
+        self._bytes = 0
+        self._counts = {"hits": 0, "misses": 0, "invalidated": 0, "evicted": 0, "uncached": 0}
+
+    @staticmethod
+    def _size(doc: Doc) -> int:
+        return len(doc.data) + len(doc.gzip or b"")
+
+    def _drop(self, path: str) -> None:
+        doc = self._docs.pop(path, None)
+        if doc is not None:
+            self._bytes -= self._size(doc)
+
+    def get(self, st: FileStat) -> Doc | None:
+        """st の文書を返す（キャッシュに無い・古ければ読み込む）。
+
+        MAX_ENTRY_BYTES を超える文書は None（呼び出し側がファイルから直接送る）。
+        読み込み中に更新されて stat と内容が食い違った場合も、次の stat で読み直される。
+        """
+        if not st.cacheable:
+            with self._lock:
+                self._counts["uncached"] += 1
+            return None
+        with self._lock:
+            doc = self._docs.get(st.path)
+            if doc is not None:
+                if doc.stat == st:
+                    self._docs.move_to_end(st.path)
+                    self._counts["hits"] += 1
+                    return doc
+                self._drop(st.path)
+                self._counts["invalidated"] += 1
+            self._counts["misses"] += 1
+
+        with open(st.path, "rb") as f:
+            data = f.read()
+        packed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0) if st.has_gzip else None
+        doc = Doc(st, data, packed)
+
+        with self._lock:
+            self._drop(st.path)
+            self._docs[st.path] = doc
+            self._bytes += self._size(doc)
+            while self._bytes > self.max_bytes and len(self._docs) > 1:
+                oldest = next(iter(self._docs))
+                self._drop(oldest)
+                self._counts["evicted"] += 1
+        return doc
+
+    def clear(self) -> None:
+        with self._lock:
+            self._docs.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                **self._counts,
+                "entries": len(self._docs),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_ratio": round(self._counts["hits"] / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,223 @@
+"""embedder.py — ベクトル索引の非同期化（embed_queue と一括ベクトル化）。
+
+従来は index drain --vec と hybrid 検索直前の追いつき処理が、FTS5 と同じ
+BEGIN IMMEDIATE の中で1行ずつ Ruri v3 を呼んでいた（初回はモデル読込、以後も行毎に
+CPU で encode）。その間は書き込みロックを握ったままになり、書き込みも検索も待たされる。
+
+  - 投入 : indexer の drain が search_docs の行を実際に変えた（消した）時に
+           embed_queue へ (source_type, source_id) を1行積むだけ（encode しない）
+  - 一括 : index embed（--watch SEC で常駐）がキューを batch 件ずつ取り出し、
+           現在の本文を index_sources から読んで encode(batch) を1回呼ぶ。
+           encode はトランザクション外、書き込みはバッチ毎に1トランザクション
+  - 遅延 : embed_status() がキューの滞留件数と最古エントリからの経過秒（lag）を返す
+           （index status / index embed の出力。--json でも同じ項目）
+
+embed_queue はベクトル索引の作成時（vec.ensure_tables）と、vec_meta があるのにキューが
+無い DB（embed_queue 導入前にベクトル化したもの）での最初の drain で作られる。
+ベクトル索引の無い DB にはキューも無く、drain は何も積まない。
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import sys
+import time
+from typing import Callable
+
+from . import get_connection, print_json
+from .index_sources import SOURCES_BY_TYPE, row_created_at, row_fields, select_sql
+
+BATCH_SIZE = 64
+
+SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS embed_queue (
+        seq INTEGER PRIMARY KEY,
+        source_type TEXT NOT NULL,
+        source_id TEXT NOT NULL,
+        enqueued_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+    )
+    """,
+]
+
+# texts → ベクトル（bytes）列。失敗時は None（vec.embed_passages と同じ形）
+Encoder = Callable[[list[str]], "list[bytes] | None"]
+
+
+def ensure_embed_queue(conn: sqlite3.Connection) -> None:
+    """embed_queue を作成する。呼び出し元で conn.commit() が必要。"""
+    for sql in SCHEMA_SQL:
+        conn.execute(sql)
+
+
+def has_embed_queue(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='embed_queue'"
+    ).fetchone() is not None
+
+
+def enqueue_embed(conn: sqlite3.Connection, source_type: str, source_id: str) -> None:
+    """1行をベクトル化待ちに積む（行が消えていれば処理時にベクトルを消す）。"""
+    conn.execute(
+        "INSERT INTO embed_queue (source_type, source_id) VALUES (?, ?)", (source_type, source_id)
+    )
+
+
+def _read_docs(conn: sqlite3.Connection, keys: list[tuple[str, str]]):
+    """(source_type, source_id) 群の現在の本文。→ (docs, gone)
+
+    docs: [(source_id, source_type, parent_id, project, created_at, raw_text)]
+    gone: 行が消えた（または未知の source_type の）キー
+    """
+    by_type: dict[str, list[str]] = {}
+    for source_type, source_id in keys:
+        by_type.setdefault(source_type, []).append(source_id)
+    docs, gone = [], []
+    for source_type, ids in by_type.items():
+        source = SOURCES_BY_TYPE.get(source_type)
+        if source is None:
+            gone.extend((source_type, i) for i in ids)
+            continue
+        try:
+            rows = conn.execute(select_sql(source, len(ids), created=True), ids).fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+        current = {str(r["id"]): r for r in rows}
+        for source_id in ids:
+            row = current.get(source_id)
+            if row is None:
+                gone.append((source_type, source_id))
+                continue
+            _sid, parent_id, project, _worker, _status, raw_text = row_fields(source, row)
+            docs.append((source_id, source_type, parent_id, project, row_created_at(row), raw_text))
+    return docs, gone
+
+
+def embed_batch(conn: sqlite3.Connection, encode: Encoder, batch_size: int = BATCH_SIZE) -> dict:
+    """キューの先頭 batch_size 件をベクトル化して書き込む。
+
+    encode が失敗した場合はキューを残したまま failed を返す（次回やり直す）。
+    処理中に同じ行が積まれ直した場合はその新しいエントリが残る（seq で区切って消す）。
+    """
+    from .vec import vec_delete, write_vectors
+
+    counts = {"queued": 0, "embedded": 0, "deleted": 0, "failed": 0, "encode_ms": 0.0}
+    rows = conn.execute(
+        "SELECT seq, source_type, source_id FROM embed_queue ORDER BY seq LIMIT ?", (batch_size,)
+    ).fetchall()
+    if not rows:
+        return counts
+    last_seq = rows[-1][0]
+    docs, gone = _read_docs(conn, list(dict.fromkeys((r[1], r[2]) for r in rows)))
+
+    started = time.perf_counter()
+    vectors = encode([d[5] for d in docs]) if docs else []
+    counts["encode_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    if vectors is None:
+        counts["failed"] = len(docs)
+        return counts
+
+    conn.commit()  # 暗黙トランザクションを閉じてから BEGIN IMMEDIATE
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        write_vectors(conn, [(*d[:5], v) for d, v in zip(docs, vectors)])
+        for source_type, source_id in gone:
+            vec_delete(conn, source_id, source_type)
+        conn.execute("DELETE FROM embed_queue WHERE seq <= ?", (last_seq,))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    counts.update(queued=len(rows), embedded=len(docs), deleted=len(gone))
+    return counts
+
+
+def embed_pending(conn: sqlite3.Connection, encode: Encoder, batch_size: int = BATCH_SIZE,
+                  limit: int | None = None) -> dict:
+    """キューが空になるまで（limit 件まで）embed_batch を繰り返す。encode 失敗で打ち切る。"""
+    totals = {"queued": 0, "embedded": 0, "deleted": 0, "failed": 0, "encode_ms": 0.0, "batches": 0}
+    while limit is None or totals["queued"] < limit:
+        size = batch_size if limit is None else min(batch_size, limit - totals["queued"])
+        counts = embed_batch(conn, encode, size)
+        for key in ("queued", "embedded", "deleted", "failed", "encode_ms"):
+            totals[key] += counts[key]
+        if counts["failed"] or not counts["queued"]:
+            break
+        totals["batches"] += 1
+    totals["encode_ms"] = round(totals["encode_ms"], 1)
+    return totals
+
+
+def embed_status(conn: sqlite3.Connection) -> dict:
+    """キューの滞留件数・最古エントリ・lag（秒）・source_type 別件数・ベクトル件数。"""
+    if not has_embed_queue(conn):
+        return {"installed": False, "pending": 0, "oldest": None, "lag_sec": 0.0,
+                "by_type": {}, "vectors": 0}
+    pending, oldest, lag = conn.execute(
+        "SELECT COUNT(*), MIN(enqueued_at),"
+        " (julianday('now') - julianday(MIN(enqueued_at))) * 86400 FROM embed_queue"
+    ).fetchone()
+    by_type = dict(conn.execute(
+        "SELECT source_type, COUNT(*) FROM embed_queue GROUP BY source_type ORDER BY source_type"
+    ).fetchall())
+    try:
+        vectors = conn.execute("SELECT COUNT(*) FROM vec_meta").fetchone()[0]
+    except sqlite3.OperationalError:
+        vectors = 0
+    return {"installed": True, "pending": pending, "oldest": oldest,
+            "lag_sec": round(lag or 0.0, 1), "by_type": by_type, "vectors": vectors}
+
+
+def run_embedder(conn: sqlite3.Connection, batch_size: int = BATCH_SIZE,
+                 limit: int | None = None) -> dict:
+    """Ruri v3 で滞留分をベクトル化する（index embed / index drain --vec）。"""
+    from .vec import embed_passages
+
+    return embed_pending(conn, lambda texts: embed_passages(texts, batch_size=batch_size),
+                         batch_size=batch_size, limit=limit)
+
+
+# ---------------------------------------------------------------------------
+# CLI handlers
+# ---------------------------------------------------------------------------
+
+def _format_pass(counts: dict, status: dict) -> str:
+    rate = counts["embedded"] / (counts["encode_ms"] / 1000) if counts["encode_ms"] else 0.0
+    return (f"Embedded: {counts['embedded']} vectors, {counts['deleted']} deleted"
+            f" ({counts['batches']} batches, encode {counts['encode_ms']:.0f} ms, {rate:.1f}/s)"
+            f" | pending {status['pending']}, lag {status['lag_sec']:.1f}s")
+
+
+def index_embed(args) -> None:
+    """index embed — embed_queue を一括ベクトル化する（--watch SEC で常駐する embedder）。"""
+    from .vec import _load_vec, ensure_tables, vec_layout
+
+    conn = get_connection()
+    try:
+        if not _load_vec(conn):
+            print("Error: sqlite-vec が利用できません。pip install sqlite-vec を実行してください。",
+                  file=sys.stderr)
+            sys.exit(1)
+        if vec_layout(conn) is None:
+            print("Error: ベクトル索引が未作成です。python3 scripts/migrate_vec.py を実行してください。",
+                  file=sys.stderr)
+            sys.exit(1)
+        ensure_tables(conn)  # 旧構成（source_id 単独キー）の移行・embed_queue の作成
+        while True:
+            counts = run_embedder(conn, batch_size=args.batch)
+            if counts["failed"]:
+                print("Error: ベクトル化に失敗しました（sentence-transformers / モデルを確認してください）。",
+                      file=sys.stderr)
+                sys.exit(1)
+            status = embed_status(conn)
+            if args.json:
+                print_json({**counts, **status})
+            elif counts["queued"] or not args.watch:
+                print(_format_pass(counts, status))
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
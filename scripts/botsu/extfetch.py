@@ -0,0 +1,224 @@
+"""extfetch.py — 外部Web検索の共有取得層（高札 enrich Stage 3 / 獏 search_ddg）。
+
+両者とも DuckDuckGo への同期 urllib 呼び出しを毎回行っていた（高札5秒・獏15秒タイムアウト）。
+本モジュールは取得そのもの（応答本文の文字列）を扱い、解析は呼び出し側に残す。
+
+  - ディスクキャッシュ : 正規化クエリ毎に1ファイル（TTL内はネットワークに出ない）
+  - サーキットブレーカ : 連続失敗 FAILURE_THRESHOLD 回で COOLDOWN_SEC 秒間は即座に諦める
+                         （期限切れキャッシュがあればそれを返す）。経過後は1件だけ試行
+  - 同一クエリの合流   : 取得中の同じクエリは先行呼び出しの結果を待つ
+  - バックエンド差し替え: url(query) → 本文 の関数。EXTFETCH_STUB_DIR 指定時は
+                         ローカルファイルを返すスタブ（テスト・オフライン用）
+
+高札コンテナへ単体でマウントされるため stdlib のみに依存する（botsu を import しない）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Callable
+
+TTL_SEC = int(os.environ.get("EXTFETCH_TTL_SEC", str(24 * 3600)))
+FAILURE_THRESHOLD = int(os.environ.get("EXTFETCH_FAILURE_THRESHOLD", "3"))
+COOLDOWN_SEC = int(os.environ.get("EXTFETCH_COOLDOWN_SEC", "300"))
+STUB_DIR = os.environ.get("EXTFETCH_STUB_DIR", "")
+
+# backend(url, timeout) → 応答本文。失敗は例外
+Backend = Callable[[str, float], str]
+
+
+class CircuitOpenError(RuntimeError):
+    """サーキットブレーカが開いている（直近の連続失敗により取得を見送った）。"""
+
+
+def normalize_query(query: str) -> str:
+    """NFKC・小文字化・空白正規化し、語の重複と順序の違いを吸収する。"""
+    words = unicodedata.normalize("NFKC", query).lower().split()
+    return " ".join(sorted(set(words)))
+
+
+def http_backend(user_agent: str) -> Backend:
+    def fetch(url: str, timeout: float) -> str:
+        req = urllib.request.Request(url, headers={"User-Agent": user_agent})
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.read().decode("utf-8", errors="replace")
+    return fetch
+
+
+def stub_backend(stub_dir: str | Path) -> Backend:
+    """URL の q= パラメータ（正規化済み）から <stub_dir>/<sha1>.txt を返すスタブ。
+
+    該当ファイルが無い場合は空文字列（= 検索結果なし）。
+    """
+    root = Path(stub_dir)
+
+    def fetch(url: str, timeout: float) -> str:
+        m = re.search(r"[?&]q=([^&]*)", url)
+        query = urllib.parse.unquote_plus(m.group(1)) if m else url
+        path = root / f"{cache_key(query)}.txt"
+        return path.read_text(encoding="utf-8") if path.exists() else ""
+    return fetch
+
+
+def cache_key(query: str) -> str:
+    return hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.body: str | None = None
+        self.error: BaseException | None = None
+
+
+class ExternalFetcher:
+    """キャッシュ・サーキットブレーカ・合流付きの外部取得。スレッドセーフ。"""
+
+    def __init__(self, name: str, url_for: Callable[[str], str], cache_dir: str | Path,
+                 backend: Backend, timeout: float,
+                 ttl_sec: int = TTL_SEC,
+                 failure_threshold: int = FAILURE_THRESHOLD,
+                 cooldown_sec: int = COOLDOWN_SEC) -> None:
+        self.name = name
+        self.url_for = url_for
+        self.cache_dir = Path(cache_dir) / name
+        self.backend = stub_backend(STUB_DIR) if STUB_DIR else backend
+        self.timeout = timeout
+        self.ttl_sec = ttl_sec
+        self.failure_threshold = failure_threshold
+        self.cooldown_sec = cooldown_sec
+        self._lock = threading.Lock()
+        self._inflight: dict[str, _Flight] = {}
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial = False
+        self._counts = {"hits": 0, "stale": 0, "fetches": 0, "errors": 0,
+                        "short_circuits": 0, "coalesced": 0}
+
+    # --- ディスクキャッシュ ---
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _read(self, key: str) -> tuple[str, float] | None:
+        try:
+            entry = json.loads(self._path(key).read_text(encoding="utf-8"))
+            return entry["body"], entry["stored_at"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write(self, key: str, query: str, body: str) -> None:
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"query": normalize_query(query), "stored_at": time.time(),
+                           "body": body}, f, ensure_ascii=False)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            pass  # キャッシュ書き込み失敗は取得結果に影響させない
+
+    # --- サーキットブレーカ ---
+
+    def _allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown_sec or self._trial:
+                return False
+            self._trial = True  # 半開: 1件だけ通す
+            return True
+
+    def _record(self, ok: bool) -> None:
+        with self._lock:
+            self._trial = False
+            if ok:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            self._counts["errors"] += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    # --- 取得 ---
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def fetch(self, query: str) -> str:
+        """query の応答本文を返す。
+
+        TTL内のキャッシュがあればそれを返す。取得に失敗した場合・ブレーカが開いている場合は
+        期限切れキャッシュがあればそれを、無ければ例外（CircuitOpenError / 取得時の例外）。
+        """
+        key = cache_key(query)
+        cached = self._read(key)
+        if cached and time.time() - cached[1] <= self.ttl_sec:
+            self._count("hits")
+            return cached[0]
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._counts["coalesced"] += 1
+        if not leader:
+            flight.done.wait(self.timeout + 1)
+            if flight.body is not None:
+                return flight.body
+            raise flight.error or TimeoutError(f"{self.name}: coalesced fetch timed out")
+
+        try:
+            flight.body = self._fetch_uncached(key, query, cached)
+            return flight.body
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            flight.done.set()
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _fetch_uncached(self, key: str, query: str, cached: tuple[str, float] | None) -> str:
+        if not self._allow():
+            self._count("short_circuits")
+            if cached:
+                self._count("stale")
+                return cached[0]
+            raise CircuitOpenError(f"{self.name}: circuit open")
+        self._count("fetches")
+        try:
+            body = self.backend(self.url_for(query), self.timeout)
+        except Exception:
+            self._record(ok=False)
+            if cached:
+                self._count("stale")
+                return cached[0]
+            raise
+        self._record(ok=True)
+        self._write(key, query, body)
+        return body
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counts,
+                "circuit": ("closed" if self._opened_at is None
+                            else "half_open" if self._trial else "open"),
+                "consecutive_failures": self._failures,
+                "inflight": len(self._inflight),
+            }
@@ -0,0 +1,138 @@
+"""index_sources.py — 全文検索の索引対象（6表）の一元定義。
+
+没日録DB内 search_index（botsu/indexer.py, migrate_fts5.py）と
+高札の search_index.db（tools/kousatsu/build_index.py）が同じ定義で
+行 → (source_id, parent_id, project, worker_id, status, 本文) を作り、同じ規則で分かち書きする。
+
+高札コンテナへ単体でマウントされるため stdlib と tokenizer のみに依存する。
+tokenizer（MeCab）は最初に分かち書きする時に import する（索引を触らない CLI の起動を軽くする）。
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Callable, NamedTuple
+
+_tokenizer = None
+
+
+def _get_tokenizer():
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            from botsu import tokenizer
+        except ImportError:  # 高札コンテナ（/app/tokenizer.py として単体マウント）
+            import tokenizer
+        _tokenizer = tokenizer
+    return _tokenizer
+
+
+def safe_str(value) -> str:
+    """NoneやNULL値を空文字列に変換する。"""
+    if value is None:
+        return ""
+    return str(value)
+
+
+def _join(*values) -> str:
+    return " ".join(filter(None, [safe_str(v) for v in values]))
+
+
+def index_text(text: str) -> str:
+    """索引に入れる content。MeCab分かち書き（共有キャッシュ経由）。
+
+    MeCab未インストール時・抽出ゼロ時は raw テキストを返す（unicode61 が最低限の分割を担当）。
+    """
+    if not text:
+        return ""
+    result = _get_tokenizer().tokenize(text)
+    return result if result.strip() else text
+
+
+class Source(NamedTuple):
+    source_type: str
+    table: str
+    # 索引内容に効く列（id 以外）。indexer のトリガは UPDATE OF でこれらのみ監視する
+    columns: tuple[str, ...]
+    # 行 → (parent_id, project, worker_id, status, 本文)
+    extract: Callable[[sqlite3.Row], tuple[str, str, str, str, str]]
+    where: str = ""
+    # 文書の作成時刻（SQL式）。ベクトル索引の鮮度スコア用で、索引内容・トリガには関わらない
+    created: str = "NULL"
+
+
+SOURCES: list[Source] = [
+    Source(
+        "command", "commands",
+        ("command", "details", "project", "status"),
+        lambda r: ("", safe_str(r["project"]), "", safe_str(r["status"]),
+                   _join(r["command"], r["details"])),
+        created="created_at",
+    ),
+    Source(
+        "subtask", "subtasks",
+        ("parent_cmd", "worker_id", "project", "description", "status", "notes"),
+        lambda r: (safe_str(r["parent_cmd"]), safe_str(r["project"]), safe_str(r["worker_id"]),
+                   safe_str(r["status"]), _join(r["description"], r["notes"])),
+        # subtasks に作成時刻の列は無い。未割当なら親コマンドの作成時刻
+        created="COALESCE(assigned_at,"
+                " (SELECT created_at FROM commands WHERE commands.id = subtasks.parent_cmd))",
+    ),
+    Source(
+        "report", "reports",
+        ("task_id", "worker_id", "status", "summary", "findings", "notes"),
+        lambda r: (safe_str(r["task_id"]), "", safe_str(r["worker_id"]), safe_str(r["status"]),
+                   _join(r["summary"], r["findings"], r["notes"])),
+        created="timestamp",
+    ),
+    Source(
+        # parent_id = cmd_id, worker_id フィールドに tags を格納
+        "dashboard", "dashboard_entries",
+        ("cmd_id", "section", "content", "status", "tags"),
+        lambda r: (safe_str(r["cmd_id"]), "", safe_str(r["tags"]), safe_str(r["status"]),
+                   _join(r["section"], r["content"])),
+        where="section IS NOT 'enrich_cache'",  # 旧enrichキャッシュ行は索引対象外
+        created="created_at",
+    ),
+    Source(
+        "diary", "diary_entries",
+        ("agent_id", "cmd_id", "subtask_id", "summary", "body"),
+        lambda r: (safe_str(r["cmd_id"]) or safe_str(r["subtask_id"]), "",
+                   safe_str(r["agent_id"]), "", _join(r["summary"], r["body"])),
+        created="created_at",
+    ),
+    Source(
+        # project フィールドに board を格納
+        "reply", "thread_replies",
+        ("thread_id", "board", "author", "body"),
+        lambda r: (safe_str(r["thread_id"]), safe_str(r["board"]), safe_str(r["author"]), "",
+                   safe_str(r["body"])),
+        created="posted_at",
+    ),
+]
+
+SOURCES_BY_TYPE = {s.source_type: s for s in SOURCES}
+
+
+def select_sql(source: Source, n_keys: int = 0, rowid: bool = False, created: bool = False) -> str:
+    """source の行を読む SELECT。n_keys > 0 なら id IN (?, ...) で絞る。
+
+    created=True なら作成時刻を _created 列として加える（row_created_at で読む）。
+    """
+    cols = ", ".join(("rowid AS _rowid",) * rowid + ("id",) + source.columns
+                     + (f"{source.created} AS _created",) * created)
+    conds = [source.where] if source.where else []
+    if n_keys:
+        conds.append(f"id IN ({','.join('?' * n_keys)})")
+    where = f" WHERE {' AND '.join(conds)}" if conds else ""
+    return f"SELECT {cols} FROM {source.table}{where}"
+
+
+def row_fields(source: Source, row: sqlite3.Row) -> tuple[str, str, str, str, str, str]:
+    """行 → (source_id, parent_id, project, worker_id, status, 本文)。"""
+    return (str(row["id"]),) + source.extract(row)
+
+
+def row_created_at(row: sqlite3.Row) -> str:
+    """select_sql(created=True) の行の作成時刻。"""
+    return safe_str(row["_created"])
@@ -0,0 +1,448 @@
+"""indexer.py — 没日録DB内 search_index の変更キュー（CDC）と一元インデクサ。
+
+従来は cmd/subtask/report/dashboard/diary/reply の各書き込み処理が
+fts5_upsert() / vec_upsert_if_available() をその場で呼び、書き込み毎に MeCab 解析
+（とベクトル化）を行っていた。書き込み経路が増える度に呼び忘れ・本文の組み立て違いが生じ、
+migrate_fts5.py の全件構築とも内容が揃っていなかった。
+
+本モジュールは索引の更新を書き込みから切り離す。
+  - トリガ : 6表（index_sources.SOURCES）の INSERT / 索引対象列の UPDATE / DELETE で
+             index_queue に (source_type, source_id) を1行追記するだけ（解析しない）
+  - drain  : キューを先頭から batch 件ずつ取り出し、現在の行内容で FTS5 を更新する
+             （行が消えていれば索引から削除。同じ行の重複エントリは1回で済む）。
+             索引の行が実際に変わった（消えた）場合はベクトル化待ちとして embed_queue に
+             積む（ベクトル化は botsu/embedder.py が別途まとめて行う）
+  - rebuild: 全件再構築（migrate_fts5.py）。キューは空にする
+
+search_index は外部コンテンツ FTS5 で、行は search_docs（(source_type, source_id) に
+UNIQUE 索引を持つ通常表、id が FTS5 の rowid）に1回だけ保存する。
+upsert / delete は search_docs への索引付きの1行操作で、FTS5 への反映は search_docs の
+トリガが rowid 指定で行う（旧構成の `DELETE FROM search_index WHERE source_id = ?` は
+FTS5 の全件走査だった）。本文を持つ旧構成の search_index は ensure_search_index() が
+本文ごと search_docs へ移して作り直す（再分かち書きはしない）。
+
+drain は `index drain`（--watch で常駐）と、検索系コマンドの直前（catch_up）で実行される。
+1バッチは「キューと行を読んで分かち書き（ロック外）→ BEGIN IMMEDIATE 内で行を読み直して
+反映・取り出したエントリを削除」の順で行う。書き込みロックは MeCab 解析の間は握らない。
+ロック内で読み直した内容を書くため、複数の drain が並走しても古い内容で上書きすることはない。
+
+トリガ方式のため 高札の POST 系書き込みでも追随する。表・トリガは ensure_index_queue() が
+作成する（書き込み系コマンド・migrate_fts5.py から呼ばれる）。
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import sys
+import time
+
+from . import fts5_delete, fts5_upsert, get_connection, print_json
+from .embedder import embed_status, enqueue_embed, ensure_embed_queue, has_embed_queue
+from .index_sources import SOURCES, SOURCES_BY_TYPE, Source, index_text, row_fields, select_sql
+
+BATCH_SIZE = 200
+# 検索前の追いつき処理で扱う上限（これを超える滞留は index drain に任せる）
+CATCH_UP_LIMIT = 1000
+
+SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS index_queue (
+        seq INTEGER PRIMARY KEY,
+        source_type TEXT NOT NULL,
+        source_id TEXT NOT NULL,
+        enqueued_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+    )
+    """,
+]
+
+
+# 外部コンテンツ FTS5。列名は search_docs と一致させる（snippet() は search_docs から本文を読む）
+SEARCH_DOCS_SQL = """
+    CREATE TABLE IF NOT EXISTS search_docs (
+        id INTEGER PRIMARY KEY,
+        source_type TEXT NOT NULL,
+        source_id TEXT NOT NULL,
+        parent_id TEXT,
+        project TEXT,
+        worker_id TEXT,
+        status TEXT,
+        content TEXT,
+        UNIQUE (source_type, source_id)
+    )
+"""
+SEARCH_INDEX_SQL = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        source_type, source_id, parent_id, project, worker_id, status, content,
+        content='search_docs', content_rowid='id', tokenize='unicode61'
+    )
+"""
+_FTS_COLUMNS = "source_type, source_id, parent_id, project, worker_id, status, content"
+_FTS_OLD = "old.id, old.source_type, old.source_id, old.parent_id, old.project, old.worker_id, old.status, old.content"
+_FTS_NEW = "new.id, new.source_type, new.source_id, new.parent_id, new.project, new.worker_id, new.status, new.content"
+SEARCH_TRIGGERS_SQL = {
+    "trg_search_docs_ins": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_search_docs_ins AFTER INSERT ON search_docs BEGIN
+            INSERT INTO search_index (rowid, {_FTS_COLUMNS}) VALUES ({_FTS_NEW});
+        END
+    """,
+    "trg_search_docs_del": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_search_docs_del AFTER DELETE ON search_docs BEGIN
+            INSERT INTO search_index (search_index, rowid, {_FTS_COLUMNS}) VALUES ('delete', {_FTS_OLD});
+        END
+    """,
+    "trg_search_docs_upd": f"""
+        CREATE TRIGGER IF NOT EXISTS trg_search_docs_upd AFTER UPDATE ON search_docs BEGIN
+            INSERT INTO search_index (search_index, rowid, {_FTS_COLUMNS}) VALUES ('delete', {_FTS_OLD});
+            INSERT INTO search_index (rowid, {_FTS_COLUMNS}) VALUES ({_FTS_NEW});
+        END
+    """,
+}
+
+
+def _trigger_name(source: Source, op: str) -> str:
+    return f"trg_index_queue_{source.table}_{op}"
+
+
+def _triggers_sql(source: Source) -> list[str]:
+    enqueue = (f"INSERT INTO index_queue (source_type, source_id)"
+               f" VALUES ('{source.source_type}', {{ref}}.id);")
+    watched = ", ".join(("id",) + source.columns)
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {_trigger_name(source, "ins")}
+        AFTER INSERT ON {source.table} BEGIN
+            {enqueue.format(ref="NEW")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {_trigger_name(source, "upd")}
+        AFTER UPDATE OF {watched} ON {source.table} BEGIN
+            {enqueue.format(ref="NEW")}
+            INSERT INTO index_queue (source_type, source_id)
+            SELECT '{source.source_type}', OLD.id WHERE OLD.id IS NOT NEW.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {_trigger_name(source, "del")}
+        AFTER DELETE ON {source.table} BEGIN
+            {enqueue.format(ref="OLD")}
+        END
+        """,
+    ]
+
+
+def ensure_index_queue(conn: sqlite3.Connection) -> bool:
+    """index_queue と、存在する索引対象表のトリガを作成する。作成したらTrue。
+
+    diary_entries / thread_replies は後から作られることがあるため、表毎に確認する
+    （sqlite_master の1回の参照のみ）。呼び出し元で conn.commit() が必要。
+    """
+    names = {r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+        " OR (type = 'trigger' AND name LIKE 'trg_index_queue_%')"
+    )}
+    missing = [s for s in SOURCES
+               if s.table in names and _trigger_name(s, "del") not in names]
+    if "index_queue" in names and not missing:
+        return False
+    for sql in SCHEMA_SQL:
+        conn.execute(sql)
+    for source in missing:
+        for sql in _triggers_sql(source):
+            conn.execute(sql)
+    return True
+
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone() is not None
+
+
+def search_layout(conn: sqlite3.Connection) -> str | None:
+    """search_index の構成。"external"（search_docs + 外部コンテンツ）/ "legacy"（本文を持つ旧FTS5）/ None。"""
+    names = {r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('search_index', 'search_docs')"
+    )}
+    if "search_index" not in names:
+        return None
+    return "external" if "search_docs" in names else "legacy"
+
+
+def _create_search_triggers(conn: sqlite3.Connection) -> None:
+    for sql in SEARCH_TRIGGERS_SQL.values():
+        conn.execute(sql)
+
+
+def _drop_search_triggers(conn: sqlite3.Connection) -> None:
+    for name in SEARCH_TRIGGERS_SQL:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def ensure_search_index(conn: sqlite3.Connection, create: bool = False) -> bool:
+    """search_index を外部コンテンツ構成にする。索引があれば（作れば）True。
+
+    旧構成は本文を search_docs へ移し、FTS5 を 'rebuild' で作り直す（MeCab は通さない）。
+    create=False では索引が無ければ何もしない。呼び出し元で conn.commit() が必要。
+    """
+    layout = search_layout(conn)
+    if layout == "external":
+        return True
+    if layout is None and not create:
+        return False
+    if layout == "legacy":
+        conn.execute("ALTER TABLE search_index RENAME TO search_index_legacy")
+    conn.execute(SEARCH_DOCS_SQL)
+    conn.execute(SEARCH_INDEX_SQL)
+    if layout == "legacy":
+        # 重複行があれば新しい方（rowid の大きい方）を残す
+        conn.execute(
+            f"INSERT OR IGNORE INTO search_docs ({_FTS_COLUMNS})"
+            f" SELECT {_FTS_COLUMNS} FROM search_index_legacy ORDER BY rowid DESC"
+        )
+        conn.execute("DROP TABLE search_index_legacy")
+        conn.execute("INSERT INTO search_index (search_index) VALUES ('rebuild')")
+    _create_search_triggers(conn)
+    return True
+
+
+def _embed_ready(conn: sqlite3.Connection) -> bool:
+    """ベクトル索引があれば embed_queue を用意して True。
+
+    embed_queue 導入前にベクトル化した DB（vec_meta はあるがキューが無い）もここで作る。
+    呼び出し元で conn.commit() が必要。
+    """
+    if has_embed_queue(conn):
+        return True
+    if not _has_table(conn, "vec_meta"):
+        return False
+    ensure_embed_queue(conn)
+    return True
+
+
+def _read_current(conn: sqlite3.Connection, keys: dict[tuple[str, str], None]) -> dict:
+    """(source_type, source_id) 群の現在の行。→ {key: (parent_id, project, worker_id, status, 本文) | None}
+
+    行が消えていれば None。未知の source_type のキーは含めない（索引に触れない）。
+    """
+    by_type: dict[str, list[str]] = {}
+    for source_type, source_id in keys:
+        by_type.setdefault(source_type, []).append(source_id)
+
+    current: dict[tuple[str, str], tuple | None] = {}
+    for source_type, ids in by_type.items():
+        source = SOURCES_BY_TYPE.get(source_type)
+        if source is None:
+            continue
+        try:
+            rows = conn.execute(select_sql(source, len(ids)), ids).fetchall()
+        except sqlite3.OperationalError:
+            rows = []  # 表が消えた（旧スキーマ）
+        found = {str(r["id"]): r for r in rows}
+        for source_id in ids:
+            row = found.get(source_id)
+            current[(source_type, source_id)] = row_fields(source, row)[1:] if row is not None else None
+    return current
+
+
+def _apply(conn: sqlite3.Connection, current: dict, tokenized: dict[tuple[str, str], tuple[str, str]],
+           counts: dict, embed: bool) -> None:
+    """_read_current() の行内容を索引に反映する。
+
+    tokenized: key → (分かち書きした本文, content)。本文がその後変わっていればここで解析し直す。
+    embed=True なら索引の行が変わった（消えた）ものを embed_queue に積む。
+    """
+    for (source_type, source_id), fields in current.items():
+        if fields is None:
+            if fts5_delete(conn, source_type, source_id) and embed:
+                enqueue_embed(conn, source_type, source_id)
+            counts["deleted"] += 1
+            continue
+        parent_id, project, worker_id, status, raw_text = fields
+        seen, content = tokenized.get((source_type, source_id), (None, None))
+        if seen != raw_text:
+            content = None  # 解析中に本文が変わった（稀）。fts5_upsert が解析する
+        if fts5_upsert(conn, source_type, source_id, parent_id, project, worker_id,
+                       status, raw_text, content=content) and embed:
+            enqueue_embed(conn, source_type, source_id)
+        counts["indexed"] += 1
+
+
+def drain(conn: sqlite3.Connection, batch_size: int = BATCH_SIZE,
+          limit: int | None = None) -> dict:
+    """index_queue を先頭から batch_size 件ずつ処理する。バッチ毎にコミットする。
+
+    limit: 処理するキュー行数の上限（None=空になるまで）。
+    search_index が無い場合はキューを捨てる（migrate_fts5.py の全件構築で揃うため）。
+    旧構成の search_index は最初に外部コンテンツ構成へ移行する。
+    ベクトル索引がある（embed_queue がある）DBでは、変わった行をベクトル化待ちに積む。
+    """
+    counts = {"queued": 0, "indexed": 0, "deleted": 0, "batches": 0}
+    if not _has_table(conn, "index_queue"):
+        return counts
+    has_fts = ensure_search_index(conn)
+    embed = has_fts and _embed_ready(conn)
+    conn.commit()  # 暗黙トランザクションを閉じてから BEGIN IMMEDIATE
+
+    while limit is None or counts["queued"] < limit:
+        size = batch_size if limit is None else min(batch_size, limit - counts["queued"])
+        rows = [tuple(r) for r in conn.execute(
+            "SELECT seq, source_type, source_id FROM index_queue ORDER BY seq LIMIT ?", (size,),
+        ).fetchall()]
+        if not rows:
+            break
+        keys = dict.fromkeys((r[1], r[2]) for r in rows)
+        tokenized = {}
+        if has_fts:
+            # 分かち書き（MeCab）は書き込みロックの外で行う
+            tokenized = {key: (fields[4], index_text(fields[4]))
+                         for key, fields in _read_current(conn, keys).items() if fields is not None}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if has_fts:
+                # ロック内で行を読み直して反映する（解析中に変わった行は古い内容で書かない）
+                _apply(conn, _read_current(conn, keys), tokenized, counts, embed)
+            # 取り出したエントリだけを消す（seq と行の組で照合。seq は空になると再利用される）
+            conn.executemany(
+                "DELETE FROM index_queue WHERE seq = ? AND source_type = ? AND source_id = ?", rows
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        counts["queued"] += len(rows)
+        counts["batches"] += 1
+    return counts
+
+
+def catch_up(conn: sqlite3.Connection) -> None:
+    """検索の直前に滞留分（最大 CATCH_UP_LIMIT 件）を反映する。
+
+    ロック競合等で失敗しても検索は止めない（その時点の索引で検索する）。
+    """
+    try:
+        if conn.execute("SELECT 1 FROM index_queue LIMIT 1").fetchone():
+            drain(conn, limit=CATCH_UP_LIMIT)
+    except sqlite3.OperationalError:
+        pass
+
+
+def queue_status(conn: sqlite3.Connection) -> dict:
+    """キューの滞留件数・最古エントリの時刻・source_type 別件数。"""
+    if not _has_table(conn, "index_queue"):
+        return {"installed": False, "pending": 0, "oldest": None, "by_type": {}}
+    pending, oldest = conn.execute(
+        "SELECT COUNT(*), MIN(enqueued_at) FROM index_queue"
+    ).fetchone()
+    by_type = dict(conn.execute(
+        "SELECT source_type, COUNT(*) FROM index_queue GROUP BY source_type ORDER BY source_type"
+    ).fetchall())
+    return {"installed": True, "pending": pending, "oldest": oldest, "by_type": by_type}
+
+
+def rebuild_index(conn: sqlite3.Connection) -> dict[str, int | None]:
+    """search_index を全件再構築し、キューを空にする。呼び出し元で conn.commit() が必要。
+
+    search_docs を入れ替えてから FTS5 を 'rebuild' で1回で作る（行毎のトリガは通さない）。
+
+    Returns:
+        表名 → 投入件数（表が無ければ None）
+    """
+    ensure_index_queue(conn)
+    ensure_search_index(conn, create=True)
+    _drop_search_triggers(conn)
+    conn.execute("DELETE FROM search_docs")
+    counts: dict[str, int | None] = {}
+    for source in SOURCES:
+        try:
+            rows = conn.execute(select_sql(source)).fetchall()
+        except sqlite3.OperationalError:
+            counts[source.table] = None
+            continue
+        conn.executemany(
+            f"INSERT OR REPLACE INTO search_docs ({_FTS_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((source.source_type, *fields[:5], index_text(fields[5]))
+             for fields in (row_fields(source, r) for r in rows)),
+        )
+        counts[source.table] = len(rows)
+    conn.execute("INSERT INTO search_index (search_index) VALUES ('rebuild')")
+    _create_search_triggers(conn)
+    conn.execute("DELETE FROM index_queue")
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# CLI handlers
+# ---------------------------------------------------------------------------
+
+def _embed_once(conn: sqlite3.Connection) -> None:
+    """index drain --vec: drain に続けて embed_queue を1回ベクトル化する。"""
+    from .embedder import run_embedder
+    from .vec import ensure_tables, vec_layout
+
+    if vec_layout(conn) is None or not ensure_tables(conn):
+        return
+    counts = run_embedder(conn)
+    if counts["queued"]:
+        print(f"Embedded: {counts['embedded']} vectors, {counts['deleted']} deleted"
+              f" ({counts['failed']} failed)")
+
+
+def index_drain(args) -> None:
+    """index drain — キューを索引へ反映する（--watch SEC で常駐）。"""
+    conn = get_connection()
+    try:
+        if ensure_index_queue(conn):
+            conn.commit()
+        while True:
+            counts = drain(conn, batch_size=args.batch)
+            if counts["queued"] or not args.watch:
+                print(f"Drained: {counts['queued']} queued -> {counts['indexed']} indexed, "
+                      f"{counts['deleted']} deleted ({counts['batches']} batches)")
+            if args.vec:
+                _embed_once(conn)
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+
+
+def index_status(args) -> None:
+    """index status — キュー（索引・ベクトル化待ち）の滞留状況を表示する。"""
+    conn = get_connection()
+    try:
+        status = queue_status(conn)
+        embed = embed_status(conn)
+    finally:
+        conn.close()
+    if args.json:
+        print_json({**status, "embed": embed})
+        return
+    if not status["installed"]:
+        print("index_queue 未作成（書き込み系コマンドの初回実行時に作成される）")
+        return
+    print(f"Pending: {status['pending']}")
+    if status["oldest"]:
+        print(f"Oldest:  {status['oldest']}")
+    for source_type, n in status["by_type"].items():
+        print(f"  {source_type:<10} {n}")
+    if embed["installed"]:
+        print(f"Embed pending: {embed['pending']} (lag {embed['lag_sec']:.1f}s, {embed['vectors']} vectors)")
+
+
+def index_rebuild(args) -> None:
+    """index rebuild — search_index を全件再構築する。"""
+    conn = get_connection()
+    try:
+        if not _has_table(conn, "search_index"):
+            print("Error: search_index テーブルが見つかりません。\n"
+                  "  python3 scripts/migrate_fts5.py を先に実行してください。", file=sys.stderr)
+            sys.exit(1)
+        counts = rebuild_index(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    print("Indexed: " + ", ".join(f"{n} {table}" for table, n in counts.items() if n is not None))
@@ -0,0 +1,273 @@
+"""orphans.py — 矛盾・放置検出（check orphans）の差分インデックス。
+
+check orphans は従来 呼び出しの度に commands×subtasks の JOIN+GROUP BY と、
+done subtask 全件から reports への LEFT JOIN を行っていた（履歴量に比例）。
+本モジュールは検出結果そのものを小さな表に保持し、トリガで差分更新する。
+
+  - orphan_cmd_progress : cmd毎の subtask 件数 / done 件数（subtasks トリガで±1）
+  - orphan_items        : 現在該当している (check_type, item_id) のみ
+      * cmd_all_subtasks_done_but_pending : progress / commands.status 変化時に当該cmdを再判定
+      * subtask_done_without_report       : subtasks.status / reports 変化時に当該subtaskを再判定
+
+時間条件のチェック（7日以上 pending / assigned）は表に持たず、
+(status, created_at) / (status, assigned_at) の複合インデックスで範囲検索する。
+
+トリガ方式のため 高札の POST 系書き込みでも追随する。表・トリガ・インデックスは
+ensure_orphan_index() が初回に作成してバックフィルする
+（cmd update, subtask add/update, report add, check orphans から呼ばれる）。
+高札コンテナへ単体でマウントされ GET /check/orphans も本モジュールで読むため
+stdlib のみに依存する（botsu を import しない）。
+"""
+
+from __future__ import annotations
+
+import sqlite3
+
+CMD_ALL_DONE = "cmd_all_subtasks_done_but_pending"
+CMD_PENDING = "cmd_pending_over_7_days"
+SUBTASK_ASSIGNED = "subtask_assigned_over_7_days"
+DONE_WITHOUT_REPORT = "subtask_done_without_report"
+
+STALE_DAYS = 7
+
+SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS orphan_cmd_progress (
+        cmd_id TEXT PRIMARY KEY,
+        subtask_count INTEGER NOT NULL DEFAULT 0,
+        done_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS orphan_items (
+        check_type TEXT NOT NULL,
+        item_id TEXT NOT NULL,
+        PRIMARY KEY (check_type, item_id)
+    ) WITHOUT ROWID
+    """,
+]
+
+# 時間条件チェック用（init_db.py INDEXES_SQL にも同じものがある）
+INDEXES_SQL = [
+    "CREATE INDEX IF NOT EXISTS idx_commands_status_created ON commands(status, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_subtasks_status_assigned ON subtasks(status, assigned_at)",
+]
+
+
+def _recheck_cmd(cmd_id: str) -> str:
+    """cmd 1件の「全subtask done なのに cmd が done でない」判定をやり直す。"""
+    return f"""
+        DELETE FROM orphan_items WHERE check_type = '{CMD_ALL_DONE}' AND item_id = {cmd_id};
+        INSERT OR IGNORE INTO orphan_items (check_type, item_id)
+        SELECT '{CMD_ALL_DONE}', c.id
+        FROM commands c JOIN orphan_cmd_progress p ON p.cmd_id = c.id
+        WHERE c.id = {cmd_id} AND c.status != 'done'
+          AND p.subtask_count > 0 AND p.subtask_count = p.done_count;
+    """
+
+
+def _recheck_subtask(subtask_id: str) -> str:
+    """subtask 1件の「done なのに report が無い」判定をやり直す（idx_reports_task_id を使用）。"""
+    return f"""
+        DELETE FROM orphan_items WHERE check_type = '{DONE_WITHOUT_REPORT}' AND item_id = {subtask_id};
+        INSERT OR IGNORE INTO orphan_items (check_type, item_id)
+        SELECT '{DONE_WITHOUT_REPORT}', s.id FROM subtasks s
+        WHERE s.id = {subtask_id} AND s.status = 'done'
+          AND NOT EXISTS (SELECT 1 FROM reports r WHERE r.task_id = s.id);
+    """
+
+
+def _progress(r: str, sign: int) -> str:
+    return f"""
+        INSERT INTO orphan_cmd_progress (cmd_id, subtask_count, done_count)
+        SELECT {r}.parent_cmd, {sign}, {sign} * ({r}.status IS 'done')
+        WHERE {r}.parent_cmd IS NOT NULL
+        ON CONFLICT(cmd_id) DO UPDATE SET
+            subtask_count = subtask_count + excluded.subtask_count,
+            done_count = done_count + excluded.done_count;
+    """
+
+
+TRIGGERS_SQL = [
+    # subtasks → cmd進捗 / done-without-report
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orphan_subtask_ins
+    AFTER INSERT ON subtasks BEGIN
+        {_progress("NEW", 1)}
+        {_recheck_subtask("NEW.id")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orphan_subtask_del
+    AFTER DELETE ON subtasks BEGIN
+        {_progress("OLD", -1)}
+        DELETE FROM orphan_items WHERE check_type = '{DONE_WITHOUT_REPORT}' AND item_id = OLD.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orphan_subtask_upd
+    AFTER UPDATE OF id, parent_cmd, status ON subtasks BEGIN
+        {_progress("OLD", -1)}
+        {_progress("NEW", 1)}
+        DELETE FROM orphan_items WHERE check_type = '{DONE_WITHOUT_REPORT}' AND item_id = OLD.id;
+        {_recheck_subtask("NEW.id")}
+    END
+    """,
+    # cmd進捗・cmd状態 → cmd判定
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orphan_progress_ins
+    AFTER INSERT ON orphan_cmd_progress BEGIN
+        {_recheck_cmd("NEW.cmd_id")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orphan_progress_upd
+    AFTER UPDATE ON orphan_cmd_progress BEGIN
+        {_recheck_cmd("NEW.cmd_id")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orphan_cmd_upd
+    AFTER UPDATE OF status ON commands BEGIN
+        {_recheck_cmd("NEW.id")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orphan_cmd_del
+    AFTER DELETE ON commands BEGIN
+        DELETE FROM orphan_items WHERE check_type = '{CMD_ALL_DONE}' AND item_id = OLD.id;
+    END
+    """,
+    # reports → done-without-report
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orphan_report_ins
+    AFTER INSERT ON reports BEGIN
+        DELETE FROM orphan_items WHERE check_type = '{DONE_WITHOUT_REPORT}' AND item_id = NEW.task_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orphan_report_del
+    AFTER DELETE ON reports BEGIN
+        {_recheck_subtask("OLD.task_id")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_orphan_report_upd
+    AFTER UPDATE OF task_id ON reports BEGIN
+        {_recheck_subtask("OLD.task_id")}
+        DELETE FROM orphan_items WHERE check_type = '{DONE_WITHOUT_REPORT}' AND item_id = NEW.task_id;
+    END
+    """,
+]
+
+# 全件再集計（バックフィル / rebuild 用）
+_REBUILD_SQL = [
+    "DELETE FROM orphan_items",
+    "DELETE FROM orphan_cmd_progress",
+    """
+    INSERT INTO orphan_cmd_progress (cmd_id, subtask_count, done_count)
+    SELECT parent_cmd, COUNT(*), SUM(status IS 'done')
+    FROM subtasks WHERE parent_cmd IS NOT NULL
+    GROUP BY parent_cmd
+    """,
+    # 上のINSERTで trg_orphan_progress_ins が発火し CMD_ALL_DONE は埋まる
+    f"""
+    INSERT OR IGNORE INTO orphan_items (check_type, item_id)
+    SELECT '{DONE_WITHOUT_REPORT}', s.id FROM subtasks s
+    WHERE s.status = 'done'
+      AND NOT EXISTS (SELECT 1 FROM reports r WHERE r.task_id = s.id)
+    """,
+]
+
+# 読み出し（4種とも該当件数に比例、履歴量に非依存）
+READ_SQL = {
+    CMD_ALL_DONE: f"""
+        SELECT c.id AS cmd_id, c.status, p.subtask_count
+        FROM orphan_items o
+        JOIN commands c ON c.id = o.item_id
+        JOIN orphan_cmd_progress p ON p.cmd_id = o.item_id
+        WHERE o.check_type = '{CMD_ALL_DONE}'
+        ORDER BY o.item_id
+    """,
+    CMD_PENDING: f"""
+        SELECT id AS cmd_id, status, created_at
+        FROM commands
+        WHERE status = 'pending'
+          AND created_at <= datetime('now', '-{STALE_DAYS} days')
+        ORDER BY created_at
+    """,
+    SUBTASK_ASSIGNED: f"""
+        SELECT id AS subtask_id, parent_cmd, worker_id, assigned_at
+        FROM subtasks
+        WHERE status = 'assigned'
+          AND assigned_at <= datetime('now', '-{STALE_DAYS} days')
+        ORDER BY assigned_at
+    """,
+    DONE_WITHOUT_REPORT: f"""
+        SELECT s.id AS subtask_id, s.parent_cmd, s.worker_id
+        FROM orphan_items o
+        JOIN subtasks s ON s.id = o.item_id
+        WHERE o.check_type = '{DONE_WITHOUT_REPORT}'
+        ORDER BY o.item_id
+    """,
+}
+
+
+# 差分インデックスが未作成のDB向けの全件走査（高札は読み取り専用接続のため作成できない）。
+# 時間条件の2種は READ_SQL と同じ（索引の範囲検索で足りる）
+SCAN_SQL = {
+    CMD_ALL_DONE: """
+        SELECT c.id AS cmd_id, c.status,
+               COUNT(s.id) AS subtask_count
+        FROM commands c
+        JOIN subtasks s ON s.parent_cmd = c.id
+        WHERE c.status != 'done'
+        GROUP BY c.id
+        HAVING COUNT(s.id) > 0
+           AND COUNT(s.id) = SUM(CASE WHEN s.status = 'done' THEN 1 ELSE 0 END)
+        ORDER BY c.id
+    """,
+    DONE_WITHOUT_REPORT: """
+        SELECT s.id AS subtask_id, s.parent_cmd, s.worker_id
+        FROM subtasks s
+        LEFT JOIN reports r ON r.task_id = s.id
+        WHERE s.status = 'done'
+          AND r.id IS NULL
+        ORDER BY s.id
+    """,
+}
+
+
+def ensure_orphan_index(conn: sqlite3.Connection) -> bool:
+    """表・トリガ・インデックスを作成する。新規作成時はバックフィルしてTrueを返す。
+
+    既に存在する場合は sqlite_master の1行参照のみ。呼び出し元で conn.commit() が必要。
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='trg_orphan_report_upd'"
+    ).fetchone()
+    if exists:
+        return False
+    for sql in SCHEMA_SQL + INDEXES_SQL + TRIGGERS_SQL:
+        conn.execute(sql)
+    rebuild_orphan_index(conn)
+    return True
+
+
+def rebuild_orphan_index(conn: sqlite3.Connection) -> None:
+    """orphan_items / orphan_cmd_progress を全件再集計する。呼び出し元で conn.commit() が必要。"""
+    for sql in _REBUILD_SQL:
+        conn.execute(sql)
+
+
+def read_orphans(conn: sqlite3.Connection, use_index: bool = True) -> dict[str, list[dict]]:
+    """4種類のチェック結果を {check_type: items} で返す（表示順は check_type の定義順）。
+
+    use_index=False なら差分インデックスを使わず全件走査する（SCAN_SQL）。
+    use_index=True で差分インデックスが未作成なら sqlite3.OperationalError。
+    """
+    sqls = READ_SQL if use_index else {**READ_SQL, **SCAN_SQL}
+    return {
+        check_type: [dict(r) for r in conn.execute(sql).fetchall()]
+        for check_type, sql in sqls.items()
+    }
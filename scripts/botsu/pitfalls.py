@@ -0,0 +1,245 @@
+"""pitfalls.py — enrich の失敗パターン（pitfalls）分類インデックス。
+
+高札 _extract_pitfalls() / botsu search --enrich は従来、パターン毎に
+subtasks × reports を LIKE '%...%' で全件走査していた（索引が効かない）。
+本モジュールは分類結果を没日録DB内の表に保持し、トリガで差分更新する。
+
+  - pitfall_patterns : パターン定義（データ。初回作成時に DEFAULT_PATTERNS を投入）
+  - pitfall_hits     : (rule_id, subtask_id) の該当組と completed_at（新しい順に索引読み）
+
+再分類のタイミング:
+  - subtasks INSERT / UPDATE(description, status, completed_at) : 当該subtaskのみ
+  - reports  INSERT / UPDATE(summary, task_id) / DELETE        : 当該subtaskのみ
+  - pitfall_patterns INSERT / UPDATE / DELETE                   : 当該パターンのみ全件
+
+高札コンテナへ単体でマウントされるため stdlib のみに依存する（botsu を import しない）。
+"""
+
+from __future__ import annotations
+
+import sqlite3
+
+# 分類対象とする subtask の状態
+CLASSIFIED_STATUSES = ("blocked", "cancelled", "done")
+
+# 初期パターン（pitfall_patterns 作成時に一度だけ投入。以後は表を編集する）
+# (pattern_id, like_pattern, severity, label, prevention)
+DEFAULT_PATTERNS = [
+    ("P001", "%コミット漏れ%", "high", "commit忘れ", "inbox descriptionに「git add+commit+push」を明記"),
+    ("P001", "%git add%", "high", "commit忘れ", "inbox descriptionに「git add+commit+push」を明記"),
+    ("P002", "%ハルシネーション%", "critical", "ハルシネーション", "成果物の実在確認（git ls-remote, ls -la）を必須化"),
+    ("P002", "%捏造%", "critical", "捏造", "成果物の実在確認を必須化"),
+    ("P003", "%マージ%", "medium", "マージ問題", "ブランチ分岐状況を事前確認"),
+    ("P004", "%差し戻%", "medium", "差し戻し", "直近の差し戻し理由を確認"),
+]
+
+SEVERITY_ORDER = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+PER_RULE_LIMIT = 3
+
+SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS pitfall_patterns (
+        rule_id INTEGER PRIMARY KEY,
+        pattern_id TEXT NOT NULL,       -- P001 等（同一IDに複数パターン可）
+        like_pattern TEXT NOT NULL,     -- description / report summary への LIKE
+        severity TEXT NOT NULL,         -- critical / high / medium / low
+        label TEXT NOT NULL,
+        prevention TEXT NOT NULL,
+        enabled INTEGER NOT NULL DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS pitfall_hits (
+        rule_id INTEGER NOT NULL,
+        subtask_id TEXT NOT NULL,
+        completed_at TEXT,
+        PRIMARY KEY (rule_id, subtask_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_pitfall_hits_recent ON pitfall_hits(rule_id, completed_at DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_pitfall_hits_subtask ON pitfall_hits(subtask_id)",
+]
+
+_STATUS_IN = "(" + ", ".join(f"'{s}'" for s in CLASSIFIED_STATUSES) + ")"
+
+# 分類条件: s（subtasks行）と p（pitfall_patterns行）が束縛された文脈で評価する
+_MATCH = f"""
+    p.enabled = 1 AND s.status IN {_STATUS_IN}
+    AND (s.description LIKE p.like_pattern
+         OR EXISTS (SELECT 1 FROM reports r
+                    WHERE r.task_id = s.id AND r.summary LIKE p.like_pattern))
+"""
+
+
+def _reclassify_subtask(subtask_id: str) -> str:
+    return f"""
+        DELETE FROM pitfall_hits WHERE subtask_id = {subtask_id};
+        INSERT OR IGNORE INTO pitfall_hits (rule_id, subtask_id, completed_at)
+        SELECT p.rule_id, s.id, s.completed_at
+        FROM subtasks s, pitfall_patterns p
+        WHERE s.id = {subtask_id} AND {_MATCH};
+    """
+
+
+def _classify_rule(rule_id: str) -> str:
+    return f"""
+        INSERT OR IGNORE INTO pitfall_hits (rule_id, subtask_id, completed_at)
+        SELECT p.rule_id, s.id, s.completed_at
+        FROM pitfall_patterns p, subtasks s
+        WHERE p.rule_id = {rule_id} AND {_MATCH};
+    """
+
+
+TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_pitfall_subtask_ins
+    AFTER INSERT ON subtasks BEGIN
+        {_reclassify_subtask("NEW.id")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_pitfall_subtask_upd
+    AFTER UPDATE OF id, description, status, completed_at ON subtasks BEGIN
+        DELETE FROM pitfall_hits WHERE subtask_id = OLD.id;
+        {_reclassify_subtask("NEW.id")}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_pitfall_subtask_del
+    AFTER DELETE ON subtasks BEGIN
+        DELETE FROM pitfall_hits WHERE subtask_id = OLD.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_pitfall_report_ins
+    AFTER INSERT ON reports BEGIN
+        {_reclassify_subtask("NEW.task_id")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_pitfall_report_upd
+    AFTER UPDATE OF summary, task_id ON reports BEGIN
+        {_reclassify_subtask("OLD.task_id")}
+        {_reclassify_subtask("NEW.task_id")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_pitfall_report_del
+    AFTER DELETE ON reports BEGIN
+        {_reclassify_subtask("OLD.task_id")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_pitfall_pattern_ins
+    AFTER INSERT ON pitfall_patterns BEGIN
+        {_classify_rule("NEW.rule_id")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_pitfall_pattern_upd
+    AFTER UPDATE OF like_pattern, enabled ON pitfall_patterns BEGIN
+        DELETE FROM pitfall_hits WHERE rule_id = OLD.rule_id;
+        {_classify_rule("NEW.rule_id")}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_pitfall_pattern_del
+    AFTER DELETE ON pitfall_patterns BEGIN
+        DELETE FROM pitfall_hits WHERE rule_id = OLD.rule_id;
+    END
+    """,
+]
+
+_READ_RULE_SQL = """
+    SELECT h.subtask_id AS id, substr(s.description, 1, 100) AS description
+    FROM pitfall_hits h
+    JOIN subtasks s ON s.id = h.subtask_id
+    WHERE h.rule_id = ?
+    ORDER BY h.completed_at DESC
+    LIMIT ?
+"""
+
+_READ_WORKER_SQL = """
+    SELECT s.id, substr(s.description, 1, 100) AS description
+    FROM subtasks s
+    WHERE s.worker_id = ? AND s.status IN ('blocked', 'cancelled')
+    ORDER BY s.completed_at DESC LIMIT 3
+"""
+
+
+def ensure_pitfall_index(conn: sqlite3.Connection) -> bool:
+    """表・トリガを作成する。新規作成時は初期パターン投入とバックフィルを行いTrueを返す。
+
+    既に存在する場合は sqlite_master の1行参照のみ。呼び出し元で conn.commit() が必要。
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='trg_pitfall_pattern_del'"
+    ).fetchone()
+    if exists:
+        return False
+    has_patterns = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='pitfall_patterns'"
+    ).fetchone()
+    for sql in SCHEMA_SQL + TRIGGERS_SQL:
+        conn.execute(sql)
+    if not has_patterns:
+        # パターン投入トリガが各パターンを全件分類する（= バックフィル）
+        conn.executemany(
+            "INSERT INTO pitfall_patterns (pattern_id, like_pattern, severity, label, prevention)"
+            " VALUES (?, ?, ?, ?, ?)",
+            DEFAULT_PATTERNS,
+        )
+    else:
+        rebuild_pitfall_index(conn)
+    return True
+
+
+def rebuild_pitfall_index(conn: sqlite3.Connection) -> None:
+    """pitfall_hits を全パターンについて再分類する。呼び出し元で conn.commit() が必要。"""
+    conn.execute("DELETE FROM pitfall_hits")
+    conn.execute(f"""
+        INSERT OR IGNORE INTO pitfall_hits (rule_id, subtask_id, completed_at)
+        SELECT p.rule_id, s.id, s.completed_at
+        FROM pitfall_patterns p, subtasks s
+        WHERE {_MATCH}
+    """)
+
+
+def read_pitfalls(conn: sqlite3.Connection, worker_id: str | None) -> list[dict]:
+    """enrich 用の pitfalls を返す（パターン毎に新しい順3件 + worker別の過去失敗 P005）。
+
+    pitfall_* 表が無い場合は sqlite3.OperationalError。
+    """
+    pitfalls: list[dict] = []
+    seen_ids: set[str] = set()
+    rules = conn.execute(
+        "SELECT rule_id, pattern_id, severity, label, prevention"
+        " FROM pitfall_patterns WHERE enabled = 1 ORDER BY rule_id"
+    ).fetchall()
+    for rule_id, pattern_id, severity, label, prevention in rules:
+        for sid, description in conn.execute(_READ_RULE_SQL, (rule_id, PER_RULE_LIMIT)):
+            if sid in seen_ids:
+                continue
+            seen_ids.add(sid)
+            pitfalls.append({
+                "pattern_id": pattern_id,
+                "source_id": sid,
+                "severity": severity,
+                "description": f"{label}: {description}",
+                "prevention": prevention,
+            })
+
+    # P005: worker別の失敗パターン
+    if worker_id:
+        for sid, description in conn.execute(_READ_WORKER_SQL, (worker_id,)):
+            if sid not in seen_ids:
+                pitfalls.append({
+                    "pattern_id": "P005",
+                    "source_id": sid,
+                    "severity": "medium",
+                    "description": f"{worker_id}の過去失敗: {description}",
+                    "prevention": f"{worker_id}に割り当て時は過去の失敗パターンに注意",
+                })
+
+    pitfalls.sort(key=lambda x: SEVERITY_ORDER.get(x["severity"], 4))
+    return pitfalls
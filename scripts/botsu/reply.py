@@ -5,7 +5,8 @@ Phase 0 CLI拡張: list-for / list-unread (cmd_441 subtask_979)
 
 from datetime import datetime
 
-from . import get_connection, now_iso, fts5_upsert, vec_upsert_if_available
+from . import get_connection, now_iso
+from .indexer import ensure_index_queue
 from .notify import notify_post
 
 
@@ -58,6 +59,7 @@ def do_reply_add(thread_id: str, board: str, agent: str, body: str,
                  notify: bool = True) -> int:
     """argsに依存しないレス投稿関数。reply_idを返す。notify=Trueでsend-keys通知も発火。"""
     conn = get_connection()
+    ensure_index_queue(conn)  # 全文検索索引はトリガ→index_queue 経由で indexer が反映
     conn.execute(
         "INSERT INTO thread_replies (thread_id, board, author, body, posted_at)"
         " VALUES (?, ?, ?, ?, ?)",
@@ -65,8 +67,6 @@ def do_reply_add(thread_id: str, board: str, agent: str, body: str,
     )
     row = conn.execute("SELECT last_insert_rowid()").fetchone()
     reply_id = row[0]
-    fts5_upsert(conn, "reply", str(reply_id), thread_id, board, agent, "", body or "")
-    vec_upsert_if_available(conn, str(reply_id), "reply", body or "", thread_id, board)
     conn.commit()
     conn.close()
 
@@ -2,7 +2,12 @@
 
 import sys
 
-from . import get_connection, now_iso, print_table, print_json, row_to_dict, _try_notify, fts5_upsert, vec_upsert_if_available
+from . import get_connection, now_iso, print_table, print_json, row_to_dict, _try_notify
+from .approved import ensure_approved_index
+from .indexer import ensure_index_queue
+from .orphans import ensure_orphan_index
+from .pitfalls import ensure_pitfall_index
+from .worker_stats import ensure_worker_stats
 
 
 def report_add(args) -> None:
@@ -15,6 +20,11 @@ def report_add(args) -> None:
         sys.exit(1)
 
     ts = now_iso()
+    ensure_worker_stats(conn)  # report_count・矛盾検出インデックスはトリガで差分更新
+    ensure_orphan_index(conn)
+    ensure_pitfall_index(conn)
+    ensure_approved_index(conn)
+    ensure_index_queue(conn)
     conn.execute(
         """INSERT INTO reports (worker_id, task_id, timestamp, status, summary, findings, files_modified, skill_candidate_name, skill_candidate_desc)
            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
@@ -32,10 +42,6 @@ def report_add(args) -> None:
     )
     conn.commit()
     report_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
-    raw_text = f"{args.summary or ''} {args.findings or ''}".strip()
-    fts5_upsert(conn, "report", str(report_id), args.task_id, "", args.worker_id or "", args.status or "", raw_text)
-    vec_upsert_if_available(conn, str(report_id), "report", raw_text, args.task_id, "")
-    conn.commit()
     conn.close()
     print(f"Created: report #{report_id} (task={args.task_id}, worker={args.worker_id})")
     _try_notify(f"📋 report #{report_id} ({args.status}) — {args.summary[:50]}",
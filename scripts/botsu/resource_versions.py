@@ -0,0 +1,118 @@
+"""resource_versions.py — 高札の条件付きGET用の資源毎版数（トリガ維持）。
+
+高札の ETag / Last-Modified は従来、没日録DB全体の PRAGMA data_version から作っていた。
+index_queue・pitfall_hits 等のトリガ維持表や、高札自身の派生インデックス作成でもDBは
+変わるため、読んでいる行と無関係な書き込みの度に全エンドポイントの 304 が外れていた。
+
+本モジュールはエンドポイントが実際に読む列の変更だけを数える。
+
+  - reports   : reports の INSERT / UPDATE / DELETE           （GET /reports/{id}）
+  - audit     : subtasks の INSERT / DELETE、
+                UPDATE(audit_status, needs_audit, notes)       （GET /audit/{subtask_id}）
+  - dashboard : dashboard_entries の INSERT / UPDATE / DELETE （GET /dashboard）
+  - commands  : commands の INSERT / DELETE、
+                UPDATE(command, details, project, status, created_at) （enrich の判断予測の履歴表）
+  - subtasks / pitfall_patterns / pitfall_hits / approved_work : 各表の全変更
+                （POST /enrich の結果キャッシュの版数。enrich_cache.data_version）
+
+派生表（pitfall_* / approved_work）は後から作られるため、ensure_resource_versions() は
+表が増えた時（PRAGMA schema_version の変化時）に呼び直して足りない資源を追加する。
+
+resource_versions は資源毎1行（version = 変更回数、changed_at = 最終変更のUNIX秒）。
+
+高札コンテナへ単体でマウントされるため stdlib のみに依存する（botsu を import しない）。
+"""
+
+from __future__ import annotations
+
+import sqlite3
+
+# 資源名 → (表, UPDATE で数える列。None なら全列)
+RESOURCES = {
+    "reports": ("reports", None),
+    "audit": ("subtasks", ("audit_status", "needs_audit", "notes")),
+    "dashboard": ("dashboard_entries", None),
+    "commands": ("commands", ("command", "details", "project", "status", "created_at")),
+    "subtasks": ("subtasks", None),
+    "pitfall_patterns": ("pitfall_patterns", None),
+    "pitfall_hits": ("pitfall_hits", None),
+    "approved_work": ("approved_work", None),
+}
+
+SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS resource_versions (
+        resource TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        changed_at REAL                    -- UNIX秒
+    ) WITHOUT ROWID
+    """,
+]
+
+# julianday は全バージョンの SQLite にある（unixepoch() は 3.38 以降）
+_NOW = "(julianday('now') - 2440587.5) * 86400.0"
+
+
+def _bump(resource: str) -> str:
+    return (f"UPDATE resource_versions SET version = version + 1, changed_at = {_NOW}"
+            f" WHERE resource = '{resource}';")
+
+
+def _triggers(resource: str) -> list[str]:
+    table, columns = RESOURCES[resource]
+    update_of = f" OF {', '.join(columns)}" if columns else ""
+    return [
+        f"""
+    CREATE TRIGGER IF NOT EXISTS trg_resource_{resource}_{suffix}
+    AFTER {event} ON {table} BEGIN
+        {_bump(resource)}
+    END
+    """
+        for suffix, event in (("ins", "INSERT"), ("upd", f"UPDATE{update_of}"), ("del", "DELETE"))
+    ]
+
+
+TRIGGERS_SQL = {resource: _triggers(resource) for resource in RESOURCES}
+
+
+def ensure_resource_versions(conn: sqlite3.Connection) -> bool:
+    """resource_versions とトリガを作成する。作成した場合 True（呼び出し元で conn.commit()）。
+
+    版数行の無い資源（後から RESOURCES に加えたもの）だけを追加する。
+    対象表が無いDB（旧スキーマ）の資源はトリガも版数行も作らない（条件付き応答はDB全体の世代）。
+    """
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    installed = set()
+    if "resource_versions" in tables:
+        installed = {r[0] for r in conn.execute("SELECT resource FROM resource_versions")}
+    missing = [name for name, (table, _columns) in RESOURCES.items()
+               if table in tables and name not in installed]
+    if not missing:
+        return False
+    for sql in SCHEMA_SQL:
+        conn.execute(sql)
+    for resource in missing:
+        conn.execute(
+            "INSERT OR IGNORE INTO resource_versions (resource, version, changed_at)"
+            f" VALUES (?, 0, {_NOW})",
+            (resource,),
+        )
+        for sql in TRIGGERS_SQL[resource]:
+            conn.execute(sql)
+    return True
+
+
+def read_resource_version(conn: sqlite3.Connection, resource: str) -> int | None:
+    """1資源の版数（版数行が無ければ None）。表が未作成なら sqlite3.OperationalError。"""
+    row = conn.execute(
+        "SELECT version FROM resource_versions WHERE resource = ?", (resource,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def read_resource_versions(conn: sqlite3.Connection) -> dict[str, tuple[int, float]]:
+    """{資源名: (version, changed_at)}。表が未作成なら sqlite3.OperationalError。"""
+    return {
+        r[0]: (r[1], r[2])
+        for r in conn.execute("SELECT resource, version, changed_at FROM resource_versions")
+    }
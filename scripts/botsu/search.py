@@ -15,62 +15,25 @@ import re as _re
 import sys
 
 from botsu import get_connection
-
-# MeCab はオプション。未インストール時はraw textで検索
-try:
-    import MeCab
-    _MECAB_AVAILABLE = True
-except ImportError:
-    _MECAB_AVAILABLE = False
-
-# MeCab品詞フィルタ (build_index.py / migrate_fts5.py と同一)
-_ALLOWED_POS = {"名詞", "動詞", "形容詞"}
+from botsu.approved import ensure_approved_index, search_approved
+from botsu.indexer import catch_up
+from botsu.pitfalls import ensure_pitfall_index, read_pitfalls
+from botsu import tokenizer as _tokenizer
 
 _SNIPPET_WIDTH = 80   # 表示最大幅
 _SNIPPET_TOKENS = 32  # FTS5 snippet() トークン数
 
 
 # ---------------------------------------------------------------------------
-# Tokenizer (main.py tokenize() 移植)
+# Tokenizer (botsu/tokenizer.py 共有キャッシュ)
 # ---------------------------------------------------------------------------
 
-def _create_tagger():
-    if not _MECAB_AVAILABLE:
-        return None
-    try:
-        return MeCab.Tagger()
-    except Exception:
-        return None
-
-
-_tagger = None  # モジュールレベルでシングルトン化
-
-
 def _tokenize(text: str) -> str:
-    """MeCabで分かち書き。MeCab未インストール時はそのまま返す。"""
-    global _tagger
+    """MeCabで分かち書き（共有キャッシュ経由）。MeCab未インストール時はそのまま返す。"""
     if not text:
         return ""
-    if not _MECAB_AVAILABLE:
-        return text
-    if _tagger is None:
-        _tagger = _create_tagger()
-    if _tagger is None:
-        return text
-    try:
-        tokens = []
-        node = _tagger.parseToNode(text)
-        while node:
-            features = node.feature.split(",")
-            if features[0] in _ALLOWED_POS:
-                surface = node.surface.strip()
-                if surface:
-                    tokens.append(surface)
-            node = node.next
-        result = " ".join(tokens)
-        return result if result.strip() else text
-    except Exception:
-        return text
+    result = _tokenizer.tokenize(text)
+    return result if result.strip() else text
 
 
 def _build_match_query(query: str) -> str:
@@ -90,6 +53,114 @@ def _build_match_query(query: str) -> str:
 # Search function
 # ---------------------------------------------------------------------------
 
+def _encode_cursor(score: float, rowid: int) -> str:
+    """keysetカーソル: 最終行の (rowid, rank)。先頭を rowid にして "-" 始まりを避ける。"""
+    return f"{rowid}:{score!r}"
+
+
+def _decode_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        rowid, score = cursor.split(":")
+        return float(score), int(rowid)
+    except ValueError:
+        print(f"Error: 不正なカーソルです: {cursor}", file=sys.stderr)
+        sys.exit(1)
+
+
+def _estimate_hits(conn, match_query: str) -> int | None:
+    """fts5vocab の文書頻度から AND 検索のヒット数上限を見積もる（MATCH走査なし）。"""
+    terms = [t.strip('"').lower() for t in match_query.split()]
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS temp.search_vocab"
+            " USING fts5vocab(main, search_index, row)"
+        )
+        row = conn.execute(
+            f"SELECT MIN(doc) FROM temp.search_vocab WHERE term IN ({','.join('?' * len(terms))})",
+            terms,
+        ).fetchone()
+    except Exception:
+        return None
+    return row[0] or 0
+
+
+def _search_page(conn, match_query: str, limit: int, project: str | None,
+                 count_mode: str, cursor: str | None):
+    """1ページ分の検索結果・総件数・次カーソルを返す。
+
+    count_mode="exact" ではページと件数を1回のMATCH走査で求める
+    (kousatsu main.py GET /search と同一方式。ORDER BY rank の全件走査に
+    COUNT(*) OVER () を相乗りさせ、snippet() はページ行のみ rowid で引き直す)。
+
+    Returns:
+        (rows, total, next_cursor)  total は count_mode="none" 時 None
+    """
+    cur_score, cur_rid = _decode_cursor(cursor) if cursor else (None, None)
+    project_cond = "AND project = :project" if project else ""
+    params = {
+        "tokens": _SNIPPET_TOKENS, "q": match_query, "project": project,
+        "n": limit + 1, "cur_score": cur_score, "cur_rid": cur_rid,
+    }
+    if count_mode == "exact":
+        sql = f"""
+            WITH hits AS (
+                SELECT rowid AS rid, rank AS score, COUNT(*) OVER () AS total
+                FROM search_index
+                WHERE search_index MATCH :q {project_cond}
+            ), page AS (
+                SELECT rid, score, total FROM hits
+                WHERE :cur_rid IS NULL
+                   OR score > :cur_score OR (score = :cur_score AND rid > :cur_rid)
+                ORDER BY score, rid
+                LIMIT :n
+            )
+            SELECT
+                page.rid, page.score AS rank, page.total,
+                source_type, source_id, parent_id, project, worker_id, status,
+                snippet(search_index, 6, '', '', '...', :tokens) AS snip
+            FROM page JOIN search_index ON search_index.rowid = page.rid
+            WHERE search_index MATCH :q
+            ORDER BY page.score, page.rid
+        """
+    else:
+        # +rank: 仮想テーブルへの制約プッシュダウンを抑止して通常比較させる
+        sql = f"""
+            SELECT
+                rowid AS rid, rank,
+                source_type, source_id, parent_id, project, worker_id, status,
+                snippet(search_index, 6, '', '', '...', :tokens) AS snip
+            FROM search_index
+            WHERE search_index MATCH :q {project_cond}
+              AND (:cur_rid IS NULL
+                   OR +rank > :cur_score OR (+rank = :cur_score AND rowid > :cur_rid))
+            ORDER BY rank, rowid
+            LIMIT :n
+        """
+    rows = conn.execute(sql, params).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["rank"], rows[-1]["rid"])
+
+    total = None
+    if count_mode == "exact":
+        if rows:
+            total = rows[0]["total"]
+        elif cursor is None:
+            total = 0
+        else:
+            # 末尾を越えたカーソル（空ページ）の時のみ件数を別途数える
+            total = conn.execute(
+                f"SELECT COUNT(*) FROM search_index WHERE search_index MATCH :q {project_cond}",
+                params,
+            ).fetchone()[0]
+    elif count_mode == "estimate":
+        estimate = _estimate_hits(conn, match_query)
+        if estimate is not None:
+            total = max(estimate, len(rows))
+    return rows, total, next_cursor
+
+
 def search(args) -> None:
     """FTS5全文検索を実行してテーブル表示する。
 
@@ -101,6 +172,8 @@ def search(args) -> None:
             - similar : 基準subtask ID (省略可)
             - limit   : 最大返却件数 (デフォルト20)
             - project : projectフィールドで絞り込み (省略可)
+            - count   : 総件数モード exact/estimate/none (デフォルトexact)
+            - cursor  : 前回表示の Next cursor (省略可)
     """
     if getattr(args, "similar", None):
         search_similar(args)
@@ -114,6 +187,8 @@ def search(args) -> None:
     query: str = args.query
     limit: int = args.limit
     project: str | None = args.project
+    count_mode: str = getattr(args, "count", None) or "exact"
+    cursor: str | None = getattr(args, "cursor", None)
 
     if not query.strip():
         print("Error: 検索クエリが空です。", file=sys.stderr)
@@ -134,55 +209,10 @@ def search(args) -> None:
                 file=sys.stderr,
             )
             sys.exit(1)
+        catch_up(conn)  # index_queue の滞留分を反映してから検索
 
-        # project絞り込みがある場合はWHERE句を追加
-        if project:
-            sql = """
-                SELECT
-                    source_type,
-                    source_id,
-                    parent_id,
-                    project,
-                    worker_id,
-                    status,
-                    snippet(search_index, 6, '', '', '...', ?) AS snip,
-                    rank
-                FROM search_index
-                WHERE search_index MATCH ?
-                  AND project = ?
-                ORDER BY rank
-                LIMIT ?
-            """
-            params = (_SNIPPET_TOKENS, match_query, project, limit)
-            count_sql = (
-                "SELECT COUNT(*) FROM search_index"
-                " WHERE search_index MATCH ? AND project = ?"
-            )
-            count_params = (match_query, project)
-        else:
-            sql = """
-                SELECT
-                    source_type,
-                    source_id,
-                    parent_id,
-                    project,
-                    worker_id,
-                    status,
-                    snippet(search_index, 6, '', '', '...', ?) AS snip,
-                    rank
-                FROM search_index
-                WHERE search_index MATCH ?
-                ORDER BY rank
-                LIMIT ?
-            """
-            params = (_SNIPPET_TOKENS, match_query, limit)
-            count_sql = (
-                "SELECT COUNT(*) FROM search_index WHERE search_index MATCH ?"
-            )
-            count_params = (match_query,)
-
-        rows = conn.execute(sql, params).fetchall()
-        total = conn.execute(count_sql, count_params).fetchone()[0]
+        rows, total, next_cursor = _search_page(
+            conn, match_query, limit, project, count_mode, cursor)
 
     except Exception as exc:
         print(f"Error: 検索失敗: {exc}", file=sys.stderr)
@@ -197,7 +227,12 @@ def search(args) -> None:
         print(f"Tokenized: {tokenized}")
     if project:
         print(f"Project: {project}")
-    print(f"Total hits: {total}  (showing {min(len(rows), limit)})")
+    if total is None:
+        print(f"Total hits: -  (showing {len(rows)})")
+    elif count_mode == "estimate":
+        print(f"Total hits: ~{total}  (showing {len(rows)})")
+    else:
+        print(f"Total hits: {total}  (showing {len(rows)})")
     print()
 
     if not rows:
@@ -237,6 +272,10 @@ def search(args) -> None:
             f"{status:<{STATUS_W}}  {snip}"
         )
 
+    if next_cursor:
+        print()
+        print(f"Next cursor: {next_cursor}")
+
 
 # ---------------------------------------------------------------------------
 # Hybrid search (FTS5 + sqlite-vec RRF)
@@ -256,7 +295,7 @@ def _search_hybrid(args) -> None:
     try:
         # sqlite-vec拡張ロード
         try:
-            from botsu.vec import _load_vec, hybrid_search
+            from botsu.vec import _load_vec, hybrid_search, upgrade_vec_tables
             if not _load_vec(conn):
                 print("Error: sqlite-vec が利用できません。pip install sqlite-vec を実行してください。",
                       file=sys.stderr)
@@ -273,6 +312,9 @@ def _search_hybrid(args) -> None:
             print("Error: vec_index が未作成です。python3 scripts/migrate_vec.py を実行してください。",
                   file=sys.stderr)
             sys.exit(1)
+        if upgrade_vec_tables(conn):  # source_id 単独キーの旧構成を移行
+            conn.commit()
+        catch_up(conn)  # 変わった行は embed_queue へ（ベクトル化は index embed）
 
         use_fresh = getattr(args, "fresh", False)
         use_verbose = getattr(args, "verbose", False)
@@ -379,27 +421,10 @@ def _extract_keywords(text: str, max_kw: int = 20) -> list[str]:
     if not text:
         return []
 
-    # MeCab名詞抽出（辞書がある場合のみ動作）
-    global _tagger
-    if _MECAB_AVAILABLE:
-        if _tagger is None:
-            _tagger = _create_tagger()
-        if _tagger is not None:
-            try:
-                node = _tagger.parseToNode(text)
-                nouns: list[str] = []
-                seen_n: set[str] = set()
-                while node:
-                    features = node.feature.split(",")
-                    surface = node.surface.strip()
-                    if features[0] == "名詞" and surface and len(surface) >= 2 and surface not in seen_n:
-                        seen_n.add(surface)
-                        nouns.append(surface)
-                    node = node.next
-                if nouns:
-                    return nouns[:max_kw]
-            except Exception:
-                pass
+    # MeCab名詞抽出（辞書がある場合のみ動作。共有キャッシュ経由）
+    nouns = _tokenizer.nouns(text)
+    if nouns:
+        return nouns[:max_kw]
 
     # Fallback: 記号/空白で分割 → 短語・ストップワードを除去
     tokens = _re.split(r'[\s\u3000\n\r\t、。，．・:：/\\|「」【】（）\[\]{}()\-_+=]+', text)
@@ -451,6 +476,7 @@ def search_similar(args) -> None:
                 file=sys.stderr,
             )
             sys.exit(1)
+        catch_up(conn)
 
         # 3. キーワード抽出 + FTS5 OR検索
         keywords = _extract_keywords(description, max_kw=20)
@@ -543,104 +569,20 @@ def search_similar(args) -> None:
 # enrich  (main.py POST /enrich 移植 — subtask_919/cmd_419 W3-c)
 # ---------------------------------------------------------------------------
 
-_PITFALL_PATTERNS = [
-    ("P001", "%コミット漏れ%",    "high",     "commit忘れ",        "inbox descriptionに「git add+commit+push」を明記"),
-    ("P001", "%git add%",          "high",     "commit忘れ",        "inbox descriptionに「git add+commit+push」を明記"),
-    ("P002", "%ハルシネーション%", "critical", "ハルシネーション",  "成果物の実在確認（git ls-remote, ls -la）を必須化"),
-    ("P002", "%捏造%",             "critical", "捏造",              "成果物の実在確認を必須化"),
-    ("P003", "%マージ%",           "medium",   "マージ問題",        "ブランチ分岐状況を事前確認"),
-    ("P004", "%差し戻%",           "medium",   "差し戻し",          "直近の差し戻し理由を確認"),
-]
-
-
 def _enrich_extract_pitfalls(conn, worker_id: str | None) -> list[dict]:
-    """没日録DBから失敗パターンを抽出する（main.py _extract_pitfalls 移植）。"""
-    pitfalls: list[dict] = []
-    seen_ids: set[str] = set()
-    for pid, like_pat, severity, desc_label, prevention in _PITFALL_PATTERNS:
-        rows = conn.execute(
-            """
-            SELECT s.id, substr(s.description, 1, 100) AS description,
-                   r.summary AS report_summary
-            FROM subtasks s
-            LEFT JOIN reports r ON r.task_id = s.id
-            WHERE (r.summary LIKE ? OR s.description LIKE ?)
-              AND s.status IN ('blocked', 'cancelled', 'done')
-            ORDER BY s.completed_at DESC LIMIT 3
-            """,
-            (like_pat, like_pat),
-        ).fetchall()
-        for row in rows:
-            if row["id"] in seen_ids:
-                continue
-            seen_ids.add(row["id"])
-            pitfalls.append({
-                "pattern_id": pid,
-                "source_id":  row["id"],
-                "severity":   severity,
-                "description": f"{desc_label}: {row['description']}",
-                "prevention": prevention,
-            })
-
-    # P005: worker別の失敗パターン
-    if worker_id:
-        rows = conn.execute(
-            """
-            SELECT s.id, substr(s.description, 1, 100) AS description
-            FROM subtasks s
-            WHERE s.worker_id = ? AND s.status IN ('blocked', 'cancelled')
-            ORDER BY s.completed_at DESC LIMIT 3
-            """,
-            (worker_id,),
-        ).fetchall()
-        for row in rows:
-            if row["id"] not in seen_ids:
-                pitfalls.append({
-                    "pattern_id": "P005",
-                    "source_id":  row["id"],
-                    "severity":   "medium",
-                    "description": f"{worker_id}の過去失敗: {row['description']}",
-                    "prevention": f"{worker_id}に割り当て時は過去の失敗パターンに注意",
-                })
-
-    order = {"critical": 0, "high": 1, "medium": 2, "low": 3}
-    pitfalls.sort(key=lambda x: order.get(x["severity"], 4))
-    return pitfalls
+    """没日録DBから失敗パターンを抽出する（pitfall_hits の索引読み。botsu/pitfalls.py）。"""
+    if ensure_pitfall_index(conn):
+        conn.commit()
+    return read_pitfalls(conn, worker_id)
 
 
 def _enrich_extract_positive(conn, keywords: list[str]) -> list[dict]:
-    """audit PASS済みの成功パターンを抽出する（main.py _extract_positive_patterns 移植）。"""
+    """audit PASS済みの成功パターンを抽出する（approved_fts の1クエリ。botsu/approved.py）。"""
     if not keywords:
         return []
-    results: list[dict] = []
-    seen: set[str] = set()
-    for kw in keywords[:5]:
-        rows = conn.execute(
-            """
-            SELECT s.id, s.project, s.worker_id,
-                   substr(s.description, 1, 120) AS description,
-                   r.summary AS report_summary
-            FROM subtasks s
-            JOIN reports r ON r.task_id = s.id AND r.status = 'done'
-            WHERE s.audit_status = 'done'
-              AND (s.description LIKE '%' || ? || '%'
-                   OR r.summary LIKE '%' || ? || '%')
-            ORDER BY s.completed_at DESC LIMIT 3
-            """,
-            (kw, kw),
-        ).fetchall()
-        for row in rows:
-            if row["id"] in seen:
-                continue
-            seen.add(row["id"])
-            results.append({
-                "source_id":   row["id"],
-                "project":     row["project"] or "",
-                "description": f"{row['description']} → audit PASS",
-                "strength":    "high" if len(rows) >= 3 else "medium",
-                "hint":        "この方向を継続せよ",
-            })
-    return results
+    if ensure_approved_index(conn):
+        conn.commit()
+    return search_approved(conn, keywords)
 
 
 def enrich_data(cmd_id: str, worker_id: str | None = None) -> dict:
@@ -670,6 +612,8 @@ def enrich_data(cmd_id: str, worker_id: str | None = None) -> dict:
         has_fts = conn.execute(
             "SELECT name FROM sqlite_master WHERE type='table' AND name='search_index'"
         ).fetchone() is not None
+        if has_fts:
+            catch_up(conn)
 
         # Stage1: 同PJ内FTS5検索
         local_results: list[dict] = []
@@ -4,7 +4,12 @@ import sqlite3
 import sys
 from collections import deque
 
-from . import get_connection, next_counter, now_iso, print_table, print_json, row_to_dict, fts5_upsert, vec_upsert_if_available
+from . import get_connection, next_counter, now_iso, print_table, print_json, row_to_dict
+from .approved import ensure_approved_index
+from .indexer import ensure_index_queue
+from .orphans import ensure_orphan_index
+from .pitfalls import ensure_pitfall_index
+from .worker_stats import ensure_worker_stats
 
 
 def _parse_blocked_by(blocked_by_str: str | None) -> list[str]:
@@ -163,16 +168,17 @@ def subtask_add(args) -> None:
 
     needs_audit = 1 if args.needs_audit else 0
 
+    ensure_worker_stats(conn)  # 足軽統計ロールアップ・矛盾検出インデックスはトリガで差分更新
+    ensure_orphan_index(conn)
+    ensure_pitfall_index(conn)
+    ensure_approved_index(conn)
+    ensure_index_queue(conn)
     conn.execute(
         """INSERT INTO subtasks (id, parent_cmd, worker_id, project, description, target_path, status, wave, needs_audit, blocked_by, assigned_at)
            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
         (subtask_id, args.cmd_id, args.worker, args.project, args.description, args.target_path, status, args.wave, needs_audit, blocked_by_str, assigned_at),
     )
     conn.commit()
-    raw_text = f"{args.description or ''}".strip()
-    fts5_upsert(conn, "subtask", subtask_id, args.cmd_id, args.project or "", args.worker or "", status, raw_text)
-    vec_upsert_if_available(conn, subtask_id, "subtask", raw_text, args.cmd_id, args.project or "", ts)
-    conn.commit()
     conn.close()
     blocked_info = f", blocked_by={blocked_by_str}" if blocked_by_str else ""
     print(f"Created: {subtask_id} (parent={args.cmd_id}, wave={args.wave}{blocked_info})")
@@ -227,6 +233,11 @@ def subtask_update(args) -> None:
         print("Error: no update fields specified.", file=sys.stderr)
         sys.exit(1)
 
+    ensure_worker_stats(conn)  # 足軽統計ロールアップ・矛盾検出インデックスはトリガで差分更新
+    ensure_orphan_index(conn)
+    ensure_pitfall_index(conn)
+    ensure_approved_index(conn)
+    ensure_index_queue(conn)
     params.append(args.subtask_id)
     query = f"UPDATE subtasks SET {', '.join(updates)} WHERE id = ?"
     cursor = conn.execute(query, params)
@@ -241,17 +252,6 @@ def subtask_update(args) -> None:
         unblocked = auto_unblock(conn, args.subtask_id)
 
     conn.commit()
-
-    row = conn.execute(
-        "SELECT description, notes, parent_cmd, project, worker_id, status FROM subtasks WHERE id = ?",
-        (args.subtask_id,),
-    ).fetchone()
-    if row:
-        raw_text = f"{row['description'] or ''} {row['notes'] or ''}".strip()
-        fts5_upsert(conn, "subtask", args.subtask_id, row["parent_cmd"] or "", row["project"] or "", row["worker_id"] or "", row["status"] or "", raw_text)
-        vec_upsert_if_available(conn, args.subtask_id, "subtask", raw_text, row["parent_cmd"] or "", row["project"] or "")
-        conn.commit()
-
     conn.close()
 
     changes = []
@@ -0,0 +1,300 @@
+"""tokenizer.py — MeCab分かち書き・名詞抽出の共有キャッシュ。
+
+高札（tools/kousatsu）と botsu CLI / migrate_fts5.py で重複していた
+MeCab 呼び出しを一本化する。同じ subtask description や cmd 本文が
+similar / coverage / enrich のたびに再解析されるため、結果をキャッシュする。
+
+キャッシュは2段:
+  1. プロセス内LRU（テキストハッシュ+モード → 結果、上限件数で追い出し）
+  2. 任意の永続キャッシュ（SHOGUN_TOKEN_CACHE_DB 指定時のみ、別SQLiteファイル）
+
+MeCab未インストール時は全て空結果を返し、呼び出し側がrawテキストで代替する。
+stdlib + MeCab のみに依存する（高札コンテナへ単体でマウントされるため botsu を import しない）。
+
+使用方法:
+    from botsu.tokenizer import tokenize, wakati, nouns, stats
+    tokenize("watchdogタイマーを実装")  # → "watchdog タイマー 実装"
+    nouns("watchdogタイマーを実装")     # → ["watchdog", "タイマー", "実装"]
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+try:
+    import MeCab
+    _MECAB_AVAILABLE = True
+except ImportError:
+    _MECAB_AVAILABLE = False
+
+# MeCab品詞フィルタ: 名詞・動詞・形容詞のみ抽出（FTS5インデックス投入用）
+ALLOWED_POS = {"名詞", "動詞", "形容詞"}
+
+# --- チューニング（環境変数で上書き可） ---
+LRU_SIZE = int(os.environ.get("SHOGUN_TOKEN_CACHE_SIZE", "4096"))
+PERSIST_DB = os.environ.get("SHOGUN_TOKEN_CACHE_DB", "")
+_PERSIST_COMMIT_EVERY = 256  # 一括インデックス時に1行毎commitしない
+
+_PERSIST_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS token_cache (
+        text_hash TEXT NOT NULL,
+        mode TEXT NOT NULL,          -- tokenize / wakati / nouns
+        dict_id TEXT NOT NULL,       -- MeCab辞書（変更時は別キーになる）
+        result TEXT NOT NULL,        -- JSON
+        PRIMARY KEY (text_hash, mode, dict_id)
+    )
+"""
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class Tokenizer:
+    """LRU + 任意の永続キャッシュ付き MeCab トークナイザ。スレッドセーフ。
+
+    MeCab.Tagger はスレッド間共有を避け、スレッド毎に生成する。
+    """
+
+    def __init__(self, maxsize: int = LRU_SIZE, persist_db: str = "") -> None:
+        self.maxsize = maxsize
+        self._lru: OrderedDict[tuple[str, str], object] = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._hits = 0
+        self._misses = 0
+        self._persist_hits = 0
+        self._evictions = 0
+        self._dict_id = ""
+        self._persist: sqlite3.Connection | None = None
+        self._persist_pending = 0
+        if persist_db:
+            self._open_persist(persist_db)
+
+    # ----- MeCab -----
+
+    def _tagger(self, wakati: bool = False):
+        """現スレッドのTaggerを返す。MeCab不可ならNone。"""
+        if not _MECAB_AVAILABLE:
+            return None
+        attr = "wakati" if wakati else "default"
+        tagger = getattr(self._local, attr, None)
+        if tagger is None:
+            try:
+                tagger = MeCab.Tagger("-Owakati") if wakati else MeCab.Tagger()
+            except Exception:
+                return None
+            setattr(self._local, attr, tagger)
+            if not self._dict_id:
+                try:
+                    self._dict_id = os.path.basename(tagger.dictionary_info().filename)
+                except Exception:
+                    self._dict_id = "mecab"
+        return tagger
+
+    def _parse_tokenize(self, text: str) -> str:
+        tagger = self._tagger()
+        if tagger is None:
+            return ""
+        tokens = []
+        node = tagger.parseToNode(text)
+        while node:
+            features = node.feature.split(",")
+            if features[0] in ALLOWED_POS:
+                surface = node.surface.strip()
+                if surface:
+                    tokens.append(surface)
+            node = node.next
+        return " ".join(tokens)
+
+    def _parse_wakati(self, text: str) -> str:
+        tagger = self._tagger(wakati=True)
+        if tagger is None:
+            return ""
+        return tagger.parse(text).strip()
+
+    def _parse_nouns(self, text: str) -> list[str]:
+        tagger = self._tagger()
+        if tagger is None:
+            return []
+        nouns = []
+        node = tagger.parseToNode(text)
+        while node:
+            features = node.feature.split(",")
+            if features[0] == "名詞" and node.surface:
+                surface = node.surface.strip()
+                if len(surface) >= 2:
+                    nouns.append(surface)
+            node = node.next
+        return list(dict.fromkeys(nouns))
+
+    # ----- 永続キャッシュ -----
+
+    def _open_persist(self, path: str) -> None:
+        try:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_PERSIST_SCHEMA)
+            conn.commit()
+            self._persist = conn
+            atexit.register(self.flush)
+        except sqlite3.Error:
+            self._persist = None  # 永続キャッシュは任意。失敗時はLRUのみ
+
+    def _persist_get(self, key: tuple[str, str]):
+        if self._persist is None:
+            return None
+        try:
+            row = self._persist.execute(
+                "SELECT result FROM token_cache WHERE text_hash = ? AND mode = ? AND dict_id = ?",
+                (key[1], key[0], self._dict_id),
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def _persist_put(self, key: tuple[str, str], value) -> None:
+        if self._persist is None:
+            return
+        try:
+            self._persist.execute(
+                "INSERT OR REPLACE INTO token_cache (text_hash, mode, dict_id, result)"
+                " VALUES (?, ?, ?, ?)",
+                (key[1], key[0], self._dict_id, json.dumps(value, ensure_ascii=False)),
+            )
+            self._persist_pending += 1
+            if self._persist_pending >= _PERSIST_COMMIT_EVERY:
+                self._persist.commit()
+                self._persist_pending = 0
+        except sqlite3.Error:
+            pass
+
+    def flush(self) -> None:
+        """未commitの永続キャッシュ書き込みを確定する（終了時に自動実行）。"""
+        with self._lock:
+            if self._persist is not None and self._persist_pending:
+                try:
+                    self._persist.commit()
+                except sqlite3.Error:
+                    pass
+                self._persist_pending = 0
+
+    # ----- キャッシュ本体 -----
+
+    def _cached(self, mode: str, text: str, parse):
+        key = (mode, _text_hash(text))
+        if self._persist is not None and not self._dict_id:
+            self._tagger()  # 永続キーに辞書IDが要るため先に初期化
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self._hits += 1
+                return self._lru[key]
+            if self._persist is not None:
+                value = self._persist_get(key)
+                if value is not None:
+                    self._persist_hits += 1
+                    self._store(key, value)
+                    return value
+            self._misses += 1
+        try:
+            value = parse(text)
+        except Exception:
+            return [] if mode == "nouns" else ""  # 解析失敗はキャッシュしない
+        with self._lock:
+            self._store(key, value)
+            self._persist_put(key, value)
+        return value
+
+    def _store(self, key: tuple[str, str], value) -> None:
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+            self._evictions += 1
+
+    # ----- 公開API -----
+
+    def ready(self) -> bool:
+        """MeCab Tagger が利用可能か（未インストール・辞書不在なら False）。"""
+        return self._tagger() is not None
+
+    def tokenize(self, text: str) -> str:
+        """名詞・動詞・形容詞の分かち書き（FTS5投入/MATCH用）。MeCab不可なら ""。"""
+        if not text:
+            return ""
+        return self._cached("tokenize", text, self._parse_tokenize)
+
+    def wakati(self, text: str) -> str:
+        """全形態素の分かち書き（-Owakati）。MeCab不可なら ""。"""
+        if not text:
+            return ""
+        return self._cached("wakati", text, self._parse_wakati)
+
+    def nouns(self, text: str) -> list[str]:
+        """2文字以上の名詞を出現順・重複なしで返す。MeCab不可なら []。"""
+        if not text:
+            return []
+        return list(self._cached("nouns", text, self._parse_nouns))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._persist_hits + self._misses
+            return {
+                "mecab_available": _MECAB_AVAILABLE,
+                "size": len(self._lru),
+                "maxsize": self.maxsize,
+                "hits": self._hits,
+                "persist_hits": self._persist_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_ratio": round((self._hits + self._persist_hits) / lookups, 3) if lookups else 0.0,
+                "persistent": self._persist is not None,
+            }
+
+
+# ---------------------------------------------------------------------------
+# モジュールレベルのシングルトン
+# ---------------------------------------------------------------------------
+
+_default: Tokenizer | None = None
+_default_lock = threading.Lock()
+
+
+def get_tokenizer() -> Tokenizer:
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = Tokenizer(persist_db=PERSIST_DB)
+    return _default
+
+
+def mecab_available() -> bool:
+    return get_tokenizer().ready()
+
+
+def tokenize(text: str) -> str:
+    return get_tokenizer().tokenize(text)
+
+
+def wakati(text: str) -> str:
+    return get_tokenizer().wakati(text)
+
+
+def nouns(text: str) -> list[str]:
+    return get_tokenizer().nouns(text)
+
+
+def stats() -> dict:
+    return get_tokenizer().stats()
@@ -3,6 +3,11 @@
 FTS5の横にベクトルインデックスを追加し、RRFでハイブリッド検索を実現する。
 sqlite-vec / sentence-transformers が未インストールの場合は graceful degradation。
 
+文書は (source_type, source_id) で識別する（report/dashboard/diary/reply の id は数値で
+表をまたいで重複する）。vec_meta は両列の複合主キー、vec_index の source_id 列には
+vec_key() の "source_type:source_id" を入れる。source_id 単独キーの旧構成は
+upgrade_vec_tables() が移行する。
+
 使用方法（クラスインターフェース）:
     vs = VecSearch(db_path)
     conn = sqlite3.connect(db_path)
@@ -39,24 +44,41 @@ def _load_vec(conn: sqlite3.Connection) -> bool:
         return False
 
 
+def _get_model():
+    """Ruri v3 モデル（プロセス内で1回だけロード）。"""
+    global _embed_model
+    if _embed_model is None:
+        from sentence_transformers import SentenceTransformer
+        _embed_model = SentenceTransformer(MODEL_NAME, device="cpu")
+    return _embed_model
+
+
 def _get_embedding(text: str, mode: str = "passage") -> bytes | None:
     """テキストをRuri v3でベクトル化。モデルは遅延ロード。
 
     mode="passage" → "文章: " プレフィックス（upsert時）
     mode="query"   → "クエリ: " プレフィックス（検索時）
     """
-    global _embed_model
     try:
-        if _embed_model is None:
-            from sentence_transformers import SentenceTransformer
-            _embed_model = SentenceTransformer(MODEL_NAME, device="cpu")
         prefix = "クエリ: " if mode == "query" else "文章: "
-        vec = _embed_model.encode(prefix + text, normalize_embeddings=True)
+        vec = _get_model().encode(prefix + text, normalize_embeddings=True)
         return struct.pack(f"{len(vec)}f", *vec)
     except Exception:
         return None
 
 
+def embed_passages(texts: list[str], batch_size: int = 32) -> list[bytes] | None:
+    """複数の文書を1回の encode でベクトル化する（"文章: " プレフィックス）。失敗時は None。"""
+    if not texts:
+        return []
+    try:
+        vecs = _get_model().encode(["文章: " + t for t in texts], batch_size=batch_size,
+                                   normalize_embeddings=True, show_progress_bar=False)
+    except Exception:
+        return None
+    return [struct.pack(f"{len(v)}f", *v) for v in vecs]
+
+
 def freshness_score(created_at: str, half_life_days: float = 90.0) -> float:
     """文書の時間鮮度スコア。新しいほど1.0、古いほど0.0に近い。"""
     if not created_at:
@@ -73,21 +95,81 @@ def freshness_score(created_at: str, half_life_days: float = 90.0) -> float:
 # テーブル作成
 # ---------------------------------------------------------------------------
 
-def ensure_tables(conn: sqlite3.Connection) -> bool:
-    """vec_index + vec_meta テーブルを作成。sqlite-vec未対応なら False。"""
-    if not _load_vec(conn):
-        return False
-    conn.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS vec_index
-                     USING vec0(source_id TEXT PRIMARY KEY, embedding float[{_VEC_DIM}])""")
-    conn.execute("""CREATE TABLE IF NOT EXISTS vec_meta (
-                    source_id   TEXT PRIMARY KEY,
+VEC_META_SQL = """CREATE TABLE IF NOT EXISTS vec_meta (
+                    source_id   TEXT NOT NULL,
                     source_type TEXT NOT NULL,
                     parent_id   TEXT,
                     project     TEXT,
                     created_at  TEXT,
                     model_name  TEXT DEFAULT 'cl-nagoya/ruri-v3-310m',
-                    vectorized_at TEXT
-                    )""")
+                    vectorized_at TEXT,
+                    PRIMARY KEY (source_type, source_id)
+                    )"""
+
+_META_COLUMNS = "source_id, source_type, parent_id, project, created_at, model_name, vectorized_at"
+
+
+def vec_key(source_type: str, source_id: str) -> str:
+    """vec_index のキー（source_id は表をまたいで重複するため source_type を前置する）。"""
+    return f"{source_type}:{source_id}"
+
+
+def split_key(key: str) -> tuple[str, str]:
+    """vec_key() の逆。→ (source_type, source_id)"""
+    source_type, _, source_id = key.partition(":")
+    return source_type, source_id
+
+
+def vec_layout(conn: sqlite3.Connection) -> str | None:
+    """vec_meta の構成。"keyed"=(source_type, source_id) キー / "legacy"=source_id 単独 / None=無し。"""
+    cols = conn.execute("PRAGMA table_info(vec_meta)").fetchall()
+    if not cols:
+        return None
+    pk = [c[1] for c in sorted(cols, key=lambda c: c[5]) if c[5]]
+    return "keyed" if pk == ["source_type", "source_id"] else "legacy"
+
+
+def upgrade_vec_tables(conn: sqlite3.Connection, batch: int = 500) -> bool:
+    """source_id 単独キーの旧構成を (source_type, source_id) キーへ移行する。
+
+    旧構成では同じ id の別表の文書が上書きし合っていたため、残っているのは各 id 1件のみ
+    （残りは migrate_vec.py / index embed の再実行でベクトル化される）。ベクトルは再計算しない。
+    移行した場合に True。呼び出し元で conn.commit() が必要。
+    """
+    if vec_layout(conn) != "legacy":
+        return False
+    conn.execute("ALTER TABLE vec_meta RENAME TO vec_meta_legacy")
+    conn.execute(VEC_META_SQL)
+    conn.execute(f"INSERT OR REPLACE INTO vec_meta ({_META_COLUMNS})"
+                 f" SELECT {_META_COLUMNS} FROM vec_meta_legacy")
+    types = dict(conn.execute("SELECT source_id, source_type FROM vec_meta_legacy").fetchall())
+    conn.execute("DROP TABLE vec_meta_legacy")
+    # vec_index のキーを vec_key へ付け替える（新キーは ':' を含むので旧キーと衝突しない）
+    while True:
+        rows = conn.execute(
+            "SELECT source_id, embedding FROM vec_index WHERE source_id NOT LIKE '%:%' LIMIT ?",
+            (batch,),
+        ).fetchall()
+        if not rows:
+            break
+        conn.executemany("DELETE FROM vec_index WHERE source_id = ?", [(r[0],) for r in rows])
+        conn.executemany(
+            "INSERT INTO vec_index (source_id, embedding) VALUES (?, ?)",
+            [(vec_key(types[r[0]], r[0]), r[1]) for r in rows if r[0] in types],
+        )
+    return True
+
+
+def ensure_tables(conn: sqlite3.Connection) -> bool:
+    """vec_index + vec_meta テーブルを作成（旧構成は移行）。sqlite-vec未対応なら False。"""
+    if not _load_vec(conn):
+        return False
+    conn.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS vec_index
+                     USING vec0(source_id TEXT PRIMARY KEY, embedding float[{_VEC_DIM}])""")
+    conn.execute(VEC_META_SQL)
+    upgrade_vec_tables(conn)
+    from .embedder import ensure_embed_queue
+    ensure_embed_queue(conn)
     conn.commit()
     return True
 
@@ -96,6 +178,27 @@ def ensure_tables(conn: sqlite3.Connection) -> bool:
 # Upsert
 # ---------------------------------------------------------------------------
 
+def write_vectors(conn: sqlite3.Connection, rows: list[tuple], model_name: str = MODEL_NAME) -> int:
+    """(source_id, source_type, parent_id, project, created_at, embedding) 群をまとめて書き込む。
+
+    トランザクションは呼び出し元（大きな単位で commit する）。書き込んだ件数を返す。
+    """
+    if not rows:
+        return 0
+    now = datetime.utcnow().isoformat()
+    keys = [(vec_key(r[1], r[0]),) for r in rows]
+    conn.executemany("DELETE FROM vec_index WHERE source_id = ?", keys)
+    conn.executemany(
+        "INSERT INTO vec_index (source_id, embedding) VALUES (?, ?)",
+        [(k[0], r[5]) for k, r in zip(keys, rows)],
+    )
+    conn.executemany(
+        f"INSERT OR REPLACE INTO vec_meta ({_META_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(*r[:5], model_name, now) for r in rows],
+    )
+    return len(rows)
+
+
 def vec_upsert(
     conn: sqlite3.Connection,
     source_id: str,
@@ -115,22 +218,18 @@ def vec_upsert(
     embedding = _get_embedding(raw_text, mode="passage")
     if embedding is None:
         return False
+    write_vectors(conn, [(source_id, source_type, parent_id, project, created_at, embedding)])
+    return True
 
-    # vec_index upsert (DELETE + INSERT)
-    conn.execute("DELETE FROM vec_index WHERE source_id = ?", (source_id,))
-    conn.execute(
-        "INSERT INTO vec_index (source_id, embedding) VALUES (?, ?)",
-        (source_id, embedding),
-    )
 
-    # vec_meta upsert
-    now = datetime.utcnow().isoformat()
-    conn.execute(
-        "INSERT OR REPLACE INTO vec_meta"
-        " (source_id, source_type, parent_id, project, created_at, model_name, vectorized_at)"
-        " VALUES (?, ?, ?, ?, ?, ?, ?)",
-        (source_id, source_type, parent_id, project, created_at, MODEL_NAME, now),
+def vec_delete(conn: sqlite3.Connection, source_id: str, source_type: str) -> bool:
+    """(source_type, source_id) のベクトルを削除。削除した場合に True。"""
+    cur = conn.execute(
+        "DELETE FROM vec_meta WHERE source_id = ? AND source_type = ?", (source_id, source_type)
     )
+    if cur.rowcount == 0:
+        return False
+    conn.execute("DELETE FROM vec_index WHERE source_id = ?", (vec_key(source_type, source_id),))
     return True
 
 
@@ -143,7 +242,7 @@ def vec_search(
     query: str,
     top_n: int = 20,
 ) -> list[tuple[str, float]]:
-    """ベクトル検索。[(source_id, distance), ...] を返す。"""
+    """ベクトル検索。[(vec_key, distance), ...] を返す。"""
     query_vec = _get_embedding(query, mode="query")
     if query_vec is None:
         return []
@@ -186,48 +285,43 @@ def hybrid_search(
     """
     pool = top_n * 3
 
-    # 1. FTS5検索
-    fts_sql = f"SELECT source_id, rank FROM {fts_table} WHERE content MATCH ? LIMIT ?"
-    fts_results = conn.execute(fts_sql, (query, pool)).fetchall()
+    # 1. FTS5検索（キーは vec_key: source_id は表をまたいで重複するため）
+    fts_sql = f"SELECT source_type, source_id, rank FROM {fts_table} WHERE content MATCH ? LIMIT ?"
+    fts_results = [vec_key(r[0], r[1]) for r in conn.execute(fts_sql, (query, pool)).fetchall()]
 
     # 2. ベクトル検索
     vec_results = vec_search(conn, query, top_n=pool)
 
-    # 3. 全source_idのメタデータを一括取得 (TYPE_WEIGHT計算 + フィルタ + verbose用)
-    all_sids = list({r[0] for r in fts_results} | {r[0] for r in vec_results})
+    # 3. 全文書のメタデータを一括取得 (フィルタ + 鮮度 + verbose用)
+    all_keys = list(set(fts_results) | {r[0] for r in vec_results})
     meta_map: dict[str, dict] = {}
-    if all_sids:
-        ph = ",".join("?" * len(all_sids))
+    if all_keys:
+        ph = ",".join("(?, ?)" for _ in all_keys)
         meta_rows = conn.execute(
-            f"SELECT source_id, source_type, project, created_at FROM vec_meta"
-            f" WHERE source_id IN ({ph})",
-            all_sids,
+            f"SELECT source_type, source_id, project, created_at FROM vec_meta"
+            f" WHERE (source_type, source_id) IN (VALUES {ph})",
+            [v for key in all_keys for v in split_key(key)],
         ).fetchall()
-        meta_map = {r[0]: {"source_type": r[1], "project": r[2], "created_at": r[3]}
-                    for r in meta_rows}
+        meta_map = {vec_key(r[0], r[1]): {"project": r[2], "created_at": r[3]} for r in meta_rows}
 
     # 4. TYPE_WEIGHT付きRRF統合 (rankも記録)
     scores: dict[str, float] = {}
     fts_ranks: dict[str, int] = {}
     vec_ranks: dict[str, int] = {}
 
-    for rank, row in enumerate(fts_results):
-        sid = row[0]
-        stype = meta_map.get(sid, {}).get("source_type", "")
-        weight = TYPE_WEIGHT.get(stype, 1.0)
-        scores[sid] = scores.get(sid, 0) + weight / (k + rank + 1)
-        fts_ranks[sid] = rank
+    for rank, key in enumerate(fts_results):
+        weight = TYPE_WEIGHT.get(split_key(key)[0], 1.0)
+        scores[key] = scores.get(key, 0) + weight / (k + rank + 1)
+        fts_ranks[key] = rank
 
-    for rank, (sid, _dist) in enumerate(vec_results):
-        stype = meta_map.get(sid, {}).get("source_type", "")
-        weight = TYPE_WEIGHT.get(stype, 1.0)
-        scores[sid] = scores.get(sid, 0) + weight / (k + rank + 1)
-        vec_ranks[sid] = rank
+    for rank, (key, _dist) in enumerate(vec_results):
+        weight = TYPE_WEIGHT.get(split_key(key)[0], 1.0)
+        scores[key] = scores.get(key, 0) + weight / (k + rank + 1)
+        vec_ranks[key] = rank
 
     # 5. source_type / project フィルタ
     if source_type:
-        scores = {s: v for s, v in scores.items()
-                  if meta_map.get(s, {}).get("source_type", "") == source_type}
+        scores = {s: v for s, v in scores.items() if split_key(s)[0] == source_type}
     if project:
         scores = {s: v for s, v in scores.items()
                   if meta_map.get(s, {}).get("project", "") == project}
@@ -235,26 +329,31 @@ def hybrid_search(
     # 6. project boosting (+0.1, フィルタとは別)
     if boost_project and scores:
         scores = {
-            sid: score + (0.1 if meta_map.get(sid, {}).get("project", "") == boost_project else 0.0)
-            for sid, score in scores.items()
+            key: score + (0.1 if meta_map.get(key, {}).get("project", "") == boost_project else 0.0)
+            for key, score in scores.items()
         }
 
     # 7. 鮮度スコア適用（freshness_weight > 0 の場合）
     if freshness_weight > 0.0 and scores:
         _alpha = 0.3
         scores = {
-            sid: score * (_alpha + (1 - _alpha) * freshness_score(meta_map.get(sid, {}).get("created_at", "")))
-            for sid, score in scores.items()
+            key: score * (_alpha + (1 - _alpha) * freshness_score(meta_map.get(key, {}).get("created_at", "")))
+            for key, score in scores.items()
         }
 
     # 8. Top-Nソート & コンテンツ取得
     ranked = sorted(scores.items(), key=lambda x: -x[1])[:top_n]
+    # 外部コンテンツ構成なら search_docs の (source_type, source_id) 索引で引く（FTS5 の列検索は全件走査）
+    has_docs = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='search_docs'"
+    ).fetchone() is not None
+    doc_table = "search_docs" if has_docs else fts_table
     results = []
-    for sid, score in ranked:
+    for key, score in ranked:
         row = conn.execute(
             "SELECT source_type, source_id, parent_id, project, worker_id, status, content"
-            " FROM search_index WHERE source_id = ?",
-            (sid,),
+            f" FROM {doc_table} WHERE source_type = ? AND source_id = ?",
+            split_key(key),
         ).fetchone()
         if row:
             entry: dict = {
@@ -268,11 +367,10 @@ def hybrid_search(
                 "hybrid_score": score,
             }
             if verbose:
-                stype = meta_map.get(sid, {}).get("source_type", "")
-                entry["fts_rank"] = fts_ranks.get(sid)
-                entry["vec_rank"] = vec_ranks.get(sid)
-                entry["type_weight"] = TYPE_WEIGHT.get(stype, 1.0)
-                entry["freshness"] = freshness_score(meta_map.get(sid, {}).get("created_at", ""))
+                entry["fts_rank"] = fts_ranks.get(key)
+                entry["vec_rank"] = vec_ranks.get(key)
+                entry["type_weight"] = TYPE_WEIGHT.get(row[0], 1.0)
+                entry["freshness"] = freshness_score(meta_map.get(key, {}).get("created_at", ""))
                 entry["final_score"] = score
             results.append(entry)
     return results
@@ -335,18 +433,8 @@ class VecSearch:
         if embedding is None:
             return False
 
-        conn.execute("DELETE FROM vec_index WHERE source_id = ?", (source_id,))
-        conn.execute(
-            "INSERT INTO vec_index (source_id, embedding) VALUES (?, ?)",
-            (source_id, embedding),
-        )
-        now = datetime.utcnow().isoformat()
-        conn.execute(
-            "INSERT OR REPLACE INTO vec_meta"
-            " (source_id, source_type, parent_id, project, created_at, model_name, vectorized_at)"
-            " VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (source_id, source_type, parent_id, project, created_at, self.model_name, now),
-        )
+        write_vectors(conn, [(source_id, source_type, parent_id, project, created_at, embedding)],
+                      model_name=self.model_name)
         return True
 
     def search(
@@ -355,7 +443,7 @@ class VecSearch:
         query: str,
         top_n: int = 20,
     ) -> list[tuple[str, float]]:
-        """ベクトル類似検索。[(source_id, distance), ...] を返す。"""
+        """ベクトル類似検索。[(vec_key, distance), ...] を返す（split_key で分解できる）。"""
         query_vec = self._embed(query, mode="query")
         if query_vec is None:
             return []
@@ -0,0 +1,237 @@
+"""worker_stats.py — 足軽別統計のロールアップ（worker_stats / worker_project_stats）。
+
+高札 GET /worker/stats は従来 足軽ごとに subtasks を4回集計していた（4N+1往復）。
+本モジュールは足軽別の集計値を没日録DB内のロールアップ表に保持し、
+subtasks / reports へのトリガで差分更新する。
+
+  - subtasks INSERT/UPDATE/DELETE : 旧行の寄与を引き、新行の寄与を足す（O(1)）
+  - reports  INSERT/DELETE        : report_count を ±1
+
+トリガ方式のため、botsu CLI 以外（高札 POST /reports, POST /audit 等）の書き込みでも
+ロールアップは追随する。高札コンテナへ単体でマウントされ GET /worker/stats も本モジュールで
+読むため stdlib のみに依存する（botsu を import しない）。表とトリガは ensure_worker_stats() が初回に作成し、
+既存データから一括バックフィルする（subtask add/update, report add から呼ばれる）。
+
+平均完了時間は 合計時間 / 件数 で保持する（julianday 差の浮動小数誤差は rebuild で解消）。
+"""
+
+from __future__ import annotations
+
+import sqlite3
+
+SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS worker_stats (
+        worker_id TEXT PRIMARY KEY,
+        total_tasks INTEGER NOT NULL DEFAULT 0,
+        done INTEGER NOT NULL DEFAULT 0,
+        blocked INTEGER NOT NULL DEFAULT 0,
+        cancelled INTEGER NOT NULL DEFAULT 0,
+        audit_approved INTEGER NOT NULL DEFAULT 0,   -- needs_audit=1 AND audit_status='done'
+        audit_rejected INTEGER NOT NULL DEFAULT 0,   -- needs_audit=1 AND audit_status='rejected'
+        completed_count INTEGER NOT NULL DEFAULT 0,  -- 完了時間を算出できたsubtask数
+        completed_hours_sum REAL NOT NULL DEFAULT 0, -- (completed_at - assigned_at) の合計（時間）
+        report_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS worker_project_stats (
+        worker_id TEXT NOT NULL,
+        project TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (worker_id, project)
+    )
+    """,
+]
+
+# subtask 1行の寄与。{r} は NEW / OLD、{sign} は 1 / -1（IS 比較でNULLを0に倒す）
+_CONTRIB_COLS = (
+    "worker_id, total_tasks, done, blocked, cancelled,"
+    " audit_approved, audit_rejected, completed_count, completed_hours_sum"
+)
+_CONTRIB_VALUES = """
+    {r}.worker_id, {sign},
+    {sign} * ({r}.status IS 'done'),
+    {sign} * ({r}.status IS 'blocked'),
+    {sign} * ({r}.status IS 'cancelled'),
+    {sign} * ({r}.needs_audit IS 1 AND {r}.audit_status IS 'done'),
+    {sign} * ({r}.needs_audit IS 1 AND {r}.audit_status IS 'rejected'),
+    {sign} * ((julianday({r}.completed_at) - julianday({r}.assigned_at)) IS NOT NULL),
+    {sign} * COALESCE((julianday({r}.completed_at) - julianday({r}.assigned_at)) * 24, 0)
+"""
+_CONTRIB_UPSERT = f"""
+    INSERT INTO worker_stats ({_CONTRIB_COLS})
+    SELECT {_CONTRIB_VALUES} WHERE {{r}}.worker_id IS NOT NULL
+    ON CONFLICT(worker_id) DO UPDATE SET
+        total_tasks = total_tasks + excluded.total_tasks,
+        done = done + excluded.done,
+        blocked = blocked + excluded.blocked,
+        cancelled = cancelled + excluded.cancelled,
+        audit_approved = audit_approved + excluded.audit_approved,
+        audit_rejected = audit_rejected + excluded.audit_rejected,
+        completed_count = completed_count + excluded.completed_count,
+        completed_hours_sum = completed_hours_sum + excluded.completed_hours_sum;
+    INSERT INTO worker_project_stats (worker_id, project, count)
+    SELECT {{r}}.worker_id, {{r}}.project, {{sign}}
+    WHERE {{r}}.worker_id IS NOT NULL AND {{r}}.project IS NOT NULL
+    ON CONFLICT(worker_id, project) DO UPDATE SET count = count + excluded.count;
+"""
+
+
+def _contrib(r: str, sign: int) -> str:
+    return _CONTRIB_UPSERT.format(r=r, sign=sign)
+
+
+TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_worker_stats_subtask_ins
+    AFTER INSERT ON subtasks BEGIN
+        {_contrib("NEW", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_worker_stats_subtask_del
+    AFTER DELETE ON subtasks BEGIN
+        {_contrib("OLD", -1)}
+        DELETE FROM worker_project_stats WHERE count <= 0 AND worker_id = OLD.worker_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_worker_stats_subtask_upd
+    AFTER UPDATE OF worker_id, project, status, needs_audit, audit_status,
+                    assigned_at, completed_at ON subtasks BEGIN
+        {_contrib("OLD", -1)}
+        {_contrib("NEW", 1)}
+        DELETE FROM worker_project_stats WHERE count <= 0 AND worker_id = OLD.worker_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_worker_stats_report_ins
+    AFTER INSERT ON reports WHEN NEW.worker_id IS NOT NULL BEGIN
+        INSERT INTO worker_stats (worker_id, report_count) VALUES (NEW.worker_id, 1)
+        ON CONFLICT(worker_id) DO UPDATE SET report_count = report_count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_worker_stats_report_del
+    AFTER DELETE ON reports WHEN OLD.worker_id IS NOT NULL BEGIN
+        UPDATE worker_stats SET report_count = report_count - 1
+        WHERE worker_id = OLD.worker_id;
+    END
+    """,
+]
+
+# 全件再集計（バックフィル / rebuild 用）。足軽ごとではなく1回の GROUP BY で求める。
+_REBUILD_SQL = [
+    "DELETE FROM worker_stats",
+    "DELETE FROM worker_project_stats",
+    f"""
+    INSERT INTO worker_stats ({_CONTRIB_COLS})
+    SELECT
+        worker_id,
+        COUNT(*),
+        SUM(status IS 'done'),
+        SUM(status IS 'blocked'),
+        SUM(status IS 'cancelled'),
+        SUM(needs_audit IS 1 AND audit_status IS 'done'),
+        SUM(needs_audit IS 1 AND audit_status IS 'rejected'),
+        COUNT(julianday(completed_at) - julianday(assigned_at)),
+        COALESCE(SUM((julianday(completed_at) - julianday(assigned_at)) * 24), 0)
+    FROM subtasks
+    WHERE worker_id IS NOT NULL
+    GROUP BY worker_id
+    """,
+    """
+    INSERT INTO worker_stats (worker_id, report_count)
+    SELECT worker_id, COUNT(*) FROM reports
+    WHERE worker_id IS NOT NULL
+    GROUP BY worker_id
+    ON CONFLICT(worker_id) DO UPDATE SET report_count = excluded.report_count
+    """,
+    """
+    INSERT INTO worker_project_stats (worker_id, project, count)
+    SELECT worker_id, project, COUNT(*) FROM subtasks
+    WHERE worker_id IS NOT NULL AND project IS NOT NULL
+    GROUP BY worker_id, project
+    """,
+]
+
+
+def ensure_worker_stats(conn: sqlite3.Connection) -> bool:
+    """ロールアップ表とトリガを作成する。新規作成時はバックフィルしてTrueを返す。
+
+    既に存在する場合は sqlite_master の1行参照のみ。呼び出し元で conn.commit() が必要。
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='trg_worker_stats_subtask_upd'"
+    ).fetchone()
+    if exists:
+        return False
+    for sql in SCHEMA_SQL:
+        conn.execute(sql)
+    for sql in TRIGGERS_SQL:
+        conn.execute(sql)
+    rebuild_worker_stats(conn)
+    return True
+
+
+def rebuild_worker_stats(conn: sqlite3.Connection) -> None:
+    """ロールアップを subtasks / reports から全件再集計する。呼び出し元で conn.commit() が必要。"""
+    for sql in _REBUILD_SQL:
+        conn.execute(sql)
+
+
+def iter_worker_stats(conn: sqlite3.Connection, worker_id: str | None = None):
+    """ロールアップから GET /worker/stats 形式の行を返すイテレータ（2クエリ固定）。
+
+    クエリは呼び出し時点で実行する（表が無い古いDBではここで sqlite3.OperationalError）。
+    足軽毎の行はカーソルから逐次生成する（高札の NDJSON 応答はそのまま流す）。
+    """
+    where, params = ("WHERE worker_id = ?", (worker_id,)) if worker_id else ("WHERE total_tasks > 0", ())
+    rows = conn.execute(f"SELECT * FROM worker_stats {where} ORDER BY worker_id", params)
+    proj_where = "AND worker_id = ?" if worker_id else ""
+    projects: dict[str, dict[str, int]] = {}
+    for r in conn.execute(
+        "SELECT worker_id, project, count FROM worker_project_stats"
+        f" WHERE count > 0 {proj_where} ORDER BY worker_id, project", params
+    ).fetchall():
+        projects.setdefault(r["worker_id"], {})[r["project"]] = r["count"]
+    return (
+        format_worker_stats(
+            r["worker_id"], r["total_tasks"], r["done"], r["blocked"], r["cancelled"],
+            r["audit_approved"], r["audit_rejected"],
+            (r["completed_hours_sum"] / r["completed_count"]) if r["completed_count"] else None,
+            projects.get(r["worker_id"], {}),
+            report_count=r["report_count"],
+        )
+        for r in rows
+    )
+
+
+def read_worker_stats(conn: sqlite3.Connection, worker_id: str | None = None) -> list[dict]:
+    """ロールアップから GET /worker/stats 形式の行を返す（2クエリ固定）。"""
+    return list(iter_worker_stats(conn, worker_id))
+
+
+def format_worker_stats(worker_id: str, total_tasks: int, done: int, blocked: int,
+                        cancelled: int, audit_approved: int, audit_rejected: int,
+                        avg_hours: float | None, projects: dict[str, int],
+                        report_count: int | None = None) -> dict:
+    """1足軽分の統計dictを組み立てる（高札 GET /worker/stats のレスポンス形式）。"""
+    audit_total = audit_approved + audit_rejected
+    entry = {
+        "worker_id": worker_id,
+        "total_tasks": total_tasks or 0,
+        "done": done or 0,
+        "blocked": blocked or 0,
+        "cancelled": cancelled or 0,
+        "audit_approved": audit_approved,
+        "audit_rejected": audit_rejected,
+        "approval_rate": round(audit_approved / audit_total, 2) if audit_total > 0 else 0.0,
+        "projects": projects,
+        "top_project": max(projects, key=projects.get) if projects else None,
+        "avg_completion_hours": round(avg_hours, 1) if avg_hours else None,
+    }
+    if report_count is not None:
+        entry["report_count"] = report_count
+    return entry
@@ -21,6 +21,7 @@ Usage:
 
     python3 scripts/botsunichiroku.py agent list [--role ROLE] [--json]
     python3 scripts/botsunichiroku.py agent update AGENT_ID --status STATUS [--task TASK_ID]
+    python3 scripts/botsunichiroku.py agent stats [--worker WORKER_ID] [--rebuild] [--json]
 
     python3 scripts/botsunichiroku.py counter next NAME
     python3 scripts/botsunichiroku.py counter show [--json]
@@ -46,29 +47,76 @@ Usage:
     python3 scripts/botsunichiroku.py kenchi search KEYWORD [--json]
     python3 scripts/botsunichiroku.py kenchi delete ID
 
-    python3 scripts/botsunichiroku.py search QUERY [--limit N] [--project PROJECT]
+    python3 scripts/botsunichiroku.py search QUERY [--limit N] [--project PROJECT] [--count exact|estimate|none] [--cursor CURSOR]
     python3 scripts/botsunichiroku.py search --similar SUBTASK_ID [--limit N]
 
     python3 scripts/botsunichiroku.py check orphans
     python3 scripts/botsunichiroku.py check coverage CMD_ID
+
+    python3 scripts/botsunichiroku.py index drain [--batch N] [--vec] [--watch SEC]
+    python3 scripts/botsunichiroku.py index embed [--batch N] [--watch SEC] [--json]
+    python3 scripts/botsunichiroku.py index status [--json]
+    python3 scripts/botsunichiroku.py index rebuild
+
+    python3 scripts/botsunichiroku.py serve [--socket PATH] [--warm-vec]
+
+    python3 scripts/botsunichiroku.py --profile-import counter show   # import時間の内訳・起動時間
 """
 
 import argparse
 import sys
+import time
+
+# サブコマンド実装の遅延ディスパッチ表（モジュール → ハンドラ名）。
+# 起動時は argparse だけを組み立て、選ばれたサブコマンドのモジュールだけを import する
+# （counter next / subtask show のたびに MeCab・notify・search まで読み込まない）。
+HANDLER_MODULES: dict[str, tuple[str, ...]] = {
+    "botsu.cmd": ("cmd_list", "cmd_add", "cmd_update", "cmd_show"),
+    "botsu.subtask": ("subtask_list", "subtask_add", "subtask_update", "subtask_show"),
+    "botsu.report": ("report_add", "report_list"),
+    "botsu.agent": ("agent_list", "agent_stats", "agent_update"),
+    "botsu.counter": ("counter_next", "counter_show"),
+    "botsu.audit": ("audit_list", "audit_record", "audit_history_stats", "stats_show", "audit_add",
+                    "audit_show", "audit_records_list", "audit_dashboard"),
+    "botsu.archive": ("archive_run",),
+    "botsu.diary": ("diary_add", "diary_list", "diary_show", "diary_today"),
+    "botsu.kenchi": ("kenchi_add", "kenchi_list", "kenchi_show", "kenchi_update", "kenchi_search", "kenchi_delete"),
+    "botsu.dashboard": ("dashboard_add", "dashboard_list", "dashboard_search"),
+    "botsu.search": ("search", "enrich_cmd"),
+    "botsu.check": ("check_orphans", "check_coverage"),
+    "botsu.reply": ("reply_add", "reply_list", "reply_list_for", "reply_list_unread"),
+    "botsu.indexer": ("index_drain", "index_status", "index_rebuild"),
+    "botsu.embedder": ("index_embed",),
+}
+HANDLERS: dict[str, str] = {name: module for module, names in HANDLER_MODULES.items() for name in names}
+
+# --profile-import の目標値（search 以外のサブコマンドのコールドスタート）
+COLD_START_TARGET_MS = 50.0
+
+
+def _lazy(name: str):
+    """ハンドラ名 → 呼び出し時に初めてモジュールを import して実行する関数。"""
+    module = HANDLERS[name]
+
+    def handler(args):
+        # import 文と同じ経路（__import__）で読む。-X importtime の内訳に載るように
+        return getattr(__import__(module, fromlist=[name]), name)(args)
+
+    handler.__name__ = handler.__qualname__ = name
+    handler.__module__ = module
+    return handler
+
+
+def _serve(args):
+    """serve サブコマンド: 常駐して Unixソケット経由でサブコマンドを実行する（botsu/daemon.py）。"""
+    from botsu.daemon import serve
+
+    return serve(args, build_parser, tuple(HANDLER_MODULES))
+
 
-from botsu.cmd import cmd_list, cmd_add, cmd_update, cmd_show
-from botsu.subtask import subtask_list, subtask_add, subtask_update, subtask_show
-from botsu.report import report_add, report_list
-from botsu.agent import agent_list, agent_update
-from botsu.counter import counter_next, counter_show
-from botsu.audit import audit_list, audit_record, audit_history_stats, stats_show, audit_add, audit_show, audit_records_list, audit_dashboard
-from botsu.archive import archive_run
-from botsu.diary import diary_add, diary_list, diary_show, diary_today
-from botsu.kenchi import kenchi_add, kenchi_list, kenchi_show, kenchi_update, kenchi_search, kenchi_delete
-from botsu.dashboard import dashboard_add, dashboard_list, dashboard_search
-from botsu.search import search, enrich_cmd
-from botsu.check import check_orphans, check_coverage
-from botsu.reply import reply_add, reply_list, reply_list_for, reply_list_unread
+def _search_or_enrich(args):
+    """search サブコマンド: --enrich 指定時は enrich 表示、それ以外は全文検索。"""
+    return _lazy("enrich_cmd" if getattr(args, "enrich", None) else "search")(args)
 
 
 # ---------------------------------------------------------------------------
@@ -80,6 +128,8 @@ def build_parser() -> argparse.ArgumentParser:
         prog="botsunichiroku",
         description="CLI tool for the multi-agent-shogun database (没日録 botsunichiroku.db)",
     )
+    parser.add_argument("--profile-import", action="store_true",
+                        help="サブコマンドを -X importtime 付きで実行し、import時間の内訳と起動時間を stderr に表示する")
     top_sub = parser.add_subparsers(dest="entity", required=True, help="Entity to manage")
 
     # === cmd ===
@@ -90,7 +140,7 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--status", help="Filter by status")
     p.add_argument("--project", help="Filter by project")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=cmd_list)
+    p.set_defaults(func=_lazy("cmd_list"))
 
     p = cmd_sub.add_parser("add", help="Add a new command")
     p.add_argument("description", help="Short description of the command")
@@ -99,17 +149,17 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--karo", choices=["roju", "midaidokoro"], help="Assign to specific karo")
     p.add_argument("--file", dest="details_file", help="Read details from file")
     p.add_argument("--stdin", dest="details_stdin", action="store_true", help="Read details from stdin")
-    p.set_defaults(func=cmd_add)
+    p.set_defaults(func=_lazy("cmd_add"))
 
     p = cmd_sub.add_parser("update", help="Update command status")
     p.add_argument("cmd_id", help="Command ID (e.g., cmd_083)")
     p.add_argument("--status", required=True, choices=["pending", "acknowledged", "in_progress", "done", "cancelled", "archived"], help="New status")
-    p.set_defaults(func=cmd_update)
+    p.set_defaults(func=_lazy("cmd_update"))
 
     p = cmd_sub.add_parser("show", help="Show command details")
     p.add_argument("cmd_id", help="Command ID (e.g., cmd_083)")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=cmd_show)
+    p.set_defaults(func=_lazy("cmd_show"))
 
     # === subtask ===
     subtask_parser = top_sub.add_parser("subtask", help="Manage subtasks")
@@ -122,7 +172,7 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--needs-audit", type=int, choices=[0, 1], help="Filter by needs_audit (0 or 1)")
     p.add_argument("--audit-status", choices=["pending", "in_progress", "done", "rejected"], help="Filter by audit status")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=subtask_list)
+    p.set_defaults(func=_lazy("subtask_list"))
 
     p = subtask_sub.add_parser("add", help="Add a new subtask")
     p.add_argument("cmd_id", help="Parent command ID (e.g., cmd_083)")
@@ -133,7 +183,7 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--target-path", help="Target working directory")
     p.add_argument("--needs-audit", action="store_true", help="Mark as requiring ohariko audit")
     p.add_argument("--blocked-by", help="Comma-separated subtask IDs this task depends on (e.g., subtask_200,subtask_201). Forces status=blocked.")
-    p.set_defaults(func=subtask_add)
+    p.set_defaults(func=_lazy("subtask_add"))
 
     p = subtask_sub.add_parser("update", help="Update subtask status")
     p.add_argument("subtask_id", help="Subtask ID (e.g., subtask_191)")
@@ -141,12 +191,12 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--worker", help="Assign/reassign to worker")
     p.add_argument("--audit-status", choices=["pending", "in_progress", "done"], help="Set audit status")
     p.add_argument("--blocked-by", help="Set/update blocked_by dependencies (comma-separated subtask IDs, or empty string to clear)")
-    p.set_defaults(func=subtask_update)
+    p.set_defaults(func=_lazy("subtask_update"))
 
     p = subtask_sub.add_parser("show", help="Show subtask details")
     p.add_argument("subtask_id", help="Subtask ID (e.g., subtask_191)")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=subtask_show)
+    p.set_defaults(func=_lazy("subtask_show"))
 
     # === report ===
     report_parser = top_sub.add_parser("report", help="Manage reports")
@@ -161,14 +211,14 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--files-modified", help="Modified files as JSON array string")
     p.add_argument("--skill-name", help="Skill candidate name")
     p.add_argument("--skill-desc", help="Skill candidate description")
-    p.set_defaults(func=report_add)
+    p.set_defaults(func=_lazy("report_add"))
 
     p = report_sub.add_parser("list", help="List reports")
     p.add_argument("--subtask", help="Filter by subtask ID")
     p.add_argument("--worker", help="Filter by worker ID")
     p.add_argument("--status", help="Filter by status")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=report_list)
+    p.set_defaults(func=_lazy("report_list"))
 
     # === agent ===
     agent_parser = top_sub.add_parser("agent", help="Manage agents")
@@ -177,13 +227,19 @@ def build_parser() -> argparse.ArgumentParser:
     p = agent_sub.add_parser("list", help="List agents")
     p.add_argument("--role", choices=["shogun", "karo", "ashigaru"], help="Filter by role")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=agent_list)
+    p.set_defaults(func=_lazy("agent_list"))
 
     p = agent_sub.add_parser("update", help="Update agent status")
     p.add_argument("agent_id", help="Agent ID (e.g., ashigaru1)")
     p.add_argument("--status", required=True, choices=["idle", "busy", "error", "offline"], help="New status")
     p.add_argument("--task", help="Current task ID (use 'none' to clear)")
-    p.set_defaults(func=agent_update)
+    p.set_defaults(func=_lazy("agent_update"))
+
+    p = agent_sub.add_parser("stats", help="Show per-worker stats (rollup)")
+    p.add_argument("--worker", metavar="WORKER_ID", help="Filter by worker ID")
+    p.add_argument("--rebuild", action="store_true", help="Rebuild rollup from subtasks/reports")
+    p.add_argument("--json", action="store_true", help="Output as JSON")
+    p.set_defaults(func=_lazy("agent_stats"))
 
     # === counter ===
     counter_parser = top_sub.add_parser("counter", help="Manage counters")
@@ -191,11 +247,11 @@ def build_parser() -> argparse.ArgumentParser:
 
     p = counter_sub.add_parser("next", help="Atomically increment and return next value")
     p.add_argument("name", help="Counter name (e.g., cmd_id, subtask_id)")
-    p.set_defaults(func=counter_next)
+    p.set_defaults(func=_lazy("counter_next"))
 
     p = counter_sub.add_parser("show", help="Show all counters")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=counter_show)
+    p.set_defaults(func=_lazy("counter_show"))
 
     # === audit ===
     audit_parser = top_sub.add_parser("audit", help="Manage audits")
@@ -205,7 +261,7 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--all", action="store_true", help="Show all audit items (not just pending)")
     p.add_argument("--subtask", help="Filter by subtask ID")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=audit_list)
+    p.set_defaults(func=_lazy("audit_list"))
 
     p = audit_sub.add_parser("add", help="Add a v4.0 合議結果 to audit_records")
     p.add_argument("subtask_id", help="Subtask ID (e.g. subtask_XXX)")
@@ -215,17 +271,17 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--reviewers", help="Reviewer list (comma-separated)")
     p.add_argument("--summary", required=True, help="One-line summary of the verdict")
     p.add_argument("--severity", choices=["S1", "S2", "S3", "S4"], help="Incident severity (S1=critical … S4=minor)")
-    p.set_defaults(func=audit_add)
+    p.set_defaults(func=_lazy("audit_add"))
 
     p = audit_sub.add_parser("show", help="Show audit_record(s) by ID or subtask")
     p.add_argument("audit_id", nargs="?", type=int, help="audit_record ID (positional, optional)")
     p.add_argument("--subtask", help="Filter by subtask ID")
-    p.set_defaults(func=audit_show)
+    p.set_defaults(func=_lazy("audit_show"))
 
     p = audit_sub.add_parser("records", help="List all audit_records (v4.0 合議結果一覧)")
     p.add_argument("--verdict", choices=["PASS", "FAIL", "CONDITIONAL"], help="Filter by verdict")
     p.add_argument("--severity", choices=["S1", "S2", "S3", "S4"], help="Filter by severity")
-    p.set_defaults(func=audit_records_list)
+    p.set_defaults(func=_lazy("audit_records_list"))
 
     p = audit_sub.add_parser("record", help="Record a retry-loop audit result to audit_history")
     p.add_argument("subtask_id", help="Subtask ID (e.g. subtask_XXX)")
@@ -237,28 +293,28 @@ def build_parser() -> argparse.ArgumentParser:
                    help="Failure category (for rejected cases)")
     p.add_argument("--findings-summary", dest="findings_summary", help="Short summary of findings (≤200 chars)")
     p.add_argument("--worker", help="Worker ID (e.g. ashigaru1)")
-    p.set_defaults(func=audit_record)
+    p.set_defaults(func=_lazy("audit_record"))
 
     p = audit_sub.add_parser("stats", help="Show failure_category stats (retry-loop recurrence tracking)")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=audit_history_stats)
+    p.set_defaults(func=_lazy("audit_history_stats"))
 
     p = audit_sub.add_parser("dashboard", help="検収PASS率ダッシュボード表示")
     p.add_argument("--json", action="store_true", help="Output as JSON")
     p.add_argument("--recent", type=int, default=10, help="直近N件の集計対象 (default: 10)")
     p.add_argument("--update-dashboard", dest="update_dashboard", action="store_true", help="dashboard.mdに検収PASS率セクションを自動更新")
-    p.set_defaults(func=audit_dashboard)
+    p.set_defaults(func=_lazy("audit_dashboard"))
 
     # === stats ===
     p = top_sub.add_parser("stats", help="Show database statistics")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=stats_show)
+    p.set_defaults(func=_lazy("stats_show"))
 
     # === archive ===
     p = top_sub.add_parser("archive", help="Archive old completed commands")
     p.add_argument("--days", type=int, default=7, help="Archive commands completed more than N days ago (default: 7)")
     p.add_argument("--dry-run", action="store_true", help="Show what would be archived without making changes")
-    p.set_defaults(func=archive_run)
+    p.set_defaults(func=_lazy("archive_run"))
 
     # === dashboard ===
     dashboard_parser = top_sub.add_parser("dashboard", help="Manage dashboard entries")
@@ -270,17 +326,17 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--cmd", help="Related command ID (e.g., cmd_249)", default=None)
     p.add_argument("--tags", help="Comma-separated tags (e.g., OTA,Arduino)", default=None)
     p.add_argument("--status", help="Entry status (e.g., done, adopted, rejected, resolved, frozen)", default=None)
-    p.set_defaults(func=dashboard_add)
+    p.set_defaults(func=_lazy("dashboard_add"))
 
     p = dashboard_sub.add_parser("list", help="List dashboard entries")
     p.add_argument("--section", help="Filter by section name", default=None)
     p.add_argument("--limit", type=int, default=20, help="Max entries to show (default: 20)")
     p.add_argument("--cmd", help="Filter by command ID", default=None)
-    p.set_defaults(func=dashboard_list)
+    p.set_defaults(func=_lazy("dashboard_list"))
 
     p = dashboard_sub.add_parser("search", help="Search dashboard entries by keyword")
     p.add_argument("keyword", help="Keyword to search in content")
-    p.set_defaults(func=dashboard_search)
+    p.set_defaults(func=_lazy("dashboard_search"))
 
     # === diary ===
     diary_parser = top_sub.add_parser("diary", help="Manage diary entries (思考記録)")
@@ -293,7 +349,7 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--cmd", help="Related command ID (e.g., cmd_414)", default=None)
     p.add_argument("--subtask", help="Related subtask ID", default=None)
     p.add_argument("--tags", help="Comma-separated tags", default=None)
-    p.set_defaults(func=diary_add)
+    p.set_defaults(func=_lazy("diary_add"))
 
     p = diary_sub.add_parser("list", help="List diary entries")
     p.add_argument("--agent", help="Filter by agent ID")
@@ -301,16 +357,16 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--cmd", help="Filter by command ID")
     p.add_argument("--limit", type=int, default=20, help="Max entries (default: 20)")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=diary_list)
+    p.set_defaults(func=_lazy("diary_list"))
 
     p = diary_sub.add_parser("show", help="Show diary entry details")
     p.add_argument("diary_id", type=int, help="Diary entry ID")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=diary_show)
+    p.set_defaults(func=_lazy("diary_show"))
 
     p = diary_sub.add_parser("today", help="Show today's diary entries (コンパクション復帰用)")
     p.add_argument("--agent", help="Filter by agent ID")
-    p.set_defaults(func=diary_today)
+    p.set_defaults(func=_lazy("diary_today"))
 
     # === kenchi (検地帳) ===
     kenchi_parser = top_sub.add_parser("kenchi", help="検地帳 — リソース台帳管理")
@@ -325,17 +381,17 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--depends-on", help="Dependencies (JSON array or comma-separated)")
     p.add_argument("--called-by", help="Callers (JSON array or comma-separated)")
     p.add_argument("--notes", help="Additional notes")
-    p.set_defaults(func=kenchi_add)
+    p.set_defaults(func=_lazy("kenchi_add"))
 
     p = kenchi_sub.add_parser("list", help="List resources")
     p.add_argument("--category", help="Filter by category")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=kenchi_list)
+    p.set_defaults(func=_lazy("kenchi_list"))
 
     p = kenchi_sub.add_parser("show", help="Show resource details")
     p.add_argument("id", help="Resource ID")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=kenchi_show)
+    p.set_defaults(func=_lazy("kenchi_show"))
 
     p = kenchi_sub.add_parser("update", help="Update a resource")
     p.add_argument("id", help="Resource ID")
@@ -346,16 +402,16 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--depends-on", help="New dependencies")
     p.add_argument("--called-by", help="New callers")
     p.add_argument("--notes", help="New notes")
-    p.set_defaults(func=kenchi_update)
+    p.set_defaults(func=_lazy("kenchi_update"))
 
     p = kenchi_sub.add_parser("search", help="Search resources by keyword")
     p.add_argument("keyword", help="Search keyword")
     p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=kenchi_search)
+    p.set_defaults(func=_lazy("kenchi_search"))
 
     p = kenchi_sub.add_parser("delete", help="Delete a resource")
     p.add_argument("id", help="Resource ID")
-    p.set_defaults(func=kenchi_delete)
+    p.set_defaults(func=_lazy("kenchi_delete"))
 
     # === search ===
     p = top_sub.add_parser(
@@ -365,6 +421,9 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("query", nargs="?", default=None, help="検索クエリ (--similar/--enrich 指定時は省略可)")
     p.add_argument("--limit", type=int, default=20, metavar="N", help="最大返却件数 (デフォルト: 20)")
     p.add_argument("--project", metavar="PROJECT", help="projectで絞り込み")
+    p.add_argument("--count", choices=["exact", "estimate", "none"], default="exact",
+                   help="総件数: exact=厳密(検索と同一走査) / estimate=語彙統計で概算 / none=省略")
+    p.add_argument("--cursor", metavar="CURSOR", help="前回表示の Next cursor から続きを表示")
     p.add_argument("--similar", metavar="SUBTASK_ID", help="指定subtaskのdescriptionで類似タスクを検索")
     p.add_argument("--enrich", metavar="CMD_ID", help="cmd_idに対してenrich（関連知見・pitfalls・成功パターン）を表示")
     p.add_argument("--hybrid", action="store_true", help="FTS5+ベクトル検索のRRFハイブリッド検索")
@@ -372,7 +431,7 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--verbose", action="store_true", help="スコア内訳を表示（--hybrid と組み合わせて使用）")
     p.add_argument("--boost-project", dest="boost_project", metavar="PROJECT",
                    help="指定PJの結果に+0.1ボーナス（--hybrid と組み合わせて使用。フィルタとは別）")
-    p.set_defaults(func=lambda args: enrich_cmd(args) if getattr(args, "enrich", None) else search(args))
+    p.set_defaults(func=_search_or_enrich)
 
     # === reply ===
     reply_parser = top_sub.add_parser("reply", help="thread_repliesへのレス投稿・一覧")
@@ -383,12 +442,12 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--agent", required=True, metavar="AGENT_ID", help="投稿者エージェントID")
     p.add_argument("--body", required=True, help="投稿本文")
     p.add_argument("--board", default="zatsudan", metavar="BOARD", help="板名 (デフォルト: zatsudan)")
-    p.set_defaults(func=reply_add)
+    p.set_defaults(func=_lazy("reply_add"))
 
     p = reply_sub.add_parser("list", help="スレッドのレス一覧を表示する")
     p.add_argument("thread_id", help="スレッドID")
     p.add_argument("--limit", type=int, default=20, metavar="N", help="最大表示件数 (デフォルト: 20)")
-    p.set_defaults(func=reply_list)
+    p.set_defaults(func=_lazy("reply_list"))
 
     p = reply_sub.add_parser("list-for", help="指定エージェント宛の@メンション検索")
     p.add_argument("agent", help="エージェントID (例: @ashigaru1 or ashigaru1)")
@@ -396,25 +455,54 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--unread", action="store_true", help="未読のみ表示")
     p.add_argument("--mark-read", action="store_true", help="表示後に既読マーク更新")
     p.add_argument("--limit", type=int, default=50, metavar="N", help="最大表示件数 (デフォルト: 50)")
-    p.set_defaults(func=reply_list_for)
+    p.set_defaults(func=_lazy("reply_list_for"))
 
     p = reply_sub.add_parser("list-unread", help="指定板の未読レス一覧")
     p.add_argument("--board", required=True, metavar="BOARD", help="板名 (例: ninmu)")
     p.add_argument("--agent", required=True, metavar="AGENT", help="誰の視点で未読判定するか (例: roju)")
     p.add_argument("--mark-read", action="store_true", help="表示後に既読マーク更新")
     p.add_argument("--limit", type=int, default=50, metavar="N", help="最大表示件数 (デフォルト: 50)")
-    p.set_defaults(func=reply_list_unread)
+    p.set_defaults(func=_lazy("reply_list_unread"))
 
     # === check ===
     check_parser = top_sub.add_parser("check", help="矛盾・放置検出 / カバレッジチェック")
     check_sub = check_parser.add_subparsers(dest="action", required=True)
 
     p = check_sub.add_parser("orphans", help="矛盾・放置タスクを検出する（4種類のチェック）")
-    p.set_defaults(func=check_orphans)
+    p.set_defaults(func=_lazy("check_orphans"))
 
     p = check_sub.add_parser("coverage", help="cmd指示文と報告文のキーワードカバレッジを検出する")
     p.add_argument("cmd_id", help="対象コマンドID (例: cmd_419)")
-    p.set_defaults(func=check_coverage)
+    p.set_defaults(func=_lazy("check_coverage"))
+
+    # === index ===
+    index_parser = top_sub.add_parser("index", help="全文検索索引の変更キュー（index_queue）操作")
+    index_sub = index_parser.add_subparsers(dest="action", required=True)
+
+    p = index_sub.add_parser("drain", help="index_queue を search_index に反映する")
+    p.add_argument("--batch", type=int, default=200, metavar="N", help="1トランザクションの件数 (デフォルト: 200)")
+    p.add_argument("--vec", action="store_true", help="続けて embed_queue を1回ベクトル化する（常駐は index embed --watch）")
+    p.add_argument("--watch", type=float, default=0, metavar="SEC", help="SEC秒毎に繰り返す（常駐）")
+    p.set_defaults(func=_lazy("index_drain"))
+
+    p = index_sub.add_parser("embed", help="embed_queue をまとめてベクトル化する（ベクトル索引の非同期更新）")
+    p.add_argument("--batch", type=int, default=64, metavar="N", help="1回の encode / 1トランザクションの件数 (デフォルト: 64)")
+    p.add_argument("--watch", type=float, default=0, metavar="SEC", help="SEC秒毎に繰り返す（常駐）")
+    p.add_argument("--json", action="store_true", help="Output as JSON")
+    p.set_defaults(func=_lazy("index_embed"))
+
+    p = index_sub.add_parser("status", help="index_queue / embed_queue の滞留状況を表示する")
+    p.add_argument("--json", action="store_true", help="Output as JSON")
+    p.set_defaults(func=_lazy("index_status"))
+
+    p = index_sub.add_parser("rebuild", help="search_index を全件再構築する")
+    p.set_defaults(func=_lazy("index_rebuild"))
+
+    # === serve ===
+    p = top_sub.add_parser("serve", help="常駐してUnixソケット経由でサブコマンドを実行する（botsu/daemon_client.py から利用）")
+    p.add_argument("--socket", metavar="PATH", help="ソケットのパス (デフォルト: data/botsu.sock, 環境変数 BOTSU_SOCKET)")
+    p.add_argument("--warm-vec", action="store_true", help="起動時にベクトルモデルも読み込む（hybrid 検索用）")
+    p.set_defaults(func=_serve)
 
     return parser
 
@@ -423,10 +511,64 @@ def build_parser() -> argparse.ArgumentParser:
 # Main
 # ---------------------------------------------------------------------------
 
+def _parse_importtime(stderr: str) -> tuple[list[tuple[str, int, int, int]], list[str]]:
+    """-X importtime の出力を [(モジュール名, 深さ, self μs, cumulative μs)] とそれ以外の行に分ける。"""
+    entries, others = [], []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            others.append(line)
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # 見出し行
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(fields[0]), int(fields[1])))
+    return entries, others
+
+
+def profile_import(argv: list[str], top: int = 15) -> int:
+    """argv のサブコマンドを別プロセス（-X importtime）で実行し、import時間の内訳を表示する。
+
+    子プロセスの標準出力はそのまま流し、内訳は stderr に出す。戻り値は子プロセスの終了コード。
+    起動時間は python 起動（site 等）を含む実測の壁時計時間。
+    """
+    import subprocess
+
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", __file__, *argv],
+                          stderr=subprocess.PIPE, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    entries, others = _parse_importtime(proc.stderr)
+    for line in others:
+        print(line, file=sys.stderr)
+
+    total_us = sum(e[2] for e in entries)
+    botsu_us = sum(e[2] for e in entries if e[0] == "botsu" or e[0].startswith("botsu."))
+    roots = sorted((e for e in entries if e[1] == 0), key=lambda e: e[3], reverse=True)
+
+    out = sys.stderr
+    print(f"\n=== import profile: {' '.join(argv)} ===", file=out)
+    print(f"{'MODULE':<40} {'SELF ms':>8} {'CUM ms':>8}", file=out)
+    for name, _depth, self_us, cum_us in roots[:top]:
+        print(f"{name:<40} {self_us / 1000:>8.2f} {cum_us / 1000:>8.2f}", file=out)
+    if len(roots) > top:
+        rest = sum(e[3] for e in roots[top:])
+        print(f"{f'(+{len(roots) - top} more)':<40} {'':>8} {rest / 1000:>8.2f}", file=out)
+    loaded = sorted(e[0] for e in entries if e[0].startswith("botsu."))
+    print(f"botsu modules: {', '.join(loaded) or '-'}", file=out)
+    print(f"imports total: {total_us / 1000:.2f} ms (botsu: {botsu_us / 1000:.2f} ms, {len(entries)} modules)", file=out)
+    verdict = "OK" if wall_ms <= COLD_START_TARGET_MS else "OVER"
+    print(f"cold start (wall): {wall_ms:.1f} ms / target {COLD_START_TARGET_MS:.0f} ms [{verdict}]", file=out)
+    return proc.returncode
+
+
 def main() -> None:
     parser = build_parser()
     args = parser.parse_args()
 
+    if args.profile_import:
+        sys.exit(profile_import([a for a in sys.argv[1:] if a != "--profile-import"]))
     if hasattr(args, "func"):
         args.func(args)
     else:
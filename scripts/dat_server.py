@@ -26,6 +26,7 @@ import subprocess
 import sys
 from collections import defaultdict
 from datetime import datetime
+from email.utils import formatdate
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from pathlib import Path
 from urllib.parse import parse_qs
@@ -55,6 +56,7 @@ from botsu.nich import (
     resolve_agent,
 )
 from botsu.reply import do_reply_add
+from botsu.docs_cache import DocsCache, accepts_gzip, stat_file
 
 DREAMS_PATH = PROJECT_ROOT / "data" / "dreams.jsonl"
 
@@ -71,6 +73,9 @@ NINMU_BBS_URL = "http://localhost:8824"
 # dat落ち閾値
 DAT_OCHI_LIMIT = 1000
 
+# /docs/ 配信キャッシュ（mtime で無効化・gzip 版付き。大きいファイルは sendfile で直接送る）
+DOCS_CACHE = DocsCache()
+
 SETTING_TXT = """\
 BBS_TITLE=没日録2ch (shogun system)
 BBS_COMMENT=Claude Code マルチエージェント没日録ビューア
@@ -792,6 +797,10 @@ class DatHandler(BaseHTTPRequestHandler):
             self.send_cp932(content)
             return
 
+        if parts == ["stats", "docs"]:
+            self._send_utf8(json.dumps(DOCS_CACHE.stats()) + "\n", "application/json")
+            return
+
         # /docs/ 静的ファイル配信
         if parts and parts[0] == "docs":
             self._serve_docs(parts[1:])
@@ -816,11 +825,12 @@ class DatHandler(BaseHTTPRequestHandler):
             self._send_utf8("403 Forbidden\n", "text/plain; charset=utf-8", 403)
             return
 
-        if not target.exists():
+        st = stat_file(target)
+        if st is None and not target.is_dir():
             self._send_utf8("404 Not Found\n", "text/plain; charset=utf-8", 404)
             return
 
-        if target.is_dir():
+        if st is None:
             # ディレクトリ: ファイル一覧HTML
             rel = target.relative_to(docs_root)
             rel_str = str(rel) if str(rel) != "." else ""
@@ -847,20 +857,59 @@ class DatHandler(BaseHTTPRequestHandler):
         else:
             content_type = "text/plain; charset=utf-8"
 
+        use_gzip = st.has_gzip and accepts_gzip(self.headers.get("Accept-Encoding"))
+        etag = st.etag[:-1] + '-gzip"' if use_gzip else st.etag
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(st.mtime, usegmt=True),
+            "Vary": "Accept-Encoding",
+        }
+        if etag in (t.strip() for t in self.headers.get("If-None-Match", "").split(",")):
+            self._send_bytes(b"", content_type, 304, headers)
+            return
+
         try:
-            text = target.read_text(encoding="utf-8", errors="replace")
-        except Exception as e:
+            doc = DOCS_CACHE.get(st)
+            large = open(st.path, "rb") if doc is None else None
+        except OSError as e:
             self._send_utf8(f"500 Error: {e}\n", "text/plain; charset=utf-8", 500)
             return
-        self._send_utf8(text, content_type)
+        if large is not None:
+            with large:
+                self._send_file(large, st.size, content_type, headers)
+            return
+        if use_gzip:
+            headers["Content-Encoding"] = "gzip"
+            self._send_bytes(doc.gzip, content_type, headers=headers)
+        else:
+            self._send_bytes(doc.data, content_type, headers=headers)
 
-    def _send_utf8(self, text: str, content_type: str = "text/plain; charset=utf-8", status: int = 200) -> None:
-        data = text.encode("utf-8")
+    def _send_bytes(self, data: bytes, content_type: str, status: int = 200,
+                    headers: dict[str, str] | None = None) -> None:
         self.send_response(status)
         self.send_header("Content-Type", content_type)
-        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(data)))
         self.end_headers()
-        self.wfile.write(data)
+        if data:
+            self.wfile.write(data)
+
+    def _send_file(self, f, size: int, content_type: str, headers: dict[str, str]) -> None:
+        """キャッシュ対象外の大きいファイルを sendfile(2) で送る（ユーザー空間に読み込まない）。"""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        self.wfile.flush()
+        # socket.sendfile は os.sendfile が使えない環境では read/send にフォールバックする
+        self.connection.sendfile(f, count=size)
+
+    def _send_utf8(self, text: str, content_type: str = "text/plain; charset=utf-8", status: int = 200) -> None:
+        self._send_bytes(text.encode("utf-8"), content_type, status)
 
 
 # ---------------------------------------------------------------------------
@@ -878,6 +927,7 @@ def main() -> None:
     print(f"JDim外部板URL:   http://localhost:{args.port}{BASE_PATH}/")
     print(f"bbsmenu:         http://localhost:{args.port}{BASE_PATH}/bbsmenu.html")
     print(f"docsルート:      http://localhost:{args.port}/docs/  ({PROJECT_ROOT / 'docs'})")
+    print(f"docsキャッシュ:  http://localhost:{args.port}/stats/docs")
     print("Ctrl+C で停止")
     try:
         server.serve_forever()
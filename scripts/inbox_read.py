@@ -20,7 +20,6 @@ exit codes:
 import os
 import sys
 import json
-import subprocess
 import tempfile
 import yaml
 
@@ -33,6 +32,9 @@ DRAIN       = os.environ.get("DRAIN",      "false") == "true"
 DRY_RUN     = os.environ.get("DRY_RUN",    "false") == "true"
 SCRIPT_DIR  = os.environ.get("SCRIPT_DIR", ".")
 
+sys.path.insert(0, os.path.join(SCRIPT_DIR, "scripts"))
+from botsu.daemon_client import run as run_botsu  # noqa: E402
+
 
 # ─── DB存在チェック ────────────────────────────────────────────────────────────
 
@@ -43,13 +45,9 @@ def is_in_db(subtask_id: str) -> bool:
     if not subtask_id.startswith("subtask_"):
         return True  # 不明なIDはdrain可として扱う（保守的でない方向）
 
+    # botsu serve 常駐があれば常駐で引く。無ければエントリ毎に botsunichiroku.py をサブプロセスで起動（5秒で打ち切り）
     try:
-        result = subprocess.run(
-            ["python3", os.path.join(SCRIPT_DIR, "scripts", "botsunichiroku.py"),
-             "subtask", "show", subtask_id],
-            capture_output=True,
-            timeout=5,
-        )
+        result = run_botsu(["subtask", "show", subtask_id], timeout=5)
         return result.returncode == 0
     except Exception:
         return False  # チェック失敗 → drain不可
@@ -153,10 +153,13 @@ INDEXES_SQL = [
     "CREATE INDEX IF NOT EXISTS idx_commands_project ON commands(project)",
     "CREATE INDEX IF NOT EXISTS idx_commands_assigned_karo ON commands(assigned_karo)",
     "CREATE INDEX IF NOT EXISTS idx_commands_priority ON commands(priority)",
+    "CREATE INDEX IF NOT EXISTS idx_commands_status_created ON commands(status, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_commands_project_status_created ON commands(project, status, created_at)",
     "CREATE INDEX IF NOT EXISTS idx_subtasks_status ON subtasks(status)",
     "CREATE INDEX IF NOT EXISTS idx_subtasks_worker_id ON subtasks(worker_id)",
     "CREATE INDEX IF NOT EXISTS idx_subtasks_parent_cmd ON subtasks(parent_cmd)",
     "CREATE INDEX IF NOT EXISTS idx_subtasks_wave ON subtasks(wave)",
+    "CREATE INDEX IF NOT EXISTS idx_subtasks_status_assigned ON subtasks(status, assigned_at)",
     "CREATE INDEX IF NOT EXISTS idx_reports_worker_id ON reports(worker_id)",
     "CREATE INDEX IF NOT EXISTS idx_reports_task_id ON reports(task_id)",
     "CREATE INDEX IF NOT EXISTS idx_agents_role ON agents(role)",
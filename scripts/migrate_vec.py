@@ -1,51 +1,227 @@
 #!/usr/bin/env python3
-"""migrate_vec.py — 既存FTS5データのバッチベクトル化（1回実行）。
+"""migrate_vec.py — 没日録の全文書のバッチベクトル化（中断しても再実行で続きから）。
+
+本文は index_sources の定義で6表から読む（search_index の分かち書き済み content ではなく原文）。
+
+  - バッチ   : --batch 件を1回の encode で処理する
+  - 並列     : --workers N でプロセスプールを使う（ワーカー毎にモデルを1回ロード、
+               作業は --batch × 4 件のシャードに分けて配る。書き込みは親プロセスのみ）
+  - 書き込み : --commit-every 件溜まる毎に vec_index / vec_meta へ1トランザクションで書く
+  - 再開     : コミット済みの vec_meta がチェックポイント。同じモデルでベクトル化済みの
+               (source_type, source_id) は飛ばす（--rebuild で全件やり直し）
+  - 進捗     : コミット毎に 件数・速度・ETA を表示する
 
 Usage:
-  python3 scripts/migrate_vec.py              # 全件ベクトル化
-  python3 scripts/migrate_vec.py --dry-run    # 件数確認のみ
+  python3 scripts/migrate_vec.py                       # 未ベクトル化分をベクトル化
+  python3 scripts/migrate_vec.py --workers 4           # 4プロセスで並列化
+  python3 scripts/migrate_vec.py --rebuild             # 既存ベクトルを消して全件
+  python3 scripts/migrate_vec.py --dry-run             # 件数確認のみ
 """
 
 from __future__ import annotations
 
+import os
 import sqlite3
-import struct
 import sys
 import time
 from pathlib import Path
+from typing import Callable, Iterator
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = SCRIPT_DIR.parent
 sys.path.insert(0, str(SCRIPT_DIR))
 
 from botsu import DB_PATH
-from botsu.vec import MODEL_NAME, _VEC_DIM, _load_vec, ensure_tables
+from botsu.index_sources import SOURCES, row_created_at, row_fields, select_sql
+from botsu.vec import MODEL_NAME, embed_passages, ensure_tables, write_vectors
 
 BATCH_SIZE = 32
+COMMIT_EVERY = 1000
+SHARD_BATCHES = 4  # 1シャード = BATCH_SIZE × SHARD_BATCHES 件
+
+# (source_id, source_type, parent_id, project, created_at, raw_text)
+Doc = tuple[str, str, str, str, str, str]
+
+
+def pending_docs(conn: sqlite3.Connection) -> tuple[list[Doc], int]:
+    """未ベクトル化（または別モデルでベクトル化済み）の文書と、ベクトル化済み件数。"""
+    try:
+        done = {
+            (r[0], r[1]) for r in conn.execute(
+                "SELECT source_type, source_id FROM vec_meta WHERE model_name = ?", (MODEL_NAME,)
+            )
+        }
+    except sqlite3.OperationalError:
+        done = set()
+    docs: list[Doc] = []
+    for source in SOURCES:
+        try:
+            rows = conn.execute(select_sql(source, created=True) + " ORDER BY id").fetchall()
+        except sqlite3.OperationalError:
+            continue  # 表が無い（旧スキーマ）
+        for row in rows:
+            source_id, parent_id, project, _worker, _status, raw_text = row_fields(source, row)
+            if (source.source_type, source_id) in done or not raw_text.strip():
+                continue
+            docs.append((source_id, source.source_type, parent_id, project, row_created_at(row),
+                         raw_text))
+    return docs, len(done)
+
+
+def backfill_created_at(conn: sqlite3.Connection) -> int:
+    """作成時刻が空のベクトル（旧版の index embed が書いたもの）に元の行の作成時刻を入れる。
+
+    呼び出し元で conn.commit() が必要。埋めた件数を返す。
+    """
+    filled = 0
+    for source in SOURCES:
+        try:
+            filled += conn.execute(
+                f"UPDATE vec_meta SET created_at = (SELECT {source.created} FROM {source.table}"
+                f" WHERE {source.table}.id = vec_meta.source_id)"
+                " WHERE source_type = ? AND COALESCE(created_at, '') = ''",
+                (source.source_type,),
+            ).rowcount
+        except sqlite3.OperationalError:
+            continue  # 表が無い（旧スキーマ）
+    return filled
+
+
+def _shards(docs: list[Doc], size: int) -> Iterator[list[Doc]]:
+    for i in range(0, len(docs), size):
+        yield docs[i:i + size]
+
+
+# ---------------------------------------------------------------------------
+# ワーカー（spawn したプロセス内で実行される）
+# ---------------------------------------------------------------------------
+
+_worker_batch = BATCH_SIZE
+
+
+def _init_worker(batch_size: int, threads: int) -> None:
+    """ワーカー起動時に1回だけモデルを読み込む。torch のスレッドはコア数をワーカーで分ける。"""
+    global _worker_batch
+    _worker_batch = batch_size
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from botsu.vec import _get_model
+    try:
+        _get_model()
+    except Exception:
+        pass  # 読み込めなければ encode が None を返し、親プロセスが報告する
+
+
+def _encode_shard(texts: list[str]) -> list[bytes] | None:
+    return embed_passages(texts, batch_size=_worker_batch)
+
+
+def _encode_shards(docs: list[Doc], workers: int, batch_size: int) -> Iterator[tuple[list[Doc], list[bytes] | None]]:
+    """シャード毎に (docs, vectors) を返す。workers > 1 ならプロセスプールで並列に encode する。"""
+    shard_size = batch_size * SHARD_BATCHES
+    if workers <= 1:
+        for shard in _shards(docs, shard_size):
+            yield shard, embed_passages([d[5] for d in shard], batch_size=batch_size)
+        return
+
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    ctx = multiprocessing.get_context("spawn")  # fork は torch のスレッドと相性が悪い
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(batch_size, threads)) as pool:
+        shards = _shards(docs, shard_size)
+        running = {}
+        try:
+            while True:
+                # 待ち行列はワーカー数の2倍まで（全件を一度に投入してメモリを食わない）
+                for shard in shards:
+                    running[pool.submit(_encode_shard, [d[5] for d in shard])] = shard
+                    if len(running) >= workers * 2:
+                        break
+                if not running:
+                    return
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield running.pop(future), future.result()
+        finally:
+            for future in running:
+                future.cancel()
+
+
+def vectorize(conn: sqlite3.Connection, docs: list[Doc],
+              encoded: Iterator[tuple[list[Doc], list[bytes] | None]],
+              commit_every: int = COMMIT_EVERY,
+              report: Callable[[int, int, float], None] | None = None) -> int:
+    """encode 済みシャードを commit_every 件毎に1トランザクションで書き込む。
+
+    encode に失敗したシャードがあれば、それまでの分を確定して RuntimeError を送出する。
+    Returns: 書き込んだ件数
+    """
+    started = time.time()
+    done = 0
+    buffer: list[tuple] = []
+
+    def flush() -> None:
+        nonlocal done
+        if not buffer:
+            return
+        write_vectors(conn, buffer)
+        conn.commit()
+        done += len(buffer)
+        buffer.clear()
+        if report:
+            report(done, len(docs), time.time() - started)
+
+    try:
+        for shard, vectors in encoded:
+            if vectors is None:
+                raise RuntimeError(f"encode failed ({shard[0][1]} {shard[0][0]} ...)")
+            buffer.extend((*d[:5], v) for d, v in zip(shard, vectors))
+            if len(buffer) >= commit_every:
+                flush()
+    finally:
+        flush()
+    return done
+
+
+def _print_progress(done: int, total: int, elapsed: float) -> None:
+    rate = done / elapsed if elapsed > 0 else 0
+    eta = (total - done) / rate if rate > 0 else 0
+    print(f"  {done}/{total} ({rate:.1f}/s, ETA {eta:.0f}s)", flush=True)
 
 
 def main():
     import argparse
-    parser = argparse.ArgumentParser(description="既存FTS5データのバッチベクトル化")
+    parser = argparse.ArgumentParser(description="没日録の全文書のバッチベクトル化（再実行で続きから）")
     parser.add_argument("--dry-run", action="store_true", help="件数確認のみ")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, metavar="N",
+                        help=f"1回の encode の件数 (デフォルト: {BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=1, metavar="N",
+                        help="encode するプロセス数 (デフォルト: 1 = このプロセス内)")
+    parser.add_argument("--commit-every", type=int, default=COMMIT_EVERY, metavar="N",
+                        help=f"1トランザクションで書き込む件数 (デフォルト: {COMMIT_EVERY})")
+    parser.add_argument("--rebuild", action="store_true", help="既存のベクトルを消して全件やり直す")
     args = parser.parse_args()
 
     print(f"DB: {DB_PATH}")
     conn = sqlite3.connect(str(DB_PATH))
     conn.execute("PRAGMA journal_mode=WAL")
-
-    # FTS5データ件数確認
-    total = conn.execute("SELECT COUNT(*) FROM search_index").fetchone()[0]
-    print(f"FTS5 entries: {total}")
+    conn.row_factory = sqlite3.Row
 
     if args.dry_run:
-        # 既存ベクトル件数
-        try:
-            vec_count = conn.execute("SELECT COUNT(*) FROM vec_meta").fetchone()[0]
-            print(f"Vec entries:  {vec_count}")
-            print(f"Remaining:    {total - vec_count}")
-        except Exception:
-            print("Vec tables not yet created")
+        docs, existing = pending_docs(conn)
+        by_type: dict[str, int] = {}
+        for d in docs:
+            by_type[d[1]] = by_type.get(d[1], 0) + 1
+        print(f"Already vectorized: {existing}")
+        print(f"Pending: {len(docs)}")
+        for source_type, n in by_type.items():
+            print(f"  {source_type:<10} {n}")
         conn.close()
         return
 
@@ -54,74 +230,45 @@ def main():
         print("Error: sqlite-vec not available", file=sys.stderr)
         sys.exit(1)
     print("vec_index + vec_meta tables ready")
+    filled = backfill_created_at(conn)
+    conn.commit()
+    if filled:
+        print(f"created_at backfilled: {filled}")
 
-    # 既にベクトル化済みのsource_idを取得
-    existing = set()
-    try:
-        rows = conn.execute("SELECT source_id FROM vec_meta").fetchall()
-        existing = {r[0] for r in rows}
-    except Exception:
-        pass
-
-    # FTS5データ取得
-    rows = conn.execute(
-        "SELECT source_type, source_id, parent_id, project, content"
-        " FROM search_index"
-    ).fetchall()
-
-    # 未ベクトル化のものだけフィルタ
-    pending = [(r[0], r[1], r[2], r[3], r[4]) for r in rows if r[1] not in existing]
-    print(f"Already vectorized: {len(existing)}")
-    print(f"Pending: {len(pending)}")
+    if args.rebuild:
+        conn.execute("DELETE FROM vec_index")
+        conn.execute("DELETE FROM vec_meta")
+        conn.execute("DELETE FROM embed_queue")  # 全件やり直すので滞留分も不要
+        conn.commit()
 
-    if not pending:
+    docs, existing = pending_docs(conn)
+    print(f"Already vectorized: {existing}")
+    print(f"Pending: {len(docs)}")
+    if not docs:
         print("Nothing to do.")
         conn.close()
         return
 
-    # モデルロード
-    print(f"Loading model: {MODEL_NAME} ...")
-    t0 = time.time()
-    from sentence_transformers import SentenceTransformer
-    model = SentenceTransformer(MODEL_NAME, device="cpu")
-    print(f"Model loaded in {time.time() - t0:.1f}s")
-
-    # バッチベクトル化
+    print(f"Vectorizing with {MODEL_NAME} (workers={args.workers}, batch={args.batch},"
+          f" commit every {args.commit_every}) ...")
     t_start = time.time()
     done = 0
-    for i in range(0, len(pending), BATCH_SIZE):
-        batch = pending[i:i + BATCH_SIZE]
-        texts = ["文章: " + r[4] for r in batch]  # Ruri v3 passage prefix
-        embeddings = model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
-
-        for row, emb in zip(batch, embeddings):
-            source_type, source_id, parent_id, project, _content = row
-            vec_bytes = struct.pack(f"{len(emb)}f", *emb)
-
-            conn.execute("DELETE FROM vec_index WHERE source_id = ?", (source_id,))
-            conn.execute(
-                "INSERT INTO vec_index (source_id, embedding) VALUES (?, ?)",
-                (source_id, vec_bytes),
-            )
-
-            from botsu import now_iso
-            conn.execute(
-                "INSERT OR REPLACE INTO vec_meta"
-                " (source_id, source_type, parent_id, project, created_at, model_name, vectorized_at)"
-                " VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (source_id, source_type, parent_id, project, "", MODEL_NAME, now_iso()),
-            )
-
-        conn.commit()
-        done += len(batch)
-        elapsed = time.time() - t_start
-        rate = done / elapsed if elapsed > 0 else 0
-        eta = (len(pending) - done) / rate if rate > 0 else 0
-        print(f"  {done}/{len(pending)} ({rate:.1f}/s, ETA {eta:.0f}s)")
+    try:
+        done = vectorize(conn, docs, _encode_shards(docs, args.workers, args.batch),
+                         commit_every=args.commit_every, report=_print_progress)
+    except KeyboardInterrupt:
+        print("\nInterrupted: committed vectors are kept. Re-run to resume.", file=sys.stderr)
+        sys.exit(130)
+    except RuntimeError as e:
+        print(f"Error: {e} (sentence-transformers / モデルを確認してください。再実行で続きから)",
+              file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.close()
 
     elapsed = time.time() - t_start
-    print(f"\nDone: {done} vectors indexed in {elapsed:.1f}s")
-    conn.close()
+    rate = done / elapsed if elapsed > 0 else 0
+    print(f"\nDone: {done} vectors indexed in {elapsed:.1f}s ({rate:.1f}/s)")
 
 
 if __name__ == "__main__":
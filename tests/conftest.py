@@ -98,3 +98,26 @@ def seeded_db_path(seeded_db, tmp_db_path):
     """テストデータ投入済みDBのファイルパスを返す。
     botsunichiroku.py のDB_PATHモンキーパッチ用。"""
     return tmp_db_path
+
+
+@pytest.fixture
+def derived_db(seeded_db):
+    """トリガ維持の派生表（scripts/botsu/*.py）を作成+バックフィルしたDB接続を返すファクトリ。
+
+    derived_db(ensure) は ensure(conn) が初回作成（True）であることを確かめてコミットする。
+    """
+    def make(ensure):
+        assert ensure(seeded_db) is True
+        seeded_db.commit()
+        return seeded_db
+    return make
+
+
+@pytest.fixture
+def assert_matches_rebuild():
+    """トリガによる差分更新後の snapshot(conn) が、rebuild(conn)（全件再構築）後と一致するか確認する。"""
+    def check(conn, snapshot, rebuild):
+        incremental = snapshot(conn)
+        rebuild(conn)
+        assert snapshot(conn) == incremental
+    return check
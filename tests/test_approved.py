@@ -0,0 +1,97 @@
+"""test_approved.py - botsu/approved.py（承認済み作業 FTS5 インデックス）のテスト
+
+監査状態・報告の変更で承認済み作業が出入りすること、短いキーワードもトークン索引で引けること、
+検索結果キャッシュが版数で無効化されることを確認する。
+"""
+
+import pytest
+
+from botsu import approved
+from botsu.approved import ensure_approved_index, rebuild_approved_index, search_approved
+
+
+def _rows(conn):
+    return [
+        tuple(r) for r in conn.execute(
+            "SELECT subtask_id, project, body FROM approved_work ORDER BY subtask_id"
+        )
+    ]
+
+
+def _ids(conn, keywords):
+    return [p["source_id"] for p in search_approved(conn, keywords)]
+
+
+def _watchdog(conn):
+    return _rows(conn), _ids(conn, ["watchdog"])
+
+
+@pytest.fixture
+def approved_db(seeded_db, derived_db):
+    approved.clear_cache()
+    seeded_db.execute(
+        "UPDATE subtasks SET audit_status = 'done', description = 'watchdogタイマー実装'"
+        " WHERE id = 'subtask_001'"
+    )
+    return derived_db(ensure_approved_index)
+
+
+def test_backfill(approved_db):
+    assert ensure_approved_index(approved_db) is False
+    assert _rows(approved_db) == [
+        ("subtask_001", "shogun", "watchdogタイマー実装\nテスト完了報告"),
+    ]
+    # 3文字以上は FTS5（trigram）、2文字は LIKE 補完
+    assert _ids(approved_db, ["watchdog"]) == ["subtask_001"]
+    assert _ids(approved_db, ["実装"]) == ["subtask_001"]
+    assert _ids(approved_db, ["完了報告"]) == ["subtask_001"]
+    assert _ids(approved_db, ["センサー"]) == []
+
+
+def test_audit_and_reports_follow(approved_db, assert_matches_rebuild):
+    conn = approved_db
+    # 監査PASSでも done 報告が無ければ対象外
+    conn.execute("UPDATE subtasks SET audit_status = 'done' WHERE id = 'subtask_002'")
+    assert _ids(conn, ["サブタスク2"]) == []
+    conn.execute(
+        "INSERT INTO reports (worker_id, task_id, timestamp, status, summary)"
+        " VALUES ('ashigaru2', 'subtask_002', '2026-01-01T01:00:00+00:00', 'done', 'watchdog連携')"
+    )
+    assert _ids(conn, ["watchdog", "サブタスク2"]) == ["subtask_002", "subtask_001"]
+    assert_matches_rebuild(conn, _watchdog, rebuild_approved_index)
+
+    conn.execute("UPDATE subtasks SET audit_status = 'rejected' WHERE id = 'subtask_002'")
+    assert _ids(conn, ["watchdog"]) == ["subtask_001"]
+    conn.execute("DELETE FROM reports WHERE task_id = 'subtask_001'")
+    assert _ids(conn, ["watchdog"]) == []
+    assert_matches_rebuild(conn, _watchdog, rebuild_approved_index)
+
+
+def test_cache_invalidated_by_version(approved_db):
+    conn = approved_db
+    assert _ids(conn, ["watchdog"]) == ["subtask_001"]
+    assert _ids(conn, ["watchdog"]) == ["subtask_001"]
+    assert approved.cache_stats()["hits"] == 1
+
+    conn.execute("UPDATE subtasks SET description = 'センサー監視' WHERE id = 'subtask_001'")
+    assert _ids(conn, ["watchdog"]) == []
+    assert approved.cache_stats()["misses"] == 2
+
+
+def test_short_keywords_use_token_index(approved_db):
+    from botsu.indexer import drain, rebuild_index
+
+    conn = approved_db
+    rebuild_index(conn)
+    conn.commit()
+    sql, params = approved._build_sql([], ["実装"])
+    plan = " ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params + [5]))
+    assert "SCAN w" not in plan  # approved_work を全件 LIKE しない
+    assert _ids(conn, ["実装"]) == ["subtask_001"]
+    assert _ids(conn, ["監視"]) == []
+
+    # 反映待ち（index_queue）の間はキャッシュせず、drain 後に見つかる
+    conn.execute("UPDATE subtasks SET description = 'センサー監視' WHERE id = 'subtask_001'")
+    assert _ids(conn, ["監視"]) == []
+    drain(conn)
+    assert _ids(conn, ["監視"]) == ["subtask_001"]
@@ -0,0 +1,60 @@
+"""test_cli_startup.py - botsunichiroku.py の遅延ディスパッチ（選ばれたサブコマンドだけ import）のテスト"""
+
+import importlib
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import botsunichiroku
+
+CLI = str(Path(__file__).resolve().parent.parent / "scripts" / "botsunichiroku.py")
+
+
+@pytest.fixture
+def shogun_root(seeded_db, tmp_db_path, tmp_path):
+    """SHOGUN_ROOT/data/botsunichiroku.db にテストDBを置いたディレクトリ。"""
+    seeded_db.close()
+    root = tmp_path / "root"
+    (root / "data").mkdir(parents=True)
+    shutil.copy(tmp_db_path, root / "data" / "botsunichiroku.db")
+    return root
+
+
+def _run(root, *argv):
+    env = {**os.environ, "SHOGUN_ROOT": str(root)}
+    return subprocess.run([sys.executable, *argv], capture_output=True, text=True, env=env)
+
+
+def test_every_handler_resolves():
+    for name, module in botsunichiroku.HANDLERS.items():
+        assert callable(getattr(importlib.import_module(module), name)), f"{module}.{name}"
+
+
+def test_non_search_command_skips_search_and_mecab(shogun_root):
+    proc = _run(shogun_root, "-X", "importtime", CLI, "counter", "show")
+    assert proc.returncode == 0, proc.stderr
+    assert "cmd_id" in proc.stdout
+
+    entries, _ = botsunichiroku._parse_importtime(proc.stderr)
+    loaded = {name for name, *_ in entries}
+    assert "botsu.counter" in loaded
+    assert not loaded & {"botsu.search", "botsu.reply", "botsu.notify", "botsu.tokenizer", "MeCab", "subprocess"}
+
+
+def test_search_flag_dispatch():
+    args = botsunichiroku.build_parser().parse_args(["search", "--enrich", "cmd_001"])
+    assert args.func is botsunichiroku._search_or_enrich
+    assert botsunichiroku.build_parser().parse_args(["counter", "next", "x"]).func.__name__ == "counter_next"
+
+
+def test_profile_import_reports_breakdown(shogun_root):
+    proc = _run(shogun_root, CLI, "--profile-import", "counter", "show")
+    assert proc.returncode == 0, proc.stderr
+    assert "cmd_id" in proc.stdout
+    assert "=== import profile: counter show ===" in proc.stderr
+    assert "botsu modules: botsu.counter" in proc.stderr
+    assert "cold start (wall):" in proc.stderr
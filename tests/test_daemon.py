@@ -0,0 +1,118 @@
+"""test_daemon.py - botsu/daemon.py（botsunichiroku.py serve 常駐）と daemon_client.py のテスト"""
+
+import shutil
+import sys
+import threading
+
+import pytest
+
+import botsu
+import botsunichiroku
+from botsu import daemon, daemon_client
+
+
+class _BlockingStdin:
+    """読まれたら失敗させる（常駐プロセス自身の stdin の代わり）。"""
+
+    def read(self, *args):
+        raise AssertionError("daemon read its own stdin")
+
+    readline = read
+
+
+@pytest.fixture
+def db_path(monkeypatch, seeded_db, tmp_db_path):
+    seeded_db.close()
+    monkeypatch.setattr(botsu, "DB_PATH", tmp_db_path)
+    return tmp_db_path
+
+
+@pytest.fixture
+def server(db_path, tmp_path):
+    path = str(tmp_path / "botsu.sock")
+    srv = daemon.make_server(path, botsunichiroku.build_parser)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv, path
+    srv.shutdown()
+    daemon.close_server(srv)
+
+
+def test_daemon_runs_subcommands(server):
+    srv, path = server
+    result = daemon_client.call(["subtask", "show", "subtask_001"], socket_path=path)
+    assert result.returncode == 0
+    assert "subtask_001" in result.stdout
+
+    missing = daemon_client.call(["subtask", "show", "subtask_999"], socket_path=path)
+    assert missing.returncode == 1
+    assert "not found" in missing.stderr
+
+    bad = daemon_client.call(["subtask", "nope"], socket_path=path)
+    assert bad.returncode == 2
+    assert "invalid choice" in bad.stderr
+
+
+def test_daemon_reuses_one_connection(server):
+    srv, path = server
+    for _ in range(3):
+        assert daemon_client.call(["counter", "show"], socket_path=path).returncode == 0
+    # 書き込み系も同じ接続で確定される
+    assert daemon_client.call(["counter", "next", "cmd_id"], socket_path=path).returncode == 0
+    shown = daemon_client.call(["counter", "show", "--json"], socket_path=path)
+    assert '"cmd_id"' in shown.stdout
+
+    stats = daemon_client.request({"op": "stats"}, socket_path=path)
+    assert stats["requests"] == 5
+    assert stats["errors"] == 0
+    assert stats["connections_opened"] == 1
+    assert botsu._held_conn is None  # 実行の間だけ貸し出す
+
+
+def test_daemon_refuses_resident_commands(server):
+    _, path = server
+    for argv in (["serve"], ["index", "drain", "--watch", "1"]):
+        result = daemon_client.call(argv, socket_path=path)
+        assert result.returncode == 2
+        assert "cannot run inside botsu serve" in result.stderr
+
+
+def test_client_falls_back_to_subprocess_with_timeout(db_path, tmp_path, monkeypatch):
+    root = tmp_path / "root"
+    (root / "data").mkdir(parents=True)
+    shutil.copy(db_path, root / "data" / "botsunichiroku.db")
+    monkeypatch.setenv("SHOGUN_ROOT", str(root))
+    missing = str(tmp_path / "absent.sock")
+    assert daemon_client.call(["counter", "show"], socket_path=missing) is None
+
+    result = daemon_client.run(["subtask", "show", "subtask_001"], socket_path=missing)
+    assert result.returncode == 0
+    assert "subtask_001" in result.stdout
+    assert daemon_client.run(["subtask", "show", "subtask_999"], socket_path=missing).returncode == 1
+
+    slow = daemon_client.run(["counter", "show"], socket_path=missing, timeout=0.001)
+    assert slow.returncode == 1
+    assert "timed out" in slow.stderr
+
+
+def test_daemon_does_not_read_its_own_stdin(server, monkeypatch):
+    srv, path = server
+    monkeypatch.setattr(sys, "stdin", _BlockingStdin())
+    result = daemon_client.call(["cmd", "add", "stdin なし", "--stdin"], socket_path=path, timeout=5)
+    assert result.returncode == 0, result.stderr
+    assert "Created: cmd_" in result.stdout
+
+    piped = daemon_client.call(["cmd", "add", "stdin あり", "--stdin"], stdin="詳細", socket_path=path)
+    assert piped.returncode == 0
+
+
+def test_stale_socket_is_replaced_and_live_one_refused(server, tmp_path):
+    _, live = server
+    with pytest.raises(SystemExit):
+        daemon.make_server(live, botsunichiroku.build_parser)
+
+    stale = tmp_path / "stale.sock"
+    stale.write_text("")
+    srv = daemon.make_server(str(stale), botsunichiroku.build_parser)
+    daemon.close_server(srv)
+    assert not stale.exists()
@@ -0,0 +1,150 @@
+"""test_docs_cache.py - botsu/docs_cache.py（/docs 配信キャッシュ）と dat_server の /docs 配信のテスト"""
+
+import gzip
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+from http.server import HTTPServer
+from pathlib import Path
+
+import pytest
+
+from botsu import docs_cache
+from botsu.docs_cache import DocsCache, accepts_gzip, stat_file
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+import dat_server  # noqa: E402
+
+
+def _bump(path: Path, text: str) -> None:
+    """同じ mtime_ns に収まらないよう mtime を明示的に進めて書き換える。"""
+    st = path.stat()
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_hit_and_mtime_invalidation(tmp_path):
+    doc = tmp_path / "a.md"
+    doc.write_text("# v1", encoding="utf-8")
+    cache = DocsCache()
+
+    assert cache.get(stat_file(doc)).data == b"# v1"
+    assert cache.get(stat_file(doc)).data == b"# v1"
+    _bump(doc, "# v2")
+    assert cache.get(stat_file(doc)).data == b"# v2"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidated"]) == (1, 2, 1)
+    assert stats["entries"] == 1
+
+
+def test_gzip_variant_and_large_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(docs_cache, "GZIP_MIN_BYTES", 10)
+    monkeypatch.setattr(docs_cache, "MAX_ENTRY_BYTES", 1000)
+    small, medium, large = (tmp_path / n for n in ("s.md", "m.md", "l.md"))
+    small.write_text("short", encoding="utf-8")
+    medium.write_text("足軽 " * 100, encoding="utf-8")
+    large.write_text("x" * 2000, encoding="utf-8")
+    cache = DocsCache()
+
+    assert cache.get(stat_file(small)).gzip is None
+    doc = cache.get(stat_file(medium))
+    assert gzip.decompress(doc.gzip) == doc.data
+    assert len(doc.gzip) < len(doc.data)
+    assert cache.get(stat_file(large)) is None
+    assert cache.stats()["uncached"] == 1
+
+
+def test_lru_eviction_by_bytes(tmp_path):
+    cache = DocsCache(max_bytes=250)
+    paths = []
+    for name in ("a", "b", "c"):
+        p = tmp_path / f"{name}.md"
+        p.write_text(name * 100, encoding="utf-8")
+        paths.append(p)
+    cache.get(stat_file(paths[0]))
+    cache.get(stat_file(paths[1]))
+    cache.get(stat_file(paths[0]))  # a を最近使用に
+    cache.get(stat_file(paths[2]))  # b が追い出される
+
+    stats = cache.stats()
+    assert stats["evicted"] == 1
+    assert stats["bytes"] <= 250
+    cache.get(stat_file(paths[0]))
+    assert cache.stats()["hits"] == 2
+
+
+def test_stat_file_and_accepts_gzip(tmp_path):
+    assert stat_file(tmp_path) is None
+    assert stat_file(tmp_path / "missing.md") is None
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("*")
+    assert not accepts_gzip("gzip;q=0, identity")
+    assert not accepts_gzip(None)
+
+
+# ---------------------------------------------------------------------------
+# dat_server /docs/
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def dat_docs(tmp_path, monkeypatch):
+    (tmp_path / "docs").mkdir()
+    monkeypatch.setattr(dat_server, "PROJECT_ROOT", tmp_path)
+    monkeypatch.setattr(dat_server, "DOCS_CACHE", DocsCache())
+    monkeypatch.setattr(docs_cache, "GZIP_MIN_BYTES", 10)
+    monkeypatch.setattr(docs_cache, "MAX_ENTRY_BYTES", 1000)
+    monkeypatch.setattr(dat_server.DatHandler, "log_message", lambda *a: None)
+    server = HTTPServer(("127.0.0.1", 0), dat_server.DatHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield tmp_path / "docs", f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def _get(url, **headers):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as resp:
+            return resp.status, dict(resp.headers), resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def test_dat_server_serves_cached_gzip_and_304(dat_docs):
+    root, base = dat_docs
+    (root / "guide.md").write_text("将軍の心得 " * 50, encoding="utf-8")
+
+    status, headers, body = _get(f"{base}/docs/guide.md")
+    assert status == 200
+    assert body == (root / "guide.md").read_bytes()
+    etag = headers["ETag"]
+
+    status, headers, body = _get(f"{base}/docs/guide.md", **{"Accept-Encoding": "gzip"})
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body) == (root / "guide.md").read_bytes()
+    assert headers["ETag"] != etag
+
+    status, _, body = _get(f"{base}/docs/guide.md", **{"If-None-Match": etag})
+    assert (status, body) == (304, b"")
+
+    stats = json.loads(_get(f"{base}/stats/docs")[2])
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_dat_server_sends_large_file_uncached(dat_docs):
+    root, base = dat_docs
+    data = ("大きい文書\n" * 500).encode("utf-8")
+    (root / "big.txt").write_bytes(data)
+
+    status, headers, body = _get(f"{base}/docs/big.txt", **{"Accept-Encoding": "gzip"})
+    assert status == 200
+    assert body == data
+    assert "Content-Encoding" not in headers
+    assert int(headers["Content-Length"]) == len(data)
+    assert dat_server.DOCS_CACHE.stats()["uncached"] == 1
+    assert _get(f"{base}/docs/missing.md")[0] == 404
+    assert _get(f"{base}/docs/")[0] == 200  # ディレクトリ一覧
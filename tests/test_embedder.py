@@ -0,0 +1,147 @@
+"""test_embedder.py - botsu/embedder.py（embed_queue とバッチ embedder）のテスト
+
+sqlite-vec / Ruri v3 は使わず、vec_index は通常表・encode は偽物で代用する。
+"""
+
+import pytest
+
+from botsu.embedder import embed_batch, embed_pending, embed_status, ensure_embed_queue
+from botsu.indexer import drain, rebuild_index
+from botsu import vec
+from botsu.vec import VEC_META_SQL
+
+
+def _fake_encode(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return [t.encode("utf-8") for t in texts]
+    return encode
+
+
+def _vectors(conn):
+    return {
+        r[0]: (r[1], r[2])
+        for r in conn.execute(
+            "SELECT m.source_id, m.source_type, v.embedding FROM vec_meta m"
+            " JOIN vec_index v ON v.source_id = m.source_type || ':' || m.source_id"
+        )
+    }
+
+
+@pytest.fixture
+def vec_db(seeded_db):
+    conn = seeded_db
+    rebuild_index(conn)
+    conn.execute("CREATE TABLE vec_index (source_id TEXT, embedding BLOB)")
+    conn.execute(VEC_META_SQL)
+    ensure_embed_queue(conn)
+    conn.commit()
+    return conn
+
+
+def test_drain_enqueues_only_changed_rows(vec_db):
+    conn = vec_db
+    conn.execute("UPDATE subtasks SET notes = 'MQTT再接続' WHERE id = 'subtask_001'")
+    conn.execute("UPDATE subtasks SET notes = 'MQTT再接続' WHERE id = 'subtask_001'")
+    # 索引対象列の UPDATE でも内容が同じならベクトル化しない
+    conn.execute("UPDATE commands SET status = status WHERE id = 'cmd_001'")
+    conn.commit()
+
+    assert drain(conn)["indexed"] == 2
+    status = embed_status(conn)
+    assert status["pending"] == 1
+    assert status["by_type"] == {"subtask": 1}
+    assert status["lag_sec"] >= 0
+    assert status["vectors"] == 0
+
+
+def test_embed_batch_writes_vectors_in_one_encode(vec_db):
+    conn = vec_db
+    for sid in ("subtask_001", "subtask_002", "subtask_003"):
+        conn.execute("UPDATE subtasks SET notes = 'バッチ' WHERE id = ?", (sid,))
+    conn.commit()
+    drain(conn)
+
+    calls = []
+    counts = embed_batch(conn, _fake_encode(calls))
+    assert (counts["queued"], counts["embedded"], counts["deleted"]) == (3, 3, 0)
+    assert len(calls) == 1 and len(calls[0]) == 3
+    assert all("バッチ" in t for t in calls[0])  # 分かち書き前の本文
+    vectors = _vectors(conn)
+    assert set(vectors) == {"subtask_001", "subtask_002", "subtask_003"}
+    assert vectors["subtask_001"][0] == "subtask"
+    assert conn.execute(
+        "SELECT created_at FROM vec_meta WHERE source_id = 'subtask_001'"
+    ).fetchone()[0] == "2026-01-01T00:00:00+00:00"  # 鮮度スコア用に元の行の時刻を持つ
+    assert embed_status(conn)["pending"] == 0
+    assert embed_status(conn)["vectors"] == 3
+
+
+def test_deleted_rows_drop_their_vectors(vec_db):
+    conn = vec_db
+    conn.execute("UPDATE commands SET details = '削除予定' WHERE id = 'cmd_003'")
+    conn.commit()
+    drain(conn)
+    embed_pending(conn, _fake_encode([]))
+    assert "cmd_003" in _vectors(conn)
+
+    conn.execute("DELETE FROM commands WHERE id = 'cmd_003'")
+    conn.commit()
+    drain(conn)
+    totals = embed_pending(conn, _fake_encode([]))
+    assert (totals["embedded"], totals["deleted"]) == (0, 1)
+    assert "cmd_003" not in _vectors(conn)
+
+
+def test_failed_encode_keeps_queue(vec_db):
+    conn = vec_db
+    conn.execute("UPDATE subtasks SET notes = 'retry' WHERE id = 'subtask_002'")
+    conn.commit()
+    drain(conn)
+
+    totals = embed_pending(conn, lambda texts: None)
+    assert totals["failed"] == 1
+    assert embed_status(conn)["pending"] == 1
+    assert embed_pending(conn, _fake_encode([]), batch_size=1)["embedded"] == 1
+    assert embed_status(conn)["pending"] == 0
+
+
+def test_without_vector_index_nothing_is_queued(seeded_db):
+    conn = seeded_db
+    rebuild_index(conn)
+    conn.execute("UPDATE subtasks SET notes = 'no vec' WHERE id = 'subtask_001'")
+    conn.commit()
+    drain(conn)
+    assert embed_status(conn)["installed"] is False
+
+
+def test_hybrid_search_keeps_same_id_of_different_tables(vec_db, monkeypatch):
+    conn = vec_db
+    conn.execute(
+        "INSERT INTO diary_entries (id, agent_id, date, summary, body)"
+        " VALUES (1, 'ashigaru1', '2026-01-01', '完了報告の振り返り', 'テスト')"
+    )
+    conn.commit()
+    drain(conn)
+    embed_pending(conn, _fake_encode([]))
+    monkeypatch.setattr(vec, "vec_search", lambda conn, query, top_n: [
+        (vec.vec_key("diary", "1"), 0.1), (vec.vec_key("report", "1"), 0.2),
+    ])
+    results = vec.hybrid_search(conn, "テスト", top_n=5)
+    assert {("report", "1"), ("diary", "1")} <= {(r["source_type"], r["source_id"]) for r in results}
+    only_diary = vec.hybrid_search(conn, "テスト", top_n=5, source_type="diary")
+    assert [(r["source_type"], r["source_id"]) for r in only_diary] == [("diary", "1")]
+
+
+def test_drain_creates_queue_for_older_vector_index(seeded_db):
+    conn = seeded_db
+    rebuild_index(conn)
+    conn.execute("CREATE TABLE vec_index (source_id TEXT, embedding BLOB)")
+    conn.execute(VEC_META_SQL)  # embed_queue 導入前の migrate_vec.py で作られた状態
+    conn.execute("UPDATE subtasks SET notes = 'upgrade' WHERE id = 'subtask_001'")
+    conn.commit()
+
+    drain(conn)
+    status = embed_status(conn)
+    assert status["installed"] is True
+    assert status["by_type"] == {"subtask": 1}
@@ -0,0 +1,133 @@
+"""test_extfetch.py - botsu/extfetch.py（外部検索の共有取得層）のテスト
+
+ネットワークには出ない（バックエンドは関数差し替え / スタブディレクトリ）。
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from botsu.extfetch import CircuitOpenError, ExternalFetcher, cache_key, normalize_query, stub_backend
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+import baku  # noqa: E402
+
+
+class _Backend:
+    """呼び出し回数を数え、fail=True の間は例外を投げるバックエンド。"""
+
+    def __init__(self, body="ok", delay=0.0):
+        self.body = body
+        self.delay = delay
+        self.fail = False
+        self.calls = []
+
+    def __call__(self, url, timeout):
+        self.calls.append(url)
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise OSError("network down")
+        return self.body
+
+
+def _fetcher(tmp_path, backend, **kwargs):
+    return ExternalFetcher("test", url_for=lambda q: f"https://example.invalid/?q={q}",
+                           cache_dir=tmp_path, backend=backend, timeout=1, **kwargs)
+
+
+def test_normalize_query():
+    assert normalize_query("  Ｗatchdog  タイマー watchdog ") == "watchdog タイマー"
+    assert cache_key("タイマー Watchdog") == cache_key("watchdog タイマー")
+
+
+def test_upstream_gets_callers_query(tmp_path):
+    backend = _Backend()
+    _fetcher(tmp_path, backend).fetch("Raspberry Pi watchdog")
+    assert backend.calls == ["https://example.invalid/?q=Raspberry Pi watchdog"]
+
+
+def test_disk_cache_and_ttl(tmp_path):
+    backend = _Backend()
+    fetcher = _fetcher(tmp_path, backend, ttl_sec=3600)
+    assert fetcher.fetch("a b") == "ok"
+    assert fetcher.fetch("b a") == "ok"
+    assert len(backend.calls) == 1
+
+    # 別プロセス相当（新しいインスタンス）でもディスクから返る
+    assert _fetcher(tmp_path, backend).fetch("a b") == "ok"
+    assert len(backend.calls) == 1
+
+    expired = _fetcher(tmp_path, backend, ttl_sec=0)
+    time.sleep(0.01)
+    backend.body = "new"
+    assert expired.fetch("a b") == "new"
+    assert len(backend.calls) == 2
+
+
+def test_circuit_breaker(tmp_path):
+    backend = _Backend()
+    backend.fail = True
+    fetcher = _fetcher(tmp_path, backend, failure_threshold=2, cooldown_sec=3600)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            fetcher.fetch("q")
+    # 開いている間はバックエンドを呼ばない
+    with pytest.raises(CircuitOpenError):
+        fetcher.fetch("q")
+    assert len(backend.calls) == 2
+    assert fetcher.stats()["circuit"] == "open"
+
+    # クールダウン経過後は1件だけ試行し、成功で閉じる
+    fetcher.cooldown_sec = 0
+    backend.fail = False
+    assert fetcher.fetch("q") == "ok"
+    assert fetcher.stats()["circuit"] == "closed"
+
+
+def test_stale_cache_on_failure(tmp_path):
+    backend = _Backend(body="old")
+    _fetcher(tmp_path, backend).fetch("q")
+    backend.fail = True
+    fetcher = _fetcher(tmp_path, backend, ttl_sec=0)
+    time.sleep(0.01)
+    assert fetcher.fetch("q") == "old"
+    assert fetcher.stats()["stale"] == 1
+
+
+def test_coalesces_inflight(tmp_path):
+    backend = _Backend(delay=0.2)
+    fetcher = _fetcher(tmp_path, backend)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetcher.fetch("same")))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["ok"] * 4
+    assert len(backend.calls) == 1
+    assert fetcher.stats()["coalesced"] == 3
+
+
+def test_stub_backend(tmp_path):
+    (tmp_path / f"{cache_key('watchdog')}.txt").write_text("stub body", encoding="utf-8")
+    fetch = stub_backend(tmp_path)
+    assert fetch("https://example.invalid/?q=watchdog&x=1", 1) == "stub body"
+    assert fetch("https://example.invalid/?q=other", 1) == ""
+
+
+def test_baku_search_ddg_uses_fetcher(tmp_path, monkeypatch):
+    html = ("<a class='result-link'>Title</a>"
+            "<td class='result-snippet'>snippet <b>text</b></td>")
+    backend = _Backend(body=html)
+    fetcher = ExternalFetcher("ddg_lite", url_for=lambda q: q, cache_dir=tmp_path,
+                              backend=backend, timeout=1)
+    monkeypatch.setattr(baku, "_ddg_fetcher", fetcher)
+    assert baku.search_ddg("量子 塩梅") == "[Title] snippet text"
+    assert baku.search_ddg("塩梅 量子") == "[Title] snippet text"
+    assert len(backend.calls) == 1
+    assert backend.calls == ["量子 塩梅"]  # 正規化はキャッシュキーだけ。上流へは呼び出し元のクエリ
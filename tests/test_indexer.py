@@ -0,0 +1,187 @@
+"""test_indexer.py - botsu/indexer.py（index_queue 変更キューと一元インデクサ）のテスト
+
+変更が index_queue に積まれて drain で search_index に反映されること、旧構成からの移行と
+drain のロック範囲を確認する。
+"""
+
+import sqlite3
+
+import pytest
+
+from botsu import fts5_delete, fts5_upsert, indexer
+from botsu.indexer import (drain, ensure_index_queue, ensure_search_index, queue_status,
+                           rebuild_index, search_layout)
+
+# 本文を FTS5 自身に持つ旧構成
+LEGACY_FTS5_CREATE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    source_type, source_id, parent_id, project, worker_id, status, content,
+    tokenize='unicode61'
+)
+"""
+
+
+def _index(conn):
+    return [
+        tuple(r) for r in conn.execute(
+            "SELECT source_type, source_id, parent_id, project, worker_id, status, content"
+            " FROM search_index ORDER BY source_type, source_id"
+        )
+    ]
+
+
+def _integrity_check(conn):
+    conn.execute("INSERT INTO search_index (search_index) VALUES ('integrity-check')")
+
+
+@pytest.fixture
+def indexed_db(seeded_db):
+    rebuild_index(seeded_db)
+    seeded_db.commit()
+    return seeded_db
+
+
+def test_rebuild_installs_queue(indexed_db):
+    conn = indexed_db
+    assert ensure_index_queue(conn) is False
+    assert queue_status(conn)["pending"] == 0
+    ids = {(r[0], r[1]) for r in _index(conn)}
+    assert ("subtask", "subtask_001") in ids
+    assert ("command", "cmd_003") in ids
+
+
+def test_changes_are_queued_then_drained(indexed_db, assert_matches_rebuild):
+    conn = indexed_db
+    conn.execute(
+        "INSERT INTO subtasks (id, parent_cmd, worker_id, project, description, status, wave)"
+        " VALUES ('subtask_005', 'cmd_002', 'ashigaru3', 'arsprout', 'watchdog設定', 'assigned', 1)"
+    )
+    for note in ("first", "second", "third"):
+        conn.execute("UPDATE subtasks SET notes = ? WHERE id = 'subtask_005'", (note,))
+    conn.execute("DELETE FROM commands WHERE id = 'cmd_003'")
+    # 索引対象外の列の更新はキューに積まない
+    conn.execute("UPDATE subtasks SET audit_status = 'done' WHERE id = 'subtask_001'")
+    conn.commit()
+
+    status = queue_status(conn)
+    assert status["pending"] == 5
+    assert status["by_type"] == {"command": 1, "subtask": 4}
+    assert ("subtask", "subtask_005") not in {(r[0], r[1]) for r in _index(conn)}
+
+    counts = drain(conn)
+    assert counts == {"queued": 5, "indexed": 1, "deleted": 1, "batches": 1}
+    assert queue_status(conn)["pending"] == 0
+    row = [r for r in _index(conn) if r[1] == "subtask_005"][0]
+    assert row[2:6] == ("cmd_002", "arsprout", "ashigaru3", "assigned")
+    assert "third" in row[6] and "second" not in row[6]
+    assert ("command", "cmd_003") not in {(r[0], r[1]) for r in _index(conn)}
+    assert_matches_rebuild(conn, _index, rebuild_index)
+
+
+def test_numeric_ids_do_not_collide_across_tables(indexed_db, assert_matches_rebuild):
+    conn = indexed_db
+    conn.execute(
+        "CREATE TABLE thread_replies (id INTEGER PRIMARY KEY, thread_id TEXT, board TEXT,"
+        " author TEXT, body TEXT, posted_at TEXT)"
+    )
+    assert ensure_index_queue(conn) is True  # 後から作られた表にもトリガを張る
+    report_id = conn.execute("SELECT id FROM reports").fetchone()[0]
+    conn.execute(
+        "INSERT INTO thread_replies (id, thread_id, board, author, body) VALUES (?, 't1', 'zatsudan', 'ashigaru1', 'レス本文')",
+        (report_id,),
+    )
+    conn.commit()
+    drain(conn)
+    conn.execute("DELETE FROM thread_replies")
+    conn.commit()
+    drain(conn)
+    assert ("report", str(report_id)) in {(r[0], r[1]) for r in _index(conn)}
+    assert not [r for r in _index(conn) if r[0] == "reply"]
+    assert_matches_rebuild(conn, _index, rebuild_index)
+
+
+def test_drain_without_search_index_discards_queue(seeded_db):
+    conn = seeded_db
+    ensure_index_queue(conn)
+    conn.execute("UPDATE commands SET status = 'done' WHERE id = 'cmd_002'")
+    conn.commit()
+    assert drain(conn)["queued"] == 1
+    assert queue_status(conn)["pending"] == 0
+
+
+def test_upsert_and_delete_are_rowid_point_operations(indexed_db):
+    conn = indexed_db
+    assert search_layout(conn) == "external"
+    rowid = conn.execute(
+        "SELECT id FROM search_docs WHERE source_type = 'subtask' AND source_id = 'subtask_001'"
+    ).fetchone()[0]
+
+    fts5_upsert(conn, "subtask", "subtask_001", "cmd_001", "shogun", "ashigaru1", "done", "zebrafish")
+    conn.commit()
+    assert [tuple(r) for r in conn.execute(
+        "SELECT rowid, source_id FROM search_index WHERE search_index MATCH 'zebrafish'"
+    )] == [(rowid, "subtask_001")]
+
+    fts5_delete(conn, "subtask", "subtask_001")
+    conn.commit()
+    assert not conn.execute("SELECT 1 FROM search_index WHERE search_index MATCH 'zebrafish'").fetchall()
+    _integrity_check(conn)
+
+    plan = " ".join(r[3] for r in conn.execute(
+        "EXPLAIN QUERY PLAN DELETE FROM search_docs WHERE source_type = 'subtask' AND source_id = 'x'"
+    ))
+    assert "USING INDEX" in plan
+
+
+def test_search_docs_check_is_cached_per_connection(indexed_db):
+    conn = indexed_db
+    statements = []
+    conn.set_trace_callback(statements.append)
+    for n in range(3):
+        fts5_upsert(conn, "command", f"cmd_9{n}", "", "shogun", "", "pending", f"word{n}")
+    conn.set_trace_callback(None)
+    assert sum("sqlite_master" in s for s in statements) <= 1
+
+
+def test_legacy_search_index_is_migrated_without_retokenizing(seeded_db):
+    conn = seeded_db
+    conn.execute(LEGACY_FTS5_CREATE)
+    conn.execute(
+        "INSERT INTO search_index (source_type, source_id, parent_id, project, worker_id, status, content)"
+        " VALUES ('subtask', 'subtask_001', 'cmd_001', 'shogun', 'ashigaru1', 'done', 'legacytoken')"
+    )
+    conn.commit()
+    assert search_layout(conn) == "legacy"
+
+    assert ensure_search_index(conn) is True
+    conn.commit()
+    assert search_layout(conn) == "external"
+    assert [tuple(r) for r in conn.execute(
+        "SELECT source_id FROM search_index WHERE search_index MATCH 'legacytoken'"
+    )] == [("subtask_001",)]
+    assert [tuple(r) for r in conn.execute("SELECT content FROM search_docs")] == [("legacytoken",)]
+    _integrity_check(conn)
+
+
+def test_drain_tokenizes_outside_the_write_lock(indexed_db, tmp_db_path, monkeypatch):
+    conn = indexed_db
+    conn.execute("UPDATE subtasks SET notes = 'stale' WHERE id = 'subtask_002'")
+    conn.commit()
+    other = sqlite3.connect(str(tmp_db_path))
+    calls = []
+
+    def tokenize(text):
+        assert not conn.in_transaction
+        if not calls:
+            # 解析中に別の接続が同じ行を書き換える（ロックを握っていないので書ける）
+            other.execute("UPDATE subtasks SET notes = 'fresh' WHERE id = 'subtask_002'")
+            other.commit()
+        calls.append(text)
+        return text
+
+    monkeypatch.setattr(indexer, "index_text", tokenize)
+    assert drain(conn, limit=1)["queued"] == 1
+    other.close()
+    row = [r for r in _index(conn) if r[1] == "subtask_002"][0]
+    assert "fresh" in row[6]  # ロック内で読み直した内容を書く
+    assert queue_status(conn)["pending"] == 1  # 解析中の更新のエントリは残る
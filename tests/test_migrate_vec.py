@@ -0,0 +1,125 @@
+"""test_migrate_vec.py - scripts/migrate_vec.py（一括ベクトル化・再開）のテスト
+
+Ruri v3 は使わず、encode 済みシャードを偽物で与える（vec_index は通常表で代用）。
+"""
+
+import pytest
+
+import migrate_vec
+from botsu.vec import VEC_META_SQL, upgrade_vec_tables, vec_key
+
+
+def _fake_encoded(docs, size):
+    for i in range(0, len(docs), size):
+        shard = docs[i:i + size]
+        yield shard, [d[5].encode("utf-8") for d in shard]
+
+
+@pytest.fixture
+def vec_db(seeded_db):
+    conn = seeded_db
+    conn.execute("CREATE TABLE vec_index (source_id TEXT, embedding BLOB)")
+    conn.execute(VEC_META_SQL)
+    conn.commit()
+    return conn
+
+
+def test_pending_docs_use_raw_text(vec_db):
+    docs, existing = migrate_vec.pending_docs(vec_db)
+    assert existing == 0
+    by_key = {(d[1], d[0]): d for d in docs}
+    assert ("subtask", "subtask_001") in by_key
+    assert ("command", "cmd_001") in by_key
+    raw = vec_db.execute("SELECT description FROM subtasks WHERE id = 'subtask_001'").fetchone()[0]
+    assert raw in by_key[("subtask", "subtask_001")][5]
+
+
+def test_vectorize_commits_in_chunks_and_resumes(vec_db):
+    conn = vec_db
+    docs, _ = migrate_vec.pending_docs(conn)
+    progress = []
+
+    def interrupted():
+        for i, item in enumerate(_fake_encoded(docs, 2)):
+            if i == 2:
+                raise KeyboardInterrupt
+            yield item
+
+    with pytest.raises(KeyboardInterrupt):
+        migrate_vec.vectorize(conn, docs, interrupted(), commit_every=3,
+                              report=lambda done, total, _t: progress.append((done, total)))
+    # 中断までに encode 済みの4件は確定している
+    assert progress == [(4, len(docs))]
+    assert conn.execute("SELECT COUNT(*) FROM vec_meta").fetchone()[0] == 4
+
+    rest, existing = migrate_vec.pending_docs(conn)
+    assert existing == 4
+    assert len(rest) == len(docs) - 4
+    assert migrate_vec.vectorize(conn, rest, _fake_encoded(rest, 2)) == len(rest)
+    assert migrate_vec.pending_docs(conn)[0] == []
+    assert conn.execute("SELECT COUNT(*) FROM vec_index").fetchone()[0] == len(docs)
+
+
+def test_failed_shard_keeps_earlier_vectors(vec_db):
+    conn = vec_db
+    docs, _ = migrate_vec.pending_docs(conn)
+
+    def failing():
+        yield docs[:2], [b"a", b"b"]
+        yield docs[2:4], None
+
+    with pytest.raises(RuntimeError):
+        migrate_vec.vectorize(conn, docs, failing(), commit_every=100)
+    assert migrate_vec.pending_docs(conn)[1] == 2
+
+
+def test_numeric_ids_do_not_collide_across_tables(vec_db):
+    conn = vec_db
+    conn.execute(
+        "INSERT INTO diary_entries (id, agent_id, date, summary, body) VALUES (1, 'ashigaru1', '2026-01-01', '日記', '本文')"
+    )
+    conn.commit()
+    docs, _ = migrate_vec.pending_docs(conn)
+    assert {("report", "1"), ("diary", "1")} <= {(d[1], d[0]) for d in docs}
+
+    migrate_vec.vectorize(conn, docs, _fake_encoded(docs, 4))
+    assert migrate_vec.pending_docs(conn) == ([], len(docs))  # 再実行で同じ id を取り合わない
+    keys = {r[0] for r in conn.execute("SELECT source_id FROM vec_index")}
+    assert {vec_key("report", "1"), vec_key("diary", "1")} <= keys
+
+
+def test_legacy_vec_tables_are_rekeyed(seeded_db):
+    conn = seeded_db
+    conn.execute("CREATE TABLE vec_index (source_id TEXT, embedding BLOB)")
+    conn.execute(
+        "CREATE TABLE vec_meta (source_id TEXT PRIMARY KEY, source_type TEXT NOT NULL, parent_id TEXT,"
+        " project TEXT, created_at TEXT, model_name TEXT, vectorized_at TEXT)"
+    )
+    conn.executemany("INSERT INTO vec_index VALUES (?, ?)", [("1", b"r"), ("cmd_001", b"c"), ("orphan", b"o")])
+    conn.executemany(
+        "INSERT INTO vec_meta (source_id, source_type, model_name) VALUES (?, ?, ?)",
+        [("1", "report", migrate_vec.MODEL_NAME), ("cmd_001", "command", migrate_vec.MODEL_NAME)],
+    )
+    assert upgrade_vec_tables(conn) is True
+    assert upgrade_vec_tables(conn) is False
+    assert dict(conn.execute("SELECT source_id, embedding FROM vec_index").fetchall()) == {
+        "report:1": b"r", "command:cmd_001": b"c",
+    }
+    docs, existing = migrate_vec.pending_docs(conn)
+    assert existing == 2
+    assert ("report", "1") not in {(d[1], d[0]) for d in docs}
+
+
+def test_created_at_comes_from_source_rows(vec_db):
+    conn = vec_db
+    docs, _ = migrate_vec.pending_docs(conn)
+    created = {(d[1], d[0]): d[4] for d in docs}
+    assert created[("command", "cmd_001")] == "2026-01-01T00:00:00+00:00"
+    assert created[("report", "1")] == "2026-01-01T00:30:00+00:00"
+    assert created[("subtask", "subtask_004")] == "2026-01-02T00:00:00+00:00"  # 未割当は親コマンド
+
+    conn.execute("INSERT INTO vec_meta (source_id, source_type, created_at) VALUES ('cmd_002', 'command', '')")
+    assert migrate_vec.backfill_created_at(conn) == 1
+    assert conn.execute(
+        "SELECT created_at FROM vec_meta WHERE source_id = 'cmd_002'"
+    ).fetchone()[0] == "2026-01-02T00:00:00+00:00"
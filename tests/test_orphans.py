@@ -0,0 +1,86 @@
+"""test_orphans.py - botsu/orphans.py（矛盾・放置検出の差分インデックス）のテスト
+
+commands / subtasks / reports の状態変化で検出対象が出入りし、索引読みと高札の全件走査が一致することを確認する。
+"""
+
+import pytest
+
+from botsu.orphans import (
+    CMD_ALL_DONE, CMD_PENDING, DONE_WITHOUT_REPORT,
+    ensure_orphan_index, read_orphans, rebuild_orphan_index,
+)
+
+
+def _ids(conn, check_type):
+    key = "cmd_id" if check_type in (CMD_ALL_DONE, CMD_PENDING) else "subtask_id"
+    return [item[key] for item in read_orphans(conn)[check_type]]
+
+
+def _orphans(conn):
+    indexed = read_orphans(conn)
+    assert read_orphans(conn, use_index=False) == indexed  # 高札の全件走査フォールバック
+    return indexed
+
+
+@pytest.fixture
+def orphan_db(derived_db):
+    return derived_db(ensure_orphan_index)
+
+
+def test_backfill(orphan_db):
+    assert ensure_orphan_index(orphan_db) is False
+    # cmd_001: subtask_001/002 とも done だが cmd は done 済み → 対象外
+    assert _ids(orphan_db, CMD_ALL_DONE) == []
+    # subtask_001 は報告あり、subtask_002 は報告なし
+    assert _ids(orphan_db, DONE_WITHOUT_REPORT) == ["subtask_002"]
+
+
+def test_cmd_all_done_follows_status(orphan_db, assert_matches_rebuild):
+    conn = orphan_db
+    conn.execute("UPDATE commands SET status = 'in_progress' WHERE id = 'cmd_001'")
+    assert _ids(conn, CMD_ALL_DONE) == ["cmd_001"]
+    assert_matches_rebuild(conn, _orphans, rebuild_orphan_index)
+
+    # 未完了の subtask が増えると外れる
+    conn.execute(
+        "INSERT INTO subtasks (id, parent_cmd, description, status, wave)"
+        " VALUES ('subtask_005', 'cmd_001', '追加', 'pending', 2)"
+    )
+    assert _ids(conn, CMD_ALL_DONE) == []
+    assert_matches_rebuild(conn, _orphans, rebuild_orphan_index)
+
+    conn.execute("UPDATE subtasks SET status = 'done' WHERE id = 'subtask_005'")
+    assert _ids(conn, CMD_ALL_DONE) == ["cmd_001"]
+    conn.execute("UPDATE commands SET status = 'done' WHERE id = 'cmd_001'")
+    assert _ids(conn, CMD_ALL_DONE) == []
+    assert_matches_rebuild(conn, _orphans, rebuild_orphan_index)
+
+
+def test_done_without_report_follows_reports(orphan_db, assert_matches_rebuild):
+    conn = orphan_db
+    conn.execute(
+        "INSERT INTO reports (worker_id, task_id, timestamp, status, summary)"
+        " VALUES ('ashigaru2', 'subtask_002', '2026-01-01T01:00:00+00:00', 'done', '報告')"
+    )
+    assert _ids(conn, DONE_WITHOUT_REPORT) == []
+    assert_matches_rebuild(conn, _orphans, rebuild_orphan_index)
+
+    conn.execute("DELETE FROM reports WHERE task_id = 'subtask_002'")
+    assert _ids(conn, DONE_WITHOUT_REPORT) == ["subtask_002"]
+
+    conn.execute("UPDATE subtasks SET status = 'done' WHERE id = 'subtask_003'")
+    assert _ids(conn, DONE_WITHOUT_REPORT) == ["subtask_002", "subtask_003"]
+    conn.execute("DELETE FROM subtasks WHERE id = 'subtask_003'")
+    assert _ids(conn, DONE_WITHOUT_REPORT) == ["subtask_002"]
+    assert_matches_rebuild(conn, _orphans, rebuild_orphan_index)
+
+
+def test_stale_checks_use_status_timestamp_indexes(orphan_db):
+    plan = " ".join(
+        r[3] for r in orphan_db.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM commands"
+            " WHERE status = 'pending' AND created_at <= datetime('now', '-7 days')"
+        )
+    )
+    assert "idx_commands_status_created" in plan
+    assert _ids(orphan_db, CMD_PENDING) == ["cmd_003"]
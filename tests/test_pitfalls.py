@@ -0,0 +1,83 @@
+"""test_pitfalls.py - botsu/pitfalls.py（失敗パターン分類インデックス）のテスト
+
+報告・subtask・パターン表の変更で pitfall_hits の分類が追従し、worker 毎の失敗履歴が引けることを確認する。
+"""
+
+import pytest
+
+from botsu.pitfalls import ensure_pitfall_index, read_pitfalls, rebuild_pitfall_index
+
+
+def _hits(conn):
+    return [tuple(r) for r in conn.execute(
+        "SELECT rule_id, subtask_id, completed_at FROM pitfall_hits ORDER BY rule_id, subtask_id"
+    )]
+
+
+def _sources(conn, worker_id=None):
+    return [(p["pattern_id"], p["source_id"]) for p in read_pitfalls(conn, worker_id)]
+
+
+@pytest.fixture
+def pitfall_db(seeded_db, derived_db):
+    seeded_db.execute(
+        "UPDATE subtasks SET description = 'マージ競合の解消' WHERE id = 'subtask_002'"
+    )
+    return derived_db(ensure_pitfall_index)
+
+
+def test_backfill_and_defaults(pitfall_db):
+    assert ensure_pitfall_index(pitfall_db) is False
+    assert pitfall_db.execute("SELECT COUNT(*) FROM pitfall_patterns").fetchone()[0] == 6
+    assert _sources(pitfall_db) == [("P003", "subtask_002")]
+
+
+def test_report_summary_classifies_subtask(pitfall_db, assert_matches_rebuild):
+    conn = pitfall_db
+    conn.execute(
+        "INSERT INTO reports (worker_id, task_id, timestamp, status, summary)"
+        " VALUES ('ashigaru1', 'subtask_001', '2026-01-01T01:00:00+00:00', 'done', '捏造を検出')"
+    )
+    assert _sources(conn) == [("P002", "subtask_001"), ("P003", "subtask_002")]
+    assert_matches_rebuild(conn, _hits, rebuild_pitfall_index)
+
+    conn.execute("DELETE FROM reports WHERE summary = '捏造を検出'")
+    assert _sources(conn) == [("P003", "subtask_002")]
+    assert_matches_rebuild(conn, _hits, rebuild_pitfall_index)
+
+
+def test_subtask_status_and_description(pitfall_db, assert_matches_rebuild):
+    conn = pitfall_db
+    # in_progress は分類対象外 → done になった時点で該当
+    conn.execute("UPDATE subtasks SET description = 'コミット漏れ対応' WHERE id = 'subtask_003'")
+    assert ("P001", "subtask_003") not in _sources(conn)
+    conn.execute(
+        "UPDATE subtasks SET status = 'done', completed_at = '2026-01-02T03:00:00+00:00'"
+        " WHERE id = 'subtask_003'"
+    )
+    assert _sources(conn)[0] == ("P001", "subtask_003")
+    assert_matches_rebuild(conn, _hits, rebuild_pitfall_index)
+
+    conn.execute("DELETE FROM subtasks WHERE id = 'subtask_003'")
+    assert _sources(conn) == [("P003", "subtask_002")]
+    assert_matches_rebuild(conn, _hits, rebuild_pitfall_index)
+
+
+def test_patterns_are_data(pitfall_db, assert_matches_rebuild):
+    conn = pitfall_db
+    conn.execute(
+        "INSERT INTO pitfall_patterns (pattern_id, like_pattern, severity, label, prevention)"
+        " VALUES ('P006', '%サブタスク1%', 'low', 'テスト', '確認')"
+    )
+    assert ("P006", "subtask_001") in _sources(conn)
+    assert_matches_rebuild(conn, _hits, rebuild_pitfall_index)
+
+    conn.execute("UPDATE pitfall_patterns SET enabled = 0 WHERE pattern_id = 'P003'")
+    assert _sources(conn) == [("P006", "subtask_001")]
+    assert_matches_rebuild(conn, _hits, rebuild_pitfall_index)
+
+
+def test_worker_failures(pitfall_db):
+    conn = pitfall_db
+    conn.execute("UPDATE subtasks SET status = 'blocked' WHERE id = 'subtask_003'")
+    assert _sources(conn, "ashigaru6") == [("P003", "subtask_002"), ("P005", "subtask_003")]
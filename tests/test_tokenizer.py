@@ -0,0 +1,58 @@
+"""test_tokenizer.py - botsu/tokenizer.py（共有MeCabキャッシュ）のテスト"""
+
+import pytest
+
+from botsu.tokenizer import Tokenizer, mecab_available
+
+pytestmark = pytest.mark.skipif(not mecab_available(), reason="MeCab未インストール")
+
+
+def test_tokenize_filters_pos():
+    tok = Tokenizer()
+    assert tok.tokenize("watchdogタイマーを実装する") == "watchdog タイマー 実装 する"
+
+
+def test_nouns_dedup_and_min_length():
+    tok = Tokenizer()
+    assert tok.nouns("タイマーとタイマーの実装") == ["タイマー", "実装"]
+
+
+def test_repeat_parse_hits_lru():
+    tok = Tokenizer()
+    tok.nouns("watchdogタイマー")
+    tok.nouns("watchdogタイマー")
+    tok.tokenize("watchdogタイマー")  # モードが違えば別キー
+    stats = tok.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["hit_ratio"] == pytest.approx(0.333, abs=0.001)
+
+
+def test_cached_nouns_are_copies():
+    tok = Tokenizer()
+    tok.nouns("watchdogタイマー").append("汚染")
+    assert tok.nouns("watchdogタイマー") == ["watchdog", "タイマー"]
+
+
+def test_lru_evicts_oldest():
+    tok = Tokenizer(maxsize=2)
+    for text in ("タイマー", "センサー", "ファームウェア"):
+        tok.tokenize(text)
+    stats = tok.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    tok.tokenize("ファームウェア")
+    assert tok.stats()["hits"] == 1
+
+
+def test_persistent_cache_survives_restart(tmp_path):
+    db = str(tmp_path / "token_cache.db")
+    first = Tokenizer(persist_db=db)
+    first.tokenize("watchdogタイマーを実装")
+    first.flush()
+
+    second = Tokenizer(persist_db=db)
+    assert second.tokenize("watchdogタイマーを実装") == "watchdog タイマー 実装"
+    stats = second.stats()
+    assert stats["persist_hits"] == 1
+    assert stats["misses"] == 0
@@ -0,0 +1,82 @@
+"""test_worker_stats.py - botsu/worker_stats.py（足軽統計ロールアップ）のテスト
+
+subtask の割当・状態変更・報告で worker 毎の件数・平均完了時間・案件内訳が追従することを確認する。
+"""
+
+import pytest
+
+from botsu.worker_stats import ensure_worker_stats, read_worker_stats, rebuild_worker_stats
+
+
+def _snapshot(conn):
+    stats = conn.execute("SELECT * FROM worker_stats ORDER BY worker_id").fetchall()
+    projects = conn.execute(
+        "SELECT * FROM worker_project_stats WHERE count > 0 ORDER BY worker_id, project"
+    ).fetchall()
+    return (
+        [tuple(round(v, 6) if isinstance(v, float) else v for v in r) for r in stats],
+        [tuple(r) for r in projects],
+    )
+
+
+@pytest.fixture
+def stats_db(derived_db):
+    return derived_db(ensure_worker_stats)
+
+
+def test_ensure_backfills_once(stats_db):
+    assert ensure_worker_stats(stats_db) is False
+    rows = {r["worker_id"]: r for r in read_worker_stats(stats_db)}
+    assert set(rows) == {"ashigaru1", "ashigaru2", "ashigaru6"}
+    assert rows["ashigaru1"]["done"] == 1
+    assert rows["ashigaru1"]["report_count"] == 1
+    assert rows["ashigaru1"]["avg_completion_hours"] == 0.5
+    assert rows["ashigaru6"]["projects"] == {"rotation-planner": 1}
+
+
+def test_insert_update_delete_match_rebuild(stats_db, assert_matches_rebuild):
+    conn = stats_db
+    conn.execute(
+        """INSERT INTO subtasks (id, parent_cmd, worker_id, project, description, status,
+           wave, needs_audit, assigned_at)
+           VALUES ('subtask_005', 'cmd_003', 'ashigaru2', 'arsprout', '追加', 'assigned',
+           1, 1, '2026-01-03T00:00:00+00:00')"""
+    )
+    assert_matches_rebuild(conn, _snapshot, rebuild_worker_stats)
+
+    conn.execute(
+        "UPDATE subtasks SET status = 'done', audit_status = 'rejected',"
+        " completed_at = '2026-01-03T06:00:00+00:00' WHERE id = 'subtask_005'"
+    )
+    assert_matches_rebuild(conn, _snapshot, rebuild_worker_stats)
+
+    # 担当替え: 旧担当から引き、新担当へ足す
+    conn.execute("UPDATE subtasks SET worker_id = 'ashigaru6' WHERE id = 'subtask_005'")
+    assert_matches_rebuild(conn, _snapshot, rebuild_worker_stats)
+    assert "arsprout" not in read_worker_stats(conn, "ashigaru2")[0]["projects"]
+
+    conn.execute("DELETE FROM subtasks WHERE id = 'subtask_005'")
+    assert_matches_rebuild(conn, _snapshot, rebuild_worker_stats)
+
+
+def test_unassigned_subtask_assignment(stats_db, assert_matches_rebuild):
+    conn = stats_db
+    conn.execute(
+        "UPDATE subtasks SET worker_id = 'ashigaru7', status = 'assigned' WHERE id = 'subtask_004'"
+    )
+    assert_matches_rebuild(conn, _snapshot, rebuild_worker_stats)
+    assert read_worker_stats(conn, "ashigaru7")[0]["total_tasks"] == 1
+
+
+def test_report_count(stats_db, assert_matches_rebuild):
+    conn = stats_db
+    conn.execute(
+        "INSERT INTO reports (worker_id, task_id, timestamp, status, summary)"
+        " VALUES ('ashigaru2', 'subtask_002', '2026-01-01T01:00:00+00:00', 'done', '報告')"
+    )
+    assert read_worker_stats(conn, "ashigaru2")[0]["report_count"] == 1
+    assert_matches_rebuild(conn, _snapshot, rebuild_worker_stats)
+
+
+def test_unknown_worker_returns_empty(stats_db):
+    assert read_worker_stats(stats_db, "ashigaru99") == []
@@ -331,6 +331,24 @@ class TestDBQueryTool:
             assert result is None
 
 
+    def test_uses_daemon_when_available(self):
+        db = DBQueryTool()
+        with patch("tools.kanjou.tools._query_daemon", return_value=(0, "subtask_100 via serve\n", "")), \
+                patch("tools.kanjou.tools.subprocess.run") as mock_run:
+            assert db.subtask_show("subtask_100") == "subtask_100 via serve"
+            mock_run.assert_not_called()
+        with patch("tools.kanjou.tools._query_daemon", return_value=(1, "", "Error: not found\n")):
+            assert db.subtask_show("subtask_100") == "Error: not found"
+
+    def test_daemon_absent_falls_back_to_cli(self, tmp_path):
+        db = DBQueryTool()
+        with patch("tools.kanjou.tools.BOTSU_SOCKET", str(tmp_path / "none.sock")), \
+                patch("tools.kanjou.tools.subprocess.run") as mock_run:
+            mock_run.return_value = MagicMock(returncode=0, stdout="cmd data\n", stderr="")
+            assert db.cmd_show("cmd_50") == "cmd data"
+            mock_run.assert_called_once()
+
+
 class TestKousatsuAPITool:
     def test_health_ok(self):
         api = KousatsuAPITool()
@@ -386,6 +404,51 @@ class TestKousatsuAPITool:
         with patch("tools.kanjou.tools.httpx.get", side_effect=httpx.TimeoutException("slow")):
             assert api.search_similar("subtask_1") is None
 
+    def test_search_similar_batch(self):
+        api = KousatsuAPITool()
+        with patch("tools.kanjou.tools.httpx.post") as mock_post:
+            mock_post.return_value = MagicMock(
+                status_code=200,
+                json=lambda: {"results": {"subtask_1": {"results": []}}, "errors": {}},
+            )
+            result = api.search_similar_batch(["subtask_1", "bad"])
+            assert "subtask_1" in result["results"]
+            assert mock_post.call_args.kwargs["json"] == {"subtask_ids": ["subtask_1"]}
+
+    def test_batch_all_invalid(self):
+        api = KousatsuAPITool()
+        assert api.search_similar_batch(["bad"]) is None
+        assert api.check_coverage_batch(["bad"]) is None
+        assert api.search_batch(["  "]) is None
+
+    def test_check_coverage_batch_timeout(self):
+        api = KousatsuAPITool()
+        with patch("tools.kanjou.tools.httpx.post", side_effect=httpx.TimeoutException("slow")):
+            assert api.check_coverage_batch(["cmd_1"]) is None
+
+    def test_conditional_get_reuses_body_on_304(self):
+        api = KousatsuAPITool(base_url="http://kousatsu.test")
+        with patch("tools.kanjou.tools.httpx.get") as mock_get:
+            mock_get.return_value = MagicMock(
+                status_code=200,
+                headers={"etag": '"abc-1"', "last-modified": "Sun, 18 Oct 2026 00:00:00 GMT"},
+                json=lambda: {"subtask_id": "subtask_1", "audit_status": "done"},
+            )
+            first = api.audit_result("subtask_1")
+            assert mock_get.call_args.kwargs["headers"] == {}
+
+            mock_get.return_value = MagicMock(status_code=304, headers={"etag": '"abc-1"'})
+            assert KousatsuAPITool(base_url="http://kousatsu.test").audit_result("subtask_1") == first
+            assert mock_get.call_args.kwargs["headers"] == {
+                "If-None-Match": '"abc-1"',
+                "If-Modified-Since": "Sun, 18 Oct 2026 00:00:00 GMT",
+            }
+
+    def test_conditional_get_invalid_ids(self):
+        api = KousatsuAPITool()
+        assert api.audit_result("bad") is None
+        assert api.enrichment("bad") is None
+
 
 class TestFileReadTool:
     def test_read_valid_file(self, tmp_path):
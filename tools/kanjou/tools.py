@@ -6,8 +6,12 @@
 """
 from __future__ import annotations
 
+import json
+import os
 import re
+import socket
 import subprocess
+from collections import OrderedDict
 from pathlib import Path
 from typing import Optional
 
@@ -17,8 +21,12 @@ import httpx
 
 BOTSUNICHIROKU_CLI = "scripts/botsunichiroku.py"
 PROJECT_ROOT = Path("/home/yasu/multi-agent-shogun")
+# botsu serve 常駐（scripts/botsu/daemon.py）のソケット。無ければ CLI を起動する
+BOTSU_SOCKET = os.environ.get("BOTSU_SOCKET", str(PROJECT_ROOT / "data" / "botsu.sock"))
 KOUSATSU_BASE = "http://localhost:8080"
 KOUSATSU_TIMEOUT = 5.0
+# 条件付きGET用に保持する応答数（URL+params 毎の ETag / Last-Modified と本文）
+KOUSATSU_VALIDATOR_CACHE_SIZE = 256
 
 # subtask_id validation: subtask_\d+
 _SUBTASK_RE = re.compile(r"^subtask_\d+$")
@@ -49,6 +57,10 @@ class DBQueryTool:
         return self._run_cli("cmd", "show", cmd_id)
 
     def _run_cli(self, *args: str) -> Optional[str]:
+        reply = _query_daemon(args)
+        if reply is not None:
+            returncode, stdout, stderr = reply
+            return stdout.strip() if returncode == 0 else stderr.strip()
         try:
             result = subprocess.run(
                 ["python3", str(PROJECT_ROOT / BOTSUNICHIROKU_CLI), *args],
@@ -62,10 +74,38 @@ class DBQueryTool:
             return None
 
 
+def _query_daemon(args: tuple[str, ...], timeout: float = 10.0) -> Optional[tuple[int, str, str]]:
+    """botsu serve に CLI 引数を送り (終了コード, stdout, stderr) を返す.
+
+    プロトコルは scripts/botsu/daemon_client.py と同じ（改行区切りJSON）.
+    常駐が無い・応答が壊れている場合は None（読み取り専用なので CLI で引き直してよい）.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(BOTSU_SOCKET)
+        sock.sendall(json.dumps({"argv": list(args)}, ensure_ascii=False).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            resp = json.loads(f.readline())
+        return resp["returncode"], resp["stdout"], resp["stderr"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    finally:
+        sock.close()
+
+
 # ---------- KousatsuAPITool ----------
 
+# (url, params) → (ETag, Last-Modified, 本文)。インスタンス間で共有（collect_info は毎回生成する）
+_validator_cache: OrderedDict[tuple, tuple[Optional[str], Optional[str], dict]] = OrderedDict()
+
+
 class KousatsuAPITool:
-    """高札API (http://localhost:8080) クライアント（読み取り専用）."""
+    """高札API (http://localhost:8080) クライアント（読み取り専用）.
+
+    GETは前回応答の ETag / Last-Modified を If-None-Match / If-Modified-Since で送り返し、
+    304 なら保持している本文を返す.
+    """
 
     def __init__(self, base_url: str = KOUSATSU_BASE, timeout: float = KOUSATSU_TIMEOUT):
         self._base_url = base_url
@@ -93,20 +133,100 @@ class KousatsuAPITool:
             return None
         return self._get("/check/coverage", params={"cmd_id": cmd_id})
 
+    def report(self, report_id: int) -> Optional[dict]:
+        return self._get(f"/reports/{report_id}")
+
+    def audit_result(self, subtask_id: str) -> Optional[dict]:
+        if not _SUBTASK_RE.match(subtask_id):
+            return None
+        return self._get(f"/audit/{subtask_id}")
+
+    def enrichment(self, cmd_id: str) -> Optional[dict]:
+        if not _CMD_RE.match(cmd_id):
+            return None
+        return self._get(f"/enrich/{cmd_id}")
+
+    def dashboard(self, section: str | None = None, cmd_id: str | None = None) -> Optional[dict]:
+        params = {k: v for k, v in (("section", section), ("cmd_id", cmd_id)) if v}
+        return self._get("/dashboard", params=params)
+
+    def search_similar_batch(self, subtask_ids: list[str]) -> Optional[dict]:
+        """複数subtaskの類似タスクを1往復で取得する（{"results": {id: ...}, "errors": {...}}）."""
+        ids = [i for i in subtask_ids if _SUBTASK_RE.match(i)]
+        if not ids:
+            return None
+        return self._post("/search/similar/batch", {"subtask_ids": ids})
+
+    def check_coverage_batch(self, cmd_ids: list[str]) -> Optional[dict]:
+        """複数cmdのカバレッジを1往復で取得する."""
+        ids = [i for i in cmd_ids if _CMD_RE.match(i)]
+        if not ids:
+            return None
+        return self._post("/check/coverage/batch", {"cmd_ids": ids})
+
+    def search_batch(self, queries: list[str]) -> Optional[dict]:
+        """複数クエリの全文検索を1往復で取得する."""
+        queries = [q for q in queries if q.strip()]
+        if not queries:
+            return None
+        return self._post("/search/batch", {"queries": queries})
+
+    def _post(self, endpoint: str, payload: dict) -> Optional[dict]:
+        try:
+            r = httpx.post(
+                f"{self._base_url}{endpoint}",
+                json=payload,
+                timeout=self._timeout,
+            )
+            if r.status_code == 200:
+                return r.json()
+            return None
+        except (httpx.ConnectError, httpx.TimeoutException, ValueError):
+            return None
+
     def _get(self, endpoint: str, params: dict | None = None) -> Optional[dict]:
+        url = f"{self._base_url}{endpoint}"
+        key = (url, tuple(sorted((params or {}).items())))
+        cached = _validator_cache.get(key)
+        headers = {}
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
         try:
             r = httpx.get(
-                f"{self._base_url}{endpoint}",
+                url,
                 params=params or {},
+                headers=headers,
                 timeout=self._timeout,
             )
+            if r.status_code == 304 and cached:
+                _validator_cache.move_to_end(key)
+                return cached[2]
             if r.status_code == 200:
-                return r.json()
+                body = r.json()
+                _remember(key, r.headers, body)
+                return body
             return None
         except (httpx.ConnectError, httpx.TimeoutException, ValueError):
             return None
 
 
+def _remember(key: tuple, headers, body: dict) -> None:
+    """検証子付きの応答を保持する（検証子が無ければ保持しない）."""
+    etag = headers.get("etag")
+    last_modified = headers.get("last-modified")
+    if not etag and not last_modified:
+        _validator_cache.pop(key, None)
+        return
+    _validator_cache[key] = (etag, last_modified, body)
+    _validator_cache.move_to_end(key)
+    while len(_validator_cache) > KOUSATSU_VALIDATOR_CACHE_SIZE:
+        _validator_cache.popitem(last=False)
+
+
 # ---------- FileReadTool ----------
 
 class FileReadTool:
@@ -2,21 +2,40 @@
 
 没日録DB（botsunichiroku.db）からテキストデータを読み取り、
 MeCabで形態素解析後、FTS5仮想テーブルに投入する。
-コンテナ起動時に毎回再構築（冪等）。
+
+既定はインクリメンタル更新（冪等）:
+  - 没日録DBのファイル状態（source_fingerprint）が前回と同じなら何もしない
+  - 各行の索引対象フィールドのダイジェストを index_rows に保持し、
+    追加・変更された行のみ分かち書きし直す（元テーブルに更新日時が無いため）。
+    消えた行は索引から削除する
+  - 1トランザクションで反映するため、高札からは更新前/後のどちらかのみが見える
+
+全件再構築（--full、索引が無い・スキーマ版数が違う場合）は
+世代番号付きの別ファイル（search_index.g<N>.db）に構築し、INDEX_DB へ rename で差し替える。
+高札（db_pool.py）はファイルの差し替えを検出して読み取り接続を開き直す。
 """
 
+import argparse
+import hashlib
 import os
 import sqlite3
 import sys
+from pathlib import Path
 
-import MeCab
+# 共有トークナイザ・索引対象定義（scripts/botsu/tokenizer.py, index_sources.py）。
+# コンテナでは docker-compose で /app/ 直下にマウントされる。
+try:
+    import index_sources as _sources
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts" / "botsu"))
+    import index_sources as _sources
 
 
 SOURCE_DB = os.environ.get("BOTSUNICHIROKU_DB", "/data/botsunichiroku.db")
 INDEX_DB = os.environ.get("INDEX_DB", "/data/search_index.db")
 
-# MeCab品詞フィルタ: 名詞・動詞・形容詞のみ抽出
-ALLOWED_POS = {"名詞", "動詞", "形容詞"}
+# index_rows / index_meta の形式を変えたら上げる（不一致なら全件再構築）
+SCHEMA_VERSION = "1"
 
 # ★ FTS5スキーマ契約（部屋子2号の main.py と共有）
 FTS5_CREATE = """
@@ -31,153 +50,257 @@ CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
 );
 """
 
+# 語彙統計ビュー（GET /search?count=estimate 用）。実データは持たず search_index を参照する。
+FTS5_VOCAB_CREATE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_vocab USING fts5vocab(search_index, row);
+"""
 
-def create_tagger() -> MeCab.Tagger:
-    """MeCab Taggerを生成する。"""
-    return MeCab.Tagger()
+# 差分更新用の管理表。rid は search_index の rowid（FTS5 を列条件で消すと全件走査になるため）
+INDEX_ROWS_CREATE = """
+CREATE TABLE IF NOT EXISTS index_rows (
+    source_type TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    rid INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (source_type, source_id)
+) WITHOUT ROWID;
+"""
 
+INDEX_META_CREATE = """
+CREATE TABLE IF NOT EXISTS index_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_INSERT_SQL = (
+    "INSERT INTO search_index"
+    " (rowid, source_type, source_id, parent_id, project, worker_id, status, content)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
 
-def tokenize(tagger: MeCab.Tagger, text: str) -> str:
+
+def tokenize(text: str) -> str:
     """テキストをMeCabで分かち書きし、名詞・動詞・形容詞のみ抽出する。
 
+    没日録DB内 search_index と同じ規則（共有トークナイザのキャッシュ経由、抽出ゼロ時は原文）。
+
     Returns:
         スペース区切りの分かち書き文字列
     """
-    if not text:
-        return ""
-    tokens = []
-    node = tagger.parseToNode(text)
-    while node:
-        features = node.feature.split(",")
-        if features[0] in ALLOWED_POS:
-            surface = node.surface.strip()
-            if surface:
-                tokens.append(surface)
-        node = node.next
-    return " ".join(tokens)
-
-
-def safe_str(value) -> str:
-    """NoneやNULL値を空文字列に変換する。"""
-    if value is None:
-        return ""
-    return str(value)
-
-
-def build_index() -> None:
-    """没日録DBからFTS5インデックスを構築する。"""
+    return _sources.index_text(text)
 
-    # 没日録DB存在チェック
-    if not os.path.exists(SOURCE_DB):
-        print(f"ERROR: 没日録DB が見つかりません: {SOURCE_DB}", file=sys.stderr)
-        sys.exit(1)
 
-    tagger = create_tagger()
+# --- 索引対象 ---
+# 行の読み方・本文の組み立ては没日録DB内 search_index と共通（index_sources.SOURCES）。
+# 高札の索引は diary / reply を含めない
+INDEX_TYPES = ("command", "subtask", "report", "dashboard")
 
-    # 没日録DB（読み取り専用）
-    src = sqlite3.connect(f"file:{SOURCE_DB}?mode=ro", uri=True)
-    src.row_factory = sqlite3.Row
+# (source_type, 元テーブル, SELECT文, 行 → (source_id, parent_id, project, worker_id, status, 本文))
+SOURCES = [
+    (s.source_type, s.table, _sources.select_sql(s, rowid=True),
+     lambda r, s=s: _sources.row_fields(s, r))
+    for s in _sources.SOURCES if s.source_type in INDEX_TYPES
+]
 
-    # 検索インデックスDB（毎回再構築）
-    if os.path.exists(INDEX_DB):
-        os.remove(INDEX_DB)
-    idx = sqlite3.connect(INDEX_DB)
-    idx.execute(FTS5_CREATE)
-
-    counts = {"command": 0, "subtask": 0, "report": 0, "dashboard": 0}
-
-    # --- commands ---
-    for row in src.execute("SELECT id, command, project, status, details FROM commands"):
-        raw_text = " ".join(filter(None, [safe_str(row["command"]), safe_str(row["details"])]))
-        content = tokenize(tagger, raw_text)
-        idx.execute(
-            "INSERT INTO search_index (source_type, source_id, parent_id, project, worker_id, status, content) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?)",
-            ("command", row["id"], "", safe_str(row["project"]), "", safe_str(row["status"]), content),
-        )
-        counts["command"] += 1
-
-    # --- subtasks ---
-    for row in src.execute(
-        "SELECT id, parent_cmd, worker_id, project, description, status, notes FROM subtasks"
-    ):
-        raw_text = " ".join(
-            filter(None, [safe_str(row["description"]), safe_str(row["notes"])])
-        )
-        content = tokenize(tagger, raw_text)
-        idx.execute(
-            "INSERT INTO search_index (source_type, source_id, parent_id, project, worker_id, status, content) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (
-                "subtask",
-                row["id"],
-                safe_str(row["parent_cmd"]),
-                safe_str(row["project"]),
-                safe_str(row["worker_id"]),
-                safe_str(row["status"]),
-                content,
-            ),
-        )
-        counts["subtask"] += 1
-
-    # --- reports ---
-    for row in src.execute(
-        "SELECT id, worker_id, task_id, status, summary, findings, notes FROM reports"
-    ):
-        raw_text = " ".join(
-            filter(None, [safe_str(row["summary"]), safe_str(row["findings"]), safe_str(row["notes"])])
-        )
-        content = tokenize(tagger, raw_text)
-        idx.execute(
-            "INSERT INTO search_index (source_type, source_id, parent_id, project, worker_id, status, content) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (
-                "report",
-                str(row["id"]),
-                safe_str(row["task_id"]),
-                "",
-                safe_str(row["worker_id"]),
-                safe_str(row["status"]),
-                content,
-            ),
-        )
-        counts["report"] += 1
 
-    # --- dashboard_entries ---
+def _digest(fields: tuple) -> str:
+    return hashlib.sha1("\x1f".join(fields).encode("utf-8")).hexdigest()
+
+
+def _read_source(src: sqlite3.Connection, sql: str) -> list:
     # テーブル存在チェック付き（古いDBでもクラッシュしない）
     try:
-        dashboard_rows = src.execute(
-            "SELECT id, cmd_id, section, content, status, tags FROM dashboard_entries"
-        ).fetchall()
+        return src.execute(sql).fetchall()
     except sqlite3.OperationalError:
-        dashboard_rows = []
-
-    for row in dashboard_rows:
-        content = tokenize(tagger, safe_str(row["content"]))
-        idx.execute(
-            "INSERT INTO search_index (source_type, source_id, parent_id, project, worker_id, status, content) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (
-                "dashboard",
-                str(row["id"]),
-                safe_str(row["cmd_id"]),   # parent_id = cmd_id
-                "",                         # project = ""
-                safe_str(row["tags"]),      # worker_id フィールドにtagsを格納
-                safe_str(row["status"]),
-                content,
-            ),
+        return []
+
+
+def source_fingerprint(path: str) -> str:
+    """没日録DBの状態スタンプ。前回と同じなら差分なしとみなす。
+
+    本体は mtime_ns+size（チェックポイントで更新される）。-wal は読み取り専用接続でも
+    空ファイルが作り直されて mtime が変わるため、size とヘッダ（リセット毎に salt が変わる）で見る。
+    """
+    try:
+        st = os.stat(path)
+        parts = [f"{st.st_mtime_ns}:{st.st_size}"]
+    except OSError:
+        parts = ["-"]
+    try:
+        with open(path + "-wal", "rb") as f:
+            header = f.read(32)
+            parts.append(f"{f.seek(0, os.SEEK_END)}:{header.hex()}")
+    except OSError:
+        parts.append("0:")  # -wal 無し = 空の -wal と同じ扱い
+    return "|".join(parts)
+
+
+def _read_meta(path: str) -> dict[str, str]:
+    """既存索引の index_meta を返す。索引が無い・旧形式なら空。"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return dict(conn.execute("SELECT key, value FROM index_meta"))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return {}
+
+
+def _create_schema(idx: sqlite3.Connection) -> None:
+    for sql in (FTS5_CREATE, FTS5_VOCAB_CREATE, INDEX_ROWS_CREATE, INDEX_META_CREATE):
+        idx.execute(sql)
+
+
+def _apply(idx: sqlite3.Connection, src: sqlite3.Connection, meta: dict[str, str]) -> dict:
+    """全索引対象を走査し、ダイジェストが変わった行のみ分かち書きして反映する。
+
+    Returns:
+        source_type → {"total", "new", "updated", "deleted"}
+    """
+    next_rid = (idx.execute("SELECT MAX(rid) FROM index_rows").fetchone()[0] or 0) + 1
+    counts = {}
+    for source_type, table, sql, extract in SOURCES:
+        watermark = int(meta.get(f"watermark:{table}", "0"))
+        known = {
+            sid: (rid, digest) for sid, rid, digest in idx.execute(
+                "SELECT source_id, rid, digest FROM index_rows WHERE source_type = ?",
+                (source_type,),
+            )
+        }
+        c = {"total": 0, "new": 0, "updated": 0, "deleted": 0}
+        inserts, rows, stale = [], [], []
+        max_rowid = watermark
+        for row in _read_source(src, sql):
+            source_id, parent_id, project, worker_id, status, raw_text = extract(row)
+            c["total"] += 1
+            max_rowid = max(max_rowid, row["_rowid"])
+            digest = _digest((parent_id, project, worker_id, status, raw_text))
+            prev = known.pop(source_id, None)
+            if prev is not None:
+                if prev[1] == digest:
+                    continue
+                stale.append(prev[0])
+                c["updated"] += 1
+            else:
+                c["new" if row["_rowid"] > watermark else "updated"] += 1
+            inserts.append((next_rid, source_type, source_id, parent_id, project, worker_id,
+                            status, tokenize(raw_text)))
+            rows.append((source_type, source_id, next_rid, digest))
+            next_rid += 1
+
+        # 走査に現れなかった既知行は元テーブルから消えたもの
+        stale.extend(rid for rid, _ in known.values())
+        c["deleted"] = len(known)
+        idx.executemany("DELETE FROM search_index WHERE rowid = ?", [(rid,) for rid in stale])
+        idx.executemany(
+            "DELETE FROM index_rows WHERE source_type = ? AND source_id = ?",
+            [(source_type, sid) for sid in known],
         )
-        counts["dashboard"] += 1
+        idx.executemany(_INSERT_SQL, inserts)
+        idx.executemany(
+            "INSERT OR REPLACE INTO index_rows (source_type, source_id, rid, digest)"
+            " VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        meta[f"watermark:{table}"] = str(max_rowid)
+        counts[source_type] = c
+    return counts
+
 
-    idx.commit()
+def _write_meta(idx: sqlite3.Connection, meta: dict[str, str]) -> None:
+    idx.executemany(
+        "INSERT OR REPLACE INTO index_meta (key, value) VALUES (?, ?)", meta.items()
+    )
+
+
+def build_full(src: sqlite3.Connection, meta: dict[str, str]) -> dict:
+    """世代番号付きファイルに全件構築し、INDEX_DB へ原子的に差し替える。"""
+    generation = int(meta.get("generation", "0")) + 1
+    index_path = Path(INDEX_DB)
+    build_path = index_path.with_name(f"{index_path.stem}.g{generation}{index_path.suffix}")
+    build_path.unlink(missing_ok=True)  # 中断された前回の残骸
+
+    idx = sqlite3.connect(str(build_path))
+    try:
+        _create_schema(idx)
+        new_meta = {"schema_version": SCHEMA_VERSION, "generation": str(generation),
+                    "source_fingerprint": source_fingerprint(SOURCE_DB)}
+        counts = _apply(idx, src, new_meta)
+        _write_meta(idx, new_meta)
+        idx.commit()
+        idx.execute("INSERT INTO search_index(search_index) VALUES ('optimize')")
+        idx.commit()
+    except BaseException:
+        idx.close()
+        build_path.unlink(missing_ok=True)
+        raise
     idx.close()
-    src.close()
+    os.replace(build_path, index_path)
+    return counts
+
 
+def build_incremental(src: sqlite3.Connection, meta: dict[str, str]) -> dict | None:
+    """既存の INDEX_DB に差分を反映する。没日録DBに変化が無ければ None。"""
+    fingerprint = source_fingerprint(SOURCE_DB)
+    if meta.get("source_fingerprint") == fingerprint:
+        return None
+    idx = sqlite3.connect(INDEX_DB)
+    try:
+        meta["source_fingerprint"] = fingerprint
+        counts = _apply(idx, src, meta)
+        _write_meta(idx, meta)
+        idx.commit()
+    finally:
+        idx.close()
+    return counts
+
+
+def build_index(full: bool = False) -> None:
+    """没日録DBからFTS5インデックスを構築・更新する。"""
+
+    # 没日録DB存在チェック
+    if not os.path.exists(SOURCE_DB):
+        print(f"ERROR: 没日録DB が見つかりません: {SOURCE_DB}", file=sys.stderr)
+        sys.exit(1)
+
+    # 没日録DB（読み取り専用）
+    src = sqlite3.connect(f"file:{SOURCE_DB}?mode=ro", uri=True)
+    src.row_factory = sqlite3.Row
+
+    meta = _read_meta(INDEX_DB)
+    try:
+        if full or meta.get("schema_version") != SCHEMA_VERSION:
+            counts = build_full(src, meta)
+            mode = f"full rebuild (generation {int(meta.get('generation', '0')) + 1})"
+        else:
+            counts = build_incremental(src, meta)
+            mode = "incremental"
+    finally:
+        src.close()
+
+    if counts is None:
+        print("Index up to date (botsunichiroku.db unchanged)")
+        return
     print(
-        f"Indexed: {counts['command']} commands, {counts['subtask']} subtasks, "
-        f"{counts['report']} reports, {counts['dashboard']} dashboard entries"
+        f"Indexed: {counts['command']['total']} commands, {counts['subtask']['total']} subtasks, "
+        f"{counts['report']['total']} reports, {counts['dashboard']['total']} dashboard entries"
     )
+    changed = {k: sum(c[k] for c in counts.values()) for k in ("new", "updated", "deleted")}
+    print(f"  {mode}: {changed['new']} new, {changed['updated']} updated, "
+          f"{changed['deleted']} deleted")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="没日録FTS5インデックスビルダー")
+    parser.add_argument("--full", action="store_true",
+                        help="全件再構築（新しい世代のファイルに構築して差し替える）")
+    args = parser.parse_args()
+    build_index(full=args.full)
 
 
 if __name__ == "__main__":
-    build_index()
+    main()
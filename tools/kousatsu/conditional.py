@@ -0,0 +1,186 @@
+"""conditional.py — 読み取り系エンドポイントの条件付き応答（ETag / Last-Modified → 304）
+
+kanjou・ダッシュボード・baku は /dashboard, /reports/{id}, /audit/{subtask_id},
+/enrich/{cmd_id}, /docs/... を内容が変わっていなくても繰り返し取得する。
+本モジュールは SQL・ファイル読み出しの前に検証子を作り、
+If-None-Match / If-Modified-Since が一致すれば 304 で即答できるようにする。
+
+  - 没日録DB : DBVersion が専用接続の PRAGMA data_version を見て、他接続のコミットを
+               検出した時だけ資源毎の版数（resource_versions 表。scripts/botsu/resource_versions.py
+               のトリガ維持）を読み直す（RecentCommands と同じ検出方式）。
+               ETag = プロセス毎の乱数 + 資源名 + 版数（再起動・DB差し替え後の取り違えを防ぐ）。
+               Last-Modified = その資源の最終変更時刻（トリガが記録）
+  - enrich   : enrich結果キャッシュ専用DBの DBVersion（資源指定なし = DB全体の世代）
+  - docs     : ファイルの (st_ino, st_mtime_ns, st_size) と mtime（docs_cache.FileStat）
+
+index_queue・派生インデックス・enrich結果キャッシュへの書き込みでは資源の版数は変わらない。
+resource_versions が無いDB（読み取り専用で作成できない等）ではDB全体の世代に戻る
+（どの行への書き込みでも検証子が変わる。取りこぼしは無く、余分な 200 があるだけ）。
+"""
+
+import email.utils
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Callable, NamedTuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# 共有キャッシュ・ブラウザにも毎回の再検証を求める（検証子が一致すれば 304 のみ）
+CACHE_CONTROL = "no-cache"
+
+
+class Validator(NamedTuple):
+    etag: str                # 引用符付きの強いETag
+    last_modified: float     # UNIX秒
+
+    def headers(self) -> dict[str, str]:
+        return {
+            "ETag": self.etag,
+            "Last-Modified": email.utils.formatdate(self.last_modified, usegmt=True),
+            "Cache-Control": CACHE_CONTROL,
+        }
+
+    def variant(self, name: str) -> "Validator":
+        """同じURLの別表現（NDJSON等）用に ETag を区別した検証子を返す。"""
+        if not name:
+            return self
+        return self._replace(etag=f'{self.etag[:-1]}-{name}"')
+
+
+class DBVersion:
+    """DBの世代番号と資源毎の版数。専用の読み取り専用接続の PRAGMA data_version で変化を検出する。
+
+    connect: 専用接続を開く関数（ReadOnlyPool.open_stream）
+    identity: DBファイルの同一性（ReadOnlyPool.generation）。変われば接続を開き直す
+    read_resources: 専用接続から {資源名: (version, changed_at)} を読む関数
+                    （resource_versions.read_resource_versions）。None なら資源毎の版数を持たない
+    """
+
+    def __init__(self, db_path: str, connect: Callable[[], sqlite3.Connection],
+                 identity: Callable[[], tuple[int, int] | None],
+                 read_resources: Callable[[sqlite3.Connection],
+                                          dict[str, tuple[int, float]]] | None = None) -> None:
+        self.db_path = db_path
+        self._connect = connect
+        self._identity = identity
+        self._read_resources = read_resources
+        self._resources: dict[str, tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._conn_identity: tuple[int, int] | None = None
+        self._data_version: int | None = None
+        self._nonce = secrets.token_hex(4)
+        self._generation = 0
+        self._changed_at = 0.0
+        self._checks = 0
+
+    def _initial_mtime(self) -> float:
+        mtimes = []
+        for suffix in ("", "-wal"):
+            try:
+                mtimes.append(os.stat(self.db_path + suffix).st_mtime)
+            except OSError:
+                pass
+        return max(mtimes, default=time.time())
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+        self._conn = None
+        self._data_version = None
+        self._resources = {}
+        # 開き直した先が別ファイルなら資源の版数は振り直されている。旧ETagと一致させない
+        self._nonce = secrets.token_hex(4)
+
+    def _reload_resources(self) -> None:
+        if self._read_resources is None:
+            return
+        try:
+            self._resources = self._read_resources(self._conn)
+        except sqlite3.OperationalError:
+            self._resources = {}  # resource_versions 未作成（DB全体の世代を使う）
+
+    def validator(self, resource: str | None = None) -> Validator | None:
+        """resource（省略時はDB全体）の現在の検証子。DBが無い・開けない場合は None。"""
+        identity = self._identity()
+        if identity is None:
+            return None
+        with self._lock:
+            self._checks += 1
+            try:
+                if self._conn is not None and self._conn_identity != identity:
+                    self._close()
+                if self._conn is None:
+                    self._conn = self._connect()
+                    self._conn_identity = identity
+                version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            except sqlite3.Error:
+                self._close()
+                return None
+            if self._data_version is None:
+                # 起動直後・DB差し替え後は過去の更新時刻を知らないためファイルの mtime を使う
+                self._generation += 1
+                self._changed_at = self._initial_mtime()
+                self._reload_resources()
+            elif version != self._data_version:
+                self._generation += 1
+                self._changed_at = time.time()
+                self._reload_resources()
+            self._data_version = version
+            if resource in self._resources:
+                resource_version, changed_at = self._resources[resource]
+                return Validator(f'"{self._nonce}-{resource}.{resource_version}"',
+                                 changed_at or self._changed_at)
+            return Validator(f'"{self._nonce}-{self._generation}"', self._changed_at)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "generation": self._generation,
+                "checks": self._checks,
+                "resources": {name: v for name, (v, _at) in self._resources.items()},
+            }
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match の比較（RFC 9110: 弱い比較。W/ 接頭辞は無視）。"""
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, validator: Validator) -> bool:
+    """リクエストの検証子が現在の検証子と一致するか。If-None-Match があれば If-Modified-Since は見ない。"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, validator.etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP日付は秒精度
+        return int(validator.last_modified) <= since
+    return False
+
+
+def not_modified_response(validator: Validator) -> Response:
+    return Response(status_code=304, headers=validator.headers())
@@ -0,0 +1,163 @@
+"""db_pool.py — 高札用 読み取り専用SQLite接続プール
+
+FastAPIの同期エンドポイントはワーカースレッド群で実行される。
+ワーカースレッド毎に1本の読み取り専用接続を保持し、リクエスト間で使い回す。
+接続を閉じないことで以下を維持する:
+  - SQLiteページキャッシュ（cache_size）と mmap 領域
+  - sqlite3 モジュールのプリペアドステートメントキャッシュ（cached_statements）
+
+sqlite3.Connection はスレッド間共有不可のため、ロックではなく threading.local で分離する。
+（接続は check_same_thread=False で開くが、使うのは開いたスレッドだけ。別スレッドから触るのは
+シャットダウン時の close_all() のみ）
+
+DBファイルが rename で差し替えられた場合（build_index.py の全件再構築）、開いたままの接続は
+旧ファイルを読み続ける。get() は GENERATION_CHECK_SEC 毎にファイルの (st_dev, st_ino) を確認し、
+接続を開いた時と異なれば開き直す。
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import metrics
+
+# --- チューニング（環境変数で上書き可） ---
+MMAP_SIZE = int(os.environ.get("KOUSATSU_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_SIZE_KIB = int(os.environ.get("KOUSATSU_CACHE_SIZE_KIB", "65536"))
+STATEMENT_CACHE = int(os.environ.get("KOUSATSU_STATEMENT_CACHE", "256"))
+GENERATION_CHECK_SEC = float(os.environ.get("KOUSATSU_GENERATION_CHECK_SEC", "1.0"))
+
+
+class ReadOnlyPool:
+    """1つのDBファイルに対するスレッド毎の読み取り専用接続プール。"""
+
+    def __init__(self, db_path: str, name: str) -> None:
+        self.db_path = db_path
+        self.name = name
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conns: set[sqlite3.Connection] = set()
+        self._opened = 0
+        self._reused = 0
+        self._discarded = 0
+        self._streams = 0
+        self._reopened = 0
+        # DBファイルの世代（(st_dev, st_ino)）。GENERATION_CHECK_SEC 毎に stat で確認する
+        self._generation: tuple[int, int] | None = None
+        self._checked_at = float("-inf")
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        uri = f"file:{self.db_path}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, cached_statements=STATEMENT_CACHE,
+                               check_same_thread=check_same_thread,
+                               **metrics.connect_kwargs())
+        metrics.attach(conn, self.name)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+        conn.execute("PRAGMA query_only=1")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _open(self) -> sqlite3.Connection:
+        # close_all() がシャットダウン用スレッドから閉じられるよう check_same_thread=False
+        conn = self._connect(check_same_thread=False)
+        with self._lock:
+            self._conns.add(conn)
+            self._opened += 1
+        return conn
+
+    def open_stream(self) -> sqlite3.Connection:
+        """ストリーミング応答用の専用接続を開く（プール外、呼び出し元で close() すること）。
+
+        StreamingResponse の反復は1行毎に別スレッドで実行されうるため、
+        スレッド毎のプール接続は使えない。反復は逐次なので check_same_thread=False で足りる。
+        """
+        conn = self._connect(check_same_thread=False)
+        with self._lock:
+            self._streams += 1
+        return conn
+
+    def exists(self) -> bool:
+        return Path(self.db_path).exists()
+
+    def generation(self) -> tuple[int, int] | None:
+        """DBファイルの世代。直近 GENERATION_CHECK_SEC 秒以内に確認済みならその値を返す。"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < GENERATION_CHECK_SEC:
+                return self._generation
+        try:
+            st = os.stat(self.db_path)
+            generation = (st.st_dev, st.st_ino)
+        except OSError:
+            generation = None
+        with self._lock:
+            self._generation = generation
+            self._checked_at = now
+        return generation
+
+    def get(self) -> sqlite3.Connection:
+        """現スレッドの接続を返す。未接続（またはDBファイル差し替え後）なら開く。
+
+        呼び出し元で close() しないこと。
+        """
+        generation = self.generation()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.generation != generation:
+            self.discard()
+            conn = None
+            with self._lock:
+                self._reopened += 1
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            self._local.generation = generation
+        else:
+            with self._lock:
+                self._reused += 1
+        return conn
+
+    def discard(self) -> None:
+        """現スレッドの接続を破棄する（DB差し替え・接続異常時）。次回 get() で再接続。"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            self._conns.discard(conn)
+            self._discarded += 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self) -> None:
+        """全スレッドの接続を閉じる（シャットダウン用。リクエスト処理の終了後に呼ぶこと）。"""
+        with self._lock:
+            conns = list(self._conns)
+            self._conns.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "db_path": self.db_path,
+                "live_connections": len(self._conns),
+                "opened": self._opened,
+                "reused": self._reused,
+                "discarded": self._discarded,
+                "streams": self._streams,
+                "generation": list(self._generation) if self._generation else None,
+                "reopened_on_swap": self._reopened,
+                "mmap_size": MMAP_SIZE,
+                "cache_size_kib": CACHE_SIZE_KIB,
+                "statement_cache": STATEMENT_CACHE,
+            }
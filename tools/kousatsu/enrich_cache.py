@@ -0,0 +1,200 @@
+"""enrich_cache.py — POST /enrich 結果のバージョン付きキャッシュ
+
+enrich結果キャッシュ専用DB（既定: 没日録DBと同じディレクトリの enrich_cache.db）の
+enrich_cache テーブルに cmd_id 毎1行で保存する。
+各行は以下の組で有効性を判定する:
+  - request_hash : text/project/worker_id/include_external のハッシュ
+  - data_version : enrichが参照するデータの版数スタンプ（data_version() 参照）
+  - stored_at    : 保存時刻（TTL判定用、UNIX秒）
+
+旧実装は dashboard_entries に section='enrich_cache' 行を追記し続けていた。
+没日録DB内に置くと高札自身の保存で没日録DBの data_version が進み、没日録DBから作る
+ETag（conditional.py）を無効化してしまうため別ファイルにしている。
+没日録DBに残った旧キャッシュ（表・dashboard_entries 行）は drop_legacy() で消す。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# --- チューニング（環境変数で上書き可） ---
+TTL_SEC = int(os.environ.get("KOUSATSU_ENRICH_CACHE_TTL_SEC", "3600"))
+MAX_ROWS = int(os.environ.get("KOUSATSU_ENRICH_CACHE_MAX_ROWS", "2000"))
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS enrich_cache (
+        cmd_id TEXT PRIMARY KEY,
+        request_hash TEXT NOT NULL,
+        data_version TEXT NOT NULL,
+        content TEXT NOT NULL,              -- JSON（internal/pitfalls/... 一式）
+        enriched_at TEXT NOT NULL,
+        stored_at REAL NOT NULL             -- UNIX秒（TTL・サイズ追い出し用）
+    )
+"""
+INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_enrich_cache_stored_at ON enrich_cache(stored_at)"
+
+# data_version を構成する資源（resource_versions.py のトリガが没日録DB内で数える変更回数）。
+# 内部検索（commands/subtasks/reports）・pitfalls・positive_patterns・判断予測が読む表
+VERSIONED_RESOURCES = ("commands", "subtasks", "reports", "audit",
+                       "pitfall_patterns", "pitfall_hits", "approved_work")
+
+
+def request_hash(text: str, project: str | None, worker_id: str | None,
+                 include_external: bool) -> str:
+    key = json.dumps([text, project or "", worker_id or "", bool(include_external)],
+                     ensure_ascii=False)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def data_version(bot_conn: sqlite3.Connection, index_db: str) -> str | None:
+    """enrich結果が依存するデータの版数スタンプを返す。
+
+    - search_index.db: ファイルの mtime_ns + size（build_index.py による再構築を検出）
+    - 没日録DB: VERSIONED_RESOURCES の版数（resource_versions 表。INSERT だけでなく
+      status / audit_status / completed_at 等の UPDATE、パターン・承認済み作業の変更も数える）
+
+    resource_versions が無い（読み取り専用で作成できない）場合は None（キャッシュしない）。
+    版数行の無い資源は 0 とする。派生表（pitfall_* / approved_work）は作成時に基表から
+    バックフィルされ内容が変わらないため、作成前後で同じスタンプになる。
+    """
+    try:
+        versions = dict(bot_conn.execute(
+            "SELECT resource, version FROM resource_versions WHERE resource IN ({})".format(
+                ", ".join("?" * len(VERSIONED_RESOURCES))),
+            VERSIONED_RESOURCES,
+        ).fetchall())
+    except sqlite3.OperationalError:
+        return None
+    parts = []
+    try:
+        st = Path(index_db).stat()
+        parts.append(f"idx:{st.st_mtime_ns}:{st.st_size}")
+    except OSError:
+        parts.append("idx:-")
+    parts.extend(f"{name}:{versions.get(name, 0)}" for name in VERSIONED_RESOURCES)
+    return "|".join(parts)
+
+
+class EnrichCache:
+    """enrich_cache テーブルの読み書きとヒット率カウンタ。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._evicted = 0
+        self._schema_ready = False
+
+    def _count(self, attr: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + n)
+
+    def ensure_schema(self, rw_conn: sqlite3.Connection) -> None:
+        """キャッシュDBに enrich_cache を作成する（WAL: 保存中も読み取り専用接続から読める）。"""
+        if self._schema_ready:
+            return
+        rw_conn.execute("PRAGMA journal_mode=WAL")
+        rw_conn.execute(SCHEMA_SQL)
+        rw_conn.execute(INDEX_SQL)
+        rw_conn.commit()
+        self._schema_ready = True
+
+    def get(self, conn: sqlite3.Connection | None, cmd_id: str) -> sqlite3.Row | None:
+        """cmd_id のキャッシュ行を有効性に関係なく返す（GET /enrich/{cmd_id} 用）。"""
+        if conn is None:
+            return None
+        try:
+            return conn.execute(
+                "SELECT content, enriched_at, data_version, stored_at"
+                " FROM enrich_cache WHERE cmd_id = ?",
+                (cmd_id,),
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+
+    def lookup(self, conn: sqlite3.Connection | None, cmd_id: str,
+               req_hash: str, version: str) -> sqlite3.Row | None:
+        """リクエスト・版数・TTLが全て一致する場合のみキャッシュ行を返す。"""
+        row = None
+        if conn is not None:  # None = キャッシュDB未作成
+            try:
+                row = conn.execute(
+                    "SELECT content, enriched_at, request_hash, data_version, stored_at"
+                    " FROM enrich_cache WHERE cmd_id = ?",
+                    (cmd_id,),
+                ).fetchone()
+            except sqlite3.OperationalError:
+                pass  # テーブル未作成 = 未キャッシュ
+        if row is None:
+            self._count("_misses")
+            return None
+        if (row["request_hash"] != req_hash
+                or row["data_version"] != version
+                or time.time() - row["stored_at"] > TTL_SEC):
+            self._count("_stale")
+            return None
+        self._count("_hits")
+        return row
+
+    def store(self, rw_conn: sqlite3.Connection, cmd_id: str, req_hash: str,
+              version: str, content: dict, enriched_at: str) -> None:
+        """キャッシュを上書き保存し、TTL超過行とMAX_ROWS超過分を追い出す。"""
+        self.ensure_schema(rw_conn)
+        now = time.time()
+        rw_conn.execute(
+            "INSERT OR REPLACE INTO enrich_cache"
+            " (cmd_id, request_hash, data_version, content, enriched_at, stored_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (cmd_id, req_hash, version,
+             json.dumps(content, ensure_ascii=False), enriched_at, now),
+        )
+        evicted = rw_conn.execute(
+            "DELETE FROM enrich_cache WHERE stored_at < ?", (now - TTL_SEC,)
+        ).rowcount
+        evicted += rw_conn.execute(
+            "DELETE FROM enrich_cache WHERE cmd_id IN ("
+            " SELECT cmd_id FROM enrich_cache ORDER BY stored_at DESC"
+            " LIMIT -1 OFFSET ?)",
+            (MAX_ROWS,),
+        ).rowcount
+        rw_conn.commit()
+        if evicted:
+            self._count("_evicted", evicted)
+
+    @staticmethod
+    def drop_legacy(bot_rw_conn: sqlite3.Connection) -> bool:
+        """没日録DBに残った旧キャッシュ（enrich_cache 表・dashboard_entries の行）を消す。
+
+        消すものがあった場合 True（呼び出し元で bot_rw_conn.commit() が必要）。
+        """
+        dropped = False
+        if bot_rw_conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='enrich_cache'"
+        ).fetchone():
+            bot_rw_conn.execute("DROP TABLE enrich_cache")
+            dropped = True
+        try:
+            dropped |= bot_rw_conn.execute(
+                "DELETE FROM dashboard_entries WHERE section = 'enrich_cache'"
+            ).rowcount > 0
+        except sqlite3.OperationalError:
+            pass
+        return dropped
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses + self._stale
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "stale": self._stale,
+                "evicted": self._evicted,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else 0.0,
+                "ttl_sec": TTL_SEC,
+                "max_rows": MAX_ROWS,
+            }
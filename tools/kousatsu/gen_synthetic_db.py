@@ -0,0 +1,369 @@
+"""合成 没日録DB ジェネレータ（高札の負荷試験用）
+
+scripts/init_db.py と同じスキーマの botsunichiroku.db を、指定した subtask 件数
+（10k / 100k / 1M 等）で生成する。付随する表は実データの比率に合わせて生成する:
+
+  commands          subtasks / 4     （1cmd あたり平均4 subtask）
+  reports           subtasks × 0.9   （done/blocked/error）
+  audit_history     needs_audit の subtask 毎に1〜2件
+  thread_replies    subtasks / 2
+  dashboard_entries commands / 2
+  diary_entries     subtasks / 10
+
+本文は語彙リストからの組み合わせ（話題語は Zipf 分布で偏らせ、検索語の頻度差を再現する）。
+同じ --seed なら同じDBになる。直近24時間の cmd も含める（enrich Stage 2d 用）。
+
+使用方法:
+  python3 gen_synthetic_db.py --subtasks 100k --out /tmp/bench/botsunichiroku.db --build-index
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+_SCRIPTS = Path(__file__).resolve().parents[2] / "scripts"
+sys.path.insert(0, str(_SCRIPTS))
+from init_db import DEFAULT_AGENTS, INDEXES_SQL, TABLES_SQL  # noqa: E402
+
+# init_db.py 以外で作られる表（migrate_add_dashboard_entries.py / botsunichiroku_2ch.py と同じ定義）
+EXTRA_TABLES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS dashboard_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cmd_id TEXT,
+        section TEXT NOT NULL,
+        content TEXT NOT NULL,
+        status TEXT,
+        tags TEXT,
+        created_at TEXT NOT NULL DEFAULT (datetime('now'))
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS thread_replies (
+        id        INTEGER PRIMARY KEY AUTOINCREMENT,
+        thread_id TEXT    NOT NULL,
+        board     TEXT    NOT NULL DEFAULT 'zatsudan',
+        author    TEXT    NOT NULL,
+        body      TEXT    NOT NULL,
+        posted_at TEXT    NOT NULL
+    )
+    """,
+]
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+CHUNK = 10_000
+
+# --- 語彙 ---
+PROJECTS = ["shogun", "arsprout", "rotation-planner", "uecs-ccm", "kousatsu", "baku"]
+TOPICS = [
+    "センサー", "watchdog", "MQTT", "ダッシュボード", "温度制御", "灌水スケジュール", "CO2濃度",
+    "FTS5インデックス", "監査フロー", "報告テンプレート", "ノード監視", "設定ファイル", "API認証",
+    "ログローテーション", "バックアップ", "キャッシュ", "デプロイ手順", "Docker構成", "テスト基盤",
+    "タイムアウト", "リトライ処理", "接続プール", "形態素解析", "ベクトル検索", "通知", "tmux連携",
+    "YAML移行", "スキーマ変更", "権限設定", "性能計測", "エラーハンドリング", "UECS電文",
+    "Raspberry Pi", "ファームウェア", "湿度補正", "日射量", "換気扇制御", "アラート閾値",
+]
+ACTIONS = ["実装", "修正", "調査", "検証", "設計", "リファクタリング", "ドキュメント整備",
+           "性能改善", "移行", "監視設定", "レビュー", "テスト追加"]
+REASONS = [
+    "本番で再現した障害への対応", "殿からの追加要望", "前回監査での指摘事項",
+    "依存ライブラリ更新に伴う変更", "計測で遅延が判明したため", "運用手順の簡素化のため",
+    "新しい圃場の追加に備える", "夜間バッチの失敗が続いたため",
+]
+CONSTRAINTS = [
+    "既存APIの互換性を保つこと", "テストを先に書くこと", "ログ出力は日本語で統一",
+    "設定値は環境変数で上書き可能にすること", "停止時間ゼロで切り替えること",
+    "Raspberry Pi 上で動作確認すること",
+]
+FINDINGS = [
+    "タイムアウト値が短すぎて再試行が多発していた", "例外が握り潰されていた",
+    "インデックスが効いていなかった", "境界値のテストが不足していた",
+    "設定ファイルのキー名が旧形式のままだった", "同時実行時にロック競合が起きていた",
+    "ドキュメントと実装が食い違っていた", "ログに機密情報が出力されていた",
+]
+BLOCKERS = ["依存タスクが未完了", "実機が手元に無い", "仕様の確認待ち", "認証情報が未発行"]
+FAILURE_CATEGORIES = ["prompt不足", "要件誤解", "技術的誤り", "回帰", "フォーマット不備"]
+DASHBOARD_SECTIONS = ["戦果", "要対応", "進行中", "スキル候補"]
+BOARDS = ["zatsudan", "kanri", "ninmu"]
+WORKERS = [a[0] for a in DEFAULT_AGENTS if a[1] in ("ashigaru", "heyago")]
+KARO = ["roju", "midaidokoro"]
+# 話題語の出現頻度（Zipf: 上位語ほど多い）
+_TOPIC_WEIGHTS = [1 / (i + 1) for i in range(len(TOPICS))]
+
+
+class _Text:
+    """シード付き乱数による日本語テキスト生成。"""
+
+    def __init__(self, rng: random.Random) -> None:
+        self.rng = rng
+
+    def topic(self) -> str:
+        return self.rng.choices(TOPICS, weights=_TOPIC_WEIGHTS)[0]
+
+    def title(self) -> str:
+        r = self.rng
+        if r.random() < 0.4:
+            return f"{self.topic()}と{self.topic()}の連携{r.choice(ACTIONS)}"
+        return f"{self.topic()}の{r.choice(ACTIONS)}"
+
+    def details(self) -> str:
+        r = self.rng
+        return (f"{self.title()}を行う。{r.choice(REASONS)}。{r.choice(CONSTRAINTS)}。"
+                f"対象は{self.topic()}周辺。")
+
+    def finding(self) -> str:
+        return f"{self.topic()}: {self.rng.choice(FINDINGS)}"
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _chunks(rows, size: int = CHUNK):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(conn: sqlite3.Connection, sql: str, rows) -> int:
+    n = 0
+    for batch in _chunks(rows):
+        conn.executemany(sql, batch)
+        n += len(batch)
+    return n
+
+
+def generate(out: Path, n_subtasks: int, seed: int = 42, days: int = 365) -> dict[str, int]:
+    """合成DBを out に生成する（既存ファイルは置き換える）。表毎の件数を返す。"""
+    rng = random.Random(seed)
+    text = _Text(rng)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    start = now - timedelta(days=days)
+    n_cmds = max(1, n_subtasks // 4)
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{out}{suffix}").unlink(missing_ok=True)
+    conn = sqlite3.connect(str(out))
+    # 生成中は耐障害性を捨てて速度優先（完了後に WAL へ切り替える）
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    for ddl in list(TABLES_SQL.values()) + EXTRA_TABLES_SQL:
+        conn.execute(ddl)
+    conn.executemany(
+        "INSERT INTO agents (id, role, display_name, model, status, current_task_id, pane_target)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)", DEFAULT_AGENTS)
+
+    # cmd i の作成時刻（単調増加。末尾 1% は直近24時間）
+    def cmd_time(i: int) -> datetime:
+        recent_from = int(n_cmds * 0.99)
+        if i >= recent_from:
+            span = max(1, n_cmds - recent_from)
+            return now - timedelta(hours=24) + timedelta(hours=24 * (i - recent_from) / span)
+        return start + timedelta(days=(days - 1) * i / max(1, recent_from))
+
+    counts: dict[str, int] = {}
+
+    def commands():
+        for i in range(1, n_cmds + 1):
+            created = cmd_time(i - 1)
+            done = i < n_cmds * 0.9
+            status = "done" if done else rng.choice(["pending", "acknowledged", "in_progress"])
+            yield (f"cmd_{i:03d}", _iso(created), text.title(), rng.choice(PROJECTS),
+                   rng.choice(["critical", "high", "medium", "medium", "low"]), status,
+                   rng.choice(KARO), text.details(), _iso(created),
+                   _iso(created + timedelta(hours=rng.randint(1, 72))) if done else None)
+
+    counts["commands"] = _insert(conn, """
+        INSERT INTO commands (id, timestamp, command, project, priority, status, assigned_karo,
+                              details, created_at, completed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", commands())
+
+    def cmd_of(i: int) -> int:
+        return min(n_cmds, 1 + (i - 1) * n_cmds // n_subtasks)
+
+    # subtask i（1始まり）毎の (worker, status, needs_audit, assigned_at) を後続表で使う。
+    # 1M件でも収まるよう id・cmd は i から導出し、時刻は datetime で持たない
+    subtask_meta: list[tuple] = []
+
+    def meta(i: int) -> tuple[str, str, str | None, str, int, datetime]:
+        worker, status, needs_audit, assigned = subtask_meta[i - 1]
+        return (f"subtask_{i:03d}", f"cmd_{cmd_of(i):03d}", worker, status, needs_audit,
+                datetime.fromtimestamp(assigned, timezone.utc))
+
+    def subtasks():
+        for i in range(1, n_subtasks + 1):
+            cmd_no = cmd_of(i)
+            assigned = cmd_time(cmd_no - 1) + timedelta(minutes=rng.randint(5, 600))
+            r = rng.random()
+            status = ("done" if r < 0.8 else "blocked" if r < 0.85 else
+                      "in_progress" if r < 0.93 else "assigned" if r < 0.98 else "cancelled")
+            worker = rng.choice(WORKERS) if status != "pending" else None
+            project = rng.choice(PROJECTS)
+            needs_audit = 1 if rng.random() < 0.3 else 0
+            sid = f"subtask_{i:03d}"
+            subtask_meta.append((worker, status, needs_audit, assigned.timestamp()))
+            notes = text.finding() if rng.random() < 0.3 else None
+            if status == "blocked":
+                notes = f"{rng.choice(BLOCKERS)}。{notes or ''}"
+            blocked_by = (f"subtask_{max(1, i - rng.randint(1, 5)):03d}"
+                          if status == "blocked" and i > 1 else None)
+            yield (sid, f"cmd_{cmd_no:03d}", worker, project, text.details(),
+                   f"/home/yasu/{project}", status, rng.randint(1, 3), notes, needs_audit,
+                   rng.choice(["done", "rejected"]) if needs_audit and status == "done" else None,
+                   blocked_by, _iso(assigned),
+                   _iso(assigned + timedelta(hours=rng.randint(1, 48))) if status == "done" else None)
+
+    counts["subtasks"] = _insert(conn, """
+        INSERT INTO subtasks (id, parent_cmd, worker_id, project, description, target_path,
+                              status, wave, notes, needs_audit, audit_status, blocked_by,
+                              assigned_at, completed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", subtasks())
+
+    def reports():
+        for i in range(1, n_subtasks + 1):
+            sid, _cmd, worker, status, _audit, assigned = meta(i)
+            if worker is None or status in ("assigned", "cancelled") or rng.random() < 0.05:
+                continue
+            r_status = ("blocked" if status == "blocked" else
+                        "error" if rng.random() < 0.05 else "done")
+            findings = [text.finding() for _ in range(rng.randint(0, 3))]
+            skill = rng.random() < 0.03
+            yield (worker, sid, _iso(assigned + timedelta(hours=rng.randint(1, 48))), r_status,
+                   f"{text.title()}を完了" if r_status == "done" else f"{text.title()}で停止",
+                   rng.choice(BLOCKERS) if r_status == "blocked" else None,
+                   repr(findings) if findings else None,
+                   text.details() if rng.random() < 0.2 else None,
+                   f"{text.topic()}-helper" if skill else None,
+                   f"{text.topic()}の定型作業を自動化する" if skill else None)
+
+    counts["reports"] = _insert(conn, """
+        INSERT INTO reports (worker_id, task_id, timestamp, status, summary, blocking_reason,
+                             findings, notes, skill_candidate_name, skill_candidate_desc)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", reports())
+
+    def audits():
+        for i in range(1, n_subtasks + 1):
+            sid, _cmd, worker, status, needs_audit, assigned = meta(i)
+            if not needs_audit or status != "done":
+                continue
+            for attempt in range(1, 1 + (2 if rng.random() < 0.2 else 1)):
+                approved = attempt > 1 or rng.random() < 0.8
+                yield (sid, attempt, rng.randint(11, 15) if approved else rng.randint(4, 10),
+                       "approved" if approved else rng.choice(["rejected_trivial", "rejected_judgment"]),
+                       None if approved else rng.choice(FAILURE_CATEGORIES),
+                       text.finding(), worker,
+                       _iso(assigned + timedelta(hours=48 + attempt)))
+
+    counts["audit_history"] = _insert(conn, """
+        INSERT INTO audit_history (subtask_id, attempt, score, verdict, failure_category,
+                                   findings_summary, worker_id, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", audits())
+
+    def replies():
+        for i in range(n_subtasks // 2):
+            board = rng.choice(BOARDS)
+            thread = (f"cmd_{rng.randint(1, n_cmds):03d}" if board == "kanri"
+                      else f"{board}_{rng.randint(1, max(1, n_subtasks // 200)):03d}")
+            posted = start + timedelta(days=days * i / max(1, n_subtasks // 2))
+            yield (thread, board, rng.choice(WORKERS + KARO),
+                   f"{text.topic()}の件、{rng.choice(FINDINGS)}。{rng.choice(CONSTRAINTS)}。",
+                   _iso(posted))
+
+    counts["thread_replies"] = _insert(conn, """
+        INSERT INTO thread_replies (thread_id, board, author, body, posted_at)
+        VALUES (?, ?, ?, ?, ?)""", replies())
+
+    def dashboard():
+        for i in range(n_cmds // 2):
+            cmd_no = rng.randint(1, n_cmds)
+            section = rng.choice(DASHBOARD_SECTIONS)
+            yield (f"cmd_{cmd_no:03d}", section, f"{text.title()}: {rng.choice(FINDINGS)}",
+                   rng.choice(["done", "in_progress", "pending"]), text.topic(),
+                   _iso(cmd_time(cmd_no - 1) + timedelta(hours=1)))
+
+    counts["dashboard_entries"] = _insert(conn, """
+        INSERT INTO dashboard_entries (cmd_id, section, content, status, tags, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)""", dashboard())
+
+    def diary():
+        for i in range(n_subtasks // 10):
+            sid, cmd, worker, _status, _audit, assigned = meta(rng.randint(1, n_subtasks))
+            yield (worker or rng.choice(WORKERS), assigned.strftime("%Y-%m-%d"), cmd, sid,
+                   f"{text.title()}の振り返り", f"{text.details()}{rng.choice(FINDINGS)}。",
+                   text.topic(), _iso(assigned))
+
+    counts["diary_entries"] = _insert(conn, """
+        INSERT INTO diary_entries (agent_id, date, cmd_id, subtask_id, summary, body, tags,
+                                   created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", diary())
+
+    conn.executemany("INSERT INTO counters (name, value) VALUES (?, ?)",
+                     [("cmd_id", n_cmds), ("subtask_id", n_subtasks)])
+    for idx_sql in INDEXES_SQL:
+        conn.execute(idx_sql)
+    conn.commit()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("ANALYZE")
+    conn.close()
+    return counts
+
+
+def build_index(db: Path, index_db: Path) -> None:
+    """build_index.py を合成DBに対して実行し search_index.db を作る。"""
+    env = {**os.environ, "BOTSUNICHIROKU_DB": str(db), "INDEX_DB": str(index_db)}
+    subprocess.run([sys.executable, str(Path(__file__).with_name("build_index.py")), "--full"],
+                   env=env, check=True)
+
+
+def parse_scale(value: str) -> int:
+    value = value.strip().lower()
+    if value in SCALES:
+        return SCALES[value]
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"件数または {'/'.join(SCALES)} を指定してください: {value}")
+    if n < 1:
+        raise argparse.ArgumentTypeError("件数は1以上")
+    return n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="合成 没日録DB ジェネレータ（高札の負荷試験用）")
+    parser.add_argument("--subtasks", type=parse_scale, default=SCALES["10k"],
+                        help="subtask件数（10k / 100k / 1m または整数。既定 10k）")
+    parser.add_argument("--out", type=Path, default=Path("bench/botsunichiroku.db"),
+                        help="出力先（既定 bench/botsunichiroku.db）")
+    parser.add_argument("--seed", type=int, default=42, help="乱数シード（既定 42）")
+    parser.add_argument("--days", type=int, default=365, help="データの期間（日、既定 365）")
+    parser.add_argument("--build-index", action="store_true",
+                        help="生成後に同じディレクトリへ search_index.db を構築する")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    counts = generate(args.out, args.subtasks, seed=args.seed, days=args.days)
+    elapsed = time.perf_counter() - t0
+    print(f"Generated: {args.out} ({args.out.stat().st_size / 1e6:.1f} MB, {elapsed:.1f}s)")
+    for table, n in counts.items():
+        print(f"  {table:<18} {n:>10,}")
+    if args.build_index:
+        index_db = args.out.with_name("search_index.db")
+        t0 = time.perf_counter()
+        build_index(args.out, index_db)
+        print(f"Index: {index_db} ({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""高札 負荷試験ドライバ
+
+起動中の高札（既定 http://localhost:8080）へ混合ワークロードを並列に流し、
+エンドポイント毎の p50/p95/p99 レイテンシとスループットを報告する。
+リクエストの引数（subtask_id・cmd_id・worker_id・検索語）は対象の没日録DBから抽出する
+（gen_synthetic_db.py の合成DBを想定。実DBでも動く）。
+
+  ワークロード（--mix で重み変更可）:
+    search        GET  /search?q=...           40
+    similar       GET  /search/similar          20
+    enrich        POST /enrich                  10
+    worker_stats  GET  /worker/stats            20
+    orphans       GET  /check/orphans           10
+
+使用方法:
+  python3 gen_synthetic_db.py --subtasks 100k --out /tmp/bench/botsunichiroku.db --build-index
+  BOTSUNICHIROKU_DB=/tmp/bench/botsunichiroku.db INDEX_DB=/tmp/bench/search_index.db \\
+      uvicorn main:app --port 8080 --workers 1 &
+  python3 loadtest.py --db /tmp/bench/botsunichiroku.db --concurrency 8 --duration 30 \\
+      --json after.json --baseline before.json
+"""
+
+import argparse
+import json
+import math
+import random
+import sqlite3
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+DEFAULT_MIX = {"search": 40, "similar": 20, "enrich": 10, "worker_stats": 20, "orphans": 10}
+SAMPLE_SIZE = 2000
+
+# transport(method, path, params, body) → HTTPステータス。通信失敗は例外
+Transport = Callable[[str, str, dict | None, dict | None], int]
+
+
+@dataclass
+class Request:
+    name: str
+    method: str
+    path: str
+    params: dict | None = None
+    body: dict | None = None
+
+
+@dataclass
+class Samples:
+    """ワークロードの引数候補（没日録DBから抽出）。"""
+    subtask_ids: list[str]
+    cmds: list[tuple[str, str, str | None]]  # (cmd_id, 本文, project)
+    worker_ids: list[str]
+    terms: list[str]
+
+
+@dataclass
+class Stats:
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    errors: dict[str, int] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, name: str, seconds: float, ok: bool) -> None:
+        with self.lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def load_samples(db_path: str, seed: int = 42, size: int = SAMPLE_SIZE) -> Samples:
+    """DBから引数候補を抽出する（rowid の一様抽出。ORDER BY random() の全件ソートを避ける）。"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        def pick(table: str, cols: str) -> list[tuple]:
+            max_rowid = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+            if not max_rowid:
+                return []
+            rowids = sorted({rng.randint(1, max_rowid) for _ in range(size)})
+            rows = []
+            for i in range(0, len(rowids), 500):
+                chunk = rowids[i:i + 500]
+                rows += conn.execute(
+                    f"SELECT {cols} FROM {table} WHERE rowid IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+            return rows
+
+        subtask_ids = [r[0] for r in pick("subtasks", "id")]
+        cmds = [(r[0], f"{r[1]} {r[2] or ''}".strip(), r[3])
+                for r in pick("commands", "id, command, details, project")]
+        worker_ids = [r[0] for r in conn.execute(
+            "SELECT DISTINCT worker_id FROM subtasks WHERE worker_id IS NOT NULL LIMIT 100")]
+        # 検索語: cmd 件名の語（空白・助詞「の」「と」で区切った断片）
+        terms = sorted({t for _id, text, _p in cmds
+                        for t in text.split()[0].replace("と", "の").split("の") if len(t) >= 2})
+    finally:
+        conn.close()
+    if not subtask_ids or not cmds:
+        raise SystemExit(f"Error: {db_path} に subtasks / commands がありません")
+    return Samples(subtask_ids, cmds, worker_ids or ["ashigaru1"], terms or ["watchdog"])
+
+
+def make_request(name: str, samples: Samples, rng: random.Random) -> Request:
+    if name == "search":
+        q = " ".join(rng.sample(samples.terms, k=min(len(samples.terms), rng.choice([1, 1, 2]))))
+        return Request(name, "GET", "/search", {"q": q, "limit": 10})
+    if name == "similar":
+        return Request(name, "GET", "/search/similar",
+                       {"subtask_id": rng.choice(samples.subtask_ids)})
+    if name == "enrich":
+        cmd_id, text, project = rng.choice(samples.cmds)
+        body = {"cmd_id": cmd_id, "text": text[:500], "include_external": False}
+        if project:
+            body["project"] = project
+        return Request(name, "POST", "/enrich", body=body)
+    if name == "worker_stats":
+        params = {"worker_id": rng.choice(samples.worker_ids)} if rng.random() < 0.7 else {}
+        return Request(name, "GET", "/worker/stats", params)
+    if name == "orphans":
+        return Request(name, "GET", "/check/orphans")
+    raise ValueError(f"unknown workload: {name}")
+
+
+def http_transport(base_url: str, timeout: float = 30.0) -> Transport:
+    base_url = base_url.rstrip("/")
+
+    def send(method: str, path: str, params: dict | None, body: dict | None) -> int:
+        url = base_url + path
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(url, data=data, method=method,
+                                     headers={"Content-Type": "application/json"} if data else {})
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+    return send
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """最近接順位法の百分位（sorted_values は昇順）。"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), math.ceil(p / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def summarize(stats: Stats, elapsed: float) -> dict:
+    """エンドポイント毎・全体の件数・エラー・p50/p95/p99/max(ms)・スループット(req/s)。"""
+    def row(values: list[float], errors: int) -> dict:
+        values = sorted(values)
+        return {
+            "requests": len(values),
+            "errors": errors,
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+            "rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        }
+    endpoints = {name: row(v, stats.errors.get(name, 0))
+                 for name, v in sorted(stats.latencies.items())}
+    all_values = [x for v in stats.latencies.values() for x in v]
+    return {
+        "elapsed_sec": round(elapsed, 3),
+        "total": row(all_values, sum(stats.errors.values())),
+        "endpoints": endpoints,
+    }
+
+
+def run(transport: Transport, samples: Samples, mix: dict[str, int], concurrency: int = 4,
+        duration: float | None = None, requests: int | None = None,
+        warmup: int = 0, seed: int = 42) -> dict:
+    """混合ワークロードを concurrency 並列で流す。duration 秒経過か requests 件で終了。"""
+    if duration is None and requests is None:
+        raise ValueError("duration か requests のどちらかを指定する")
+    names = [n for n, w in mix.items() if w > 0]
+    weights = [mix[n] for n in names]
+
+    warm_rng = random.Random(seed ^ 0x5A5A)
+    for _ in range(warmup):
+        req = make_request(warm_rng.choice(names), samples, warm_rng)
+        try:
+            transport(req.method, req.path, req.params, req.body)
+        except OSError:
+            pass
+
+    stats = Stats()
+    counter = iter(range(requests)) if requests is not None else None
+    counter_lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration if duration is not None else None
+
+    def worker(worker_no: int) -> None:
+        rng = random.Random(seed * 1000 + worker_no)
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if counter is not None:
+                with counter_lock:
+                    if next(counter, None) is None:
+                        return
+            req = make_request(rng.choices(names, weights=weights)[0], samples, rng)
+            t0 = time.perf_counter()
+            try:
+                ok = 200 <= transport(req.method, req.path, req.params, req.body) < 300
+            except OSError:
+                ok = False
+            stats.record(req.name, time.perf_counter() - t0, ok)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for f in [pool.submit(worker, i) for i in range(concurrency)]:
+            f.result()
+    result = summarize(stats, time.perf_counter() - start)
+    result["concurrency"] = concurrency
+    result["mix"] = dict(zip(names, weights))
+    return result
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    """'search=50,similar=10' → 重み辞書（指定しなかった種類は 0）。"""
+    mix = dict.fromkeys(DEFAULT_MIX, 0)
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(
+                f"unknown workload '{name}' (choose from {', '.join(DEFAULT_MIX)})")
+        try:
+            mix[name] = int(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"weight must be an integer: {part}")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("all weights are zero")
+    return mix
+
+
+def _delta(now: float, before: float) -> str:
+    if not before:
+        return ""
+    return f" ({(now - before) / before * 100:+.1f}%)"
+
+
+def format_report(result: dict, baseline: dict | None = None) -> str:
+    head = (f"{'endpoint':<14}{'requests':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'p99 ms':>10}{'max ms':>10}{'req/s':>9}")
+    lines = [f"elapsed {result['elapsed_sec']}s, concurrency {result['concurrency']}", head,
+             "-" * len(head)]
+    rows = list(result["endpoints"].items()) + [("TOTAL", result["total"])]
+    for name, r in rows:
+        lines.append(f"{name:<14}{r['requests']:>9}{r['errors']:>8}{r['p50_ms']:>10}"
+                     f"{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}{r['rps']:>9}")
+    if baseline:
+        lines += ["", "vs baseline (p50 / p95 / p99 / req/s):"]
+        base_rows = {**baseline.get("endpoints", {}), "TOTAL": baseline.get("total", {})}
+        for name, r in rows:
+            b = base_rows.get(name)
+            if not b:
+                continue
+            lines.append(
+                f"  {name:<12} p50 {r['p50_ms']}{_delta(r['p50_ms'], b['p50_ms'])}"
+                f"  p95 {r['p95_ms']}{_delta(r['p95_ms'], b['p95_ms'])}"
+                f"  p99 {r['p99_ms']}{_delta(r['p99_ms'], b['p99_ms'])}"
+                f"  req/s {r['rps']}{_delta(r['rps'], b['rps'])}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="高札 負荷試験ドライバ")
+    parser.add_argument("--db", required=True,
+                        help="引数候補を抽出する没日録DB（高札が読んでいるものと同じファイル）")
+    parser.add_argument("--base-url", default="http://localhost:8080", help="高札のURL")
+    parser.add_argument("--concurrency", type=int, default=4, help="並列数（既定 4）")
+    parser.add_argument("--duration", type=float, default=None, help="計測秒数（既定 30）")
+    parser.add_argument("--requests", type=int, default=None, help="総リクエスト数で終了")
+    parser.add_argument("--warmup", type=int, default=50, help="計測前のリクエスト数（既定 50）")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="重み（例: search=50,similar=20,enrich=0）")
+    parser.add_argument("--seed", type=int, default=42, help="乱数シード（既定 42）")
+    parser.add_argument("--timeout", type=float, default=30.0, help="1リクエストのタイムアウト秒")
+    parser.add_argument("--json", dest="json_out", help="結果をJSONで保存するパス")
+    parser.add_argument("--baseline", help="比較対象の結果JSON（--json で保存したもの）")
+    args = parser.parse_args()
+    if args.duration is None and args.requests is None:
+        args.duration = 30.0
+
+    samples = load_samples(args.db, seed=args.seed)
+    transport = http_transport(args.base_url, timeout=args.timeout)
+    try:
+        transport("GET", "/health", None, None)
+    except OSError as e:
+        print(f"Error: 高札に接続できません ({args.base_url}): {e}", file=sys.stderr)
+        sys.exit(1)
+
+    result = run(transport, samples, args.mix, concurrency=args.concurrency,
+                 duration=args.duration, requests=args.requests, warmup=args.warmup,
+                 seed=args.seed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(format_report(result, baseline))
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
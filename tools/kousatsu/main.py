@@ -10,80 +10,182 @@ import re
 import sqlite3
 import time
 import urllib.parse
-import urllib.request
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
 
-import MeCab
-from fastapi import FastAPI, HTTPException, Query
-from pydantic import BaseModel
-
-app = FastAPI(title="高札 - 通信ハブ+検索API", version="2.0.0")
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+
+import conditional as _conditional
+import metrics as _metrics
+from db_pool import ReadOnlyPool
+
+# scripts/botsu の stdlib のみのモジュール（共有トークナイザ・enrich用の派生インデックス）。
+# コンテナでは docker-compose で
+# /app/{tokenizer,pitfalls,approved,orphans,extfetch,docs_cache,resource_versions,worker_stats}.py
+# にマウントされる。
+try:
+    import approved as _approved
+    import docs_cache as _docs_cache
+    import extfetch as _extfetch
+    import orphans as _orphans
+    import pitfalls as _pitfalls
+    import resource_versions as _resource_versions
+    import tokenizer as _tokenizer
+    import worker_stats as _worker_stats
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts" / "botsu"))
+    import approved as _approved
+    import docs_cache as _docs_cache
+    import extfetch as _extfetch
+    import orphans as _orphans
+    import pitfalls as _pitfalls
+    import resource_versions as _resource_versions
+    import tokenizer as _tokenizer
+    import worker_stats as _worker_stats
+from enrich_cache import EnrichCache, data_version, request_hash
+from predictor import DecisionPredictor
+from recent_window import RecentCommands
 
 # --- 環境変数 ---
 BOTSUNICHIROKU_DB = os.environ.get("BOTSUNICHIROKU_DB", "/data/botsunichiroku.db")
 INDEX_DB = os.environ.get("INDEX_DB", "/data/search_index.db")
-
-# --- MeCab シングルトン ---
-_mecab_wakati: MeCab.Tagger | None = None
-_mecab_default: MeCab.Tagger | None = None
-
-
-def get_mecab_wakati() -> MeCab.Tagger:
-    global _mecab_wakati
-    if _mecab_wakati is None:
-        _mecab_wakati = MeCab.Tagger("-Owakati")
-    return _mecab_wakati
+EXTERNAL_CACHE_DIR = os.environ.get(
+    "KOUSATSU_EXTERNAL_CACHE_DIR", str(Path(BOTSUNICHIROKU_DB).parent / "external_cache"))
+ENRICH_CACHE_DB = os.environ.get(
+    "KOUSATSU_ENRICH_CACHE_DB", str(Path(BOTSUNICHIROKU_DB).parent / "enrich_cache.db"))
+
+# --- 読み取り専用接続プール（ワーカースレッド毎に1接続） ---
+_index_pool = ReadOnlyPool(INDEX_DB, "index")
+_botsunichiroku_pool = ReadOnlyPool(BOTSUNICHIROKU_DB, "botsunichiroku")
+_enrich_pool = ReadOnlyPool(ENRICH_CACHE_DB, "enrich_cache")
+
+# --- 没日録DBの資源毎の版数（ETag / Last-Modified。専用接続の data_version 変化時のみ読み直す） ---
+_botsunichiroku_version = _conditional.DBVersion(
+    BOTSUNICHIROKU_DB, _botsunichiroku_pool.open_stream, _botsunichiroku_pool.generation,
+    _resource_versions.read_resource_versions)
+
+# --- enrich結果キャッシュ（専用DB enrich_cache.db。没日録DBの版数を動かさない） ---
+_enrich_cache = EnrichCache()
+_enrich_version = _conditional.DBVersion(
+    ENRICH_CACHE_DB, _enrich_pool.open_stream, _enrich_pool.generation)
+
+# --- 直近N時間のcmd（enrich Stage 2d。専用接続の data_version 変化時のみ再読込） ---
+_recent_commands = RecentCommands(_botsunichiroku_pool.open_stream)
+
+# --- 外部検索（DuckDuckGo Instant Answer API。キャッシュ・ブレーカ・合流は extfetch.py） ---
+_external_fetcher = _extfetch.ExternalFetcher(
+    "duckduckgo_api",
+    url_for=lambda q: (f"https://api.duckduckgo.com/"
+                       f"?q={urllib.parse.quote(q)}&format=json&no_html=1"),
+    cache_dir=EXTERNAL_CACHE_DIR,
+    backend=_extfetch.http_backend("kousatsu/2.0"),
+    timeout=5,
+)
+
+# --- TAGE的判断予測（T1/T2/T3 履歴テーブルをメモリ保持。commands の版数が変わった時のみ再構築） ---
+_predictor = DecisionPredictor(
+    _botsunichiroku_pool.open_stream,
+    read_version=lambda conn: _resource_versions.read_resource_version(conn, "commands"))
+
+
+def _prepare_databases() -> None:
+    """起動時に資源毎の版数のトリガ・enrich結果キャッシュDBを用意する（失敗しても起動は続ける）。
+
+    没日録DBが読み取り専用・未作成なら条件付き応答はDB全体の世代に戻る。
+    """
+    if Path(BOTSUNICHIROKU_DB).exists():
+        try:
+            conn = sqlite3.connect(BOTSUNICHIROKU_DB)
+            try:
+                created = _resource_versions.ensure_resource_versions(conn)
+                if EnrichCache.drop_legacy(conn) or created:
+                    conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            pass
+    try:
+        Path(ENRICH_CACHE_DB).parent.mkdir(parents=True, exist_ok=True)
+        conn = get_enrich_cache_db_rw()
+        try:
+            _enrich_cache.ensure_schema(conn)
+        finally:
+            conn.close()
+    except (OSError, sqlite3.Error):
+        pass
 
 
-def get_mecab_default() -> MeCab.Tagger:
-    global _mecab_default
-    if _mecab_default is None:
-        _mecab_default = MeCab.Tagger()
-    return _mecab_default
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    _prepare_databases()
+    yield
+    _enrich_executor.shutdown(wait=False, cancel_futures=True)
+    _recent_commands.close()
+    _predictor.close()
+    _botsunichiroku_version.close()
+    _enrich_version.close()
+    _index_pool.close_all()
+    _botsunichiroku_pool.close_all()
+    _enrich_pool.close_all()
+
+
+app = FastAPI(title="高札 - 通信ハブ+検索API", version="2.0.0", lifespan=_lifespan)
+
+# --- メトリクス（KOUSATSU_METRICS=1 の時のみミドルウェアを登録） ---
+if _metrics.ENABLED:
+    @app.middleware("http")
+    async def _observe_request(request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # ルートテンプレート単位で集計（/reports/{report_id} 等のID毎に系列を作らない）
+            route = request.scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            _metrics.REQUESTS.observe((path, request.method, str(status)),
+                                      time.perf_counter() - start)
 
+# --- MeCab（共有トークナイザ経由、LRUキャッシュ付き） ---
 
 def tokenize(text: str) -> str:
     """MeCab分かち書き。空白区切りのトークン列を返す。"""
-    tagger = get_mecab_wakati()
-    return tagger.parse(text).strip()
+    return _tokenizer.wakati(text)
 
 
 def extract_nouns(text: str) -> list[str]:
     """MeCabで名詞のみ抽出。カバレッジチェック用。"""
-    tagger = get_mecab_default()
-    node = tagger.parseToNode(text)
-    nouns = []
-    while node:
-        features = node.feature.split(",")
-        if features[0] == "名詞" and node.surface:
-            surface = node.surface.strip()
-            if len(surface) >= 2:
-                nouns.append(surface)
-        node = node.next
-    return list(dict.fromkeys(nouns))
+    return _tokenizer.nouns(text)
+
+
+tokenize = _metrics.instrument("wakati", tokenize)
+extract_nouns = _metrics.instrument("nouns", extract_nouns)
 
 
 def get_index_db() -> sqlite3.Connection:
-    """FTS5インデックスDBへの読み取り専用接続を返す。"""
-    db_path = Path(INDEX_DB)
-    if not db_path.exists():
+    """FTS5インデックスDBへの読み取り専用接続（プール管理）を返す。
+
+    接続はワーカースレッドが保持し続けるため、呼び出し元で close() しないこと。
+    """
+    if not _index_pool.exists():
         raise HTTPException(status_code=503, detail="search_index.db not found")
-    uri = f"file:{db_path}?mode=ro"
-    conn = sqlite3.connect(uri, uri=True)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return _index_pool.get()
 
 
 def get_botsunichiroku_db() -> sqlite3.Connection:
-    """没日録DBへの読み取り専用接続を返す。"""
-    db_path = Path(BOTSUNICHIROKU_DB)
-    if not db_path.exists():
+    """没日録DBへの読み取り専用接続（プール管理）を返す。close() 不要。"""
+    if not _botsunichiroku_pool.exists():
         raise HTTPException(status_code=503, detail="botsunichiroku.db not found")
-    uri = f"file:{db_path}?mode=ro"
-    conn = sqlite3.connect(uri, uri=True)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return _botsunichiroku_pool.get()
 
 
 def get_botsunichiroku_db_rw() -> sqlite3.Connection:
@@ -91,11 +193,74 @@ def get_botsunichiroku_db_rw() -> sqlite3.Connection:
     db_path = Path(BOTSUNICHIROKU_DB)
     if not db_path.exists():
         raise HTTPException(status_code=503, detail="botsunichiroku.db not found")
-    conn = sqlite3.connect(str(db_path))
+    conn = sqlite3.connect(str(db_path), **_metrics.connect_kwargs())
+    _metrics.attach(conn, "botsunichiroku_rw")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def get_enrich_cache_db() -> sqlite3.Connection | None:
+    """enrich結果キャッシュDBへの読み取り専用接続（プール管理）。DBが無ければ None。"""
+    if not _enrich_pool.exists():
+        return None
+    return _enrich_pool.get()
+
+
+def get_enrich_cache_db_rw() -> sqlite3.Connection:
+    """enrich結果キャッシュDBへの読み書き接続を返す（無ければ作成）。呼び出し元で close() すること。"""
+    conn = sqlite3.connect(ENRICH_CACHE_DB, **_metrics.connect_kwargs())
+    _metrics.attach(conn, "enrich_cache_rw")
     conn.row_factory = sqlite3.Row
     return conn
 
 
+# --- NDJSONストリーミング（Accept: application/x-ndjson または ?stream=1） ---
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _wants_ndjson(request: Request, stream: bool) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def get_botsunichiroku_stream_db() -> sqlite3.Connection:
+    """ストリーミング応答用の没日録DB専用接続。_ndjson_response() が送出完了時に閉じる。"""
+    if not _botsunichiroku_pool.exists():
+        raise HTTPException(status_code=503, detail="botsunichiroku.db not found")
+    return _botsunichiroku_pool.open_stream()
+
+
+# --- 条件付き応答（If-None-Match / If-Modified-Since → 304。SQL・ファイル読み出しの前に判定） ---
+
+def _not_modified(request: Request,
+                  validator: _conditional.Validator | None) -> Response | None:
+    """検証子が一致すれば 304 応答を返す。None なら通常処理を続ける。"""
+    if validator is not None and _conditional.is_not_modified(request, validator):
+        return _conditional.not_modified_response(validator)
+    return None
+
+
+def _set_validator(response: Response, validator: _conditional.Validator | None) -> Response:
+    if validator is not None:
+        response.headers.update(validator.headers())
+    return response
+
+
+def _ndjson_response(conn: sqlite3.Connection, items, summary) -> StreamingResponse:
+    """items（カーソル由来のイテレータ）を1行1JSONで逐次送出し、最終行に {"summary": summary()} を送る。
+
+    summary は全行送出後に評価する（件数・統計の集計を先頭行の送出より後ろに回す）。
+    """
+    def lines():
+        try:
+            for item in items:
+                yield _json.dumps(item, ensure_ascii=False) + "\n"
+            yield _json.dumps({"summary": summary()}, ensure_ascii=False) + "\n"
+        finally:
+            conn.close()
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+
 # --- Pydanticモデル ---
 
 class ReportCreate(BaseModel):
@@ -123,245 +288,307 @@ class DashboardEntryCreate(BaseModel):
     tags: str = ""       # カンマ区切りタグ
 
 
+# --- バッチ要求（1リクエストあたりの上限件数） ---
+BATCH_MAX = int(os.environ.get("KOUSATSU_BATCH_MAX", "100"))
+
+
+class SearchBatchRequest(BaseModel):
+    queries: list[str] = Field(..., min_length=1, max_length=BATCH_MAX)
+    limit: int = Field(10, ge=1, le=50)
+    count: str = Field("exact", pattern="^(exact|estimate|none)$")
+
+
+class SimilarBatchRequest(BaseModel):
+    subtask_ids: list[str] = Field(..., min_length=1, max_length=BATCH_MAX)
+    limit: int = Field(5, ge=1, le=20)
+
+
+class CoverageBatchRequest(BaseModel):
+    cmd_ids: list[str] = Field(..., min_length=1, max_length=BATCH_MAX)
+
+
 # ============================================================
-# 1. GET /search - 全文検索
+# 1. GET /search - 全文検索（keysetカーソル + 件数モード） / POST /search/batch
 # ============================================================
-@app.get("/search")
-def search(
-    q: str = Query(..., min_length=1, description="検索クエリ"),
-    limit: int = Query(10, ge=1, le=50, description="返却件数"),
-):
+def _encode_cursor(score: float, rowid: int, position: int) -> str:
+    """keysetカーソル: 最終行の (rowid, rank) と通し順位。"""
+    return f"{rowid}:{score!r}:{position}"
+
+
+def _decode_cursor(cursor: str) -> tuple[float, int, int]:
+    try:
+        rowid, score, position = cursor.split(":")
+        return float(score), int(rowid), int(position)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+
+def _estimate_hits(conn: sqlite3.Connection, tokens: list[str]) -> int | None:
+    """fts5vocab の文書頻度から AND 検索のヒット数上限を見積もる（MATCH走査なし）。
+
+    search_vocab が無い（古いインデックス）場合は None。
+    """
+    terms = [t.lower() for t in tokens]
+    try:
+        row = conn.execute(
+            f"SELECT MIN(doc) FROM search_vocab WHERE term IN ({','.join('?' * len(terms))})",
+            terms,
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] or 0
+
+
+# ページ取得とヒット件数を1回のMATCH走査で得る。
+# ORDER BY rank は全ヒットの走査を伴うため、COUNT(*) OVER () はその走査に相乗りする。
+# snippet() はウィンドウ関数と同一SELECTで使えないため、ページ行のみ rowid で引き直す
+# （FTS5 の rowid= 制約付きMATCHは該当行のdoclistシークのみ）。
+_SEARCH_EXACT_SQL = _metrics.named("search_exact", """
+    WITH hits AS (
+        SELECT rowid AS rid, rank AS score, COUNT(*) OVER () AS total
+        FROM search_index
+        WHERE search_index MATCH :q
+    ), page AS (
+        SELECT rid, score, total FROM hits
+        WHERE :cur_rid IS NULL
+           OR score > :cur_score OR (score = :cur_score AND rid > :cur_rid)
+        ORDER BY score, rid
+        LIMIT :n
+    )
+    SELECT
+        page.rid, page.score, page.total,
+        source_type, source_id, parent_id, project, worker_id, status,
+        snippet(search_index, 6, '...', '...', '', 32) AS snippet
+    FROM page JOIN search_index ON search_index.rowid = page.rid
+    WHERE search_index MATCH :q
+    ORDER BY page.score, page.rid
+""")
+
+# 件数不要時: カーソル条件は +rank（仮想テーブルへの制約プッシュダウンを抑止）で評価
+_SEARCH_PAGE_SQL = _metrics.named("search_page", """
+    SELECT
+        rowid AS rid, rank AS score,
+        source_type, source_id, parent_id, project, worker_id, status,
+        snippet(search_index, 6, '...', '...', '', 32) AS snippet
+    FROM search_index
+    WHERE search_index MATCH :q
+      AND (:cur_rid IS NULL
+           OR +rank > :cur_score OR (+rank = :cur_score AND rowid > :cur_rid))
+    ORDER BY rank, rowid
+    LIMIT :n
+""")
+
+
+def _run_search(conn: sqlite3.Connection, q: str, limit: int, count: str,
+                cursor: str | None) -> dict:
+    """1クエリ分の検索（GET /search, POST /search/batch 共通）。"""
     tokenized = tokenize(q)
     if not tokenized.strip():
         raise HTTPException(status_code=400, detail="Empty query after tokenization")
 
     # FTS5 MATCH用: 各トークンをダブルクォートで囲んで特殊文字をエスケープ
     # ハイフン(-), コロン(:), ドット(.)等がFTS5演算子として誤解釈される問題を防ぐ
-    tokens = tokenized.split()
-    match_query = " ".join(f'"{t}"' for t in tokens if t.strip())
+    tokens = [t for t in tokenized.split() if t.strip()]
+    match_query = " ".join(f'"{t}"' for t in tokens)
+
+    cur_score, cur_rid, position = (None, None, 0)
+    if cursor:
+        cur_score, cur_rid, position = _decode_cursor(cursor)
+
+    # 1件余分に取得して次ページ有無を判定
+    params = {"q": match_query, "n": limit + 1,
+              "cur_score": cur_score, "cur_rid": cur_rid}
+    sql = _SEARCH_EXACT_SQL if count == "exact" else _SEARCH_PAGE_SQL
+    rows = conn.execute(sql, params).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    total_hits = None
+    if count == "exact":
+        if rows:
+            total_hits = rows[0]["total"]
+        elif cursor is None:
+            total_hits = 0
+        else:
+            # 末尾を越えたカーソル（空ページ）の時のみ件数を別途数える
+            total_hits = conn.execute(
+                "SELECT COUNT(*) FROM search_index WHERE search_index MATCH ?",
+                (match_query,),
+            ).fetchone()[0]
+    elif count == "estimate":
+        estimate = _estimate_hits(conn, tokens)
+        if estimate is not None:
+            total_hits = max(estimate, position + len(rows))
 
-    conn = get_index_db()
-    try:
-        cur = conn.execute(
-            """
-            SELECT
-                source_type,
-                source_id,
-                parent_id,
-                project,
-                worker_id,
-                status,
-                snippet(search_index, 6, '...', '...', '', 32) AS snippet,
-                rank
-            FROM search_index
-            WHERE search_index MATCH ?
-            ORDER BY rank
-            LIMIT ?
-            """,
-            (match_query, limit),
+    results = []
+    for i, row in enumerate(rows, position + 1):
+        results.append(
+            {
+                "source_type": row["source_type"],
+                "source_id": row["source_id"],
+                "parent_id": row["parent_id"],
+                "project": row["project"],
+                "worker_id": row["worker_id"],
+                "status": row["status"],
+                "snippet": row["snippet"],
+                "rank": i,
+                "score": row["score"],
+            }
         )
-        rows = cur.fetchall()
 
-        # 全件数取得
-        count_cur = conn.execute(
-            "SELECT COUNT(*) FROM search_index WHERE search_index MATCH ?",
-            (match_query,),
-        )
-        total_hits = count_cur.fetchone()[0]
-
-        results = []
-        for i, row in enumerate(rows, 1):
-            results.append(
-                {
-                    "source_type": row["source_type"],
-                    "source_id": row["source_id"],
-                    "parent_id": row["parent_id"],
-                    "project": row["project"],
-                    "worker_id": row["worker_id"],
-                    "status": row["status"],
-                    "snippet": row["snippet"],
-                    "rank": i,
-                    "score": row["rank"],
-                }
-            )
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = _encode_cursor(last["score"], last["rid"], position + len(rows))
+
+    return {
+        "query": q,
+        "tokenized_query": tokenized,
+        "total_hits": total_hits,
+        "count_mode": count,
+        "results": results,
+        "next_cursor": next_cursor,
+    }
+
+
+def _batch_response(keys: list[str], run) -> dict:
+    """入力キー毎に run(key) を実行し、結果とエラーをキー別に返す（重複キーは1回のみ実行）。"""
+    results: dict[str, dict] = {}
+    errors: dict[str, dict] = {}
+    for key in dict.fromkeys(keys):
+        try:
+            results[key] = run(key)
+        except HTTPException as exc:
+            errors[key] = {"status_code": exc.status_code, "detail": exc.detail}
+    return {"results": results, "errors": errors}
 
-        return {
-            "query": q,
-            "tokenized_query": tokenized,
-            "total_hits": total_hits,
-            "results": results,
-        }
-    finally:
-        conn.close()
+
+@app.get("/search")
+def search(
+    q: str = Query(..., min_length=1, description="検索クエリ"),
+    limit: int = Query(10, ge=1, le=50, description="返却件数"),
+    count: str = Query("exact", pattern="^(exact|estimate|none)$",
+                       description="総件数: exact=同一走査で厳密 / estimate=語彙統計で概算 / none=省略"),
+    cursor: str | None = Query(None, description="前ページの next_cursor"),
+):
+    return _run_search(get_index_db(), q, limit, count, cursor)
+
+
+@app.post("/search/batch")
+def search_batch(req: SearchBatchRequest):
+    """複数クエリを1接続で検索する。結果はクエリ文字列をキーに返す（1ページ目のみ）。"""
+    conn = get_index_db()
+    return _batch_response(
+        req.queries, lambda q: _run_search(conn, q, req.limit, req.count, None)
+    )
 
 
 # ============================================================
 # 2. GET /check/orphans - 矛盾・放置検出
 # ============================================================
+# 各チェックの (check_type, description)。検出SQLは scripts/botsu/orphans.py の READ_SQL
+# （トリガ維持の差分インデックス orphan_items / orphan_cmd_progress を読む）。
+# 未作成のDBでは orphans.SCAN_SQL の全件走査にフォールバックする。
+_ORPHAN_CHECKS = [
+    (_orphans.CMD_ALL_DONE, "全subtaskがdoneだがcmdがpendingのまま"),
+    (_orphans.CMD_PENDING, "7日以上pendingのまま放置されているcmd"),
+    (_orphans.SUBTASK_ASSIGNED, "7日以上assignedのまま放置されているsubtask"),
+    (_orphans.DONE_WITHOUT_REPORT, "subtaskがdoneなのにreportが1件もない"),
+]
+
+
+def _read_orphan_checks(conn: sqlite3.Connection, use_index: bool) -> list[dict]:
+    found = _orphans.read_orphans(conn, use_index=use_index)
+    return [
+        {
+            "check_type": check_type,
+            "description": description,
+            "count": len(found[check_type]),
+            "items": found[check_type],
+        }
+        for check_type, description in _ORPHAN_CHECKS
+    ]
+
+
 @app.get("/check/orphans")
 def check_orphans():
     conn = get_botsunichiroku_db()
     try:
-        checks = []
-
-        # (a) subtask全doneなのにcmdがpendingのまま
-        cur_a = conn.execute(
-            """
-            SELECT c.id AS cmd_id, c.status,
-                   COUNT(s.id) AS subtask_count
-            FROM commands c
-            JOIN subtasks s ON s.parent_cmd = c.id
-            WHERE c.status != 'done'
-            GROUP BY c.id
-            HAVING COUNT(s.id) > 0
-               AND COUNT(s.id) = SUM(CASE WHEN s.status = 'done' THEN 1 ELSE 0 END)
-            """
-        )
-        items_a = [
-            {"cmd_id": r["cmd_id"], "status": r["status"], "subtask_count": r["subtask_count"]}
-            for r in cur_a.fetchall()
-        ]
-        checks.append(
-            {
-                "check_type": "cmd_all_subtasks_done_but_pending",
-                "description": "全subtaskがdoneだがcmdがpendingのまま",
-                "count": len(items_a),
-                "items": items_a,
-            }
-        )
-
-        # (b) 7日以上pendingのまま放置されているcmd
-        cur_b = conn.execute(
-            """
-            SELECT id AS cmd_id, status, created_at
-            FROM commands
-            WHERE status = 'pending'
-              AND created_at <= datetime('now', '-7 days')
-            """
-        )
-        items_b = [
-            {"cmd_id": r["cmd_id"], "status": r["status"], "created_at": r["created_at"]}
-            for r in cur_b.fetchall()
-        ]
-        checks.append(
-            {
-                "check_type": "cmd_pending_over_7_days",
-                "description": "7日以上pendingのまま放置されているcmd",
-                "count": len(items_b),
-                "items": items_b,
-            }
-        )
-
-        # (c) 7日以上assignedのまま放置されているsubtask
-        cur_c = conn.execute(
-            """
-            SELECT id AS subtask_id, parent_cmd, worker_id, assigned_at
-            FROM subtasks
-            WHERE status = 'assigned'
-              AND assigned_at <= datetime('now', '-7 days')
-            """
-        )
-        items_c = [
-            {
-                "subtask_id": r["subtask_id"],
-                "parent_cmd": r["parent_cmd"],
-                "worker_id": r["worker_id"],
-                "assigned_at": r["assigned_at"],
-            }
-            for r in cur_c.fetchall()
-        ]
-        checks.append(
-            {
-                "check_type": "subtask_assigned_over_7_days",
-                "description": "7日以上assignedのまま放置されているsubtask",
-                "count": len(items_c),
-                "items": items_c,
-            }
-        )
+        checks = _read_orphan_checks(conn, use_index=True)
+        source = "index"
+    except sqlite3.OperationalError:
+        checks = _read_orphan_checks(conn, use_index=False)
+        source = "scan"
 
-        # (d) subtaskがdoneなのにreportが1件もない
-        cur_d = conn.execute(
-            """
-            SELECT s.id AS subtask_id, s.parent_cmd, s.worker_id
-            FROM subtasks s
-            LEFT JOIN reports r ON r.task_id = s.id
-            WHERE s.status = 'done'
-              AND r.id IS NULL
-            """
-        )
-        items_d = [
-            {
-                "subtask_id": r["subtask_id"],
-                "parent_cmd": r["parent_cmd"],
-                "worker_id": r["worker_id"],
-            }
-            for r in cur_d.fetchall()
-        ]
-        checks.append(
-            {
-                "check_type": "subtask_done_without_report",
-                "description": "subtaskがdoneなのにreportが1件もない",
-                "count": len(items_d),
-                "items": items_d,
-            }
-        )
-
-        total_issues = sum(c["count"] for c in checks)
+    total_issues = sum(c["count"] for c in checks)
 
-        return {
-            "timestamp": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
-            "checks": checks,
-            "total_issues": total_issues,
-        }
-    finally:
-        conn.close()
+    return {
+        "timestamp": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        "checks": checks,
+        "total_issues": total_issues,
+        "source": source,
+    }
 
 
 # ============================================================
-# 3. GET /check/coverage - カバレッジチェック
+# 3. GET /check/coverage - カバレッジチェック / POST /check/coverage/batch
 # ============================================================
-@app.get("/check/coverage")
-def check_coverage(
-    cmd_id: str = Query(..., description="対象コマンドID（例: cmd_145）"),
-):
-    conn = get_botsunichiroku_db()
-    try:
-        # 1. commandsテーブルからcmd_idの command + details を取得
-        cmd_row = conn.execute(
-            "SELECT command, details FROM commands WHERE id = ?",
-            (cmd_id,),
-        ).fetchone()
+def _coverage_batch(conn: sqlite3.Connection, cmd_ids: list[str]) -> dict[str, dict | None]:
+    """cmd毎のカバレッジを返す（存在しないcmdは None）。
+
+    commands / reports / subtask件数はそれぞれ IN 句1クエリで一括取得する。
+    """
+    ids = list(dict.fromkeys(cmd_ids))
+    placeholders = ",".join("?" * len(ids))
+
+    # 1. commandsテーブルからcmd_idの command + details を取得
+    cmd_rows = {
+        r["id"]: r
+        for r in conn.execute(
+            f"SELECT id, command, details FROM commands WHERE id IN ({placeholders})", ids
+        ).fetchall()
+    }
+
+    # 2. 該当cmdの全subtaskの全reportのsummaryを取得
+    summaries: dict[str, list[str]] = {}
+    for r in conn.execute(
+        f"""
+        SELECT s.parent_cmd, r.summary
+        FROM reports r
+        JOIN subtasks s ON r.task_id = s.id
+        WHERE s.parent_cmd IN ({placeholders})
+          AND r.summary IS NOT NULL
+        """,
+        ids,
+    ).fetchall():
+        summaries.setdefault(r["parent_cmd"], []).append(r["summary"])
+
+    subtask_counts = {
+        r["parent_cmd"]: r["n"]
+        for r in conn.execute(
+            f"SELECT parent_cmd, COUNT(*) AS n FROM subtasks"
+            f" WHERE parent_cmd IN ({placeholders}) GROUP BY parent_cmd",
+            ids,
+        ).fetchall()
+    }
+
+    results: dict[str, dict | None] = {}
+    for cmd_id in ids:
+        cmd_row = cmd_rows.get(cmd_id)
         if cmd_row is None:
-            raise HTTPException(status_code=404, detail=f"Command {cmd_id} not found")
+            results[cmd_id] = None
+            continue
 
         instruction_text = " ".join(
             part for part in [cmd_row["command"], cmd_row["details"]] if part
         )
 
-        # 2. MeCabで名詞を抽出（指示文のキーワード集合）
+        # 3. MeCabで名詞を抽出（指示文のキーワード集合）
         instruction_keywords = extract_nouns(instruction_text)
 
-        # 3. 該当cmdの全subtaskの全reportのsummaryを取得
-        report_rows = conn.execute(
-            """
-            SELECT r.summary
-            FROM reports r
-            JOIN subtasks s ON r.task_id = s.id
-            WHERE s.parent_cmd = ?
-              AND r.summary IS NOT NULL
-            """,
-            (cmd_id,),
-        ).fetchall()
-
-        subtask_count = conn.execute(
-            "SELECT COUNT(*) FROM subtasks WHERE parent_cmd = ?",
-            (cmd_id,),
-        ).fetchone()[0]
-
-        report_count = len(report_rows)
-
         # 4. MeCabで名詞を抽出（報告文のキーワード集合）
-        report_text = " ".join(r["summary"] for r in report_rows if r["summary"])
+        report_summaries = summaries.get(cmd_id, [])
+        report_text = " ".join(s for s in report_summaries if s)
         report_keywords = extract_nouns(report_text) if report_text.strip() else []
 
         # 5. 指示文にあって報告文にないキーワード = 言及漏れ候補
@@ -373,84 +600,103 @@ def check_coverage(
             covered = len(instruction_keywords) - len(missing_keywords)
             coverage_ratio = round(covered / len(instruction_keywords), 2)
 
-        return {
+        results[cmd_id] = {
             "cmd_id": cmd_id,
             "instruction_keywords": instruction_keywords,
             "report_keywords": report_keywords,
             "missing_keywords": missing_keywords,
             "coverage_ratio": coverage_ratio,
-            "subtask_count": subtask_count,
-            "report_count": report_count,
+            "subtask_count": subtask_counts.get(cmd_id, 0),
+            "report_count": len(report_summaries),
         }
-    finally:
-        conn.close()
+    return results
 
 
-# ============================================================
-# 4. GET /search/similar - 類似タスク自動検索
-# ============================================================
-@app.get("/search/similar")
-def search_similar(
-    subtask_id: str = Query(..., description="基準subtask ID"),
-    limit: int = Query(5, ge=1, le=20, description="返却件数"),
+@app.get("/check/coverage")
+def check_coverage(
+    cmd_id: str = Query(..., description="対象コマンドID（例: cmd_145）"),
 ):
-    # 1. 没日録DBからsubtaskのdescription取得
-    bot_conn = get_botsunichiroku_db()
-    try:
-        row = bot_conn.execute(
-            "SELECT description FROM subtasks WHERE id = ?",
-            (subtask_id,),
-        ).fetchone()
-        if row is None:
-            raise HTTPException(status_code=404, detail=f"Subtask {subtask_id} not found")
-        description = row["description"]
-    finally:
-        bot_conn.close()
+    result = _coverage_batch(get_botsunichiroku_db(), [cmd_id])[cmd_id]
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Command {cmd_id} not found")
+    return result
 
-    # 2. キーワード自動抽出
-    keywords = extract_nouns(description)
-    if not keywords:
-        return {
-            "subtask_id": subtask_id,
-            "keywords": [],
-            "results": [],
-        }
 
-    # 3. FTS5 OR検索
-    match_query = " OR ".join(f'"{kw}"' for kw in keywords)
+@app.post("/check/coverage/batch")
+def check_coverage_batch(req: CoverageBatchRequest):
+    """複数cmdのカバレッジを一括計算する。結果は cmd_id をキーに返す。"""
+    found = _coverage_batch(get_botsunichiroku_db(), req.cmd_ids)
 
-    idx_conn = get_index_db()
-    try:
-        cur = idx_conn.execute(
-            """
-            SELECT
-                source_type,
-                source_id,
-                parent_id,
-                project,
-                worker_id,
-                status,
-                snippet(search_index, 6, '...', '...', '', 32) AS snippet,
-                rank
-            FROM search_index
-            WHERE search_index MATCH ?
-            ORDER BY rank
-            LIMIT ?
-            """,
-            (match_query, limit + 10),  # 自身除外分を余分に取得
-        )
-        rows = cur.fetchall()
-    finally:
-        idx_conn.close()
+    def run(cmd_id: str) -> dict:
+        if found[cmd_id] is None:
+            raise HTTPException(status_code=404, detail=f"Command {cmd_id} not found")
+        return found[cmd_id]
 
-    # 4. 自分自身を除外し、audit_statusを付与
-    bot_conn2 = get_botsunichiroku_db()
-    try:
-        results = []
+    return _batch_response(req.cmd_ids, run)
+
+
+# ============================================================
+# 4. GET /search/similar - 類似タスク自動検索 / POST /search/similar/batch
+# ============================================================
+_SIMILAR_SQL = _metrics.named("search_similar", """
+    SELECT
+        source_type,
+        source_id,
+        parent_id,
+        project,
+        worker_id,
+        status,
+        snippet(search_index, 6, '...', '...', '', 32) AS snippet,
+        rank
+    FROM search_index
+    WHERE search_index MATCH ?
+    ORDER BY rank
+    LIMIT ?
+""")
+
+
+def _similar_batch(subtask_ids: list[str], limit: int) -> dict[str, dict | None]:
+    """subtask毎の類似タスクを返す（存在しないsubtaskは None）。
+
+    description と 結果subtaskの audit_status は IN 句1クエリで一括取得する。
+    """
+    ids = list(dict.fromkeys(subtask_ids))
+    bot_conn = get_botsunichiroku_db()
+
+    # 1. 没日録DBからsubtaskのdescription取得
+    descriptions = {
+        r["id"]: r["description"]
+        for r in bot_conn.execute(
+            f"SELECT id, description FROM subtasks WHERE id IN ({','.join('?' * len(ids))})",
+            ids,
+        ).fetchall()
+    }
+
+    results: dict[str, dict | None] = {}
+    idx_conn = None
+    for subtask_id in ids:
+        if subtask_id not in descriptions:
+            results[subtask_id] = None
+            continue
+
+        # 2. キーワード自動抽出
+        keywords = extract_nouns(descriptions[subtask_id])
+        if not keywords:
+            results[subtask_id] = {"subtask_id": subtask_id, "keywords": [], "results": []}
+            continue
+
+        # 3. FTS5 OR検索（自身除外分を余分に取得）
+        match_query = " OR ".join(f'"{kw}"' for kw in keywords)
+        if idx_conn is None:
+            idx_conn = get_index_db()
+        rows = idx_conn.execute(_SIMILAR_SQL, (match_query, limit + 10)).fetchall()
+
+        # 4. 自分自身を除外
+        items = []
         for row in rows:
             if row["source_id"] == subtask_id:
                 continue
-            if len(results) >= limit:
+            if len(items) >= limit:
                 break
             item = {
                 "source_type": row["source_type"],
@@ -462,224 +708,238 @@ def search_similar(
                 "snippet": row["snippet"],
                 "score": row["rank"],
             }
-            # subtask型の結果にはaudit_statusを付与
             if row["source_type"] == "subtask":
-                audit_row = bot_conn2.execute(
-                    "SELECT audit_status FROM subtasks WHERE id = ?",
-                    (row["source_id"],),
-                ).fetchone()
-                item["audit_status"] = audit_row["audit_status"] if audit_row else None
-            results.append(item)
-    finally:
-        bot_conn2.close()
-
-    return {
-        "subtask_id": subtask_id,
-        "keywords": keywords,
-        "results": results,
+                item["audit_status"] = None
+            items.append(item)
+        results[subtask_id] = {"subtask_id": subtask_id, "keywords": keywords, "results": items}
+
+    # 5. subtask型の結果に audit_status を一括付与
+    wanted = {
+        item["source_id"]
+        for res in results.values() if res
+        for item in res["results"] if "audit_status" in item
     }
+    if wanted:
+        wanted_ids = list(wanted)
+        audit = {
+            r["id"]: r["audit_status"]
+            for r in bot_conn.execute(
+                f"SELECT id, audit_status FROM subtasks WHERE id IN ({','.join('?' * len(wanted_ids))})",
+                wanted_ids,
+            ).fetchall()
+        }
+        for res in results.values():
+            for item in (res["results"] if res else []):
+                if "audit_status" in item:
+                    item["audit_status"] = audit.get(item["source_id"])
+    return results
+
+
+@app.get("/search/similar")
+def search_similar(
+    subtask_id: str = Query(..., description="基準subtask ID"),
+    limit: int = Query(5, ge=1, le=20, description="返却件数"),
+):
+    result = _similar_batch([subtask_id], limit)[subtask_id]
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Subtask {subtask_id} not found")
+    return result
+
+
+@app.post("/search/similar/batch")
+def search_similar_batch(req: SimilarBatchRequest):
+    """複数subtaskの類似タスクを一括検索する。結果は subtask_id をキーに返す。"""
+    found = _similar_batch(req.subtask_ids, req.limit)
+
+    def run(subtask_id: str) -> dict:
+        if found[subtask_id] is None:
+            raise HTTPException(status_code=404, detail=f"Subtask {subtask_id} not found")
+        return found[subtask_id]
+
+    return _batch_response(req.subtask_ids, run)
 
 
 # ============================================================
 # 5. GET /audit/history - 監査履歴
 # ============================================================
+def _audit_filters(worker_id: str | None, project: str | None,
+                   prefix: str = "") -> tuple[str, list]:
+    conditions = [f"{prefix}needs_audit = 1"]
+    params: list = []
+    if worker_id:
+        conditions.append(f"{prefix}worker_id = ?")
+        params.append(worker_id)
+    if project:
+        conditions.append(f"{prefix}project = ?")
+        params.append(project)
+    return " AND ".join(conditions), params
+
+
+def _audit_history_items(conn: sqlite3.Connection, worker_id: str | None,
+                         project: str | None, limit: int):
+    where_clause, params = _audit_filters(worker_id, project, prefix="s.")
+    params.append(limit)
+
+    cur = conn.execute(
+        f"""
+        SELECT
+            s.id AS subtask_id,
+            s.parent_cmd,
+            s.worker_id,
+            s.project,
+            s.description,
+            s.status,
+            s.needs_audit,
+            s.audit_status,
+            s.assigned_at,
+            s.completed_at,
+            (SELECT r.summary FROM reports r WHERE r.task_id = s.id
+             ORDER BY r.timestamp DESC LIMIT 1) AS latest_report_summary
+        FROM subtasks s
+        WHERE {where_clause}
+        ORDER BY s.completed_at DESC
+        LIMIT ?
+        """,
+        params,
+    )
+    for row in cur:
+        yield {
+            "subtask_id": row["subtask_id"],
+            "parent_cmd": row["parent_cmd"],
+            "worker_id": row["worker_id"],
+            "project": row["project"],
+            "description": row["description"],
+            "audit_status": row["audit_status"],
+            "completed_at": row["completed_at"],
+            "latest_report_summary": row["latest_report_summary"],
+        }
+
+
+def _audit_history_stats(conn: sqlite3.Connection, worker_id: str | None,
+                         project: str | None) -> dict:
+    # 統計は全件（limitなし）で計算
+    stat_where, stat_params = _audit_filters(worker_id, project)
+    stat_row = conn.execute(
+        f"""
+        SELECT
+            COUNT(*) AS total,
+            SUM(CASE WHEN audit_status = 'done' THEN 1 ELSE 0 END) AS done,
+            SUM(CASE WHEN audit_status = 'rejected' THEN 1 ELSE 0 END) AS rejected,
+            SUM(CASE WHEN audit_status = 'pending' OR audit_status IS NULL THEN 1 ELSE 0 END) AS pending
+        FROM subtasks
+        WHERE {stat_where}
+        """,
+        stat_params,
+    ).fetchone()
+    stats = {
+        "total": stat_row["total"] or 0,
+        "done": stat_row["done"] or 0,
+        "rejected": stat_row["rejected"] or 0,
+        "pending": stat_row["pending"] or 0,
+    }
+    stats["approval_rate"] = round(stats["done"] / stats["total"], 2) if stats["total"] > 0 else 0.0
+    return stats
+
+
 @app.get("/audit/history")
 def audit_history(
+    request: Request,
     worker_id: str = Query(None, description="足軽IDでフィルタ"),
     project: str = Query(None, description="プロジェクトでフィルタ"),
     limit: int = Query(20, ge=1, le=100, description="返却件数"),
+    stream: bool = Query(False, description="NDJSONで逐次返却（Accept: application/x-ndjson と同じ）"),
 ):
-    conn = get_botsunichiroku_db()
-    try:
-        # 動的フィルタ構築
-        conditions = ["s.needs_audit = 1"]
-        params: list = []
-        if worker_id:
-            conditions.append("s.worker_id = ?")
-            params.append(worker_id)
-        if project:
-            conditions.append("s.project = ?")
-            params.append(project)
-
-        where_clause = " AND ".join(conditions)
-        params.append(limit)
-
-        cur = conn.execute(
-            f"""
-            SELECT
-                s.id AS subtask_id,
-                s.parent_cmd,
-                s.worker_id,
-                s.project,
-                s.description,
-                s.status,
-                s.needs_audit,
-                s.audit_status,
-                s.assigned_at,
-                s.completed_at,
-                (SELECT r.summary FROM reports r WHERE r.task_id = s.id
-                 ORDER BY r.timestamp DESC LIMIT 1) AS latest_report_summary
-            FROM subtasks s
-            WHERE {where_clause}
-            ORDER BY s.completed_at DESC
-            LIMIT ?
-            """,
-            params,
+    if _wants_ndjson(request, stream):
+        conn = get_botsunichiroku_stream_db()
+        return _ndjson_response(
+            conn,
+            _audit_history_items(conn, worker_id, project, limit),
+            lambda: {"stats": _audit_history_stats(conn, worker_id, project)},
         )
-        rows = cur.fetchall()
 
-        items = []
-        stats = {"total": 0, "done": 0, "rejected": 0, "pending": 0}
-        for row in rows:
-            items.append({
-                "subtask_id": row["subtask_id"],
-                "parent_cmd": row["parent_cmd"],
-                "worker_id": row["worker_id"],
-                "project": row["project"],
-                "description": row["description"],
-                "audit_status": row["audit_status"],
-                "completed_at": row["completed_at"],
-                "latest_report_summary": row["latest_report_summary"],
-            })
+    conn = get_botsunichiroku_db()
+    return {
+        "items": list(_audit_history_items(conn, worker_id, project, limit)),
+        "stats": _audit_history_stats(conn, worker_id, project),
+    }
+
 
-        # 統計は全件（limitなし）で計算
-        stat_params: list = []
-        stat_conditions = ["needs_audit = 1"]
-        if worker_id:
-            stat_conditions.append("worker_id = ?")
-            stat_params.append(worker_id)
-        if project:
-            stat_conditions.append("project = ?")
-            stat_params.append(project)
-        stat_where = " AND ".join(stat_conditions)
-
-        stat_cur = conn.execute(
-            f"""
-            SELECT
-                COUNT(*) AS total,
-                SUM(CASE WHEN audit_status = 'done' THEN 1 ELSE 0 END) AS done,
-                SUM(CASE WHEN audit_status = 'rejected' THEN 1 ELSE 0 END) AS rejected,
-                SUM(CASE WHEN audit_status = 'pending' OR audit_status IS NULL THEN 1 ELSE 0 END) AS pending
-            FROM subtasks
-            WHERE {stat_where}
-            """,
-            stat_params,
+# ============================================================
+# 6. GET /worker/stats - 足軽パフォーマンス統計（ロールアップ or 一括集計）
+# ============================================================
+def _worker_stats_aggregate(conn: sqlite3.Connection, worker_id: str | None):
+    """subtasks を GROUP BY worker_id で一括集計する（ロールアップ未作成時）。2クエリ固定。"""
+    where, params = ("AND worker_id = ?", (worker_id,)) if worker_id else ("", ())
+    rows = conn.execute(
+        f"""
+        SELECT
+            worker_id,
+            COUNT(*) AS total_tasks,
+            SUM(CASE WHEN status = 'done' THEN 1 ELSE 0 END) AS done,
+            SUM(CASE WHEN status = 'blocked' THEN 1 ELSE 0 END) AS blocked,
+            SUM(CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END) AS cancelled,
+            SUM(CASE WHEN needs_audit = 1 AND audit_status = 'done' THEN 1 ELSE 0 END) AS audit_approved,
+            SUM(CASE WHEN needs_audit = 1 AND audit_status = 'rejected' THEN 1 ELSE 0 END) AS audit_rejected,
+            AVG((julianday(completed_at) - julianday(assigned_at)) * 24) AS avg_hours
+        FROM subtasks
+        WHERE worker_id IS NOT NULL {where}
+        GROUP BY worker_id
+        ORDER BY worker_id
+        """,
+        params,
+    )
+    projects: dict[str, dict[str, int]] = {}
+    for r in conn.execute(
+        f"""
+        SELECT worker_id, project, COUNT(*) AS count
+        FROM subtasks
+        WHERE worker_id IS NOT NULL AND project IS NOT NULL {where}
+        GROUP BY worker_id, project
+        ORDER BY worker_id, project
+        """,
+        params,
+    ).fetchall():
+        projects.setdefault(r["worker_id"], {})[r["project"]] = r["count"]
+    return (
+        _worker_stats.format_worker_stats(
+            r["worker_id"], r["total_tasks"], r["done"], r["blocked"], r["cancelled"],
+            r["audit_approved"], r["audit_rejected"], r["avg_hours"],
+            projects.get(r["worker_id"], {}),
         )
-        stat_row = stat_cur.fetchone()
-        stats["total"] = stat_row["total"] or 0
-        stats["done"] = stat_row["done"] or 0
-        stats["rejected"] = stat_row["rejected"] or 0
-        stats["pending"] = stat_row["pending"] or 0
-        stats["approval_rate"] = round(stats["done"] / stats["total"], 2) if stats["total"] > 0 else 0.0
+        for r in rows
+    )
 
-        return {
-            "items": items,
-            "stats": stats,
-        }
-    finally:
-        conn.close()
+
+def _iter_worker_stats(rows, worker_id: str | None):
+    # worker_id指定で該当なしの場合もゼロ埋めの1件を返す（従来互換）
+    found = False
+    for entry in rows:
+        found = True
+        yield entry
+    if worker_id and not found:
+        yield _worker_stats.format_worker_stats(worker_id, 0, 0, 0, 0, 0, 0, None, {})
 
 
-# ============================================================
-# 6. GET /worker/stats - 足軽パフォーマンス統計
-# ============================================================
 @app.get("/worker/stats")
 def worker_stats(
+    request: Request,
     worker_id: str = Query(None, description="足軽IDでフィルタ（省略時: 全足軽）"),
+    stream: bool = Query(False, description="NDJSONで逐次返却（Accept: application/x-ndjson と同じ）"),
 ):
-    conn = get_botsunichiroku_db()
+    streaming = _wants_ndjson(request, stream)
+    conn = get_botsunichiroku_stream_db() if streaming else get_botsunichiroku_db()
     try:
-        # worker_idフィルタ
-        if worker_id:
-            workers = [worker_id]
-        else:
-            cur = conn.execute(
-                "SELECT DISTINCT worker_id FROM subtasks WHERE worker_id IS NOT NULL"
-            )
-            workers = [row["worker_id"] for row in cur.fetchall()]
-
-        results = []
-        for wid in workers:
-            # タスク数集計
-            task_cur = conn.execute(
-                """
-                SELECT
-                    COUNT(*) AS total_tasks,
-                    SUM(CASE WHEN status = 'done' THEN 1 ELSE 0 END) AS done,
-                    SUM(CASE WHEN status = 'blocked' THEN 1 ELSE 0 END) AS blocked,
-                    SUM(CASE WHEN status = 'cancelled' THEN 1 ELSE 0 END) AS cancelled
-                FROM subtasks
-                WHERE worker_id = ?
-                """,
-                (wid,),
-            )
-            task_row = task_cur.fetchone()
-
-            # audit統計
-            audit_cur = conn.execute(
-                """
-                SELECT
-                    SUM(CASE WHEN audit_status = 'done' THEN 1 ELSE 0 END) AS audit_approved,
-                    SUM(CASE WHEN audit_status = 'rejected' THEN 1 ELSE 0 END) AS audit_rejected
-                FROM subtasks
-                WHERE worker_id = ? AND needs_audit = 1
-                """,
-                (wid,),
-            )
-            audit_row = audit_cur.fetchone()
-            audit_approved = audit_row["audit_approved"] or 0
-            audit_rejected = audit_row["audit_rejected"] or 0
-            audit_total = audit_approved + audit_rejected
-            approval_rate = round(audit_approved / audit_total, 2) if audit_total > 0 else 0.0
-
-            # プロジェクト別タスク数
-            proj_cur = conn.execute(
-                """
-                SELECT project, COUNT(*) AS count
-                FROM subtasks
-                WHERE worker_id = ? AND project IS NOT NULL
-                GROUP BY project
-                """,
-                (wid,),
-            )
-            projects = {row["project"]: row["count"] for row in proj_cur.fetchall()}
-
-            # 平均完了時間（時間単位）
-            avg_cur = conn.execute(
-                """
-                SELECT AVG(
-                    (julianday(completed_at) - julianday(assigned_at)) * 24
-                ) AS avg_hours
-                FROM subtasks
-                WHERE worker_id = ?
-                  AND completed_at IS NOT NULL
-                  AND assigned_at IS NOT NULL
-                """,
-                (wid,),
-            )
-            avg_row = avg_cur.fetchone()
-            avg_completion_hours = round(avg_row["avg_hours"], 1) if avg_row["avg_hours"] else None
-
-            # top_project
-            top_project = max(projects, key=projects.get) if projects else None
-
-            results.append({
-                "worker_id": wid,
-                "total_tasks": task_row["total_tasks"] or 0,
-                "done": task_row["done"] or 0,
-                "blocked": task_row["blocked"] or 0,
-                "cancelled": task_row["cancelled"] or 0,
-                "audit_approved": audit_approved,
-                "audit_rejected": audit_rejected,
-                "approval_rate": approval_rate,
-                "projects": projects,
-                "top_project": top_project,
-                "avg_completion_hours": avg_completion_hours,
-            })
+        # ロールアップ表（worker_stats.py がトリガで差分更新）。未作成の古いDBでは OperationalError
+        rows = _worker_stats.iter_worker_stats(conn, worker_id)
+        source = "rollup"
+    except sqlite3.OperationalError:
+        rows = _worker_stats_aggregate(conn, worker_id)
+        source = "aggregate"
+    workers = _iter_worker_stats(rows, worker_id)
 
-        return {"workers": results}
-    finally:
-        conn.close()
+    if streaming:
+        return _ndjson_response(conn, workers, lambda: {"source": source})
+    return {"workers": list(workers), "source": source}
 
 
 # ============================================================
@@ -697,21 +957,14 @@ def health():
     index_record_count = 0
     if index_exists:
         try:
-            uri = f"file:{index_db_path}?mode=ro"
-            conn = sqlite3.connect(uri, uri=True)
+            conn = _index_pool.get()
             count = conn.execute("SELECT COUNT(*) FROM search_index").fetchone()[0]
             index_record_count = count
-            conn.close()
         except Exception:
-            pass
+            _index_pool.discard()
 
     # MeCab利用可否
-    mecab_available = False
-    try:
-        get_mecab_wakati()
-        mecab_available = True
-    except Exception:
-        pass
+    mecab_available = _tokenizer.mecab_available()
 
     return {
         "status": "ok",
@@ -722,6 +975,47 @@ def health():
     }
 
 
+# ============================================================
+# 7b. GET /health/pool - 接続プール統計
+# ============================================================
+@app.get("/health/pool")
+def pool_stats():
+    return {
+        "index": _index_pool.stats(),
+        "botsunichiroku": _botsunichiroku_pool.stats(),
+        "enrich_pool": _enrich_pool.stats(),
+        "enrich_cache": _enrich_cache.stats(),
+        "tokenizer": _tokenizer.stats(),
+        "botsunichiroku_version": _botsunichiroku_version.stats(),
+        "enrich_version": _enrich_version.stats(),
+        "docs_cache": _docs.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text format。KOUSATSU_METRICS=1 で起動した場合のみ有効（無効時404）。"""
+    if not _metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="metrics disabled (set KOUSATSU_METRICS=1)")
+    pools = {"index": _index_pool.stats(), "botsunichiroku": _botsunichiroku_pool.stats(),
+             "enrich_cache": _enrich_pool.stats()}
+    cache = _enrich_cache.stats()
+    tok = _tokenizer.stats()
+    approved = _approved.cache_stats()
+    recent = _recent_commands.stats()
+    docs = _docs.stats()
+    # 接続の新規オープン数は kousatsu_connections_opened_total（接続時に計上）
+    gauges = {
+        "kousatsu_pool_connections_live": {k: v["live_connections"] for k, v in pools.items()},
+        "kousatsu_cache_hit_ratio": {"enrich": cache["hit_ratio"], "tokenizer": tok["hit_ratio"],
+                                     "approved": approved["hit_ratio"], "docs": docs["hit_ratio"]},
+        "kousatsu_cache_entries": {"tokenizer": tok["size"], "approved": approved["size"],
+                                   "recent_commands": recent["size"], "docs": docs["entries"]},
+    }
+    return PlainTextResponse(_metrics.render(gauges),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # ============================================================
 # 8. POST /reports - 足軽/部屋子が報告を登録
 # ============================================================
@@ -805,27 +1099,29 @@ def create_audit(audit: AuditCreate):
 # 10. GET /reports/{report_id} - 報告全文取得
 # ============================================================
 @app.get("/reports/{report_id}")
-def get_report(report_id: int):
+def get_report(report_id: int, request: Request, response: Response):
+    validator = _botsunichiroku_version.validator("reports")
+    not_modified = _not_modified(request, validator)
+    if not_modified is not None:
+        return not_modified
     conn = get_botsunichiroku_db()
-    try:
-        row = conn.execute(
-            "SELECT * FROM reports WHERE id = ?", (report_id,)
-        ).fetchone()
-        if row is None:
-            raise HTTPException(status_code=404, detail=f"report {report_id} not found")
-        return {
-            "id": row["id"],
-            "worker_id": row["worker_id"],
-            "task_id": row["task_id"],
-            "timestamp": row["timestamp"],
-            "status": row["status"],
-            "summary": row["summary"],
-            "notes": row["notes"],
-            "skill_candidate_name": row["skill_candidate_name"],
-            "skill_candidate_desc": row["skill_candidate_desc"],
-        }
-    finally:
-        conn.close()
+    row = conn.execute(
+        "SELECT * FROM reports WHERE id = ?", (report_id,)
+    ).fetchone()
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"report {report_id} not found")
+    _set_validator(response, validator)
+    return {
+        "id": row["id"],
+        "worker_id": row["worker_id"],
+        "task_id": row["task_id"],
+        "timestamp": row["timestamp"],
+        "status": row["status"],
+        "summary": row["summary"],
+        "notes": row["notes"],
+        "skill_candidate_name": row["skill_candidate_name"],
+        "skill_candidate_desc": row["skill_candidate_desc"],
+    }
 
 
 # ============================================================
@@ -863,60 +1159,70 @@ def create_dashboard_entry(entry: DashboardEntryCreate):
 # ============================================================
 @app.get("/dashboard")
 def get_dashboard(
+    request: Request,
+    response: Response,
     section: str = Query(None, description="セクションでフィルタ"),
     cmd_id: str = Query(None, description="cmd_idでフィルタ"),
     q: str = Query(None, description="contentのLIKE検索"),
     limit: int = Query(20, ge=1, le=100, description="返却件数"),
+    stream: bool = Query(False, description="NDJSONで逐次返却（Accept: application/x-ndjson と同じ）"),
 ):
-    conn = get_botsunichiroku_db()
-    try:
-        conditions = []
-        params: list = []
-        if section:
-            conditions.append("section = ?")
-            params.append(section)
-        if cmd_id:
-            conditions.append("cmd_id = ?")
-            params.append(cmd_id)
-        if q:
-            conditions.append("content LIKE ?")
-            params.append(f"%{q}%")
-
-        where_clause = ("WHERE " + " AND ".join(conditions)) if conditions else ""
-
-        count_cur = conn.execute(
+    streaming = _wants_ndjson(request, stream)
+    validator = _botsunichiroku_version.validator("dashboard")
+    if validator is not None and streaming:
+        validator = validator.variant("ndjson")
+    not_modified = _not_modified(request, validator)
+    if not_modified is not None:
+        return not_modified
+    conn = get_botsunichiroku_stream_db() if streaming else get_botsunichiroku_db()
+    conditions = []
+    params: list = []
+    if section:
+        conditions.append("section = ?")
+        params.append(section)
+    if cmd_id:
+        conditions.append("cmd_id = ?")
+        params.append(cmd_id)
+    if q:
+        conditions.append("content LIKE ?")
+        params.append(f"%{q}%")
+
+    where_clause = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    def count_total() -> int:
+        return conn.execute(
             f"SELECT COUNT(*) FROM dashboard_entries {where_clause}",
-            params.copy(),
-        )
-        total = count_cur.fetchone()[0]
-
-        params.append(limit)
-        cur = conn.execute(
-            f"""SELECT id, cmd_id, section, content, status, tags, created_at
-                FROM dashboard_entries
-                {where_clause}
-                ORDER BY created_at DESC
-                LIMIT ?""",
             params,
-        )
-        rows = cur.fetchall()
+        ).fetchone()[0]
 
-        entries = [
-            {
-                "id": row["id"],
-                "cmd_id": row["cmd_id"],
-                "section": row["section"],
-                "content": row["content"],
-                "status": row["status"],
-                "tags": row["tags"],
-                "created_at": row["created_at"],
-            }
-            for row in rows
-        ]
+    cur = conn.execute(
+        f"""SELECT id, cmd_id, section, content, status, tags, created_at
+            FROM dashboard_entries
+            {where_clause}
+            ORDER BY created_at DESC
+            LIMIT ?""",
+        params + [limit],
+    )
+    entries = (
+        {
+            "id": row["id"],
+            "cmd_id": row["cmd_id"],
+            "section": row["section"],
+            "content": row["content"],
+            "status": row["status"],
+            "tags": row["tags"],
+            "created_at": row["created_at"],
+        }
+        for row in cur
+    )
 
-        return {"total": total, "entries": entries}
-    finally:
-        conn.close()
+    if streaming:
+        # 件数は全エントリ送出後に数える（先頭行の送出を COUNT(*) で待たせない）
+        return _set_validator(
+            _ndjson_response(conn, entries, lambda: {"total": count_total()}), validator)
+    entries = list(entries)
+    _set_validator(response, validator)
+    return {"total": count_total(), "entries": entries}
 
 
 # ============================================================
@@ -924,44 +1230,60 @@ def get_dashboard(
 # ============================================================
 _DOCS_ROOT = Path("/app/static")
 _ALLOWED_CATEGORIES = {"instructions", "context"}
+_DOCS_MEDIA_TYPE = "text/markdown; charset=utf-8"
+# 本文+gzip版のLRU（mtime変化で無効化。大きい文書はキャッシュせず FileResponse で送る）
+_docs = _docs_cache.DocsCache()
 
 
 @app.get("/docs/{category}/{filename}")
-def get_doc(category: str, filename: str):
+def get_doc(category: str, filename: str, request: Request):
     if category not in _ALLOWED_CATEGORIES:
         raise HTTPException(status_code=404, detail=f"Unknown category: {category}")
     # パストラバーサル防止: filenameにスラッシュ・dotdotを含まないこと
     if "/" in filename or "\\" in filename or ".." in filename:
         raise HTTPException(status_code=400, detail="Invalid filename")
     doc_path = _DOCS_ROOT / category / filename
-    if not doc_path.exists() or not doc_path.is_file():
+    st = _docs_cache.stat_file(doc_path)  # stat 1回（存在・通常ファイル確認を兼ねる）
+    if st is None:
         raise HTTPException(status_code=404, detail=f"{category}/{filename} not found")
-    content = doc_path.read_text(encoding="utf-8")
-    from fastapi.responses import Response
-    return Response(content=content, media_type="text/markdown; charset=utf-8")
+    use_gzip = st.has_gzip and _docs_cache.accepts_gzip(request.headers.get("accept-encoding"))
+    validator = _conditional.Validator(st.etag, st.mtime).variant("gzip" if use_gzip else "")
+    not_modified = _not_modified(request, validator)
+    if not_modified is not None:
+        return not_modified
+    headers = {**validator.headers(), "Vary": "Accept-Encoding"}
+    doc = _docs.get(st)
+    if doc is None:
+        return FileResponse(doc_path, media_type=_DOCS_MEDIA_TYPE, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=doc.gzip, media_type=_DOCS_MEDIA_TYPE, headers=headers)
+    return Response(content=doc.data, media_type=_DOCS_MEDIA_TYPE, headers=headers)
 
 
 # ============================================================
 # 11. GET /audit/{subtask_id} - 監査結果取得
 # ============================================================
 @app.get("/audit/{subtask_id}")
-def get_audit(subtask_id: str):
+def get_audit(subtask_id: str, request: Request, response: Response):
+    validator = _botsunichiroku_version.validator("audit")
+    not_modified = _not_modified(request, validator)
+    if not_modified is not None:
+        return not_modified
     conn = get_botsunichiroku_db()
-    try:
-        row = conn.execute(
-            "SELECT id, audit_status, needs_audit, notes FROM subtasks WHERE id = ?",
-            (subtask_id,),
-        ).fetchone()
-        if row is None:
-            raise HTTPException(status_code=404, detail=f"subtask '{subtask_id}' not found")
-        return {
-            "subtask_id": subtask_id,
-            "audit_status": row["audit_status"],
-            "needs_audit": bool(row["needs_audit"]),
-            "notes": row["notes"],
-        }
-    finally:
-        conn.close()
+    row = conn.execute(
+        "SELECT id, audit_status, needs_audit, notes FROM subtasks WHERE id = ?",
+        (subtask_id,),
+    ).fetchone()
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"subtask '{subtask_id}' not found")
+    _set_validator(response, validator)
+    return {
+        "subtask_id": subtask_id,
+        "audit_status": row["audit_status"],
+        "needs_audit": bool(row["needs_audit"]),
+        "notes": row["notes"],
+    }
 
 
 # ============================================================
@@ -1004,134 +1326,280 @@ class Prediction(BaseModel):
     note: str
 
 
+# --- enrichステージ並列実行 ---
+# 各ステージは独立に実行でき、締切（ミリ秒）を超えたものは空結果で打ち切る（部分結果ポリシー）。
+# 打ち切られたステージのスレッドは止められないため、executorは上限付きで共有する。
+ENRICH_WORKERS = int(os.environ.get("KOUSATSU_ENRICH_WORKERS", "8"))
+STAGE_DEADLINES_MS = {
+    "fts5_local": int(os.environ.get("KOUSATSU_DEADLINE_FTS5_LOCAL_MS", "1000")),
+    "fts5_global": int(os.environ.get("KOUSATSU_DEADLINE_FTS5_GLOBAL_MS", "1000")),
+    "pitfall": int(os.environ.get("KOUSATSU_DEADLINE_PITFALL_MS", "1000")),
+    "positive": int(os.environ.get("KOUSATSU_DEADLINE_POSITIVE_MS", "1000")),
+    "recent": int(os.environ.get("KOUSATSU_DEADLINE_RECENT_MS", "1000")),
+    "external": int(os.environ.get("KOUSATSU_DEADLINE_EXTERNAL_MS", "3000")),
+    "prediction": int(os.environ.get("KOUSATSU_DEADLINE_PREDICTION_MS", "1000")),
+}
+
+_enrich_executor = ThreadPoolExecutor(max_workers=ENRICH_WORKERS,
+                                      thread_name_prefix="enrich")
+
+
+class _StageRunner:
+    """enrichステージを共有executorへ投入し、締切付きで結果を回収する。"""
+
+    def __init__(self) -> None:
+        self._futures: dict[str, tuple[Future, float]] = {}
+        self._elapsed_ms: dict[str, int] = {}
+        self.stages: dict[str, dict] = {}
+
+    def submit(self, name: str, fn, *args) -> None:
+        def timed():
+            t = time.monotonic()
+            try:
+                return fn(*args)
+            finally:
+                self._elapsed_ms[name] = int((time.monotonic() - t) * 1000)
+        self._futures[name] = (_enrich_executor.submit(timed), time.monotonic())
+
+    def result(self, name: str, default):
+        """ステージ結果を返す。締切超過・例外時はdefaultを返し、metaに記録する。
+
+        HTTPException（DB不在の503等）はそのまま伝播させる。
+        """
+        if name not in self._futures:
+            return default
+        future, submitted = self._futures[name]
+        deadline = submitted + STAGE_DEADLINES_MS[name] / 1000
+        try:
+            value = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            status = "ok"
+        except FutureTimeoutError:
+            future.cancel()
+            value, status = default, "timeout"
+        except HTTPException:
+            raise
+        except Exception:
+            value, status = default, "error"
+        wall_ms = self._elapsed_ms.get(name, int((time.monotonic() - submitted) * 1000))
+        self.stages[name] = {"ms": wall_ms, "status": status,
+                             "deadline_ms": STAGE_DEADLINES_MS[name]}
+        return value
+
+    def ms(self, name: str) -> int:
+        return self.stages.get(name, {}).get("ms", 0)
+
+    def timeouts(self) -> list[str]:
+        return [n for n, s in self.stages.items() if s["status"] == "timeout"]
+
+    def errors(self) -> list[str]:
+        return [n for n, s in self.stages.items() if s["status"] == "error"]
+
+    def critical_path(self) -> str | None:
+        if not self.stages:
+            return None
+        return max(self.stages, key=lambda n: self.stages[n]["ms"])
+
+
+def _fts5_local_stage(match_query: str, project: str | None,
+                      cmd_id: str) -> list[dict]:
+    """Stage 1: 同PJ内FTS5検索（局所）。"""
+    idx_conn = get_index_db()
+    if project:
+        rows = idx_conn.execute("""
+            SELECT source_type, source_id, parent_id, project,
+                   worker_id, status,
+                   snippet(search_index, 6, '...', '...', '', 64) AS snippet,
+                   rank
+            FROM search_index
+            WHERE search_index MATCH ? AND project = ?
+            ORDER BY rank LIMIT 10
+        """, (match_query, project)).fetchall()
+    else:
+        rows = idx_conn.execute("""
+            SELECT source_type, source_id, parent_id, project,
+                   worker_id, status,
+                   snippet(search_index, 6, '...', '...', '', 64) AS snippet,
+                   rank
+            FROM search_index
+            WHERE search_index MATCH ?
+            ORDER BY rank LIMIT 10
+        """, (match_query,)).fetchall()
+    results = []
+    for row in rows:
+        if row["source_id"] == cmd_id:
+            continue
+        results.append({
+            "source_type": row["source_type"],
+            "source_id": row["source_id"],
+            "project": row["project"],
+            "snippet": row["snippet"],
+            "score": row["rank"],
+            "stage": "local",
+        })
+    return results
+
+
+def _fts5_global_stage(match_query: str, project: str,
+                       cmd_id: str) -> list[dict]:
+    """Stage 2: 全PJ横断FTS5検索（拡大）。局所結果との重複除去は呼び出し側で行う。"""
+    idx_conn = get_index_db()
+    rows = idx_conn.execute("""
+        SELECT source_type, source_id, parent_id, project,
+               worker_id, status,
+               snippet(search_index, 6, '...', '...', '', 64) AS snippet,
+               rank
+        FROM search_index
+        WHERE search_index MATCH ? AND project != ?
+        ORDER BY rank LIMIT 10
+    """, (match_query, project)).fetchall()
+    results = []
+    for row in rows:
+        sid = row["source_id"]
+        if sid == cmd_id:
+            continue
+        results.append({
+            "source_type": row["source_type"],
+            "source_id": sid,
+            "project": row["project"],
+            "snippet": row["snippet"],
+            "score": row["rank"],
+            "stage": "global",
+            "hint": f"{row['project']}プロジェクトの類似タスク",
+            "confidence": round(0.5 + min(abs(row["rank"]) / 20, 0.4), 2),
+        })
+    return results
+
+
+_resource_schema_lock = threading.Lock()
+_resource_schema_version: int | None = None
+
+
+def _enrich_data_version() -> str | None:
+    """enrich結果キャッシュの版数スタンプ（enrich_cache.data_version）。
+
+    派生表（pitfall_* / approved_work）は起動後に作られるため、没日録DBのスキーマが
+    変わった時だけ読み書き接続で resource_versions のトリガを追加してから読む。
+    """
+    global _resource_schema_version
+    conn = get_botsunichiroku_db()
+    schema = conn.execute("PRAGMA schema_version").fetchone()[0]
+    if schema != _resource_schema_version:
+        with _resource_schema_lock:
+            try:
+                rw_conn = get_botsunichiroku_db_rw()
+                try:
+                    if _resource_versions.ensure_resource_versions(rw_conn):
+                        rw_conn.commit()
+                finally:
+                    rw_conn.close()
+            except sqlite3.Error:
+                pass  # 読み取り専用: 版数が取れなければキャッシュしない
+            _resource_schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    return data_version(conn, INDEX_DB)
+
+
 @app.post("/enrich")
 def enrich(req: EnrichRequest):
     t0 = time.monotonic()
 
+    # --- キャッシュ照会: 同一リクエストかつデータ版数が変わっていなければ即返却 ---
+    req_hash = request_hash(req.text, req.project, req.worker_id,
+                            req.include_external)
+    version = _enrich_data_version()
+    cached = None
+    if version is not None:
+        cached = _enrich_cache.lookup(get_enrich_cache_db(), req.cmd_id,
+                                      req_hash, version)
+    if cached is not None:
+        return {
+            "cmd_id": req.cmd_id,
+            "enriched_at": cached["enriched_at"],
+            **_json.loads(cached["content"]),
+            "meta": {
+                "source": "cache",
+                "data_version": version,
+                "total_ms": int((time.monotonic() - t0) * 1000),
+            },
+        }
+
     keywords = extract_nouns(req.text)
 
-    # --- Stage 1: 同PJ内FTS5検索（局所） ---
-    local_results = []
-    t_local = 0
+    # --- 独立ステージを一斉投入 ---
+    runner = _StageRunner()
     if keywords:
         match_query = " OR ".join(f'"{kw}"' for kw in keywords[:15])
-        idx_conn = get_index_db()
-        try:
-            t1 = time.monotonic()
-            if req.project:
-                rows = idx_conn.execute("""
-                    SELECT source_type, source_id, parent_id, project,
-                           worker_id, status,
-                           snippet(search_index, 6, '...', '...', '', 64) AS snippet,
-                           rank
-                    FROM search_index
-                    WHERE search_index MATCH ? AND project = ?
-                    ORDER BY rank LIMIT 10
-                """, (match_query, req.project)).fetchall()
-            else:
-                rows = idx_conn.execute("""
-                    SELECT source_type, source_id, parent_id, project,
-                           worker_id, status,
-                           snippet(search_index, 6, '...', '...', '', 64) AS snippet,
-                           rank
-                    FROM search_index
-                    WHERE search_index MATCH ?
-                    ORDER BY rank LIMIT 10
-                """, (match_query,)).fetchall()
-            t_local = int((time.monotonic() - t1) * 1000)
-            for row in rows:
-                if row["source_id"] == req.cmd_id:
-                    continue
-                local_results.append({
-                    "source_type": row["source_type"],
-                    "source_id": row["source_id"],
-                    "project": row["project"],
-                    "snippet": row["snippet"],
-                    "score": row["rank"],
-                    "stage": "local",
-                })
-        finally:
-            idx_conn.close()
-
-    # --- Stage 2: 全PJ横断FTS5検索（拡大） ---
-    global_results = []
-    t_global = 0
-    if keywords and req.project:
-        local_ids = {r["source_id"] for r in local_results}
-        idx_conn = get_index_db()
-        try:
-            t2 = time.monotonic()
-            rows = idx_conn.execute("""
-                SELECT source_type, source_id, parent_id, project,
-                       worker_id, status,
-                       snippet(search_index, 6, '...', '...', '', 64) AS snippet,
-                       rank
-                FROM search_index
-                WHERE search_index MATCH ? AND project != ?
-                ORDER BY rank LIMIT 10
-            """, (match_query, req.project)).fetchall()
-            t_global = int((time.monotonic() - t2) * 1000)
-            for row in rows:
-                sid = row["source_id"]
-                if sid == req.cmd_id or sid in local_ids:
-                    continue
-                global_results.append({
-                    "source_type": row["source_type"],
-                    "source_id": sid,
-                    "project": row["project"],
-                    "snippet": row["snippet"],
-                    "score": row["rank"],
-                    "stage": "global",
-                    "hint": f"{row['project']}プロジェクトの類似タスク",
-                    "confidence": round(0.5 + min(abs(row["rank"]) / 20, 0.4), 2),
-                })
-        finally:
-            idx_conn.close()
-
-    # --- Stage 2b: pitfalls抽出 ---
-    t_pit = time.monotonic()
-    pitfalls = _extract_pitfalls(keywords, req.worker_id)
-    t_pitfall = int((time.monotonic() - t_pit) * 1000)
-
-    # --- Stage 2c: positive_patterns抽出 ---
-    positive_patterns = _extract_positive_patterns(keywords)
+        runner.submit("fts5_local", _fts5_local_stage,
+                      match_query, req.project, req.cmd_id)
+        if req.project:
+            runner.submit("fts5_global", _fts5_global_stage,
+                          match_query, req.project, req.cmd_id)
+    runner.submit("pitfall", _extract_pitfalls, keywords, req.worker_id)
+    runner.submit("positive", _extract_positive_patterns, keywords)
+    runner.submit("recent", _search_recent_cmds, keywords, req.cmd_id)
+    runner.submit("prediction", _predict_decision,
+                  keywords, req.project, req.cmd_id)
+
+    # --- Stage 1 + 2d: 局所FTS5 + 直近24h LIKE補完 ---
+    local_results = runner.result("fts5_local", [])
+    local_ids = {r["source_id"] for r in local_results}
+    local_results.extend(runner.result("recent", []))
+
+    # --- Stage 3: 外部検索（sanitized）。局所ヒットが乏しい時のみ ---
+    if req.include_external and len(local_results) <= 2:
+        runner.submit("external", _search_external_sanitized, keywords)
 
-    # --- Stage 2d: 直近24h SQL LIKE補完 ---
-    recent = _search_recent_cmds(keywords, req.cmd_id)
-    local_results.extend(recent)
+    # --- Stage 2: 全PJ横断（局所と重複するものを除外） ---
+    global_results = [r for r in runner.result("fts5_global", [])
+                      if r["source_id"] not in local_ids]
 
-    # --- Stage 3: 外部検索（sanitized） ---
-    external = []
-    if req.include_external and len(local_results) <= 2:
-        external = _search_external_sanitized(keywords)
+    # --- Stage 2b/2c: pitfalls + positive_patterns ---
+    pitfalls = runner.result("pitfall", [])
+    positive_patterns = runner.result("positive", [])
 
     # --- TAGE的判断予測 ---
-    prediction = _predict_decision(keywords, req.project, req.cmd_id)
+    prediction = runner.result("prediction", None)
 
-    # --- キャッシュ保存 ---
-    _cache_enrichment(req.cmd_id, local_results, pitfalls,
-                      positive_patterns, prediction, global_results, external)
+    external = runner.result("external", [])
 
-    total_ms = int((time.monotonic() - t0) * 1000)
-    return {
-        "cmd_id": req.cmd_id,
-        "enriched_at": _now_iso(),
+    enriched_at = _now_iso()
+    result = {
         "internal": local_results[:10],
         "pitfalls": [p if isinstance(p, dict) else p.dict() for p in pitfalls[:5]],
         "positive_patterns": [p if isinstance(p, dict) else p.dict() for p in positive_patterns[:5]],
         "prediction": prediction.dict() if prediction else None,
         "cross_project": global_results[:5],
         "external": external[:5],
+    }
+
+    # --- キャッシュ保存（打ち切り・失敗ステージを含む部分結果は保存しない） ---
+    if version is not None and not runner.timeouts() and not runner.errors():
+        _cache_enrichment(req.cmd_id, req_hash, version, result, enriched_at)
+
+    total_ms = int((time.monotonic() - t0) * 1000)
+    return {
+        "cmd_id": req.cmd_id,
+        "enriched_at": enriched_at,
+        **result,
         "meta": {
+            "source": "live",
+            "data_version": version,
             "internal_hits": len(local_results),
             "pitfall_hits": len(pitfalls),
             "positive_hits": len(positive_patterns),
             "cross_project_hits": len(global_results),
             "prediction_table": (prediction.basis[0]["table"]
                                  if prediction and prediction.basis else None),
-            "fts5_local_ms": t_local,
-            "fts5_global_ms": t_global,
-            "pitfall_query_ms": t_pitfall,
+            "fts5_local_ms": runner.ms("fts5_local"),
+            "fts5_global_ms": runner.ms("fts5_global"),
+            "pitfall_query_ms": runner.ms("pitfall"),
+            "positive_query_ms": runner.ms("positive"),
+            "recent_query_ms": runner.ms("recent"),
+            "external_ms": runner.ms("external"),
+            "prediction_ms": runner.ms("prediction"),
+            "stages": runner.stages,
+            "critical_path": runner.critical_path(),
+            "timeouts": runner.timeouts(),
+            "stage_errors": runner.errors(),
             "total_ms": total_ms,
             "keywords": keywords[:10],
         },
@@ -1143,97 +1611,57 @@ def enrich(req: EnrichRequest):
 # ============================================================
 
 @app.get("/enrich/{cmd_id}")
-def get_enrichment(cmd_id: str):
-    """キャッシュ済みenrich結果を取得。"""
-    bot_conn = get_botsunichiroku_db()
-    try:
-        row = bot_conn.execute("""
-            SELECT content, created_at FROM dashboard_entries
-            WHERE cmd_id = ? AND section = 'enrich_cache'
-            ORDER BY created_at DESC LIMIT 1
-        """, (cmd_id,)).fetchone()
-        if not row:
-            raise HTTPException(status_code=404,
-                                detail=f"No enrichment found for {cmd_id}")
-        cached = _json.loads(row["content"])
-        return {
-            "cmd_id": cmd_id,
-            "enriched_at": row["created_at"],
-            **cached,
-            "meta": {"source": "cache"},
-        }
-    finally:
-        bot_conn.close()
+def get_enrichment(cmd_id: str, request: Request, response: Response):
+    """キャッシュ済みenrich結果を取得（版数・TTLに関わらず最新の保存結果）。"""
+    validator = _enrich_version.validator()
+    not_modified = _not_modified(request, validator)
+    if not_modified is not None:
+        return not_modified
+    row = _enrich_cache.get(get_enrich_cache_db(), cmd_id)
+    if not row:
+        raise HTTPException(status_code=404,
+                            detail=f"No enrichment found for {cmd_id}")
+    _set_validator(response, validator)
+    return {
+        "cmd_id": cmd_id,
+        "enriched_at": row["enriched_at"],
+        **_json.loads(row["content"]),
+        "meta": {"source": "cache", "data_version": row["data_version"]},
+    }
 
 
 # ============================================================
 # Internal: pitfalls抽出
 # ============================================================
 
-def _extract_pitfalls(keywords: list[str], worker_id: str | None) -> list[dict]:
-    """没日録DBから失敗パターンを抽出する。"""
-    bot_conn = get_botsunichiroku_db()
-    pitfalls = []
+_derived_index_lock = threading.Lock()
+
+
+def _read_derived(read, ensure):
+    """派生インデックス（scripts/botsu/*.py のトリガ維持表）から読む。
+
+    表が未作成のDBでは初回のみ読み書き接続で ensure（作成+バックフィル）してから読み直す。
+    作成した表の resource_versions トリガも同じトランザクションで入れる（enrichキャッシュの版数）。
+    """
     try:
-        patterns = [
-            ("P001", "%コミット漏れ%", "high",
-             "commit忘れ", "inbox descriptionに「git add+commit+push」を明記"),
-            ("P002", "%ハルシネーション%", "critical",
-             "ハルシネーション", "成果物の実在確認（git ls-remote, ls -la）を必須化"),
-            ("P002", "%捏造%", "critical",
-             "捏造", "成果物の実在確認を必須化"),
-            ("P003", "%マージ%", "medium",
-             "マージ問題", "ブランチ分岐状況を事前確認"),
-            ("P004", "%差し戻%", "medium",
-             "差し戻し", "直近の差し戻し理由を確認"),
-        ]
-        seen_ids: set[str] = set()
-        for pid, like_pattern, severity, desc_label, prevention in patterns:
-            rows = bot_conn.execute("""
-                SELECT s.id, s.parent_cmd, s.worker_id,
-                       substr(s.description, 1, 100) AS description,
-                       r.summary AS report_summary
-                FROM subtasks s
-                LEFT JOIN reports r ON r.task_id = s.id
-                WHERE (r.summary LIKE ? OR s.description LIKE ?)
-                  AND s.status IN ('blocked', 'cancelled', 'done')
-                ORDER BY s.completed_at DESC LIMIT 3
-            """, (like_pattern, like_pattern)).fetchall()
-            for row in rows:
-                if row["id"] in seen_ids:
-                    continue
-                seen_ids.add(row["id"])
-                pitfalls.append({
-                    "pattern_id": pid,
-                    "source_id": row["id"],
-                    "severity": severity,
-                    "description": f"{desc_label}: {row['description']}",
-                    "prevention": prevention,
-                })
-
-        # P005: worker別の失敗パターン
-        if worker_id:
-            rows = bot_conn.execute("""
-                SELECT s.id, substr(s.description, 1, 100) AS description
-                FROM subtasks s
-                WHERE s.worker_id = ? AND s.status IN ('blocked', 'cancelled')
-                ORDER BY s.completed_at DESC LIMIT 3
-            """, (worker_id,)).fetchall()
-            for row in rows:
-                if row["id"] not in seen_ids:
-                    pitfalls.append({
-                        "pattern_id": "P005",
-                        "source_id": row["id"],
-                        "severity": "medium",
-                        "description": f"{worker_id}の過去失敗: {row['description']}",
-                        "prevention": f"{worker_id}に割り当て時は過去の失敗パターンに注意",
-                    })
-    finally:
-        bot_conn.close()
+        return read(get_botsunichiroku_db())
+    except sqlite3.OperationalError:
+        pass
+    with _derived_index_lock:
+        rw_conn = get_botsunichiroku_db_rw()
+        try:
+            if ensure(rw_conn):
+                _resource_versions.ensure_resource_versions(rw_conn)
+                rw_conn.commit()
+        finally:
+            rw_conn.close()
+    return read(get_botsunichiroku_db())
 
-    order = {"critical": 0, "high": 1, "medium": 2, "low": 3}
-    pitfalls.sort(key=lambda x: order.get(x["severity"], 4))
-    return pitfalls
+
+def _extract_pitfalls(keywords: list[str], worker_id: str | None) -> list[dict]:
+    """没日録DBから失敗パターンを抽出する（pitfall_hits の索引読み。scripts/botsu/pitfalls.py）。"""
+    return _read_derived(lambda conn: _pitfalls.read_pitfalls(conn, worker_id),
+                         _pitfalls.ensure_pitfall_index)
 
 
 # ============================================================
@@ -1241,39 +1669,14 @@ def _extract_pitfalls(keywords: list[str], worker_id: str | None) -> list[dict]:
 # ============================================================
 
 def _extract_positive_patterns(keywords: list[str]) -> list[dict]:
-    """audit PASS済みの成功パターンを抽出する。"""
+    """audit PASS済みの成功パターンを抽出する（approved_fts の1クエリ。scripts/botsu/approved.py）。
+
+    結果は (承認済み作業の版数, キーワード集合) 単位でプロセス内キャッシュされる。
+    """
     if not keywords:
         return []
-    bot_conn = get_botsunichiroku_db()
-    results = []
-    seen: set[str] = set()
-    try:
-        for kw in keywords[:5]:
-            rows = bot_conn.execute("""
-                SELECT s.id, s.project, s.worker_id,
-                       substr(s.description, 1, 120) AS description,
-                       r.summary AS report_summary
-                FROM subtasks s
-                JOIN reports r ON r.task_id = s.id AND r.status = 'done'
-                WHERE s.audit_status = 'done'
-                  AND (s.description LIKE '%' || ? || '%'
-                       OR r.summary LIKE '%' || ? || '%')
-                ORDER BY s.completed_at DESC LIMIT 3
-            """, (kw, kw)).fetchall()
-            for row in rows:
-                if row["id"] in seen:
-                    continue
-                seen.add(row["id"])
-                results.append({
-                    "source_id": row["id"],
-                    "project": row["project"] or "",
-                    "description": f"{row['description']} → audit PASS",
-                    "strength": "high" if len(rows) >= 3 else "medium",
-                    "hint": "この方向を継続せよ",
-                })
-    finally:
-        bot_conn.close()
-    return results
+    return _read_derived(lambda conn: _approved.search_approved(conn, keywords),
+                         _approved.ensure_approved_index)
 
 
 # ============================================================
@@ -1282,88 +1685,11 @@ def _extract_positive_patterns(keywords: list[str]) -> list[dict]:
 
 def _predict_decision(keywords: list[str], project: str | None,
                       cmd_id: str) -> Prediction | None:
-    """殿の過去裁定履歴から判断を予測する。TAGE分岐予測器方式。"""
-    if not keywords:
+    """殿の過去裁定履歴から判断を予測する。TAGE分岐予測器方式（predictor.py）。"""
+    if not keywords or not _botsunichiroku_pool.exists():
         return None
-    bot_conn = get_botsunichiroku_db()
-    try:
-        # T1: 直近cmd（最短履歴テーブル）
-        t1_rows = bot_conn.execute("""
-            SELECT c.id, c.command, c.details, c.project
-            FROM commands c
-            WHERE c.status = 'done' AND c.id != ?
-            ORDER BY c.created_at DESC LIMIT 5
-        """, (cmd_id,)).fetchall()
-
-        # T2: 同PJ内（中程度履歴テーブル）
-        t2_rows = []
-        if project:
-            t2_rows = bot_conn.execute("""
-                SELECT c.id, c.command, c.details
-                FROM commands c
-                WHERE c.project = ? AND c.status = 'done' AND c.id != ?
-                ORDER BY c.created_at DESC LIMIT 10
-            """, (project, cmd_id)).fetchall()
-
-        # T3: 全PJ（最長履歴テーブル）
-        t3_rows = bot_conn.execute("""
-            SELECT c.id, c.command, c.details
-            FROM commands c
-            WHERE c.status = 'done' AND c.id != ?
-            ORDER BY c.created_at DESC LIMIT 30
-        """, (cmd_id,)).fetchall()
-
-        # 既知の判断パターン（殿の好み）
-        known_patterns = [
-            {"question": "DBエンジン選定",
-             "keywords": ["DB", "データベース", "SQLite", "Postgres"],
-             "predicted_choice": "SQLite",
-             "reason": "殿のマクガイバー精神。月額課金回避"},
-            {"question": "言語選定",
-             "keywords": ["Python", "Go", "Rust", "言語"],
-             "predicted_choice": "Python",
-             "reason": "既存基盤がPython。Simple>Complex"},
-            {"question": "デプロイ方式",
-             "keywords": ["Docker", "デプロイ", "コンテナ"],
-             "predicted_choice": "Docker Compose",
-             "reason": "既存高札がDocker Compose"},
-            {"question": "設計方針",
-             "keywords": ["設計", "アーキテクチャ"],
-             "predicted_choice": "マクガイバー精神（ありもの活用）",
-             "reason": "新規依存最小化"},
-        ]
-
-        for pattern in known_patterns:
-            if any(kw in keywords for kw in pattern["keywords"]):
-                basis = []
-                for table_name, table_rows in [("T1", t1_rows),
-                                                ("T2", t2_rows),
-                                                ("T3", t3_rows)]:
-                    for row in table_rows:
-                        text = f"{row['command']} {row['details'] or ''}"
-                        if any(pk in text for pk in pattern["keywords"]):
-                            basis.append({
-                                "table": table_name,
-                                "source": f"{row['id']}: {row['command'][:60]}",
-                                "match": True,
-                            })
-                if basis:
-                    conf = ("high" if len(basis) >= 3
-                            else ("medium" if len(basis) >= 2 else "low"))
-                    return Prediction(
-                        question=pattern["question"],
-                        predicted_choice=pattern["predicted_choice"],
-                        confidence=conf,
-                        basis=basis[:5],
-                        note=(f"確信度{conf}。" + (
-                            "足軽は投機実行可。ミスプレディクション時はaudit FAILで巻き戻し"
-                            if conf == "high"
-                            else "家老が殿に確認推奨"
-                        )),
-                    )
-    finally:
-        bot_conn.close()
-    return None
+    prediction = _predictor.predict(keywords, project, cmd_id)
+    return Prediction(**prediction) if prediction else None
 
 
 # ============================================================
@@ -1372,37 +1698,10 @@ def _predict_decision(keywords: list[str], project: str | None,
 
 def _search_recent_cmds(keywords: list[str],
                         exclude_cmd_id: str) -> list[dict]:
-    """直近24時間のcmdをSQL LIKEで検索。"""
-    if not keywords:
+    """直近N時間（KOUSATSU_RECENT_WINDOW_HOURS、既定24）のcmdをキーワード部分一致で検索。"""
+    if not keywords or not _botsunichiroku_pool.exists():
         return []
-    bot_conn = get_botsunichiroku_db()
-    results = []
-    try:
-        for kw in keywords[:5]:
-            rows = bot_conn.execute("""
-                SELECT id, project, status,
-                       substr(command || ' ' || COALESCE(details, ''), 1, 200) AS snippet
-                FROM commands
-                WHERE created_at > datetime('now', '-24 hours')
-                  AND id != ?
-                  AND (command LIKE '%' || ? || '%'
-                       OR details LIKE '%' || ? || '%')
-                LIMIT 3
-            """, (exclude_cmd_id, kw, kw)).fetchall()
-            for row in rows:
-                results.append({
-                    "source_type": "command_recent",
-                    "source_id": row["id"],
-                    "project": row["project"],
-                    "snippet": row["snippet"],
-                    "score": 0,
-                    "stage": "local",
-                })
-    finally:
-        bot_conn.close()
-    seen: set[str] = set()
-    return [r for r in results
-            if r["source_id"] not in seen and not seen.add(r["source_id"])]
+    return _recent_commands.search(keywords, exclude_cmd_id)
 
 
 # ============================================================
@@ -1410,38 +1709,42 @@ def _search_recent_cmds(keywords: list[str],
 # ============================================================
 
 def _search_external_sanitized(keywords: list[str]) -> list[dict]:
-    """外部Web検索を実行し、sanitizerでフィルタして返す。"""
+    """外部Web検索を実行し、sanitizerでフィルタして返す。
+
+    同じキーワード集合はTTL内ならディスクキャッシュから返る。取得失敗・連続失敗中の
+    ブレーカ開放（extfetch.CircuitOpenError。ネットワークには出ない）は例外のまま伝播させ、
+    _StageRunner がステージエラーとして記録する（縮退した結果はキャッシュしない）。
+    """
     from sanitizer import sanitize_external_result
 
     results = []
     query = " ".join(keywords[:5])
+    body = _external_fetcher.fetch(query)
+    if not body:
+        return results
     try:
-        url = (f"https://api.duckduckgo.com/"
-               f"?q={urllib.parse.quote(query)}&format=json&no_html=1")
-        req = urllib.request.Request(url, headers={"User-Agent": "kousatsu/2.0"})
-        with urllib.request.urlopen(req, timeout=5) as resp:
-            data = _json.loads(resp.read())
-            if data.get("Abstract"):
-                sanitized = sanitize_external_result({
-                    "source": "duckduckgo",
-                    "title": data.get("Heading", ""),
-                    "snippet": data["Abstract"],
-                    "url": data.get("AbstractURL", ""),
-                })
-                if sanitized:
-                    results.append(sanitized)
-            for topic in (data.get("RelatedTopics") or [])[:3]:
-                if isinstance(topic, dict) and topic.get("Text"):
-                    sanitized = sanitize_external_result({
-                        "source": "duckduckgo",
-                        "title": topic.get("Text", "")[:80],
-                        "snippet": topic.get("Text", ""),
-                        "url": topic.get("FirstURL", ""),
-                    })
-                    if sanitized:
-                        results.append(sanitized)
-    except Exception:
-        pass  # 外部検索失敗はgraceful degradation
+        data = _json.loads(body)
+    except ValueError:
+        return results  # 応答がJSONでない（検索結果なし扱い）
+    if data.get("Abstract"):
+        sanitized = sanitize_external_result({
+            "source": "duckduckgo",
+            "title": data.get("Heading", ""),
+            "snippet": data["Abstract"],
+            "url": data.get("AbstractURL", ""),
+        })
+        if sanitized:
+            results.append(sanitized)
+    for topic in (data.get("RelatedTopics") or [])[:3]:
+        if isinstance(topic, dict) and topic.get("Text"):
+            sanitized = sanitize_external_result({
+                "source": "duckduckgo",
+                "title": topic.get("Text", "")[:80],
+                "snippet": topic.get("Text", ""),
+                "url": topic.get("FirstURL", ""),
+            })
+            if sanitized:
+                results.append(sanitized)
     return results
 
 
@@ -1449,26 +1752,11 @@ def _search_external_sanitized(keywords: list[str]) -> list[dict]:
 # Internal: キャッシュ保存
 # ============================================================
 
-def _cache_enrichment(cmd_id, internal, pitfalls, positive_patterns,
-                      prediction, cross_project, external):
-    """結果をdashboard_entriesにキャッシュ保存。"""
-    bot_conn = get_botsunichiroku_db_rw()
+def _cache_enrichment(cmd_id, req_hash, version, result, enriched_at):
+    """結果をenrich結果キャッシュDBに保存（cmd_id毎に上書き）。"""
+    conn = get_enrich_cache_db_rw()
     try:
-        cache_data = _json.dumps({
-            "internal": internal[:10],
-            "pitfalls": [p if isinstance(p, dict) else p.dict()
-                         for p in pitfalls[:5]],
-            "positive_patterns": [p if isinstance(p, dict) else p.dict()
-                                  for p in positive_patterns[:5]],
-            "prediction": (prediction.dict() if prediction else None),
-            "cross_project": cross_project[:5],
-            "external": external[:5],
-        }, ensure_ascii=False)
-        bot_conn.execute("""
-            INSERT INTO dashboard_entries
-                (cmd_id, section, content, status, created_at)
-            VALUES (?, 'enrich_cache', ?, 'cached', datetime('now'))
-        """, (cmd_id, cache_data))
-        bot_conn.commit()
+        _enrich_cache.store(conn, cmd_id, req_hash, version,
+                            result, enriched_at)
     finally:
-        bot_conn.close()
+        conn.close()
@@ -0,0 +1,228 @@
+"""metrics.py — 高札 /metrics 用の軽量計測（Prometheus text format、stdlib のみ）
+
+KOUSATSU_METRICS=1 の時のみ有効。無効時は以下を一切行わない:
+  - リクエスト計測ミドルウェアの登録（main.py 側で ENABLED を見て登録しない）
+  - SQLite 接続の計測用ファクトリ（connect_kwargs() が空で通常の sqlite3.Connection）
+  - トークナイザ呼び出しのラップ（instrument() が元の関数をそのまま返す）
+
+計測対象:
+  - kousatsu_request_duration_seconds{route,method,status}  ルート毎のレイテンシ
+  - kousatsu_sql_duration_seconds{query}                    名前付きクエリ毎の実行時間
+  - kousatsu_tokenizer_duration_seconds{mode}               MeCab（LRU込み）の所要時間
+  - 接続数・キャッシュヒット率は render() 時に各 stats() から gauge として出力
+
+SQL時間は計測用の接続クラスで Connection.execute() の所要時間
+（最初の行が得られるまでのステップ）を計る。Python の sqlite3 のトレースコールバックは
+文の開始しか通知せず所要時間を取れないため、トレースコールバックは
+実行された全SQL文（PRAGMA 等を含む）を種別毎に数える用途に使う。
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+ENABLED = os.environ.get("KOUSATSU_METRICS", "").lower() in ("1", "true", "yes")
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class Histogram:
+    """ラベル組毎の累積バケット・合計・件数。スレッドセーフ。"""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...],
+                 buckets: tuple[float, ...]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: tuple[str, ...], seconds: float) -> None:
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(k, list(v[0]), v[1], v[2]) for k, v in sorted(self._series.items())]
+        for label_values, counts, total, n in snapshot:
+            base = _labels(self.labels, label_values)
+            for bound, c in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {c}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {n}')
+            lines.append(f"{self.name}_sum{{{base}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {n}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+REQUESTS = Histogram("kousatsu_request_duration_seconds", "HTTP request latency by route.",
+                     ("route", "method", "status"), REQUEST_BUCKETS)
+SQL = Histogram("kousatsu_sql_duration_seconds", "SQLite execute() time by named query.",
+                ("query",), FAST_BUCKETS)
+TOKENIZER = Histogram("kousatsu_tokenizer_duration_seconds", "Tokenizer call time (LRU included).",
+                      ("mode",), FAST_BUCKETS)
+
+_counter_lock = threading.Lock()
+_counters: dict[tuple[str, str], int] = {}
+
+
+def inc(name: str, label: str = "", n: int = 1) -> None:
+    if not ENABLED:
+        return
+    with _counter_lock:
+        _counters[(name, label)] = _counters.get((name, label), 0) + n
+
+
+# ---------------------------------------------------------------------------
+# SQL クエリ名
+# ---------------------------------------------------------------------------
+
+_SQL_NAMES: dict[str, str] = {}
+_fallback_names: OrderedDict[str, str] = OrderedDict()
+_FALLBACK_MAX = 512
+_names_lock = threading.Lock()
+_VERB_TABLE_RE = re.compile(
+    r"^\s*(?:WITH\b.*?\)\s*)?(SELECT|INSERT|UPDATE|DELETE|REPLACE|PRAGMA|CREATE)\b"
+    r"(?:.*?\b(?:FROM|INTO|UPDATE|TABLE)\s+([\w.]+))?",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def named(name: str, sql: str) -> str:
+    """SQL文字列にメトリクス名を付けて返す（モジュール定数の定義時に使う）。"""
+    _SQL_NAMES[sql] = name
+    return sql
+
+
+def query_name(sql: str) -> str:
+    name = _SQL_NAMES.get(sql)
+    if name is not None:
+        return name
+    with _names_lock:
+        name = _fallback_names.get(sql)
+        if name is not None:
+            return name
+    m = _VERB_TABLE_RE.match(sql)
+    if m:
+        name = m.group(1).lower() + (f"_{m.group(2).lower()}" if m.group(2) else "")
+    else:
+        name = "other"
+    with _names_lock:
+        _fallback_names[sql] = name
+        while len(_fallback_names) > _FALLBACK_MAX:
+            _fallback_names.popitem(last=False)
+    return name
+
+
+class TimedConnection(sqlite3.Connection):
+    """execute() / executemany() の所要時間をクエリ名別に記録する接続。"""
+
+    def execute(self, sql, *args):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            SQL.observe((query_name(sql),), time.perf_counter() - start)
+
+    def executemany(self, sql, *args):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            SQL.observe((query_name(sql),), time.perf_counter() - start)
+
+
+def _trace(statement: str) -> None:
+    # 展開済みSQL（パラメータ値入り）が渡るため、文の種別（先頭キーワード）のみで数える
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    inc("kousatsu_sql_statements_total", verb)
+
+
+def connect_kwargs() -> dict:
+    """sqlite3.connect() への追加引数。有効時のみ計測用の接続クラスを指定する。"""
+    return {"factory": TimedConnection} if ENABLED else {}
+
+
+def attach(conn: sqlite3.Connection, kind: str) -> sqlite3.Connection:
+    """新規接続の計上とトレースコールバック設定。無効時は何もしない。"""
+    if ENABLED:
+        inc("kousatsu_connections_opened_total", kind)
+        conn.set_trace_callback(_trace)
+    return conn
+
+
+# ---------------------------------------------------------------------------
+# トークナイザ
+# ---------------------------------------------------------------------------
+
+def instrument(mode: str, func):
+    """トークナイザ関数を計測付きでラップする。無効時は func をそのまま返す。"""
+    if not ENABLED:
+        return func
+
+    def timed(text):
+        start = time.perf_counter()
+        try:
+            return func(text)
+        finally:
+            TOKENIZER.observe((mode,), time.perf_counter() - start)
+
+    timed.__doc__ = func.__doc__
+    timed.__name__ = func.__name__
+    return timed
+
+
+# ---------------------------------------------------------------------------
+# 出力
+# ---------------------------------------------------------------------------
+
+def render(gauges: dict[str, dict[str, float]]) -> str:
+    """Prometheus text format を返す。gauges は {metric名: {label値: 値}}（label名は "name"）。"""
+    lines: list[str] = []
+    for hist in (REQUESTS, SQL, TOKENIZER):
+        lines.extend(hist.render())
+
+    with _counter_lock:
+        counters = sorted(_counters.items())
+    seen: set[str] = set()
+    for (name, label), value in counters:
+        if name not in seen:
+            lines.append(f"# TYPE {name} counter")
+            seen.add(name)
+        lines.append(f'{name}{{name="{_escape(label)}"}} {value}')
+
+    for name, series in gauges.items():
+        lines.append(f"# TYPE {name} gauge")
+        for label, value in series.items():
+            lines.append(f'{name}{{name="{_escape(label)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    """全計測値を破棄する（テスト用）。"""
+    for hist in (REQUESTS, SQL, TOKENIZER):
+        with hist._lock:
+            hist._series.clear()
+    with _counter_lock:
+        _counters.clear()
@@ -0,0 +1,262 @@
+"""predictor.py — enrich の TAGE的判断予測（殿の過去裁定履歴）エンジン
+
+旧実装は予測の度に T1/T2/T3 の履歴テーブル（直近5件 / 同PJ直近10件 / 直近30件の done cmd）を
+SQLで引き直し、全行をハードコードの既知パターンと部分一致で突き合わせていた。
+
+本モジュールは履歴テーブルをメモリに保持する。
+  - commands 表自身の版数（resource_versions の commands 行。commands の INSERT / DELETE と
+    履歴に効く列の UPDATE でトリガが進める）が変わった時のみ再構築する。
+    報告・subtask・索引キュー等、他の表への書き込みでは再構築しない
+    （resource_versions が無いDBでは専用接続の PRAGMA data_version で代用する）
+      * T1/T3: (status, created_at) 索引を降順に LIMIT 件だけ読む
+      * T2   : 要求されたPJのみ遅延構築（(project, status, created_at) 索引）
+  - パターン照合は cmd 毎に1回だけ行い（本文が変わらない限り再利用）、
+    テーブル毎に「パターン → 該当行」を前計算しておく
+  - 予測はキーワード → パターンの辞書引きと、該当行の先頭数件の参照のみ
+
+履歴長は KOUSATSU_TAGE_LENGTHS（"T1,T2,T3"、既定 "5,10,30"）、
+既知パターンは KOUSATSU_PREDICTION_PATTERNS（JSONファイル）で差し替えられる。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Callable
+
+# 既知の判断パターン（殿の好み）。KOUSATSU_PREDICTION_PATTERNS 未指定時に使う
+DEFAULT_PATTERNS = [
+    {"question": "DBエンジン選定",
+     "keywords": ["DB", "データベース", "SQLite", "Postgres"],
+     "predicted_choice": "SQLite",
+     "reason": "殿のマクガイバー精神。月額課金回避"},
+    {"question": "言語選定",
+     "keywords": ["Python", "Go", "Rust", "言語"],
+     "predicted_choice": "Python",
+     "reason": "既存基盤がPython。Simple>Complex"},
+    {"question": "デプロイ方式",
+     "keywords": ["Docker", "デプロイ", "コンテナ"],
+     "predicted_choice": "Docker Compose",
+     "reason": "既存高札がDocker Compose"},
+    {"question": "設計方針",
+     "keywords": ["設計", "アーキテクチャ"],
+     "predicted_choice": "マクガイバー精神（ありもの活用）",
+     "reason": "新規依存最小化"},
+]
+
+PATTERN_FIELDS = ("question", "keywords", "predicted_choice", "reason")
+MAX_BASIS = 5
+
+
+def _parse_lengths(value: str) -> tuple[int, int, int]:
+    t1, t2, t3 = (int(v) for v in value.split(","))
+    return t1, t2, t3
+
+
+DEFAULT_LENGTHS = _parse_lengths(os.environ.get("KOUSATSU_TAGE_LENGTHS", "5,10,30"))
+
+_GLOBAL_SQL = """
+    SELECT id, command, details, project
+    FROM commands
+    WHERE status = 'done'
+    ORDER BY created_at DESC LIMIT ?
+"""
+_PROJECT_SQL = """
+    SELECT id, command, details, project
+    FROM commands
+    WHERE project = ? AND status = 'done'
+    ORDER BY created_at DESC LIMIT ?
+"""
+
+
+def load_patterns(path: str | None = None) -> list[dict]:
+    """既知パターンを読み込む。path（既定 KOUSATSU_PREDICTION_PATTERNS）未指定なら既定値。
+
+    JSONは PATTERN_FIELDS を持つオブジェクトの配列。形式不正は ValueError。
+    """
+    path = path if path is not None else os.environ.get("KOUSATSU_PREDICTION_PATTERNS", "")
+    if not path:
+        return [dict(p) for p in DEFAULT_PATTERNS]
+    with open(path, encoding="utf-8") as f:
+        patterns = json.load(f)
+    if not isinstance(patterns, list):
+        raise ValueError(f"{path}: パターンはJSON配列で指定すること")
+    for i, p in enumerate(patterns):
+        missing = [k for k in PATTERN_FIELDS if k not in p]
+        if missing:
+            raise ValueError(f"{path}: patterns[{i}] に {', '.join(missing)} が無い")
+        if not isinstance(p["keywords"], list) or not p["keywords"]:
+            raise ValueError(f"{path}: patterns[{i}].keywords は空でない配列で指定すること")
+    return patterns
+
+
+class _Table:
+    """履歴テーブル1本（新しい順の行と、パターン番号 → 該当行の前計算）。"""
+
+    def __init__(self, name: str, length: int, rows: list[tuple], n_patterns: int) -> None:
+        self.name = name
+        self.length = length
+        # rows: (id, command先頭60字, 該当パターン番号集合)。除外cmd分として length+1 行まで持つ
+        self.positions = {row[0]: i for i, row in enumerate(rows)}
+        self.by_pattern: list[list[tuple[int, str, str]]] = [[] for _ in range(n_patterns)]
+        for i, (cmd_id, head, matched) in enumerate(rows):
+            for p in matched:
+                self.by_pattern[p].append((i, cmd_id, head))
+
+    def basis(self, pattern: int, exclude_id: str, limit: int) -> list[dict]:
+        """exclude_id を除いた先頭 length 行のうち pattern に該当するものを最大 limit 件。"""
+        excluded = self.positions.get(exclude_id)
+        end = self.length + 1 if excluded is not None and excluded <= self.length else self.length
+        out = []
+        for pos, cmd_id, head in self.by_pattern[pattern]:
+            if pos >= end or len(out) >= limit:
+                break
+            if cmd_id == exclude_id:
+                continue
+            out.append({"table": self.name, "source": f"{cmd_id}: {head}", "match": True})
+        return out
+
+    def view(self, name: str, length: int) -> "_Table":
+        """同じ並びの先頭 length 行を別名で参照する（T1 は T3 の先頭部分）。"""
+        table = _Table.__new__(_Table)
+        table.name, table.length = name, length
+        table.positions, table.by_pattern = self.positions, self.by_pattern
+        return table
+
+
+class DecisionPredictor:
+    """T1/T2/T3 履歴テーブルをメモリに保持する判断予測器。スレッドセーフ。"""
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection],
+                 patterns: list[dict] | None = None,
+                 lengths: tuple[int, int, int] = DEFAULT_LENGTHS,
+                 read_version: Callable[[sqlite3.Connection], int | None] | None = None) -> None:
+        """read_version: 専用接続から commands 表の版数を読む関数（None なら data_version のみ）。"""
+        self._connect = connect
+        self._read_version = read_version
+        self.patterns = patterns if patterns is not None else load_patterns()
+        self.t1_len, self.t2_len, self.t3_len = lengths
+        self._keyword_index: dict[str, list[int]] = {}
+        for i, p in enumerate(self.patterns):
+            for kw in p["keywords"]:
+                self._keyword_index.setdefault(kw, []).append(i)
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._watermark: tuple | None = None
+        self._t1: _Table | None = None
+        self._t3: _Table | None = None
+        self._t2: dict[str, _Table] = {}
+        # cmd_id → (本文, 該当パターン番号集合)。本文が変わらない限り照合し直さない
+        self._matches: dict[str, tuple[str, frozenset[int]]] = {}
+        self._rebuilds = 0
+        self._match_computed = 0
+
+    # --- 構築 ---
+
+    def _row(self, row) -> tuple:
+        text = f"{row['command']} {row['details'] or ''}"
+        cached = self._matches.get(row["id"])
+        if cached is None or cached[0] != text:
+            matched = frozenset(
+                i for i, p in enumerate(self.patterns)
+                if any(pk in text for pk in p["keywords"])
+            )
+            self._matches[row["id"]] = cached = (text, matched)
+            self._match_computed += 1
+        return row["id"], row["command"][:60], cached[1]
+
+    def _table(self, name: str, length: int, sql: str, params: tuple) -> _Table:
+        rows = [self._row(r) for r in self._conn.execute(sql, params + (length + 1,))]
+        return _Table(name, length, rows, len(self.patterns))
+
+    def _current_watermark(self) -> tuple:
+        if self._read_version is not None:
+            try:
+                version = self._read_version(self._conn)
+            except sqlite3.OperationalError:
+                version = None  # resource_versions 未作成
+            if version is not None:
+                return ("commands", version)
+        return ("data_version", self._conn.execute("PRAGMA data_version").fetchone()[0])
+
+    def _refresh(self) -> None:
+        if self._conn is None:
+            self._conn = self._connect()
+        watermark = self._current_watermark()
+        if watermark == self._watermark:
+            return
+        # 照合キャッシュは直前まで保持していたテーブルに現れた cmd のみ残す
+        live = set(self._t3.positions) if self._t3 else set()
+        for table in self._t2.values():
+            live.update(table.positions)
+        self._matches = {k: v for k, v in self._matches.items() if k in live}
+        self._t2.clear()
+
+        # T1 は T3 と同じ並びの先頭部分（索引を二度引かない）
+        glob = self._table("T3", max(self.t1_len, self.t3_len), _GLOBAL_SQL, ())
+        self._t1 = glob.view("T1", self.t1_len)
+        self._t3 = glob.view("T3", self.t3_len)
+        self._watermark = watermark
+        self._rebuilds += 1
+
+    def _project_table(self, project: str) -> _Table:
+        table = self._t2.get(project)
+        if table is None:
+            table = self._table("T2", self.t2_len, _PROJECT_SQL, (project,))
+            self._t2[project] = table
+        return table
+
+    # --- 予測 ---
+
+    def predict(self, keywords: list[str], project: str | None, cmd_id: str) -> dict | None:
+        """キーワードに該当する最初のパターンについて、履歴上の根拠があれば予測を返す。"""
+        candidates = sorted({i for kw in keywords for i in self._keyword_index.get(kw, ())})
+        if not candidates:
+            return None
+        with self._lock:
+            self._refresh()
+            tables = [self._t1]
+            if project:
+                tables.append(self._project_table(project))
+            tables.append(self._t3)
+
+        for p in candidates:
+            basis = []
+            for table in tables:
+                basis.extend(table.basis(p, cmd_id, MAX_BASIS - len(basis)))
+            if not basis:
+                continue
+            pattern = self.patterns[p]
+            conf = "high" if len(basis) >= 3 else ("medium" if len(basis) >= 2 else "low")
+            return {
+                "question": pattern["question"],
+                "predicted_choice": pattern["predicted_choice"],
+                "confidence": conf,
+                "basis": basis,
+                "note": f"確信度{conf}。" + (
+                    "足軽は投機実行可。ミスプレディクション時はaudit FAILで巻き戻し"
+                    if conf == "high" else "家老が殿に確認推奨"
+                ),
+            }
+        return None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except sqlite3.Error:
+                    pass
+            self._conn = None
+            self._watermark = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "lengths": [self.t1_len, self.t2_len, self.t3_len],
+                "patterns": len(self.patterns),
+                "rebuilds": self._rebuilds,
+                "matches_cached": len(self._matches),
+                "matches_computed": self._match_computed,
+                "t2_projects": len(self._t2),
+            }
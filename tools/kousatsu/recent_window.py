@@ -0,0 +1,168 @@
+"""recent_window.py — enrich Stage 2d 用「直近N時間のcmd」ホットウィンドウ
+
+旧実装はキーワード毎（最大5回）に commands を
+created_at > datetime('now','-24 hours') AND (command LIKE ... OR details LIKE ...) で検索していた。
+created_at には索引が無く、しかも形式が混在（'T'区切り/空白区切り、TZ有無）しているため
+文字列比較は不正確で、毎回全件走査になる。
+
+本モジュールは直近 HOURS 時間（KOUSATSU_RECENT_WINDOW_HOURS、既定24）の cmd をメモリに保持する。
+  - 専用接続の PRAGMA data_version が変わった時のみ再読込（他接続のコミット検出）
+      * 新規行: rowid > 既読最大rowid のみ（rowid範囲 = B-tree末尾）
+      * 既存行: ウィンドウ内の rowid のみ読み直す（status・details の更新反映）
+  - 初回（とウィンドウ拡大時）のみ全件を読み、created_at を Python で解釈する
+  - 時間経過による追い出しは検索時に時刻で判定（再読込不要）
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+DEFAULT_HOURS = float(os.environ.get("KOUSATSU_RECENT_WINDOW_HOURS", "24"))
+PER_KEYWORD = 3
+MAX_KEYWORDS = 5
+
+_SELECT = """
+    SELECT rowid, id, project, status, created_at,
+           substr(command || ' ' || COALESCE(details, ''), 1, 200) AS snippet,
+           command || ' ' || COALESCE(details, '') AS body
+    FROM commands
+"""
+
+
+def parse_created_at(value: str | None) -> datetime | None:
+    """created_at（ISO形式混在）を aware datetime にする。TZ無しはローカル時刻とみなす。"""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.strip().replace(" ", "T", 1))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.astimezone()
+
+
+class RecentCommands:
+    """直近N時間の commands をメモリに保持し、キーワード部分一致で引く。スレッドセーフ。"""
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection],
+                 hours: float = DEFAULT_HOURS) -> None:
+        self._connect = connect
+        self.hours = hours
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._data_version: int | None = None
+        self._max_rowid = 0
+        # rowid → (id, project, status, created_at(datetime), snippet, body小文字)
+        self._entries: dict[int, tuple] = {}
+        self._full_loads = 0
+        self._incremental_loads = 0
+
+    # --- 読込 ---
+
+    def _keep(self, row, cutoff: datetime) -> bool:
+        created = parse_created_at(row["created_at"])
+        if created is None or created <= cutoff:
+            self._entries.pop(row["rowid"], None)
+            return False
+        self._entries[row["rowid"]] = (
+            row["id"], row["project"], row["status"], created,
+            row["snippet"], row["body"].lower(),
+        )
+        return True
+
+    def _full_load(self, conn: sqlite3.Connection, cutoff: datetime) -> None:
+        self._entries.clear()
+        self._max_rowid = 0
+        for row in conn.execute(_SELECT):
+            self._max_rowid = max(self._max_rowid, row["rowid"])
+            self._keep(row, cutoff)
+        self._full_loads += 1
+
+    def _incremental_load(self, conn: sqlite3.Connection, cutoff: datetime) -> None:
+        known = [rowid for rowid, e in self._entries.items() if e[3] > cutoff]
+        self._entries = {rowid: self._entries[rowid] for rowid in known}
+        if known:
+            seen = set()
+            for row in conn.execute(
+                _SELECT + f" WHERE rowid IN ({','.join('?' * len(known))})", known
+            ):
+                seen.add(row["rowid"])
+                self._keep(row, cutoff)
+            for rowid in set(known) - seen:  # 削除された行
+                del self._entries[rowid]
+        for row in conn.execute(_SELECT + " WHERE rowid > ?", (self._max_rowid,)):
+            self._max_rowid = max(self._max_rowid, row["rowid"])
+            self._keep(row, cutoff)
+        self._incremental_loads += 1
+
+    def _refresh(self, hours: float) -> None:
+        if self._conn is None:
+            self._conn = self._connect()
+        conn = self._conn
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        widen = hours > self.hours
+        self.hours = max(self.hours, hours)
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=self.hours)
+        if self._data_version is None or widen:
+            self._full_load(conn, cutoff)
+        elif version != self._data_version:
+            self._incremental_load(conn, cutoff)
+        self._data_version = version
+
+    # --- 検索 ---
+
+    def search(self, keywords: list[str], exclude_cmd_id: str,
+               hours: float | None = None) -> list[dict]:
+        """直近 hours 時間（既定 self.hours）の cmd からキーワード毎に新しい順最大3件を返す。
+
+        保持幅を超える hours が指定された場合は保持幅を広げて全件から読み直す。
+        """
+        if not keywords:
+            return []
+        hours = hours or self.hours
+        with self._lock:
+            self._refresh(hours)
+            entries = list(self._entries.values())
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
+        entries = sorted((e for e in entries if e[3] > cutoff and e[0] != exclude_cmd_id),
+                         key=lambda e: e[3], reverse=True)
+
+        results = []
+        seen: set[str] = set()
+        for kw in keywords[:MAX_KEYWORDS]:
+            needle = kw.lower()
+            matched = [e for e in entries if needle in e[5]][:PER_KEYWORD]
+            for cmd_id, project, _status, _created, snippet, _body in matched:
+                if cmd_id in seen:
+                    continue
+                seen.add(cmd_id)
+                results.append({
+                    "source_type": "command_recent",
+                    "source_id": cmd_id,
+                    "project": project,
+                    "snippet": snippet,
+                    "score": 0,
+                    "stage": "local",
+                })
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except sqlite3.Error:
+                    pass
+            self._conn = None
+            self._data_version = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hours": self.hours,
+                "size": len(self._entries),
+                "max_rowid": self._max_rowid,
+                "full_loads": self._full_loads,
+                "incremental_loads": self._incremental_loads,
+            }
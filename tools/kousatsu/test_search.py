@@ -4,10 +4,13 @@ Wave1（build_index.py + main.py）の全機能をテストする。
 テスト用の小さな没日録DBを tmp_path に作成し、本番DBには一切触れない。
 """
 
+import json
 import os
 import sqlite3
 import subprocess
 import sys
+import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from unittest.mock import patch
 
@@ -321,6 +324,56 @@ class TestBuildIndex:
         assert row["worker_id"] == "ashigaru1"
         assert row["status"] == "done"
 
+    def _rebuild(self, test_db, index_db, *args):
+        env = {**os.environ, "BOTSUNICHIROKU_DB": test_db, "INDEX_DB": index_db}
+        result = subprocess.run(
+            [sys.executable, str(Path(__file__).parent / "build_index.py"), *args],
+            env=env, capture_output=True, text=True,
+        )
+        assert result.returncode == 0, result.stderr
+        return result.stdout
+
+    def test_incremental_applies_only_changes(self, test_db, index_db):
+        """差分更新で追加・変更・削除された行のみが反映されるか"""
+        assert "up to date" in self._rebuild(test_db, index_db)
+        src = sqlite3.connect(test_db)
+        src.execute("UPDATE commands SET details = 'ラズパイ監視に変更' WHERE id = 'cmd_100'")
+        src.execute("DELETE FROM reports WHERE task_id = 'subtask_206'")
+        src.execute(
+            "INSERT INTO commands (id, timestamp, command, project, priority, status, assigned_karo,"
+            " details, created_at) VALUES ('cmd_103', '2026-02-05T10:00:00', 'センサー校正',"
+            " 'shogun', 'low', 'pending', 'roju', '温度センサー校正', '2026-02-05T10:00:00')"
+        )
+        src.commit()
+        src.close()
+        out = self._rebuild(test_db, index_db)
+        assert "incremental: 1 new, 1 updated, 1 deleted" in out
+
+        conn = sqlite3.connect(index_db)
+        assert conn.execute("SELECT COUNT(*) FROM search_index").fetchone()[0] == 22
+        content = conn.execute(
+            "SELECT content FROM search_index WHERE source_id = 'cmd_100'"
+        ).fetchone()[0]
+        assert "ラズパイ" in content
+        hits = conn.execute(
+            "SELECT source_id FROM search_index WHERE search_index MATCH 'センサー'"
+        ).fetchall()
+        assert ("cmd_103",) in hits
+        assert conn.execute("SELECT COUNT(*) FROM index_rows").fetchone()[0] == 22
+        conn.close()
+
+    def test_full_rebuild_swaps_generation(self, tmp_path, test_db, index_db):
+        """--full は世代番号付きファイルに構築し、INDEX_DB を差し替えるか"""
+        inode = os.stat(index_db).st_ino
+        self._rebuild(test_db, index_db, "--full")
+        assert os.stat(index_db).st_ino != inode
+        assert not list(tmp_path.glob("search_index.g*.db"))
+        conn = sqlite3.connect(index_db)
+        meta = dict(conn.execute("SELECT key, value FROM index_meta"))
+        assert meta["generation"] == "2"
+        assert conn.execute("SELECT COUNT(*) FROM search_index").fetchone()[0] == 22
+        conn.close()
+
 
 # ============================================================
 # 2. GET /search エンドポイントのテスト
@@ -387,6 +440,62 @@ class TestSearchEndpoint:
         ranks = [r["rank"] for r in data["results"]]
         assert ranks == sorted(ranks)
 
+    def test_search_cursor_pages_cover_all_hits(self, client):
+        """next_cursorで全件を重複なく辿れ、一括取得と同順になるか"""
+        full = client.get("/search", params={"q": "watchdog", "limit": 50}).json()
+        assert full["total_hits"] >= 3
+        ids, ranks, cursor = [], [], None
+        while True:
+            params = {"q": "watchdog", "limit": 1}
+            if cursor:
+                params["cursor"] = cursor
+            page = client.get("/search", params=params).json()
+            assert page["total_hits"] == full["total_hits"]
+            ids += [r["source_id"] for r in page["results"]]
+            ranks += [r["rank"] for r in page["results"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert ids == [r["source_id"] for r in full["results"]]
+        assert ranks == list(range(1, len(ids) + 1))
+
+    def test_search_count_none(self, client):
+        """count=noneでは総件数を返さないか"""
+        resp = client.get("/search", params={"q": "watchdog", "count": "none"})
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["total_hits"] is None
+        assert data["count_mode"] == "none"
+        assert len(data["results"]) > 0
+
+    def test_search_count_estimate_is_upper_bound(self, client):
+        """count=estimateは厳密件数以上の見積もりを返すか"""
+        exact = client.get("/search", params={"q": "watchdog"}).json()["total_hits"]
+        resp = client.get("/search", params={"q": "watchdog", "count": "estimate"})
+        assert resp.status_code == 200
+        assert resp.json()["total_hits"] >= exact
+
+    def test_search_invalid_cursor(self, client):
+        """不正なカーソルで400が返るか"""
+        resp = client.get("/search", params={"q": "watchdog", "cursor": "bogus"})
+        assert resp.status_code == 400
+
+    def test_search_invalid_count_mode(self, client):
+        """未知のcountモードで422が返るか"""
+        resp = client.get("/search", params={"q": "watchdog", "count": "all"})
+        assert resp.status_code == 422
+
+    def test_search_batch_matches_single(self, client):
+        """POST /search/batch がクエリ別に単発と同じ結果を返し、失敗はerrorsに入るか"""
+        resp = client.post("/search/batch",
+                           json={"queries": ["watchdog", "FTS5", " "], "limit": 3})
+        assert resp.status_code == 200
+        data = resp.json()
+        for q in ("watchdog", "FTS5"):
+            single = client.get("/search", params={"q": q, "limit": 3}).json()
+            assert data["results"][q] == single
+        assert data["errors"][" "]["status_code"] == 400
+
 
 # ============================================================
 # 3. GET /check/orphans エンドポイントのテスト
@@ -453,6 +562,38 @@ class TestCheckOrphans:
         subtask_ids = [item["subtask_id"] for item in no_report["items"]]
         assert "subtask_203" in subtask_ids
 
+    def test_orphans_index_matches_scan(self, client, test_db):
+        """差分インデックス作成後も全件走査と同じ結果を返し、書き込みに追随するか"""
+        def by_type(data):
+            return {c["check_type"]: c["items"] for c in data["checks"]}
+
+        before = client.get("/check/orphans").json()
+        assert before["source"] == "scan"
+
+        sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts" / "botsu"))
+        from orphans import ensure_orphan_index
+        conn = sqlite3.connect(test_db)
+        ensure_orphan_index(conn)
+        conn.commit()
+
+        after = client.get("/check/orphans").json()
+        assert after["source"] == "index"
+        assert by_type(after) == by_type(before)
+
+        # cmd_101 の残り subtask を done に → 全done検出、subtask_203 に報告 → 報告なし解消
+        conn.execute("UPDATE subtasks SET status = 'done' WHERE id = 'subtask_204'")
+        conn.execute(
+            "INSERT INTO reports (worker_id, task_id, timestamp, status, summary)"
+            " VALUES ('ashigaru7', 'subtask_203', '2026-02-05T10:00:00', 'done', '報告')"
+        )
+        conn.commit()
+        conn.close()
+        checks = by_type(client.get("/check/orphans").json())
+        assert "cmd_101" in [i["cmd_id"] for i in checks["cmd_all_subtasks_done_but_pending"]]
+        no_report = [i["subtask_id"] for i in checks["subtask_done_without_report"]]
+        assert "subtask_203" not in no_report
+        assert "subtask_204" in no_report
+
 
 # ============================================================
 # 4. GET /check/coverage エンドポイントのテスト
@@ -503,6 +644,23 @@ class TestCheckCoverage:
         assert data["subtask_count"] == 4   # subtask_200, subtask_201, subtask_205, subtask_208
         assert data["report_count"] == 4    # 4 reports for cmd_100's subtasks
 
+    def test_coverage_batch_matches_single(self, client):
+        """POST /check/coverage/batch が単発と同じ結果をcmd_id別に返すか"""
+        resp = client.post("/check/coverage/batch",
+                           json={"cmd_ids": ["cmd_100", "cmd_101", "cmd_999", "cmd_100"]})
+        assert resp.status_code == 200
+        data = resp.json()
+        assert set(data["results"]) == {"cmd_100", "cmd_101"}
+        for cmd_id in ("cmd_100", "cmd_101"):
+            single = client.get("/check/coverage", params={"cmd_id": cmd_id}).json()
+            assert data["results"][cmd_id] == single
+        assert data["errors"]["cmd_999"]["status_code"] == 404
+
+    def test_coverage_batch_rejects_empty(self, client):
+        """空リストは422"""
+        resp = client.post("/check/coverage/batch", json={"cmd_ids": []})
+        assert resp.status_code == 422
+
 
 # ============================================================
 # 5. GET /health エンドポイントのテスト
@@ -541,6 +699,17 @@ class TestHealth:
         data = resp.json()
         assert data["mecab_available"] is True
 
+    def test_health_pool_stats(self, client):
+        """接続プール統計が返り、繰り返しリクエストで接続が再利用されるか"""
+        for _ in range(5):
+            assert client.get("/audit/subtask_205").status_code == 200
+        resp = client.get("/health/pool")
+        assert resp.status_code == 200
+        stats = resp.json()["botsunichiroku"]
+        assert stats["opened"] >= 1
+        assert stats["opened"] + stats["reused"] >= 5
+        assert stats["opened"] < 5
+
 
 # ============================================================
 # 6. GET /search/similar エンドポイントのテスト
@@ -602,6 +771,20 @@ class TestSearchSimilar:
             assert "source_id" in first
             assert "score" in first
 
+    def test_similar_batch_matches_single(self, client):
+        """POST /search/similar/batch が単発と同じ結果をsubtask_id別に返すか"""
+        ids = ["subtask_200", "subtask_205", "subtask_999"]
+        resp = client.post("/search/similar/batch", json={"subtask_ids": ids, "limit": 3})
+        assert resp.status_code == 200
+        data = resp.json()
+        for subtask_id in ids[:2]:
+            single = client.get("/search/similar",
+                                params={"subtask_id": subtask_id, "limit": 3}).json()
+            assert data["results"][subtask_id] == single
+        assert data["errors"] == {
+            "subtask_999": {"status_code": 404, "detail": "Subtask subtask_999 not found"}
+        }
+
 
 # ============================================================
 # 7. GET /audit/history エンドポイントのテスト
@@ -749,6 +932,27 @@ class TestWorkerStats:
         assert len(data["workers"]) == 1
         assert data["workers"][0]["total_tasks"] == 0
 
+    def test_worker_stats_rollup_matches_aggregate(self, client, test_db):
+        """ロールアップ表作成後もGROUP BY集計と同じ結果を返すか"""
+        before = client.get("/worker/stats").json()
+        assert before["source"] == "aggregate"
+
+        sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts" / "botsu"))
+        from worker_stats import ensure_worker_stats
+        conn = sqlite3.connect(test_db)
+        ensure_worker_stats(conn)
+        conn.commit()
+        conn.close()
+
+        after = client.get("/worker/stats").json()
+        assert after["source"] == "rollup"
+        for w in after["workers"]:
+            assert w.pop("report_count") >= 0
+        assert after["workers"] == before["workers"]
+
+        one = client.get("/worker/stats", params={"worker_id": "nonexistent"}).json()
+        assert one["workers"][0]["total_tasks"] == 0
+
 
 # ============================================================
 # 9. POST/GET /dashboard エンドポイントのテスト
@@ -907,6 +1111,29 @@ class TestEnrich:
         assert "cross_project" in data
         assert isinstance(data["cross_project"], list)
 
+    def test_enrich_pitfalls_index(self, client, test_db):
+        """初回enrichで分類インデックスを作成し、以後の書き込みにトリガで追随するか"""
+        resp = client.post("/enrich", json={"cmd_id": "cmd_999", "text": "watchdog"})
+        assert resp.status_code == 200
+        conn = sqlite3.connect(test_db)
+        assert conn.execute(
+            "SELECT COUNT(*) FROM pitfall_patterns WHERE enabled = 1"
+        ).fetchone()[0] > 0
+
+        conn.execute(
+            "INSERT INTO reports (worker_id, task_id, timestamp, status, summary)"
+            " VALUES ('ashigaru1', 'subtask_200', '2026-02-01T00:00:00', 'done', '差し戻し対応')"
+        )
+        conn.execute("UPDATE subtasks SET status = 'done' WHERE id = 'subtask_200'")
+        conn.commit()
+        conn.close()
+
+        resp = client.post("/enrich", json={"cmd_id": "cmd_998", "text": "センサー"})
+        pitfalls = resp.json()["pitfalls"]
+        assert {"pattern_id": "P004", "source_id": "subtask_200"} in [
+            {"pattern_id": p["pattern_id"], "source_id": p["source_id"]} for p in pitfalls
+        ]
+
     def test_enrich_meta_keywords(self, client):
         """metaにキーワードが含まれるか"""
         resp = client.post("/enrich", json={
@@ -929,6 +1156,61 @@ class TestEnrich:
         assert "total_ms" in data["meta"]
         assert "fts5_local_ms" in data["meta"]
 
+    def test_enrich_meta_stages(self, client):
+        """metaにステージ毎の所要時間とクリティカルパスが含まれるか"""
+        resp = client.post("/enrich", json={
+            "cmd_id": "cmd_999",
+            "text": "watchdogタイマー",
+            "project": "shogun",
+        })
+        assert resp.status_code == 200
+        meta = resp.json()["meta"]
+        for name in ("fts5_local", "fts5_global", "pitfall", "positive",
+                     "recent", "prediction"):
+            assert meta["stages"][name]["status"] == "ok"
+            assert meta["stages"][name]["ms"] >= 0
+        assert meta["critical_path"] in meta["stages"]
+        assert meta["timeouts"] == []
+
+    def test_enrich_stage_timeout_returns_partial(self, client):
+        """締切超過ステージは空結果で打ち切り、他ステージの結果は返るか"""
+        import main as main_mod
+
+        def slow_pitfalls(keywords, worker_id):
+            time.sleep(0.5)
+            return []
+
+        with patch.object(main_mod, "_extract_pitfalls", slow_pitfalls), \
+                patch.dict(main_mod.STAGE_DEADLINES_MS, {"pitfall": 10}):
+            resp = client.post("/enrich", json={
+                "cmd_id": "cmd_999",
+                "text": "watchdogタイマー",
+                "project": "shogun",
+            })
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["pitfalls"] == []
+        assert data["meta"]["timeouts"] == ["pitfall"]
+        assert data["meta"]["stages"]["pitfall"]["status"] == "timeout"
+        assert len(data["internal"]) > 0
+
+    def test_enrich_stage_error_degrades(self, client):
+        """ステージ内の例外は500にせず、そのステージのみ空結果になるか"""
+        import main as main_mod
+
+        def broken_positive(keywords):
+            raise sqlite3.OperationalError("boom")
+
+        with patch.object(main_mod, "_extract_positive_patterns", broken_positive):
+            resp = client.post("/enrich", json={
+                "cmd_id": "cmd_999",
+                "text": "watchdogタイマー",
+            })
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["positive_patterns"] == []
+        assert data["meta"]["stage_errors"] == ["positive"]
+
     def test_enrich_empty_text(self, client):
         """空テキストでもエラーにならないか"""
         resp = client.post("/enrich", json={
@@ -961,6 +1243,22 @@ class TestEnrich:
         data = resp.json()
         assert isinstance(data["positive_patterns"], list)
 
+    def test_enrich_positive_patterns_index(self, client, test_db):
+        """承認済み作業インデックスを初回に作成し、audit PASS の追加に追随するか"""
+        resp = client.post("/enrich", json={"cmd_id": "cmd_999", "text": "watchdogドキュメント"})
+        ids = [p["source_id"] for p in resp.json()["positive_patterns"]]
+        assert ids[0] == "subtask_205"
+        assert "subtask_200" not in ids
+
+        conn = sqlite3.connect(test_db)
+        conn.execute("UPDATE subtasks SET audit_status = 'done' WHERE id = 'subtask_200'")
+        conn.commit()
+        conn.close()
+
+        resp = client.post("/enrich", json={"cmd_id": "cmd_998", "text": "watchdogドキュメント"})
+        ids = [p["source_id"] for p in resp.json()["positive_patterns"]]
+        assert "subtask_200" in ids
+
     def test_enrich_cache_and_get(self, client):
         """POST /enrichの結果がGET /enrich/{cmd_id}でキャッシュ取得できるか"""
         # まずPOSTでenrich
@@ -978,6 +1276,93 @@ class TestEnrich:
         assert data["cmd_id"] == "cmd_test_cache"
         assert data["meta"]["source"] == "cache"
 
+    def test_enrich_repeat_served_from_cache(self, client):
+        """同一リクエストの再POSTはキャッシュから返るか"""
+        body = {"cmd_id": "cmd_999", "text": "watchdogタイマー", "project": "shogun"}
+        first = client.post("/enrich", json=body).json()
+        second = client.post("/enrich", json=body).json()
+        assert first["meta"]["source"] == "live"
+        assert second["meta"]["source"] == "cache"
+        assert second["internal"] == first["internal"]
+        assert second["enriched_at"] == first["enriched_at"]
+
+    def test_enrich_cache_invalidated_by_new_data(self, client, test_db):
+        """報告追加でデータ版数が変わればキャッシュを使わないか"""
+        body = {"cmd_id": "cmd_999", "text": "watchdogタイマー"}
+        client.post("/enrich", json=body)
+        conn = sqlite3.connect(test_db)
+        conn.execute(
+            "INSERT INTO reports (worker_id, task_id, timestamp, status, summary)"
+            " VALUES ('ashigaru1', 'subtask_200', '2026-02-10T10:00:00', 'done', '追加報告')"
+        )
+        conn.commit()
+        conn.close()
+        assert client.post("/enrich", json=body).json()["meta"]["source"] == "live"
+
+    def test_enrich_cache_invalidated_by_status_update(self, client, test_db):
+        """既存行のUPDATE（subtaskの状態変更）でもキャッシュを使わないか"""
+        body = {"cmd_id": "cmd_999", "text": "watchdogタイマー"}
+        client.post("/enrich", json=body)
+        assert client.post("/enrich", json=body).json()["meta"]["source"] == "cache"
+        conn = sqlite3.connect(test_db)
+        assert conn.execute(
+            "UPDATE subtasks SET status = 'blocked' WHERE rowid = (SELECT MIN(rowid) FROM subtasks)"
+        ).rowcount == 1
+        conn.commit()
+        conn.close()
+        assert client.post("/enrich", json=body).json()["meta"]["source"] == "live"
+
+    def test_enrich_cache_keyed_by_request(self, client):
+        """同じcmd_idでもtextが変わればキャッシュを使わないか"""
+        client.post("/enrich", json={"cmd_id": "cmd_999", "text": "watchdogタイマー"})
+        resp = client.post("/enrich", json={"cmd_id": "cmd_999", "text": "Docker基盤"})
+        assert resp.json()["meta"]["source"] == "live"
+
+    def test_enrich_cache_single_row_per_cmd(self, client, test_db):
+        """キャッシュは専用テーブルにcmd_id毎1行で、dashboard_entriesには書かないか"""
+        client.post("/enrich", json={"cmd_id": "cmd_999", "text": "watchdogタイマー"})
+        client.post("/enrich", json={"cmd_id": "cmd_999", "text": "Docker基盤"})
+        conn = sqlite3.connect(str(Path(test_db).parent / "enrich_cache.db"))
+        n_cache = conn.execute(
+            "SELECT COUNT(*) FROM enrich_cache WHERE cmd_id = 'cmd_999'").fetchone()[0]
+        conn.close()
+        conn = sqlite3.connect(test_db)
+        n_dash = conn.execute(
+            "SELECT COUNT(*) FROM dashboard_entries WHERE section = 'enrich_cache'"
+        ).fetchone()[0]
+        has_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'enrich_cache'").fetchone()
+        conn.close()
+        assert n_cache == 1
+        assert n_dash == 0
+        assert has_table is None  # 没日録DBには書かない（ETagの版数を動かさない）
+
+    def test_enrich_partial_result_not_cached(self, client):
+        """締切超過を含む部分結果はキャッシュされないか"""
+        import main as main_mod
+
+        def slow_pitfalls(keywords, worker_id):
+            time.sleep(0.3)
+            return []
+
+        body = {"cmd_id": "cmd_999", "text": "watchdogタイマー"}
+        with patch.object(main_mod, "_extract_pitfalls", slow_pitfalls), \
+                patch.dict(main_mod.STAGE_DEADLINES_MS, {"pitfall": 10}):
+            client.post("/enrich", json=body)
+        assert client.post("/enrich", json=body).json()["meta"]["source"] == "live"
+
+    def test_enrich_external_failure_not_cached(self, client):
+        """外部検索の失敗（ブレーカ開放を含む）はステージエラーとして記録され、キャッシュされないか"""
+        import main as main_mod
+
+        body = {"cmd_id": "cmd_999", "text": "量子テレポーテーション", "include_external": True}
+        with patch.object(main_mod._external_fetcher, "fetch",
+                          side_effect=main_mod._extfetch.CircuitOpenError("open")):
+            meta = client.post("/enrich", json=body).json()["meta"]
+        assert meta["stage_errors"] == ["external"]
+        with patch.object(main_mod._external_fetcher, "fetch", return_value=""):
+            assert client.post("/enrich", json=body).json()["meta"]["source"] == "live"
+
     def test_get_enrich_not_found(self, client):
         """存在しないcmd_idで404が返るか"""
         resp = client.get("/enrich/cmd_nonexistent")
@@ -1059,3 +1444,612 @@ class TestSanitizer:
         })
         assert result is not None
         assert len(result["snippet"]) <= 500
+
+
+# ============================================================
+# 12. db_pool.py のテスト
+# ============================================================
+
+class TestReadOnlyPool:
+    """db_pool.ReadOnlyPool のテスト群"""
+
+    def test_same_thread_reuses_connection(self, test_db):
+        """同一スレッドでは同じ接続が返るか"""
+        from db_pool import ReadOnlyPool
+        pool = ReadOnlyPool(test_db, "test")
+        conn1 = pool.get()
+        conn2 = pool.get()
+        assert conn1 is conn2
+        stats = pool.stats()
+        assert stats["opened"] == 1
+        assert stats["reused"] == 1
+        pool.close_all()
+
+    def test_other_thread_gets_own_connection(self, test_db):
+        """別スレッドには別の接続が割り当てられるか"""
+        import threading
+        from db_pool import ReadOnlyPool
+        pool = ReadOnlyPool(test_db, "test")
+        main_conn = pool.get()
+        seen = []
+        t = threading.Thread(target=lambda: seen.append(pool.get()))
+        t.start()
+        t.join()
+        assert seen[0] is not main_conn
+        assert pool.stats()["live_connections"] == 2
+        pool.close_all()
+        assert pool.stats()["live_connections"] == 0
+
+    def test_close_all_closes_other_thread_connections(self, test_db):
+        """close_all()が別スレッドで開かれた接続も実際に閉じるか"""
+        import threading
+        from db_pool import ReadOnlyPool
+        pool = ReadOnlyPool(test_db, "test")
+        seen = []
+        t = threading.Thread(target=lambda: seen.append(pool.get()))
+        t.start()
+        t.join()
+        pool.close_all()
+        with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+            seen[0].execute("SELECT 1")
+
+    def test_connection_is_read_only_with_pragmas(self, test_db):
+        """読み取り専用で、mmap_size/cache_sizeが設定されているか"""
+        from db_pool import CACHE_SIZE_KIB, ReadOnlyPool
+        pool = ReadOnlyPool(test_db, "test")
+        conn = pool.get()
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -CACHE_SIZE_KIB
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM commands")
+        pool.close_all()
+
+    def test_discard_reopens(self, test_db):
+        """discard()後のget()で新しい接続が開かれるか"""
+        from db_pool import ReadOnlyPool
+        pool = ReadOnlyPool(test_db, "test")
+        conn1 = pool.get()
+        pool.discard()
+        conn2 = pool.get()
+        assert conn1 is not conn2
+        assert pool.stats()["discarded"] == 1
+        pool.close_all()
+
+    def test_reopens_after_file_swap(self, tmp_path, test_db, monkeypatch):
+        """DBファイルが rename で差し替えられたら接続を開き直すか"""
+        import shutil
+        import db_pool
+        monkeypatch.setattr(db_pool, "GENERATION_CHECK_SEC", 0)
+        pool = db_pool.ReadOnlyPool(test_db, "test")
+        conn1 = pool.get()
+        assert pool.get() is conn1
+
+        new_db = str(tmp_path / "next.db")
+        shutil.copy(test_db, new_db)
+        src = sqlite3.connect(new_db)
+        src.execute("DELETE FROM commands")
+        src.commit()
+        src.close()
+        os.replace(new_db, test_db)
+
+        conn2 = pool.get()
+        assert conn2 is not conn1
+        assert conn2.execute("SELECT COUNT(*) FROM commands").fetchone()[0] == 0
+        assert pool.stats()["reopened_on_swap"] == 1
+        pool.close_all()
+
+
+# ============================================================
+# 13. enrich_cache.py のテスト
+# ============================================================
+
+class TestEnrichCache:
+    """enrich_cache.EnrichCache のテスト群"""
+
+    def _store(self, cache, conn, cmd_id):
+        cache.store(conn, cmd_id, "h", "v1", {"internal": []}, "2026-02-10T10:00:00")
+
+    def test_ttl_expired_is_stale(self, test_db):
+        """TTL超過行はlookupでヒットしないか"""
+        import enrich_cache
+        cache = enrich_cache.EnrichCache()
+        conn = sqlite3.connect(test_db)
+        conn.row_factory = sqlite3.Row
+        self._store(cache, conn, "cmd_1")
+        assert cache.lookup(conn, "cmd_1", "h", "v1") is not None
+        with patch.object(enrich_cache, "TTL_SEC", -1):
+            assert cache.lookup(conn, "cmd_1", "h", "v1") is None
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["stale"] == 1
+        conn.close()
+
+    def test_size_eviction_keeps_newest(self, test_db):
+        """MAX_ROWSを超えた古い行から追い出されるか"""
+        import enrich_cache
+        cache = enrich_cache.EnrichCache()
+        conn = sqlite3.connect(test_db)
+        conn.row_factory = sqlite3.Row
+        with patch.object(enrich_cache, "MAX_ROWS", 2):
+            for cmd_id in ("cmd_1", "cmd_2", "cmd_3"):
+                self._store(cache, conn, cmd_id)
+        remaining = {r[0] for r in conn.execute("SELECT cmd_id FROM enrich_cache")}
+        assert remaining == {"cmd_2", "cmd_3"}
+        assert cache.stats()["evicted"] == 1
+        conn.close()
+
+    def test_legacy_rows_not_indexed(self, tmp_path, test_db):
+        """旧dashboard_entriesのenrich_cache行がFTS5索引に入らないか"""
+        conn = sqlite3.connect(test_db)
+        conn.execute(
+            "INSERT INTO dashboard_entries (cmd_id, section, content, status)"
+            " VALUES ('cmd_100', 'enrich_cache', '{\"internal\": []}', 'cached')"
+        )
+        conn.commit()
+        conn.close()
+        index_path = str(tmp_path / "legacy_index.db")
+        env = {**os.environ, "BOTSUNICHIROKU_DB": test_db, "INDEX_DB": index_path}
+        subprocess.run([sys.executable, str(Path(__file__).parent / "build_index.py")],
+                       env=env, capture_output=True, check=True)
+        idx = sqlite3.connect(index_path)
+        n = idx.execute(
+            "SELECT COUNT(*) FROM search_index WHERE source_type = 'dashboard' AND status = 'cached'"
+        ).fetchone()[0]
+        idx.close()
+        assert n == 0
+
+
+# ============================================================
+# 14. NDJSONストリーミング（?stream=1 / Accept: application/x-ndjson）のテスト
+# ============================================================
+
+def _ndjson(resp) -> tuple[list[dict], dict]:
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    return lines[:-1], lines[-1]["summary"]
+
+
+class TestNdjsonStreaming:
+    """GET /dashboard, /audit/history, /worker/stats のストリーミング応答"""
+
+    def test_dashboard_stream_matches_json(self, client):
+        full = client.get("/dashboard", params={"limit": 50}).json()
+        items, summary = _ndjson(client.get("/dashboard", params={"limit": 50, "stream": 1}))
+        assert items == full["entries"]
+        assert summary == {"total": full["total"]}
+
+    def test_dashboard_stream_by_accept_header(self, client):
+        full = client.get("/dashboard", params={"section": "戦果"}).json()
+        items, summary = _ndjson(client.get(
+            "/dashboard", params={"section": "戦果"},
+            headers={"Accept": "application/x-ndjson"},
+        ))
+        assert items == full["entries"]
+        assert summary["total"] == full["total"]
+
+    def test_audit_history_stream_matches_json(self, client):
+        full = client.get("/audit/history").json()
+        items, summary = _ndjson(client.get("/audit/history", params={"stream": "true"}))
+        assert items == full["items"]
+        assert summary == {"stats": full["stats"]}
+
+    def test_worker_stats_stream_matches_json(self, client):
+        full = client.get("/worker/stats").json()
+        items, summary = _ndjson(client.get("/worker/stats", params={"stream": 1}))
+        assert items == full["workers"]
+        assert summary == {"source": full["source"]}
+
+        items, _ = _ndjson(client.get("/worker/stats",
+                                      params={"worker_id": "nonexistent", "stream": 1}))
+        assert [w["total_tasks"] for w in items] == [0]
+
+    def test_stream_uses_dedicated_connection(self, client):
+        client.get("/dashboard", params={"stream": 1})
+        stats = client.get("/health/pool").json()["botsunichiroku"]
+        assert stats["streams"] >= 1
+
+
+# ============================================================
+# 14b. 条件付きGET（ETag / Last-Modified → 304）のテスト
+# ============================================================
+
+def _pool_requests(client) -> int:
+    stats = client.get("/health/pool").json()["botsunichiroku"]
+    return stats["opened"] + stats["reused"]
+
+
+class TestConditionalGet:
+    """GET /reports/{id}, /audit/{id}, /dashboard, /enrich/{id}, /docs/... の 304 応答"""
+
+    @pytest.mark.parametrize("path", ["/reports/1", "/audit/subtask_205", "/dashboard"])
+    def test_if_none_match_returns_304_without_sql(self, client, path):
+        first = client.get(path)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert first.headers["last-modified"]
+
+        before = _pool_requests(client)
+        resp = client.get(path, headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.content == b""
+        assert resp.headers["etag"] == etag
+        assert _pool_requests(client) == before  # プール接続を使っていない（SQL未実行）
+
+    def test_if_modified_since(self, client):
+        first = client.get("/reports/1")
+        resp = client.get("/reports/1",
+                          headers={"If-Modified-Since": first.headers["last-modified"]})
+        assert resp.status_code == 304
+        # If-None-Match が優先される
+        resp = client.get("/reports/1", headers={
+            "If-None-Match": '"stale"',
+            "If-Modified-Since": first.headers["last-modified"],
+        })
+        assert resp.status_code == 200
+
+    def test_write_changes_etag(self, client):
+        etag = client.get("/dashboard").headers["etag"]
+        client.post("/dashboard", json={"section": "戦果", "content": "新規エントリ"})
+        resp = client.get("/dashboard", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["etag"] != etag
+        assert resp.json()["total"] == 4
+
+    def test_ndjson_has_distinct_etag(self, client):
+        etag = client.get("/dashboard").headers["etag"]
+        resp = client.get("/dashboard", params={"stream": 1}, headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["etag"] != etag
+        resp = client.get("/dashboard", params={"stream": 1},
+                          headers={"If-None-Match": resp.headers["etag"]})
+        assert resp.status_code == 304
+
+    def test_unrelated_writes_keep_etag(self, client, test_db):
+        """enrich結果の保存・他表への書き込みでは資源のETagが変わらないか"""
+        etags = {path: client.get(path).headers["etag"]
+                 for path in ("/reports/1", "/audit/subtask_205", "/dashboard")}
+        client.post("/enrich", json={"cmd_id": "cmd_etag", "text": "watchdog設定"})
+        conn = sqlite3.connect(test_db)
+        conn.execute("UPDATE subtasks SET status = 'done' WHERE id = 'subtask_205'")
+        conn.execute("UPDATE commands SET status = status")
+        conn.commit()
+        conn.close()
+        for path, etag in etags.items():
+            assert client.get(path, headers={"If-None-Match": etag}).status_code == 304, path
+
+    def test_audit_write_changes_only_audit_etag(self, client):
+        audit_etag = client.get("/audit/subtask_205").headers["etag"]
+        report_etag = client.get("/reports/1").headers["etag"]
+        client.post("/audit", json={"subtask_id": "subtask_205", "result": "approved",
+                                    "summary": "監査OK"})
+        resp = client.get("/audit/subtask_205", headers={"If-None-Match": audit_etag})
+        assert resp.status_code == 200
+        assert resp.json()["audit_status"] == "done"
+        assert client.get("/reports/1",
+                          headers={"If-None-Match": report_etag}).status_code == 304
+
+    def test_enrich_cache_entry(self, client):
+        client.post("/enrich", json={"cmd_id": "cmd_etag", "text": "watchdog設定"})
+        first = client.get("/enrich/cmd_etag")
+        assert first.status_code == 200
+        resp = client.get("/enrich/cmd_etag", headers={"If-None-Match": first.headers["etag"]})
+        assert resp.status_code == 304
+
+    def test_docs_etag_follows_file(self, client, tmp_path, monkeypatch):
+        import main as main_mod
+        (tmp_path / "context").mkdir()
+        doc = tmp_path / "context" / "a.md"
+        doc.write_text("# v1", encoding="utf-8")
+        monkeypatch.setattr(main_mod, "_DOCS_ROOT", tmp_path)
+
+        first = client.get("/docs/context/a.md")
+        assert first.text == "# v1"
+        etag = first.headers["etag"]
+        assert client.get("/docs/context/a.md",
+                          headers={"If-None-Match": etag}).status_code == 304
+
+        doc.write_text("# version 2", encoding="utf-8")
+        resp = client.get("/docs/context/a.md", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.text == "# version 2"
+        assert client.get("/docs/context/missing.md").status_code == 404
+
+    def test_docs_served_from_cache_with_gzip(self, client, tmp_path, monkeypatch):
+        import main as main_mod
+        (tmp_path / "instructions").mkdir()
+        text = "# 足軽の心得\n" + "報告は簡潔に。" * 200
+        (tmp_path / "instructions" / "ashigaru.md").write_text(text, encoding="utf-8")
+        monkeypatch.setattr(main_mod, "_DOCS_ROOT", tmp_path)
+
+        plain = client.get("/docs/instructions/ashigaru.md", headers={"Accept-Encoding": "identity"})
+        assert plain.text == text
+        assert "content-encoding" not in plain.headers
+        packed = client.get("/docs/instructions/ashigaru.md", headers={"Accept-Encoding": "gzip"})
+        assert packed.headers["content-encoding"] == "gzip"
+        assert packed.text == text  # httpx が展開する
+        assert packed.headers["etag"] != plain.headers["etag"]
+        assert packed.headers["vary"] == "Accept-Encoding"
+
+        stats = client.get("/health/pool").json()["docs_cache"]
+        assert (stats["misses"], stats["hits"]) == (1, 1)
+
+
+# ============================================================
+# 15. GET /metrics（KOUSATSU_METRICS=1 時のみ）のテスト
+# ============================================================
+
+@pytest.fixture
+def metrics_client(test_db, index_db, monkeypatch):
+    """計測有効で main を再importした TestClient。"""
+    import metrics
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.reset()
+    with patch.dict(os.environ, {"BOTSUNICHIROKU_DB": test_db, "INDEX_DB": index_db}):
+        import importlib
+        import main as main_mod
+        importlib.reload(main_mod)
+        with TestClient(main_mod.app) as tc:
+            yield tc
+    metrics.reset()
+
+
+class TestMetrics:
+    """GET /metrics のテスト群"""
+
+    def test_metrics_disabled_by_default(self, client):
+        assert client.get("/metrics").status_code == 404
+
+    def test_metrics_exposes_route_sql_and_tokenizer(self, metrics_client):
+        assert metrics_client.get("/search", params={"q": "watchdog"}).status_code == 200
+        assert metrics_client.get("/reports/1").status_code == 200
+        resp = metrics_client.get("/metrics")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain")
+        body = resp.text
+        assert 'kousatsu_request_duration_seconds_count{route="/search",method="GET",status="200"} 1' in body
+        # パスパラメータはルートテンプレートで集計される
+        assert 'route="/reports/{report_id}"' in body
+        assert 'kousatsu_sql_duration_seconds_count{query="search_exact"} 1' in body
+        assert 'kousatsu_tokenizer_duration_seconds_count{mode="wakati"}' in body
+        assert 'kousatsu_connections_opened_total{name="index"}' in body
+        assert 'kousatsu_cache_hit_ratio{name="tokenizer"}' in body
+
+    def test_histogram_buckets_are_cumulative(self):
+        from metrics import Histogram
+        h = Histogram("t_seconds", "test", ("k",), (0.1, 1.0))
+        for v in (0.05, 0.5, 5.0):
+            h.observe(("a",), v)
+        lines = h.render()
+        assert 't_seconds_bucket{k="a",le="0.1"} 1' in lines
+        assert 't_seconds_bucket{k="a",le="1.0"} 2' in lines
+        assert 't_seconds_bucket{k="a",le="+Inf"} 3' in lines
+        assert 't_seconds_count{k="a"} 3' in lines
+
+
+# ============================================================
+# 16. recent_window.py（enrich Stage 2d 直近cmdウィンドウ）のテスト
+# ============================================================
+
+class TestRecentWindow:
+    """直近N時間のcmdウィンドウが data_version 変化時のみ差分で追随するか"""
+
+    @staticmethod
+    def _insert(conn, cmd_id, command, created_at):
+        conn.execute(
+            "INSERT INTO commands (id, timestamp, command, project, priority, status,"
+            " assigned_karo, details, created_at) VALUES (?,?,?,?,?,?,?,?,?)",
+            (cmd_id, created_at, command, "shogun", "low", "pending", "roju", None, created_at),
+        )
+        conn.commit()
+
+    def test_window_follows_writes(self, test_db):
+        from recent_window import RecentCommands
+
+        def connect():
+            conn = sqlite3.connect(f"file:{test_db}?mode=ro", uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            return conn
+
+        window = RecentCommands(connect, hours=24)
+        now = datetime.now(timezone.utc)
+        rw = sqlite3.connect(test_db)
+        # created_at は TZ付き 'T' 区切り
+        self._insert(rw, "cmd_900", "watchdog再調整", now.isoformat())
+        self._insert(rw, "cmd_901", "古いwatchdog", (now - timedelta(hours=30)).isoformat())
+
+        ids = [r["source_id"] for r in window.search(["watchdog"], "cmd_999")]
+        assert ids == ["cmd_900"]
+        assert window.stats()["full_loads"] == 1
+
+        # 変更なし → 再読込しない
+        window.search(["watchdog"], "cmd_999")
+        assert window.stats()["incremental_loads"] == 0
+
+        # created_at は空白区切り・TZ無し（ローカル時刻とみなす）
+        local_naive = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._insert(rw, "cmd_902", "WATCHDOG監視追加", local_naive)
+        ids = [r["source_id"] for r in window.search(["watchdog"], "cmd_900")]
+        assert ids == ["cmd_902"]
+        assert window.stats()["full_loads"] == 1
+        assert window.stats()["incremental_loads"] == 1
+
+        # 既存行の更新・削除も反映
+        rw.execute("UPDATE commands SET command = 'センサー' WHERE id = 'cmd_900'")
+        rw.execute("DELETE FROM commands WHERE id = 'cmd_902'")
+        rw.commit()
+        assert window.search(["watchdog"], "cmd_999") == []
+
+        # 保持幅を超える指定は全件から読み直す
+        ids = [r["source_id"] for r in window.search(["watchdog"], "cmd_999", hours=48)]
+        assert ids == ["cmd_901"]
+        assert window.stats()["hours"] == 48
+        window.close()
+        rw.close()
+
+
+# ============================================================
+# 17. predictor.py（TAGE的判断予測エンジン）のテスト
+# ============================================================
+
+class TestPredictor:
+    """履歴テーブルのメモリ保持・差分再構築・パターン設定の読込"""
+
+    @staticmethod
+    def _connect(test_db):
+        def connect():
+            conn = sqlite3.connect(f"file:{test_db}?mode=ro", uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            return conn
+        return connect
+
+    @staticmethod
+    def _add_done(conn, cmd_id, command, project, created_at):
+        conn.execute(
+            "INSERT INTO commands (id, timestamp, command, project, priority, status,"
+            " assigned_karo, details, created_at) VALUES (?,?,?,?,?,?,?,?,?)",
+            (cmd_id, created_at, command, project, "low", "done", "roju", None, created_at),
+        )
+        conn.commit()
+
+    def test_predict_and_refresh(self, test_db):
+        from predictor import DecisionPredictor
+
+        rw = sqlite3.connect(test_db)
+        self._add_done(rw, "cmd_300", "Docker化", "shogun", "2026-03-01T00:00:00")
+        predictor = DecisionPredictor(self._connect(test_db), lengths=(1, 2, 3))
+
+        pred = predictor.predict(["Docker"], "shogun", "cmd_999")
+        assert pred["predicted_choice"] == "Docker Compose"
+        # T1（直近1件）・T2（同PJ）・T3 の全てに cmd_300 が現れる
+        assert [b["table"] for b in pred["basis"]] == ["T1", "T2", "T3"]
+        assert pred["confidence"] == "high"
+        # 対象cmd自身は根拠から除外される
+        assert predictor.predict(["Docker"], "shogun", "cmd_300") is None
+
+        # 変更が無ければ再構築しない
+        predictor.predict(["Docker"], None, "cmd_999")
+        assert predictor.stats()["rebuilds"] == 1
+        computed = predictor.stats()["matches_computed"]
+
+        # cmd完了（他接続のコミット）で再構築。照合済みの cmd は照合し直さない
+        self._add_done(rw, "cmd_301", "Dockerデプロイ", "arsprout", "2026-03-02T00:00:00")
+        pred = predictor.predict(["Docker"], None, "cmd_999")
+        assert predictor.stats()["rebuilds"] == 2
+        assert predictor.stats()["matches_computed"] == computed + 1
+        assert [b["source"].split(":")[0] for b in pred["basis"]] == ["cmd_301", "cmd_301", "cmd_300"]
+        predictor.close()
+        rw.close()
+
+    def test_rebuild_keyed_on_commands_version(self, test_db):
+        from predictor import DecisionPredictor
+
+        sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts" / "botsu"))
+        from resource_versions import ensure_resource_versions, read_resource_version
+        rw = sqlite3.connect(test_db)
+        assert ensure_resource_versions(rw) is True
+        rw.commit()
+        predictor = DecisionPredictor(
+            self._connect(test_db), lengths=(1, 2, 3),
+            read_version=lambda conn: read_resource_version(conn, "commands"))
+        predictor.predict(["Docker"], None, "cmd_999")
+        assert predictor.stats()["rebuilds"] == 1
+
+        # 他の表への書き込み・履歴に効かない列の更新では再構築しない
+        rw.execute(
+            "INSERT INTO reports (worker_id, task_id, timestamp, status, summary)"
+            " VALUES ('ashigaru1', 'subtask_200', '2026-02-10T10:00:00', 'done', '追加報告')"
+        )
+        rw.execute("UPDATE commands SET priority = 'high'")
+        rw.commit()
+        predictor.predict(["Docker"], None, "cmd_999")
+        assert predictor.stats()["rebuilds"] == 1
+
+        self._add_done(rw, "cmd_300", "Docker化", "shogun", "2026-03-01T00:00:00")
+        pred = predictor.predict(["Docker"], None, "cmd_999")
+        assert predictor.stats()["rebuilds"] == 2
+        assert pred["basis"][0]["source"].startswith("cmd_300")
+        predictor.close()
+        rw.close()
+
+    def test_patterns_from_config(self, test_db, tmp_path, monkeypatch):
+        from predictor import DecisionPredictor, load_patterns
+
+        path = tmp_path / "patterns.json"
+        path.write_text(json.dumps([{
+            "question": "監視方式", "keywords": ["watchdog"],
+            "predicted_choice": "ハードウェアWDT", "reason": "既存実装",
+        }], ensure_ascii=False), encoding="utf-8")
+        monkeypatch.setenv("KOUSATSU_PREDICTION_PATTERNS", str(path))
+
+        predictor = DecisionPredictor(self._connect(test_db))
+        pred = predictor.predict(["watchdog"], "shogun", "cmd_999")
+        assert pred["predicted_choice"] == "ハードウェアWDT"
+        assert pred["basis"][0]["source"].startswith("cmd_100")
+        assert predictor.predict(["Docker"], "shogun", "cmd_999") is None
+        predictor.close()
+
+        path.write_text(json.dumps([{"question": "x"}]), encoding="utf-8")
+        with pytest.raises(ValueError):
+            load_patterns()
+
+
+# ============================================================
+# 18. gen_synthetic_db.py + loadtest.py（負荷試験ハーネス）のテスト
+# ============================================================
+
+@pytest.fixture
+def synthetic_client(tmp_path):
+    """合成DB（小規模）を生成・索引化し、それを読む main の TestClient。"""
+    import gen_synthetic_db
+    db = tmp_path / "botsunichiroku.db"
+    counts = gen_synthetic_db.generate(db, 400, seed=7)
+    gen_synthetic_db.build_index(db, tmp_path / "search_index.db")
+    with patch.dict(os.environ, {"BOTSUNICHIROKU_DB": str(db),
+                                 "INDEX_DB": str(tmp_path / "search_index.db")}):
+        import importlib
+        import main as main_mod
+        importlib.reload(main_mod)
+        with TestClient(main_mod.app) as tc:
+            yield tc, str(db), counts
+
+
+class TestLoadHarness:
+    """合成DBがスキーマ通りで、混合ワークロードが全て成功するか"""
+
+    def test_synthetic_db_ratios(self, synthetic_client):
+        _client, db, counts = synthetic_client
+        assert counts["subtasks"] == 400
+        assert counts["commands"] == 100
+        assert 300 <= counts["reports"] <= 400
+        assert counts["thread_replies"] == 200
+        conn = sqlite3.connect(db)
+        orphans = conn.execute(
+            "SELECT COUNT(*) FROM subtasks s LEFT JOIN commands c ON c.id = s.parent_cmd"
+            " WHERE c.id IS NULL").fetchone()[0]
+        conn.close()
+        assert orphans == 0
+
+    def test_mixed_workload_succeeds(self, synthetic_client):
+        import loadtest
+        client, db, _counts = synthetic_client
+
+        def transport(method, path, params, body):
+            return client.request(method, path, params=params, json=body).status_code
+
+        samples = loadtest.load_samples(db, size=50)
+        result = loadtest.run(transport, samples, loadtest.DEFAULT_MIX, concurrency=1,
+                              requests=60, seed=3)
+        assert result["total"]["requests"] == 60
+        assert result["total"]["errors"] == 0
+        assert set(result["endpoints"]) == set(loadtest.DEFAULT_MIX)
+        total = result["total"]
+        assert total["p50_ms"] <= total["p95_ms"] <= total["p99_ms"] <= total["max_ms"]
+        assert "TOTAL" in loadtest.format_report(result, baseline=result)
+
+    def test_percentile_and_mix(self):
+        import loadtest
+        values = [i / 1000 for i in range(1, 101)]
+        assert loadtest.percentile(values, 50) == 0.05
+        assert loadtest.percentile(values, 99) == 0.099
+        assert loadtest.parse_mix("search=3,orphans")["orphans"] == 1
+        assert loadtest.parse_mix("search=3")["enrich"] == 0